@@ -0,0 +1,305 @@
+# backend/authapi/admin_analytics.py
+"""
+Platform-wide analytics rollups for the admin dashboard
+
+An incremental job folds new scans, signups and logins into hourly and daily
+rollup documents. A stored watermark means each run only reads documents
+created since the previous run. Dashboard endpoints then read a handful of
+rollup documents instead of scanning scans/users.
+
+Runs may overlap (the admin refresh endpoint, the cron script, several
+app workers). Each window is claimed by moving the watermark past it with
+a compare-and-set before it is processed, so no window is ever folded in
+twice. A run that dies mid-window leaves that window short;
+backfill(since=...) rebuilds it.
+
+The job reads the primary: a lagging secondary could hide documents older
+than the watermark for good. Dashboard reads of the rollups are analytics
+workload and may be served by secondaries (see db.for_workload).
+
+Rollup document (analytics_rollups):
+    {_id: "day:2026-10-18", granularity, bucket, scans, quality_sum,
+     quality_count, status: {...}, variety: {...}, signups, logins,
+     scanners: {<hll register>: rank}}
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import db
+from handlers.view_counter import HyperLogLog
+from query_registry import Param, register_query_shape
+
+rollups_collection = db.db["analytics_rollups"]
+state_collection = db.db["analytics_state"]
+
+GRANULARITIES = ("hour", "day")
+WATERMARK_ID = "rollup_watermark"
+# Documents are stamped by the app before insert; leave room for stragglers
+INGEST_LAG = timedelta(minutes=1)
+# Backfills walk history in windows of this size to bound memory
+BACKFILL_WINDOW = timedelta(days=7)
+
+
+def ensure_indexes():
+    """Indexes for rollup reads and for the watermark range scans of the job"""
+    try:
+        rollups_collection.create_index([("granularity", ASCENDING), ("bucket", ASCENDING)])
+        db.users_collection.create_index([("lastLogin", ASCENDING)])
+    except Exception as e:
+        print(f"[ANALYTICS] Error creating indexes: {e}")
+
+
+def _bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_id(bucket: datetime, granularity: str) -> str:
+    fmt = "%Y-%m-%d" if granularity == "day" else "%Y-%m-%dT%H"
+    return f"{granularity}:{bucket.strftime(fmt)}"
+
+
+def _field_key(value: Any) -> str:
+    # Mongo field names cannot contain "." or start with "$"
+    return str(value or "Unknown").replace(".", "_").lstrip("$")
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {
+        "inc": {},
+        "scanners": HyperLogLog()
+    }
+
+
+def _add(bucket: Dict[str, Any], field: str, amount: float) -> None:
+    bucket["inc"][field] = bucket["inc"].get(field, 0) + amount
+
+
+def _scans_pipeline(start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {
+                "hour": {"$dateTrunc": {"date": "$created_at", "unit": "hour"}},
+                "status": "$status",
+                "variety": "$variety"
+            },
+            "scans": {"$sum": 1},
+            "quality_sum": {"$sum": {"$ifNull": ["$quality_score", 0]}},
+            "users": {"$addToSet": "$user_id"}
+        }}
+    ]
+
+
+def _users_pipeline(field: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {field: {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": {"$dateTrunc": {"date": f"${field}", "unit": "hour"}}, "count": {"$sum": 1}}}
+    ]
+
+
+register_query_shape("analytics.scan_window", "scans", pipeline=_scans_pipeline(Param("since"), Param("now")))
+register_query_shape("analytics.signup_window", "users", pipeline=_users_pipeline("createdAt", Param("since"), Param("now")))
+register_query_shape("analytics.login_window", "users", pipeline=_users_pipeline("lastLogin", Param("since"), Param("now")))
+
+
+def _collect_scans(start: datetime, end: datetime, buckets: Dict) -> int:
+    """Fold scans created in [start, end) into hourly/daily buckets"""
+    pipeline = _scans_pipeline(start, end)
+    rows = (
+        row
+        for collection, _, _ in db.scan_sources_between(start, end)
+        for row in collection.aggregate(pipeline, allowDiskUse=True)
+    )
+
+    total = 0
+    for row in rows:
+        hour = row["_id"]["hour"]
+        for granularity in GRANULARITIES:
+            key = (granularity, _bucket_start(hour, granularity))
+            bucket = buckets.setdefault(key, _new_bucket())
+            _add(bucket, "scans", row["scans"])
+            _add(bucket, "quality_sum", row["quality_sum"])
+            _add(bucket, "quality_count", row["scans"])
+            _add(bucket, f"status.{_field_key(row['_id']['status'])}", row["scans"])
+            _add(bucket, f"variety.{_field_key(row['_id']['variety'])}", row["scans"])
+            for user_id in row["users"]:
+                bucket["scanners"].add(str(user_id))
+        total += row["scans"]
+    return total
+
+
+def _collect_users(field: str, counter: str, start: datetime, end: datetime, buckets: Dict) -> int:
+    """Count users whose `field` timestamp falls in [start, end)"""
+    rows = db.users_collection.aggregate(_users_pipeline(field, start, end))
+    total = 0
+    for row in rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, _bucket_start(row["_id"], granularity))
+            _add(buckets.setdefault(key, _new_bucket()), counter, row["count"])
+        total += row["count"]
+    return total
+
+
+def _write_buckets(buckets: Dict) -> None:
+    ops = []
+    for (granularity, bucket_start), bucket in buckets.items():
+        update: Dict[str, Any] = {"$setOnInsert": {"granularity": granularity, "bucket": bucket_start}}
+        if bucket["inc"]:
+            update["$inc"] = bucket["inc"]
+        registers = bucket["scanners"].sparse()
+        if registers:
+            update["$max"] = {f"scanners.{i}": r for i, r in registers.items()}
+        ops.append(UpdateOne({"_id": _bucket_id(bucket_start, granularity)}, update, upsert=True))
+    if ops:
+        rollups_collection.bulk_write(ops, ordered=False)
+
+
+def process_window(start: datetime, end: datetime) -> Dict[str, int]:
+    """Fold every scan, signup and login in [start, end) into the rollups"""
+    buckets: Dict = {}
+    stats = {
+        "scans": _collect_scans(start, end, buckets),
+        # Users only keep their latest login, so logins count users per hour
+        "signups": _collect_users("createdAt", "signups", start, end, buckets),
+        "logins": _collect_users("lastLogin", "logins", start, end, buckets),
+    }
+    _write_buckets(buckets)
+    return stats
+
+
+def _first_activity() -> Optional[datetime]:
+    firsts = [
+        collection.find_one({"created_at": {"$type": "date"}}, {"created_at": 1}, sort=[("created_at", ASCENDING)])
+        for collection, _, _ in db.scan_sources()
+    ]
+    first_user = db.users_collection.find_one({"createdAt": {"$type": "date"}}, {"createdAt": 1}, sort=[("createdAt", ASCENDING)])
+    candidates = [d["created_at"] for d in firsts if d] + ([first_user["createdAt"]] if first_user else [])
+    return min(candidates) if candidates else None
+
+
+def _claim_window(until: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Move the watermark over the next window before it is processed
+
+    Returns (start, end) for the caller to process, or None once the
+    watermark has reached `until`.
+    """
+    while True:
+        state = state_collection.find_one({"_id": WATERMARK_ID}) or {}
+        watermark = state.get("watermark")
+        start = watermark or _first_activity()
+        if start is None or start >= until:
+            return None
+        end = min(start + BACKFILL_WINDOW, until)
+        try:
+            # Only matches if no other run moved the watermark since the read
+            result = state_collection.update_one(
+                {"_id": WATERMARK_ID, "watermark": watermark},
+                {"$set": {"watermark": end, "updated_at": datetime.utcnow()}},
+                upsert=watermark is None
+            )
+            if result.modified_count or result.upserted_id is not None:
+                return start, end
+        except DuplicateKeyError:
+            # A concurrent first run created the state document
+            pass
+
+
+def run_incremental(until: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Process everything newer than the stored watermark, in bounded windows,
+    claiming each window before processing it
+    """
+    until = until or (datetime.utcnow() - INGEST_LAG)
+    totals = {"scans": 0, "signups": 0, "logins": 0, "windows": 0}
+    while True:
+        window = _claim_window(until)
+        if window is None:
+            return totals
+        stats = process_window(*window)
+        for key, value in stats.items():
+            totals[key] += value
+        totals["windows"] += 1
+
+
+def backfill(since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Rebuild rollups from `since` (default: all history) up to now"""
+    if since is None:
+        rollups_collection.delete_many({})
+        state_collection.delete_one({"_id": WATERMARK_ID})
+    else:
+        since = _bucket_start(since, "day")
+        rollups_collection.delete_many({"bucket": {"$gte": since}})
+        state_collection.update_one({"_id": WATERMARK_ID}, {"$set": {"watermark": since}}, upsert=True)
+    return run_incremental()
+
+
+def _present(doc: Dict[str, Any]) -> Dict[str, Any]:
+    sketch = HyperLogLog()
+    sketch.merge_registers(doc.get("scanners", {}))
+    quality_count = doc.get("quality_count", 0)
+    return {
+        "bucket": doc["bucket"].isoformat(),
+        "scans": doc.get("scans", 0),
+        "avg_quality": round(doc.get("quality_sum", 0) / quality_count, 1) if quality_count else 0,
+        "status": doc.get("status", {}),
+        "variety": doc.get("variety", {}),
+        "active_scanners": sketch.estimate(),
+        "signups": doc.get("signups", 0),
+        "logins": doc.get("logins", 0)
+    }
+
+
+def get_rollups(granularity: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Rollup buckets in [start, end), oldest first"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+    cursor = db.analytics(rollups_collection).find(
+        {"granularity": granularity, "bucket": {"$gte": _bucket_start(start, granularity), "$lt": end}}
+    ).sort("bucket", ASCENDING)
+    return [_present(doc) for doc in cursor]
+
+
+register_query_shape(
+    "analytics.rollups", "analytics_rollups",
+    {"granularity": Param("granularity"), "bucket": {"$gte": Param("since"), "$lt": Param("now")}},
+    sort=[("bucket", ASCENDING)]
+)
+
+
+def get_summary(start: datetime, end: datetime) -> Dict[str, Any]:
+    """Totals over [start, end) merged from the daily rollups"""
+    merged: Dict[str, Any] = {"scans": 0, "quality_sum": 0, "quality_count": 0, "signups": 0, "logins": 0,
+                              "status": {}, "variety": {}}
+    sketch = HyperLogLog()
+    days = 0
+    for doc in db.analytics(rollups_collection).find({"granularity": "day", "bucket": {"$gte": _bucket_start(start, "day"), "$lt": end}}):
+        days += 1
+        for field in ("scans", "quality_sum", "quality_count", "signups", "logins"):
+            merged[field] += doc.get(field, 0)
+        for field in ("status", "variety"):
+            for key, value in doc.get(field, {}).items():
+                merged[field][key] = merged[field].get(key, 0) + value
+        sketch.merge_registers(doc.get("scanners", {}))
+
+    state = db.analytics(state_collection).find_one({"_id": WATERMARK_ID}) or {}
+    return {
+        "scans": merged["scans"],
+        "avg_quality": round(merged["quality_sum"] / merged["quality_count"], 1) if merged["quality_count"] else 0,
+        "status": merged["status"],
+        "variety": merged["variety"],
+        "active_scanners": sketch.estimate(),
+        "signups": merged["signups"],
+        "logins": merged["logins"],
+        "days": days,
+        "up_to": state["watermark"].isoformat() if state.get("watermark") else None
+    }
+
+
+ensure_indexes()
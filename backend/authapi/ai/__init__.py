@@ -2,11 +2,13 @@
 from .yolo_detector import (
     YOLODetector,
     create_yolo_detector,
-    get_yolo_detector
+    get_yolo_detector,
+    analyze_detections
 )
 
 __all__ = [
     'YOLODetector',
     'create_yolo_detector',
-    'get_yolo_detector'
+    'get_yolo_detector',
+    'analyze_detections'
 ]
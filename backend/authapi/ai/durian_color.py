@@ -37,8 +37,10 @@ def load_color_model(model_path: Optional[str] = None):
 	_color_model = model
 	return _color_model
 
-def preprocess_image(img_path: str, target_size=(224, 224)):
-	img = Image.open(img_path).convert('RGB')
+def preprocess_image(img_path, target_size=(224, 224)):
+	# Accepts an already decoded PIL image so callers don't decode twice
+	img = img_path if isinstance(img_path, Image.Image) else Image.open(img_path)
+	img = img.convert('RGB')
 	transform = transforms.Compose([
 		transforms.Resize(target_size),
 		transforms.ToTensor(),
@@ -47,11 +49,11 @@ def preprocess_image(img_path: str, target_size=(224, 224)):
 	x = transform(img).unsqueeze(0)  # Add batch dim
 	return x
 
-def get_durian_color(image_path: str, model_path: Optional[str] = None) -> Dict[str, Any]:
+def get_durian_color(image_path, model_path: Optional[str] = None) -> Dict[str, Any]:
 	"""
 	Predict durian color class from image using EfficientNetB0 (PyTorch)
 	Args:
-		image_path: Path to image file
+		image_path: Path to image file, or a decoded PIL image
 		model_path: Optional path to .pth model
 	Returns:
 		Dict with prediction result
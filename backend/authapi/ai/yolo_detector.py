@@ -173,59 +173,7 @@ class YOLODetector:
         """
         Analyze detections and provide insights
         """
-        if not detections:
-            return {
-                "found": False,
-                "message": "No durians detected in image",
-                "recommendation": "Try taking a clearer photo with better lighting"
-            }
-        
-        # Count by class
-        class_counts = {}
-        for det in detections:
-            cls = det["class_name"]
-            class_counts[cls] = class_counts.get(cls, 0) + 1
-        
-        # Average confidence
-        avg_confidence = sum(d["confidence"] for d in detections) / len(detections)
-        
-        # Primary detection info
-        primary = detections[0]
-        
-        return {
-            "found": True,
-            "total_count": len(detections),
-            "class_breakdown": class_counts,
-            "average_confidence": round(avg_confidence, 3),
-            "primary_class": primary["class_name"],
-            "primary_confidence": round(primary["confidence"], 3),
-            "quality_score": self._calculate_quality_score(primary),
-            "recommendation": self._get_recommendation(primary)
-        }
-    
-    def _calculate_quality_score(self, detection: Dict) -> float:
-        """Calculate a quality score based on detection"""
-        # Base score from confidence
-        score = detection["confidence"] * 100
-        
-        # Adjust based on bbox size (larger = better scan)
-        bbox = detection["bbox_normalized"]
-        size_factor = (bbox["width"] * bbox["height"]) * 0.5
-        score += size_factor * 20
-        
-        return min(round(score, 1), 100)
-    
-    def _get_recommendation(self, detection: Dict) -> str:
-        """Get recommendation based on detection"""
-        conf = detection["confidence"]
-        class_name = detection["class_name"].lower()
-        
-        if conf > 0.8:
-            return f"High confidence detection of {class_name}. Ready for analysis."
-        elif conf > 0.5:
-            return f"Detected {class_name}. Consider retaking for better accuracy."
-        else:
-            return "Low confidence. Try better lighting or closer shot."
+        return analyze_detections(detections)
     
     def test_connection(self) -> Dict[str, Any]:
         """Test if the model is loaded and ready"""
@@ -236,6 +184,69 @@ class YOLODetector:
         }
 
 
+def analyze_detections(detections: List[Dict]) -> Dict[str, Any]:
+    """
+    Analyze detections and provide insights
+
+    Module level so stored scans can re-derive their analysis on read.
+    """
+    if not detections:
+        return {
+            "found": False,
+            "message": "No durians detected in image",
+            "recommendation": "Try taking a clearer photo with better lighting"
+        }
+    
+    # Count by class
+    class_counts = {}
+    for det in detections:
+        cls = det["class_name"]
+        class_counts[cls] = class_counts.get(cls, 0) + 1
+    
+    # Average confidence
+    avg_confidence = sum(d["confidence"] for d in detections) / len(detections)
+    
+    # Primary detection info
+    primary = detections[0]
+    
+    return {
+        "found": True,
+        "total_count": len(detections),
+        "class_breakdown": class_counts,
+        "average_confidence": round(avg_confidence, 3),
+        "primary_class": primary["class_name"],
+        "primary_confidence": round(primary["confidence"], 3),
+        "quality_score": calculate_quality_score(primary),
+        "recommendation": get_recommendation(primary)
+    }
+
+
+def calculate_quality_score(detection: Dict) -> float:
+    """Calculate a quality score based on detection"""
+    # Base score from confidence
+    score = detection["confidence"] * 100
+    
+    # Adjust based on bbox size (larger = better scan)
+    bbox = detection["bbox_normalized"]
+    size_factor = (bbox["width"] * bbox["height"]) * 0.5
+    score += size_factor * 20
+    
+    return min(round(score, 1), 100)
+
+
+def get_recommendation(detection: Dict) -> str:
+    """Get recommendation based on detection"""
+    conf = detection["confidence"]
+    class_name = detection["class_name"].lower()
+    
+    if conf > 0.8:
+        return f"High confidence detection of {class_name}. Ready for analysis."
+    elif conf > 0.5:
+        return f"Detected {class_name}. Consider retaking for better accuracy."
+    else:
+        return "Low confidence. Try better lighting or closer shot."
+
+
 # Factory function
 def create_yolo_detector(model_path: Optional[str] = None) -> YOLODetector:
     """Create a YOLO detector instance"""
@@ -52,6 +52,24 @@ app.register_blueprint(chatbot_bp, url_prefix='/chatbot')
 app.register_blueprint(shop_bp, url_prefix='/shop')
 app.register_blueprint(transaction_bp, url_prefix='/api')   
 
+from password_hasher import PasswordHashingBusy
+
+# Start the password hashing processes now rather than on the first login
+import password_hasher
+password_hasher.warm_up()
+
+# Per-route MongoDB round trips and time (see db_monitoring)
+import db_monitoring
+db_monitoring.init_app(app)
+
+# Verify bearer tokens once per request; the user lands on flask.g
+import auth_middleware
+auth_middleware.init_app(app)
+
+# Deliver queued email from startup, not only after this process queues one
+from handlers import mail_queue
+mail_queue.init_app(app)
+
 
 
 # ---------------------------
@@ -136,6 +154,78 @@ def home():
 
 
 
+@app.route("/metrics", methods=["GET"])
+
+def metrics():
+
+    """MongoDB command and per-route metrics; guarded by METRICS_TOKEN when set"""
+
+    token = os.getenv("METRICS_TOKEN")
+
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    from handlers.mail_queue import get_mail_queue
+
+    from handlers.media_service import get_media_service
+
+    return jsonify({
+        "success": True,
+        "db": db_monitoring.COMMAND_MONITOR.snapshot(),
+        "media": get_media_service().snapshot(),
+        "mail": get_mail_queue().snapshot()
+    })
+
+
+
+@app.route("/media/local/<path:public_id>", methods=["GET"])
+
+def local_media(public_id):
+
+    """Files stored by the local media backend (MEDIA_BACKEND=local)"""
+
+    from flask import send_from_directory
+
+    from handlers.media_service import MEDIA_BACKEND, MEDIA_LOCAL_ROOT
+
+    if MEDIA_BACKEND != "local":
+
+        return jsonify({"success": False, "error": "Endpoint not found"}), 404
+
+    return send_from_directory(MEDIA_LOCAL_ROOT, public_id)
+
+
+
+@app.route("/media/store/<name>", methods=["GET"])
+
+def store_media(name):
+
+    """Files in the content-addressed image store (MEDIA_BACKEND=store)"""
+
+    from flask import send_file
+
+    from handlers.image_store import CACHE_MAX_AGE_SECONDS, ContentStore
+
+    resolved = ContentStore().resolve(name)
+
+    if resolved is None:
+
+        return jsonify({"success": False, "error": "Image not found"}), 404
+
+    path, mimetype, etag = resolved
+
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=CACHE_MAX_AGE_SECONDS)
+
+    response.cache_control.public = True
+
+    response.cache_control.immutable = True
+
+    return response
+
+
+
 @app.route("/status", methods=["GET", "OPTIONS"])
 
 def status():
@@ -184,6 +274,18 @@ def internal_error(error):
 
 
 
+@app.errorhandler(PasswordHashingBusy)
+
+def password_hashing_busy(error):
+
+    response = jsonify({"success": False, "error": "Server busy, please retry"})
+
+    response.headers["Retry-After"] = str(error.retry_after)
+
+    return response, 503
+
+
+
 # ---------------------------
 
 # Run App
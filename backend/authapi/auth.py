@@ -1,8 +1,12 @@
 # backend/authapi/auth.py
 
-from db import users_collection, upload_user_pfp
+from db import users_collection, user_search_fields
 
-from passlib.context import CryptContext
+from handlers.avatar_pipeline import default_avatar, get_avatar_pipeline
+
+from query_registry import Param, register_query_shape
+
+import password_hasher
 
 from jose import jwt
 
@@ -14,9 +18,9 @@ import os
 
 
 
-# Password hashing
+# Password hashing runs in a process pool (see password_hasher)
 
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+PasswordHashingBusy = password_hasher.PasswordHashingBusy
 
 
 
@@ -38,19 +42,13 @@ ACCESS_TOKEN_EXPIRE_HOURS = 24
 
 def hash_password(password: str) -> str:
 
-    return pwd_context.hash(password)
+    return password_hasher.hash_password(password)
 
 
 
 def verify_password(password: str, hashed: str) -> bool:
 
-    try:
-
-        return pwd_context.verify(password, hashed)
-
-    except:
-
-        return password == hashed
+    return password_hasher.verify_password(password, hashed)
 
 
 
@@ -86,7 +84,9 @@ def signup_user(name: str, email: str, password: str, confirm_password: str):
 
         "photoProfile": "https://via.placeholder.com/120",
 
-        "createdAt": datetime.datetime.utcnow()
+        "createdAt": datetime.datetime.utcnow(),
+
+        **user_search_fields(name, email)
 
     })
 
@@ -98,17 +98,24 @@ def login_user(email: str, password: str):
 
     user = users_collection.find_one({"email": email})
 
-    if not user or not verify_password(password, user["password"]):
+    if not user:
+        return {"error": "Invalid credentials"}
+
+    verified, new_hash = password_hasher.verify_and_update(password, user["password"])
+    if not verified:
         return {"error": "Invalid credentials"}
 
     # Prevent login if user is not active
     if not user.get("isActive", True):
         return {"error": "User is deactivated. Please contact support."}
 
-    # Set isLoggedIn True
+    # Set isLoggedIn True; a hash made with old parameters is replaced in the same write
+    login_update = {"isLoggedIn": True, "lastLogin": datetime.datetime.utcnow()}
+    if new_hash:
+        login_update["password"] = new_hash
     users_collection.update_one(
         {"_id": user["_id"]},
-        {"$set": {"isLoggedIn": True, "lastLogin": datetime.datetime.utcnow()}}
+        {"$set": login_update}
     )
 
 
@@ -150,11 +157,16 @@ def login_user(email: str, password: str):
 
 
 
+# Login and both signup paths look users up by email
+register_query_shape("users.by_email", "users", {"email": Param("email")})
+
+
+
 # NEW: Cloudinary signup function
 
 def signup_user_with_pfp(name, email, password, confirm_password, photo_file=None):
 
-    """Signup user with profile picture upload to Cloudinary"""
+    """Signup user; the profile picture is uploaded in the background"""
 
     if password != confirm_password:
 
@@ -172,151 +184,67 @@ def signup_user_with_pfp(name, email, password, confirm_password, photo_file=Non
 
     
 
-    # Create user document first
-
-    user_doc = {
-
-        "name": name,
-
-        "email": email,
-
-        "password": hashed,
-        
-        "role": "user",
-
-        "isLoggedIn": True,
-
-        "createdAt": datetime.datetime.utcnow(),
-
-        "lastLogin": datetime.datetime.utcnow()
-
-    }
-
-
-    
-    # Insert user
-
-    result = users_collection.insert_one(user_doc)
-
-    user_id_obj = result.inserted_id
-    user_id = str(result.inserted_id)
-
-    
-
-    # Handle profile picture
-
-    photo_data = None
+    # Read the photo before responding; the request stream is gone afterwards
 
-    
+    image_data = None
 
     if photo_file:
 
-        try:
-            print(f"[SIGNUP] Photo file received: {photo_file.filename}")
-            print(f"[SIGNUP] Photo file size: {photo_file.content_length}")
-            
-            # Read file directly into bytes without temp file
-            photo_file.seek(0)  # Make sure we're at the start
-            image_data = photo_file.read()
-            print(f"[SIGNUP] Image data read: {len(image_data)} bytes")
-            
-            # Upload to Cloudinary
-
-            print(f"[SIGNUP] Uploading to Cloudinary with user_id: {user_id}")
-            upload_result = upload_user_pfp(
-
-                image_data=image_data,
-
-                user_id=user_id,  
-
-                username=name,
-
-                delete_old=False
-
-            )
-
-            print(f"[SIGNUP] Upload result: {upload_result}")
-            
-
-            if upload_result.get("success"):
-
-                photo_data = {
-
-                    "photoProfile": upload_result.get("photoProfile") or upload_result.get("url"),
-
-                    "photoThumbnail": upload_result.get("photoThumbnail") or upload_result.get("thumbnail"),
-
-                    "photoPublicId": upload_result.get("photoPublicId") or upload_result.get("public_id")
-
-                }
-
-            else:
-
-                # Use default avatar
+        photo_file.seek(0)
 
-                default_url = f"https://ui-avatars.com/api/?name={name[:2]}&background=random&color=fff&size=400"
+        image_data = photo_file.read() or None
 
-                photo_data = {
+        print(f"[SIGNUP] Photo received: {photo_file.filename}, {len(image_data or b'')} bytes")
 
-                    "photoProfile": default_url,
+    else:
 
-                    "photoThumbnail": default_url
+        print(f"[SIGNUP] No photo file provided")
 
-                }
 
-            
 
-        except Exception as e:
+    # Default avatar until the uploaded one is processed
 
-            import traceback
-            print(f"[SIGNUP] PFP upload error: {str(e)}")
-            print(f"[SIGNUP] Error traceback: {traceback.format_exc()}")
+    now = datetime.datetime.utcnow()
 
-            # Use default avatar
+    user = {
 
-            default_url = f"https://ui-avatars.com/api/?name={name[:2]}&background=random&color=fff&size=400"
-
-            photo_data = {
+        "name": name,
 
-                "photoProfile": default_url,
+        "email": email,
 
-                "photoThumbnail": default_url
+        "password": hashed,
+        
+        "role": "user",
 
-            }
+        "isLoggedIn": True,
 
-    else:
-        print(f"[SIGNUP] No photo file provided")
+        "createdAt": now,
 
-        # No photo provided, use default
+        "lastLogin": now,
 
-        default_url = f"https://ui-avatars.com/api/?name={name[:2]}&background=random&color=fff&size=400"
+        **default_avatar(name),
 
-        photo_data = {
+        **user_search_fields(name, email)
 
-            "photoProfile": default_url,
+    }
 
-            "photoThumbnail": default_url
+    if image_data:
 
-        }
-    # Update user with photo data
+        user["photoPending"] = True
 
-    if photo_data:
 
-        users_collection.update_one(
 
-            {"_id": result.inserted_id},
+    result = users_collection.insert_one(user)
 
-            {"$set": photo_data}
+    if image_data:
 
-        )
-    # Get updated user
+        get_avatar_pipeline().submit(result.inserted_id, name, image_data)
 
-    user = users_collection.find_one({"_id": result.inserted_id})
     # Generate JWT token for auto-login
 
     payload = {
 
-        "sub": str(user["_id"]),
+        "sub": str(result.inserted_id),
 
         "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
 
@@ -331,13 +259,14 @@ def signup_user_with_pfp(name, email, password, confirm_password, photo_file=Non
 
         "token": token,  
         "user": {
-            "id": str(user["_id"]),
+            "id": str(result.inserted_id),
             "name": user["name"],
             "email": user["email"],
-            "role": user.get("role", "user"),
-            "photoProfile": user.get("photoProfile"),
-            "photoThumbnail": user.get("photoThumbnail"),
-            "photoPublicId": user.get("photoPublicId"),
+            "role": user["role"],
+            "photoProfile": user["photoProfile"],
+            "photoThumbnail": user["photoThumbnail"],
+            "photoPublicId": None,
+            "photoPending": bool(image_data),
             "createdAt": user["createdAt"]
         }
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,125 @@
+# backend/authapi/auth_middleware.py
+"""
+Bearer-token authentication for every request
+
+init_app registers a before_request hook. It reads
+"Authorization: Bearer <jwt>", verifies the token issued by auth.login_user,
+and puts the user's summary (name, email, role, avatar, isActive) on
+flask.g.current_user. The token's user id is on g.current_user_id.
+
+Requests without a token pass through with g.current_user = None; routes
+that take a user_id in the body keep working. A bad or expired token gets
+401, and a deactivated user gets 403. The /auth blueprint is exempt, so an
+expired token never blocks logging in again.
+
+Verifying a JWT means an HMAC and JSON decoding on every request. Verified
+tokens are kept in an LRU keyed by their signature (AUTH_TOKEN_CACHE_SIZE).
+An entry also stores the signed header.payload, so a hit requires the exact
+token that was verified. The user comes from db.get_user_summary, a
+short-TTL cache that admin deactivation invalidates. A cache miss costs one
+users round trip. It is recorded in the route's metrics but runs
+outside_budget(), so it doesn't count toward any view's @db_budget.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from bson.errors import InvalidId
+from jose import JWTError, jwt
+
+import db
+from auth import JWT_ALGORITHM, JWT_SECRET
+from db_monitoring import outside_budget
+
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 4096))
+
+EXEMPT_BLUEPRINTS = {"auth"}
+# The metrics token travels in the same header
+EXEMPT_ENDPOINTS = {"health", "home", "status", "metrics", "static"}
+
+# signature -> (signed header.payload, user id, exp)
+_verified: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+def verify_token(token: str) -> Optional[str]:
+    """The user id in a valid, unexpired token, or None"""
+    signing_input, _, signature = token.rpartition(".")
+    now = time.time()
+    with _verified_lock:
+        entry = _verified.get(signature)
+        if entry is not None:
+            if entry[0] == signing_input and entry[2] > now:
+                _verified.move_to_end(signature)
+                return entry[1]
+            if entry[2] <= now:
+                del _verified[signature]
+
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+    user_id = claims.get("sub")
+    if not user_id:
+        return None
+
+    with _verified_lock:
+        _verified[signature] = (signing_input, user_id, float(claims.get("exp", now + 60)))
+        while len(_verified) > TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+    return user_id
+
+
+def current_user() -> Optional[Dict[str, Any]]:
+    """Summary of the authenticated user of this request, if any"""
+    from flask import g
+    return g.get("current_user")
+
+
+def request_user(user_id) -> Optional[Dict[str, Any]]:
+    """
+    Summary of `user_id` for stamping name/avatar on new documents
+
+    Uses the request's authenticated user when it is the same user, otherwise
+    the user summary cache. Either way there is no users round trip on a hit.
+    """
+    from flask import g
+    user = g.get("current_user")
+    if user is not None and g.get("current_user_id") == str(user_id):
+        return user
+    return db.get_user_summary(user_id)
+
+
+def init_app(app) -> None:
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def _authenticate():
+        g.current_user = None
+        g.current_user_id = None
+        if request.method == "OPTIONS":
+            return None
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return None
+        if request.blueprint in EXEMPT_BLUEPRINTS or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        user_id = verify_token(header[7:].strip())
+        try:
+            # Shows up in the route's metrics, but isn't part of any view's @db_budget
+            with outside_budget():
+                user = db.get_user_summary(user_id) if user_id else None
+        except InvalidId:
+            user = None
+        if not user:
+            return jsonify({"success": False, "error": "Invalid or expired token"}), 401
+        if not user.get("isActive", True):
+            return jsonify({"success": False, "error": "User is deactivated. Please contact support."}), 403
+
+        g.current_user = user
+        g.current_user_id = user_id
+        return None
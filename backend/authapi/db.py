@@ -1,14 +1,27 @@
 from dotenv import load_dotenv
 import os
-from pymongo import MongoClient
-from datetime import datetime
+import base64
+import heapq
+import re
+import threading
+import time
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from bson import json_util
+from datetime import datetime, timedelta, timezone
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 from io import BytesIO
 import uuid
-from typing import Optional, Dict, Any, List
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from bson import ObjectId
+from bson.errors import InvalidId
+from scan_schema import compact_fields, expand_scan, upgrade_update, unpack_payload
+from query_registry import Param, register_query_shape
+from db_monitoring import COMMAND_MONITOR
 
 # Load .env
 load_dotenv()
@@ -17,10 +30,89 @@ load_dotenv()
 # MongoDB setup
 # ---------------------------
 MONGO_URI = os.getenv("MONGO_URI")
-client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 10000)),
+    # 0 means no limit
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0)) or None,
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0)) or None,
+    # Read preference of request-path (OLTP) queries
+    "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+    # Latency, reply size and per-request round trips (see db_monitoring)
+    "event_listeners": [COMMAND_MONITOR],
+}
+client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
 db = client["durianapp"]
+
+# ---------------------------
+# Workload routing
+# ---------------------------
+# Request-path reads and all writes (OLTP) use the client defaults above.
+# Dashboard and report reads (ANALYTICS) go through handles that prefer
+# secondaries, so they do not compete with saves, likes and logins on the
+# primary. maxStalenessSeconds bounds how far behind those reads may be;
+# MongoDB requires at least 90 seconds (-1 disables the bound).
+OLTP = "oltp"
+ANALYTICS = "analytics"
+
+ANALYTICS_READ_PREFERENCE = os.getenv("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+ANALYTICS_MAX_STALENESS_SECONDS = int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", 120))
+
+_READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _read_preference(mode: str, max_staleness: int):
+    if mode not in _READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary":
+        return Primary()
+    if 0 <= max_staleness < 90:
+        print(f"[DB] maxStalenessSeconds {max_staleness} is below MongoDB's minimum, using 90")
+        max_staleness = 90
+    return _READ_PREFERENCE_MODES[mode](max_staleness=max_staleness)
+
+
+_WORKLOAD_READ_PREFERENCES = {
+    ANALYTICS: _read_preference(ANALYTICS_READ_PREFERENCE, ANALYTICS_MAX_STALENESS_SECONDS),
+}
+_workload_handles: Dict[Any, Any] = {}
+
+
+def for_workload(collection, workload: str = OLTP):
+    """
+    The handle of `collection` to use for a workload
+
+    OLTP returns the collection itself; other workloads get a cached
+    with_options copy carrying their read preference.
+    """
+    if workload == OLTP:
+        return collection
+    key = (collection.full_name, workload)
+    handle = _workload_handles.get(key)
+    if handle is None:
+        handle = collection.with_options(read_preference=_WORKLOAD_READ_PREFERENCES[workload])
+        _workload_handles[key] = handle
+    return handle
+
+
+def analytics(collection):
+    """Shorthand for for_workload(collection, ANALYTICS)"""
+    return for_workload(collection, ANALYTICS)
+
 users_collection = db["users"]
 comments_collection = db["comments"]
+# One document per (target, user) like; posts/comments only keep the counter
+likes_collection = db["likes"]
+# Incrementally maintained counters (e.g. posts per category)
+counters_collection = db["counters"]
 
 # ---------------------------
 # Cloudinary setup
@@ -48,6 +140,263 @@ ACCESS_TOKEN_EXPIRE_HOURS = int(os.getenv("ACCESS_TOKEN_EXPIRE_HOURS", 24))
 def get_db():
     return db
 
+# ---------------------------
+# Keyset pagination helpers
+# ---------------------------
+
+MAX_PAGE_SIZE = 100
+# Legacy liked_by arrays can be huge; they are never shipped to clients
+LISTING_PROJECTION = {"liked_by": 0}
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", 30))
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+_count_cache: Dict[str, Any] = {}
+_count_cache_lock = threading.Lock()
+
+
+def parse_object_id(value: Any, label: str = "id") -> ObjectId:
+    """
+    ObjectId from a route parameter
+
+    Raises:
+        ValueError: if the value is not a valid ObjectId
+    """
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid {label}")
+
+
+def parse_utc_datetime(value: str, label: str = "date") -> datetime:
+    """
+    Naive UTC datetime from an ISO 8601 route parameter
+
+    Stored timestamps are naive UTC. A value with an offset is converted to
+    UTC; one without is taken as UTC already.
+
+    Raises:
+        ValueError: if the value is not an ISO 8601 date or datetime
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid {label}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def clamp_page_size(limit: int) -> int:
+    """Keep client supplied page sizes within sane bounds."""
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str = "created_at") -> Optional[str]:
+    """
+    Build an opaque cursor pointing just past `doc` in (sort_field, _id) order
+    """
+    if not isinstance(doc.get("_id"), ObjectId):
+        return None
+    raw = json_util.dumps([sort_field, doc.get(sort_field), doc["_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str = "created_at") -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor for the same sort_field
+
+    Raises:
+        ValueError: if the cursor is malformed or was issued for another sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        field, value, oid = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if field != sort_field or not isinstance(oid, ObjectId):
+        raise ValueError("Invalid cursor")
+    return {"value": value, "_id": oid}
+
+
+def _after_position(sort_field: str, position: Dict[str, Any], direction: int, nullable: bool) -> Dict[str, Any]:
+    """Filter matching documents strictly after `position` in (sort_field, _id) order"""
+    op = "$lt" if direction == DESCENDING else "$gt"
+    value = position["value"]
+    same_value = {sort_field: value, "_id": {op: position["_id"]}}
+
+    if value is None:
+        # Missing values sort lowest: descending has nothing below them,
+        # ascending continues with every non-null value
+        if direction == DESCENDING:
+            return same_value
+        return {"$or": [{sort_field: {"$ne": None}}, same_value]}
+
+    clauses = [{sort_field: {op: value}}, same_value]
+    if nullable and direction == DESCENDING:
+        # Range operators never match missing values, so add them back explicitly
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+
+def paginate(
+    collection,
+    query: Dict[str, Any],
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    direction: int = DESCENDING,
+    projection: Optional[Dict[str, Any]] = None,
+    sort_field: str = "created_at",
+    nullable: bool = False
+) -> Dict[str, Any]:
+    """
+    Page through `collection` ordered by (sort_field, _id).
+
+    With a cursor the page starts right after the cursor position, so a deep
+    page costs the same index seek as the first one. `skip` is only honoured
+    when no cursor is given, for older clients. Pass nullable=True when some
+    documents may lack sort_field.
+
+    Returns:
+        {"items": [...], "next_cursor": str or None}
+    """
+    limit = clamp_page_size(limit)
+    if projection and any(v for k, v in projection.items() if k != "_id"):
+        # Inclusion projections must keep the sort key for the next cursor
+        projection = dict(projection, **{sort_field: 1})
+    if cursor:
+        after = _after_position(sort_field, decode_cursor(cursor, sort_field), direction, nullable)
+        query = {"$and": [query, after]} if query else after
+
+    find = collection.find(query, projection).sort([(sort_field, direction), ("_id", direction)])
+    if skip and not cursor:
+        find = find.skip(skip)
+    items = list(find.limit(limit + 1))
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1], sort_field)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def cached_count(collection, query: Dict[str, Any], ttl: int = COUNT_CACHE_TTL_SECONDS) -> int:
+    """count_documents with a short-lived in-process cache keyed by query shape and values"""
+    key = f"{collection.name}:{json_util.dumps(query, sort_keys=True)}"
+    now = time.monotonic()
+    with _count_cache_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    total = collection.count_documents(query)
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            for stale in [k for k, (expires, _) in _count_cache.items() if expires <= now]:
+                del _count_cache[stale]
+            if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+                _count_cache.clear()
+        _count_cache[key] = (now + ttl, total)
+    return total
+
+
+# ---------------------------
+# Counting helpers
+# ---------------------------
+
+def estimated_count(collection, ttl: int = COUNT_CACHE_TTL_SECONDS) -> int:
+    """Unfiltered total from collection metadata instead of an index/collection walk"""
+    key = f"{collection.name}:estimated"
+    now = time.monotonic()
+    with _count_cache_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    total = collection.estimated_document_count()
+    with _count_cache_lock:
+        _count_cache[key] = (now + ttl, total)
+    return total
+
+
+# Written once the counters hold every existing post. Until then an $inc
+# would create a partial counter, so the first write or read rebuilds instead.
+CATEGORY_COUNTS_MARKER = "post_category:bootstrapped"
+_category_counts_bootstrapped = False
+
+
+def _ensure_category_counts() -> bool:
+    """Bootstrap the per-category counters if that never happened; True if this call did it"""
+    global _category_counts_bootstrapped
+    if _category_counts_bootstrapped:
+        return False
+    if counters_collection.find_one({"_id": CATEGORY_COUNTS_MARKER}, {"_id": 1}):
+        _category_counts_bootstrapped = True
+        return False
+    rebuild_category_counts()
+    return True
+
+
+def adjust_category_count(category: str, delta: int) -> None:
+    """Keep the per-category post counter in step with a post insert (+1) or delete (-1)"""
+    if not category:
+        return
+    # The rebuild already counted this post
+    if _ensure_category_counts():
+        return
+    counters_collection.update_one(
+        {"_id": f"post_category:{category}"},
+        {"$inc": {"count": delta}, "$set": {"scope": "post_category", "key": category}},
+        upsert=True
+    )
+
+
+def rebuild_category_counts() -> Dict[str, int]:
+    """Recompute the per-category counters from posts (initial fill / reconciliation)"""
+    global _category_counts_bootstrapped
+    # Marked first: posts inserted while aggregating are $inc'ed and then
+    # overwritten by the aggregate that already includes them
+    counters_collection.update_one(
+        {"_id": CATEGORY_COUNTS_MARKER},
+        {"$set": {"scope": "post_category_state", "bootstrapped_at": datetime.utcnow()}},
+        upsert=True
+    )
+    _category_counts_bootstrapped = True
+    counts = {
+        row["_id"]: row["count"]
+        for row in posts_collection.aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}])
+        if row["_id"]
+    }
+    counters_collection.delete_many({"scope": "post_category", "key": {"$nin": list(counts)}})
+    for category, count in counts.items():
+        counters_collection.update_one(
+            {"_id": f"post_category:{category}"},
+            {"$set": {"scope": "post_category", "key": category, "count": count}},
+            upsert=True
+        )
+    return counts
+
+
+def category_counts() -> Dict[str, int]:
+    """Per-category post counts, read from the incremental counters"""
+    _ensure_category_counts()
+    counts = {doc["key"]: doc["count"] for doc in counters_collection.find({"scope": "post_category"})}
+    return {category: count for category, count in counts.items() if count > 0}
+
+# One document per category: a scan of the (tiny) counters collection is fine
+register_query_shape("counters.post_categories", "counters", {"scope": "post_category"}, allow=("COLLSCAN",))
+
+
+def count_posts(query: Dict[str, Any]) -> int:
+    """Total for a posts listing, using the cheapest source that is exact enough"""
+    if not query:
+        return estimated_count(posts_collection)
+    if set(query) == {"category"} and isinstance(query["category"], str):
+        return category_counts().get(query["category"], 0)
+    return cached_count(posts_collection, query)
+
 def set_logged_in(user_id: str, is_logged_in: bool):
     """Update the user's login status."""
     users_collection.update_one(
@@ -56,6 +405,58 @@ def set_logged_in(user_id: str, is_logged_in: bool):
         upsert=False
     )
 
+# Every route that loads or updates a user by id
+register_query_shape("users.by_id", "users", {"_id": Param("user_id")})
+
+# ---------------------------
+# User summary cache
+# ---------------------------
+# Routes that stamp a user's name/avatar on a post, comment or scan, and the
+# auth middleware checking isActive, read these few fields on every request.
+# Entries live USER_CACHE_TTL_SECONDS; every write to them calls
+# invalidate_user_summary, so only other workers can see stale values, and
+# only until the TTL runs out.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_SUMMARY_PROJECTION = {
+    "name": 1, "email": 1, "role": 1, "photoProfile": 1, "photoThumbnail": 1, "isActive": 1
+}
+_user_cache: "OrderedDict[ObjectId, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def get_user_summary(user_id) -> Optional[Dict[str, Any]]:
+    """
+    A user's display fields and isActive, from a short-TTL cache
+
+    The returned dict is shared between requests; do not mutate it.
+    Unknown users are not cached, so a just-created account is found.
+    """
+    user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_oid)
+        if entry and entry[0] > now:
+            _user_cache.move_to_end(user_oid)
+            return entry[1]
+
+    user = users_collection.find_one({"_id": user_oid}, USER_SUMMARY_PROJECTION)
+    if user:
+        with _user_cache_lock:
+            _user_cache[user_oid] = (now + USER_CACHE_TTL_SECONDS, user)
+            _user_cache.move_to_end(user_oid)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+def invalidate_user_summary(user_id) -> None:
+    """Drop a user from the summary cache after changing name, avatar, role or status"""
+    try:
+        user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+    except Exception:
+        return
+    with _user_cache_lock:
+        _user_cache.pop(user_oid, None)
+
 def update_photo_profile(user_id: str, photo_url: str, photo_public_id: Optional[str] = None):
     """Update the user's profile photo."""
     update_data = {"photoProfile": photo_url}
@@ -67,11 +468,14 @@ def update_photo_profile(user_id: str, photo_url: str, photo_public_id: Optional
         {"$set": update_data},
         upsert=False
     )
+    invalidate_user_summary(user_id)
 
 #comments
 
 # Posts collection
 posts_collection = db["posts"]
+# HyperLogLog registers for unique-viewer counting (see handlers/view_counter.py)
+post_view_sketches_collection = db["post_view_sketches"]
 
 def create_comment(user_id: str, post_id: str, content: str) -> Optional[Dict[str, Any]]:
     """
@@ -81,7 +485,7 @@ def create_comment(user_id: str, post_id: str, content: str) -> Optional[Dict[st
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
         post_oid = ObjectId(post_id) if not isinstance(post_id, ObjectId) else post_id
 
-        user = users_collection.find_one({"_id": user_oid})
+        user = get_user_summary(user_oid)
         if not user:
             return None
 
@@ -96,7 +500,6 @@ def create_comment(user_id: str, post_id: str, content: str) -> Optional[Dict[st
             "post_id": post_oid,
             "content": content,
             "likes": 0,
-            "liked_by": [],
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -128,6 +531,24 @@ def get_comments_by_post(post_id: str, limit: int = 50, skip: int = 0) -> List[D
         return []
 
 
+def get_comments_page(post_id: str, limit: int = 50, cursor: Optional[str] = None, skip: int = 0) -> Dict[str, Any]:
+    """
+    Get one page of comments for a post, oldest first
+
+    Raises:
+        ValueError: if the post id or cursor is malformed
+    """
+    post_oid = parse_object_id(post_id, "post id")
+    page = paginate(comments_collection, {"post_id": post_oid}, limit=limit, cursor=cursor, skip=skip,
+                    direction=ASCENDING, projection=LISTING_PROJECTION)
+    return {"comments": page["items"], "next_cursor": page["next_cursor"]}
+
+register_query_shape(
+    "comments.page", "comments", {"post_id": Param("post_id")},
+    sort=[("created_at", ASCENDING), ("_id", ASCENDING)], projection=LISTING_PROJECTION, limit=51
+)
+
+
 def get_comment_count(post_id: str) -> int:
     try:
         post_oid = ObjectId(post_id) if not isinstance(post_id, ObjectId) else post_id
@@ -136,33 +557,86 @@ def get_comment_count(post_id: str) -> int:
         print(f"[DB] Error counting comments: {e}")
         return 0
 
+register_query_shape("comments.count_by_post", "comments", {"post_id": Param("post_id")})
 
-def like_comment(comment_id: str, user_id: str) -> Optional[Dict[str, Any]]:
-    """Toggle like/unlike for a comment"""
+
+def toggle_like(collection, doc_id: ObjectId, user_oid: ObjectId) -> Optional[Dict[str, Any]]:
+    """
+    Like/unlike a post or comment
+
+    The unique (target_id, user_id) index on likes decides the direction:
+    inserting succeeds for a new like, a duplicate means the user is
+    unliking. The denormalized counter on the target is then adjusted and
+    read back in the same write.
+
+    Since likes moved out of the liked_by arrays this is no longer one atomic
+    round trip. A like costs two (insert, counter) and an unlike three
+    (failed insert, delete, counter). The like record is the source of
+    truth and the counter follows it: between the two writes a reader can
+    see the old count, and a crash in that window leaves the counter off by
+    one until `scripts/migrate_likes.py --recount` resets it.
+
+    Returns:
+        {"likes": int, "liked": bool} or None if the document does not exist
+    """
     try:
-        comment_oid = ObjectId(comment_id) if not isinstance(comment_id, ObjectId) else comment_id
-        user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+        likes_collection.insert_one({
+            "target_id": doc_id,
+            "target_type": collection.name,
+            "user_id": user_oid,
+            "created_at": datetime.utcnow()
+        })
+        delta = 1
+    except DuplicateKeyError:
+        result = likes_collection.delete_one({"target_id": doc_id, "user_id": user_oid})
+        # A concurrent unlike may already have removed it
+        delta = -result.deleted_count
+
+    doc = collection.find_one_and_update(
+        {"_id": doc_id},
+        {"$inc": {"likes": delta}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "likes": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is None:
+        if delta > 0:
+            likes_collection.delete_one({"target_id": doc_id, "user_id": user_oid})
+        return None
+    return {"likes": doc.get("likes", 0), "liked": delta > 0}
 
-        comment = comments_collection.find_one({"_id": comment_oid})
-        if not comment:
-            return None
+register_query_shape("likes.by_target_user", "likes", {"target_id": Param("post_id"), "user_id": Param("user_id")})
 
-        liked_by = comment.get("liked_by", [])
 
-        if user_oid in liked_by:
-            comments_collection.update_one(
-                {"_id": comment_oid},
-                {"$pull": {"liked_by": user_oid}, "$inc": {"likes": -1}, "$set": {"updated_at": datetime.utcnow()}}
-            )
-            liked = False
-        else:
-            comments_collection.update_one(
-                {"_id": comment_oid},
-                {"$addToSet": {"liked_by": user_oid}, "$inc": {"likes": 1}, "$set": {"updated_at": datetime.utcnow()}}
-            )
-            liked = True
+def liked_targets(user_id: Optional[str], target_ids: List[ObjectId]) -> set:
+    """
+    Return which of target_ids the user has liked, with one $in query
 
-        return comments_collection.find_one({"_id": comment_oid})
+    Used to build the per-page liked_by_me flag for the viewer.
+    """
+    if not user_id or not target_ids:
+        return set()
+    try:
+        user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+    except Exception:
+        return set()
+    cursor = likes_collection.find(
+        {"target_id": {"$in": list(target_ids)}, "user_id": user_oid},
+        {"_id": 0, "target_id": 1}
+    )
+    return {like["target_id"] for like in cursor}
+
+register_query_shape(
+    "likes.liked_targets", "likes", {"target_id": {"$in": Param("post_ids")}, "user_id": Param("user_id")},
+    projection={"_id": 0, "target_id": 1}
+)
+
+
+def like_comment(comment_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Toggle like/unlike for a comment"""
+    try:
+        comment_oid = ObjectId(comment_id) if not isinstance(comment_id, ObjectId) else comment_id
+        user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
+        return toggle_like(comments_collection, comment_oid, user_oid)
     except Exception as e:
         print(f"[DB] Error liking comment: {e}")
         return None
@@ -196,6 +670,7 @@ def delete_comment(comment_id: str, user_id: str) -> bool:
 
         result = comments_collection.delete_one({"_id": comment_oid, "user_id": user_oid})
         if result.deleted_count > 0:
+            likes_collection.delete_many({"target_id": comment_oid})
             # Decrement replies on post
             try:
                 posts_collection.update_one({"_id": comment.get("post_id")}, {"$inc": {"replies": -1}})
@@ -222,8 +697,7 @@ def has_user_liked_comment(comment_id: str, user_id: str) -> bool:
     try:
         comment_oid = ObjectId(comment_id) if not isinstance(comment_id, ObjectId) else comment_id
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
-        comment = comments_collection.find_one({"_id": comment_oid, "liked_by": user_oid})
-        return comment is not None
+        return likes_collection.find_one({"target_id": comment_oid, "user_id": user_oid}, {"_id": 1}) is not None
     except Exception as e:
         print(f"[DB] Error checking like status: {e}")
         return False
@@ -236,7 +710,7 @@ def has_user_liked_comment(comment_id: str, user_id: str) -> bool:
 def create_post(user_id: str, title: str, content: str, category: str) -> Optional[Dict[str, Any]]:
     try:
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
-        user = users_collection.find_one({"_id": user_oid})
+        user = get_user_summary(user_oid)
         if not user:
             return None
 
@@ -250,14 +724,16 @@ def create_post(user_id: str, title: str, content: str, category: str) -> Option
             "replies": 0,
             "views": 0,
             "likes": 0,
-            "liked_by": [],
             "is_pinned": False,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
+        from forum_search import search_fields
+        post_data.update(search_fields(title))
 
         result = posts_collection.insert_one(post_data)
         if result.inserted_id:
+            adjust_category_count(category, 1)
             return posts_collection.find_one({"_id": result.inserted_id})
         return None
     except Exception as e:
@@ -265,64 +741,78 @@ def create_post(user_id: str, title: str, content: str, category: str) -> Option
         return None
 
 
-def get_post(post_id: str, increment_views: bool = True) -> Optional[Dict[str, Any]]:
+def get_post(post_id: str, increment_views: bool = True, viewer: Optional[str] = None) -> Optional[Dict[str, Any]]:
     try:
         post_oid = ObjectId(post_id) if not isinstance(post_id, ObjectId) else post_id
-        post = posts_collection.find_one({"_id": post_oid})
+        post = posts_collection.find_one({"_id": post_oid}, LISTING_PROJECTION)
         if not post:
             return None
         if increment_views:
-            posts_collection.update_one({"_id": post_oid}, {"$inc": {"views": 1}})
-        return posts_collection.find_one({"_id": post_oid})
+            from handlers.view_counter import get_view_counter
+            counter = get_view_counter()
+            counter.record(post_oid, viewer)
+            post["views"] = post.get("views", 0) + counter.pending(post_oid)
+        return post
     except Exception as e:
         print(f"[DB] Error getting post: {e}")
         return None
 
+register_query_shape("posts.by_id", "posts", {"_id": Param("post_id")}, projection=LISTING_PROJECTION)
 
-def get_posts(category: str = "All", limit: int = 50, skip: int = 0, search: str = "") -> Dict[str, Any]:
-    try:
-        query = {}
-        if category and category != "All":
-            query["category"] = category
-        if search:
-            query["$or"] = [
-                {"title": {"$regex": search, "$options": "i"}},
-                {"content": {"$regex": search, "$options": "i"}},
-                {"username": {"$regex": search, "$options": "i"}}
-            ]
-
-        posts = list(posts_collection.find(query).sort("created_at", -1).skip(skip).limit(limit))
-        total = posts_collection.count_documents(query)
-        return {"posts": posts, "total": total}
-    except Exception as e:
-        print(f"[DB] Error getting posts: {e}")
-        return {"posts": [], "total": 0}
+
+def get_posts(
+    category: str = "All",
+    limit: int = 50,
+    skip: int = 0,
+    search: str = "",
+    cursor: Optional[str] = None,
+    include_total: bool = True
+) -> Dict[str, Any]:
+    """
+    Get one page of posts, newest first
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    query = {}
+    if category and category != "All":
+        query["category"] = category
+    if search:
+        from forum_search import text_query
+        search_query = text_query(search)
+        if search_query is None:
+            return {"posts": [], "next_cursor": None, "total": 0} if include_total else {"posts": [], "next_cursor": None}
+        query.update(search_query)
+
+    page = paginate(posts_collection, query, limit=limit, cursor=cursor, skip=skip, projection=LISTING_PROJECTION)
+    result = {"posts": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        result["total"] = count_posts(query)
+    return result
+
+register_query_shape(
+    "posts.page", "posts", {}, sort=[("created_at", DESCENDING), ("_id", DESCENDING)],
+    projection=LISTING_PROJECTION, limit=51
+)
+register_query_shape(
+    "posts.page_by_category", "posts", {"category": Param("category")},
+    sort=[("created_at", DESCENDING), ("_id", DESCENDING)], projection=LISTING_PROJECTION, limit=51
+)
+register_query_shape(
+    "posts.page_after_cursor", "posts",
+    {"$and": [{"category": Param("category")}, _after_position(
+        "created_at", {"value": Param("post_created_at"), "_id": Param("post_id")}, DESCENDING, False
+    )]},
+    sort=[("created_at", DESCENDING), ("_id", DESCENDING)], projection=LISTING_PROJECTION, limit=51
+)
 
 
 def like_post(post_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Toggle like/unlike for a post"""
     try:
         post_oid = ObjectId(post_id) if not isinstance(post_id, ObjectId) else post_id
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
-
-        post = posts_collection.find_one({"_id": post_oid})
-        if not post:
-            return None
-
-        liked_by = post.get("liked_by", [])
-        if user_oid in liked_by:
-            posts_collection.update_one(
-                {"_id": post_oid},
-                {"$pull": {"liked_by": user_oid}, "$inc": {"likes": -1}, "$set": {"updated_at": datetime.utcnow()}}
-            )
-            liked = False
-        else:
-            posts_collection.update_one(
-                {"_id": post_oid},
-                {"$addToSet": {"liked_by": user_oid}, "$inc": {"likes": 1}, "$set": {"updated_at": datetime.utcnow()}}
-            )
-            liked = True
-
-        return posts_collection.find_one({"_id": post_oid})
+        return toggle_like(posts_collection, post_oid, user_oid)
     except Exception as e:
         print(f"[DB] Error liking post: {e}")
         return None
@@ -330,9 +820,9 @@ def like_post(post_id: str, user_id: str) -> Optional[Dict[str, Any]]:
 
 def get_forum_stats() -> Dict[str, int]:
     try:
-        total_posts = posts_collection.count_documents({})
-        total_comments = comments_collection.count_documents({})
-        total_users = users_collection.count_documents({})
+        total_posts = estimated_count(analytics(posts_collection))
+        total_comments = estimated_count(analytics(comments_collection))
+        total_users = estimated_count(analytics(users_collection))
         return {"total_posts": total_posts, "total_comments": total_comments, "total_users": total_users}
     except Exception as e:
         print(f"[DB] Error getting stats: {e}")
@@ -342,6 +832,50 @@ def get_forum_stats() -> Dict[str, int]:
 # Cloudinary PFP Functions
 # ---------------------------
 
+def upload_pfp_image(image_data: bytes, user_id, username: str) -> Dict[str, Any]:
+    """
+    Upload a profile picture to Cloudinary without touching MongoDB
+
+    Returns photoProfile, photoThumbnail and photoPublicId; raises on failure
+    so callers can retry (see handlers/avatar_pipeline.py).
+    """
+    # Generate unique public ID
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    public_id = f"users/{user_id}/pfp_{username}_{timestamp}"
+
+    # Upload to Cloudinary with face detection and auto-crop
+    print(f"[DB] Uploading image to Cloudinary: {len(image_data)} bytes")
+    print(f"[DB] Public ID: {public_id}")
+
+    from handlers.media_service import get_media_service
+    uploaded = get_media_service().upload(
+        image_data,
+        public_id=public_id,
+        folder=f"users/{user_id}",
+        overwrite=True,
+        transformation=[
+            {"width": 500, "height": 500, "crop": "fill", "gravity": "face"},
+            {"quality": "auto:good"},
+            {"fetch_format": "auto"}
+        ],
+        thumbnail={
+            "width": 150, "height": 150, "crop": "fill", "gravity": "face",
+            "quality": "auto:good", "fetch_format": "auto"
+        }
+    )
+    if not uploaded["url"]:
+        raise RuntimeError(f"Upload returned no URL: {uploaded}")
+
+    print(f"[DB] Secure URL: {uploaded['url']}")
+
+    return {
+        "photoProfile": uploaded["url"],
+        "photoThumbnail": uploaded["thumbnail_url"],
+        "photoPublicId": uploaded["public_id"],
+        "format": uploaded["format"],
+        "size": uploaded["size"]
+    }
+
 def upload_user_pfp(
     image_data: bytes,
     user_id: str,
@@ -351,6 +885,8 @@ def upload_user_pfp(
     """
     Upload user profile picture to Cloudinary and update MongoDB
     
+    Synchronous; request handlers queue the work on the avatar pipeline instead.
+
     Args:
         image_data: Image bytes
         user_id: MongoDB user ID
@@ -369,54 +905,10 @@ def upload_user_pfp(
         # Get user to check for existing PFP
         user = users_collection.find_one({"_id": user_id})
         
-        # Delete old PFP if exists and delete_old is True
-        if delete_old and user and "photoPublicId" in user:
-            try:
-                cloudinary.uploader.destroy(user["photoPublicId"])
-            except:
-                pass  # Ignore deletion errors
-        
-        # Generate unique public ID
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        public_id = f"users/{user_id}/pfp_{username}_{timestamp}"
-        
-        # Upload to Cloudinary with face detection and auto-crop
-        print(f"[DB] Uploading image to Cloudinary: {len(image_data)} bytes")
-        print(f"[DB] Public ID: {public_id}")
-        
-        upload_result = cloudinary.uploader.upload(
-            BytesIO(image_data),
-            public_id=public_id,
-            folder=f"users/{user_id}",
-            overwrite=True,
-            transformation=[
-                {"width": 500, "height": 500, "crop": "fill", "gravity": "face"},
-                {"quality": "auto:good"},
-                {"fetch_format": "auto"}
-            ]
-        )
-        
-        print(f"[DB] Cloudinary response: {upload_result}")
-        
-        # Extract URLs (original and thumbnail)
-        secure_url = upload_result.get("secure_url")
-        public_id = upload_result.get("public_id")
-        
-        print(f"[DB] Secure URL: {secure_url}")
-        print(f"[DB] Public ID from response: {public_id}")
-        
-        # Create thumbnail URL
-        thumbnail_url = cloudinary.utils.cloudinary_url(
-            public_id,
-            width=150,
-            height=150,
-            crop="fill",
-            gravity="face",
-            quality="auto:good",
-            fetch_format="auto"
-        )[0]
-        
-        print(f"[DB] Thumbnail URL: {thumbnail_url}")
+        uploaded = upload_pfp_image(image_data, user_id, username)
+        secure_url = uploaded["photoProfile"]
+        thumbnail_url = uploaded["photoThumbnail"]
+        public_id = uploaded["photoPublicId"]
         
         # Update MongoDB with both URLs
         users_collection.update_one(
@@ -429,6 +921,12 @@ def upload_user_pfp(
             }},
             upsert=False
         )
+        invalidate_user_summary(user_id)
+        
+        # Delete old PFP if exists and delete_old is True (only once the new one is in place)
+        if delete_old and user and user.get("photoPublicId") and user["photoPublicId"] != public_id:
+            from handlers.media_gc import schedule_deletion
+            schedule_deletion(user["photoPublicId"], reason="avatar replaced")
         
         print(f"[DB] MongoDB updated successfully")
         
@@ -440,8 +938,8 @@ def upload_user_pfp(
             "url": secure_url,
             "thumbnail": thumbnail_url,
             "public_id": public_id,
-            "format": upload_result.get("format"),
-            "size": upload_result.get("bytes")
+            "format": uploaded["format"],
+            "size": uploaded["size"]
         }
         
     except Exception as e:
@@ -466,23 +964,23 @@ def delete_user_pfp(user_id: str) -> bool:
         if not user or "photoPublicId" not in user:
             return False
         
-        # Delete from Cloudinary
-        result = cloudinary.uploader.destroy(user["photoPublicId"])
-        
-        if result.get("result") == "ok":
-            # Remove PFP data from MongoDB
-            users_collection.update_one(
-                {"_id": user_id},
-                {"$unset": {
-                    "photoProfile": "",
-                    "photoThumbnail": "",
-                    "photoPublicId": "",
-                    "photoUpdatedAt": ""
-                }},
-                upsert=False
-            )
-            return True
-        return False
+        # Remove PFP data from MongoDB
+        users_collection.update_one(
+            {"_id": user_id},
+            {"$unset": {
+                "photoProfile": "",
+                "photoThumbnail": "",
+                "photoPublicId": "",
+                "photoUpdatedAt": ""
+            }},
+            upsert=False
+        )
+        invalidate_user_summary(user_id)
+        
+        # The Cloudinary asset is deleted in the background
+        from handlers.media_gc import schedule_deletion
+        schedule_deletion(user["photoPublicId"], reason="avatar deleted")
+        return True
         
     except:
         return False
@@ -523,10 +1021,338 @@ def initialize_roles():
 initialize_roles() 
 
 
+def user_search_fields(name: Optional[str] = None, email: Optional[str] = None) -> Dict[str, str]:
+    """Lowercased copies of name/email backing the indexed admin prefix search"""
+    fields = {}
+    if name is not None:
+        fields["nameLower"] = name.lower()
+    if email is not None:
+        fields["emailLower"] = email.lower()
+    return fields
+
+
+def initialize_user_search_fields():
+    result = users_collection.update_many(
+        {"nameLower": {"$exists": False}},
+        [{"$set": {
+            "nameLower": {"$toLower": {"$ifNull": ["$name", ""]}},
+            "emailLower": {"$toLower": {"$ifNull": ["$email", ""]}}
+        }}]
+    )
+    print(f"Updated {result.modified_count} users with search fields.")
+
+try:
+    initialize_user_search_fields()
+except Exception as e:
+    print(f"[DB] Error initializing user search fields: {e}")
+
+# Existing databases predate the counters; fill them once, before any post is written
+try:
+    _ensure_category_counts()
+except Exception as e:
+    print(f"[DB] Error bootstrapping category counts: {e}")
+
+
+# Fields shown by the admin user list; everything else stays on the server
+ADMIN_USER_PROJECTION = {
+    "name": 1, "email": 1, "role": 1, "profile_picture": 1,
+    "createdAt": 1, "updatedAt": 1, "isActive": 1
+}
+ADMIN_USER_SORTS = {"createdAt": "createdAt", "name": "nameLower", "email": "emailLower"}
+
+
+def get_users_page(
+    role: Optional[str] = None,
+    active: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    search: str = "",
+    sort: str = "createdAt",
+    direction: int = DESCENDING,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+) -> Dict[str, Any]:
+    """
+    One page of users for the admin list, filtered and keyset-paginated
+
+    Raises:
+        ValueError: if the sort key or cursor is invalid
+    """
+    if sort not in ADMIN_USER_SORTS:
+        raise ValueError(f"Invalid sort: {sort}")
+
+    query: Dict[str, Any] = {}
+    if role:
+        query["role"] = role
+    if active is True:
+        # Users without the flag have never been deactivated
+        query["isActive"] = {"$ne": False}
+    elif active is False:
+        query["isActive"] = False
+    if created_from or created_to:
+        query["createdAt"] = {}
+        if created_from:
+            query["createdAt"]["$gte"] = created_from
+        if created_to:
+            query["createdAt"]["$lt"] = created_to
+    if search:
+        prefix = {"$regex": "^" + re.escape(search.strip().lower())}
+        query["$or"] = [{"nameLower": prefix}, {"emailLower": prefix}]
+
+    page = paginate(
+        users_collection, query, limit=limit, cursor=cursor, direction=direction,
+        projection=ADMIN_USER_PROJECTION, sort_field=ADMIN_USER_SORTS[sort], nullable=True
+    )
+    result = {"users": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        result["total"] = cached_count(users_collection, query) if query else estimated_count(users_collection)
+    return result
+
+register_query_shape(
+    "users.admin_page", "users", {"isActive": {"$ne": False}},
+    sort=[("createdAt", DESCENDING), ("_id", DESCENDING)], projection=ADMIN_USER_PROJECTION, limit=51
+)
+register_query_shape(
+    "users.admin_search", "users",
+    {"$or": [{"nameLower": {"$regex": Param("name_prefix")}}, {"emailLower": {"$regex": Param("name_prefix")}}]},
+    sort=[("nameLower", ASCENDING), ("_id", ASCENDING)], projection=ADMIN_USER_PROJECTION, limit=51
+)
+
+
 # ---------------------------
 # Scans collection for scan history
 # ---------------------------
 scans_collection = db["scans"]
+# Compressed detection payloads of scans past the retention window (see scan_archive.py)
+scans_archive_collection = db["scans_archive"]
+
+# "monthly" routes new scans to scans_YYYY_MM collections so old months can
+# be dropped or archived whole; "none" keeps everything in `scans`. Scans
+# already in `scans` stay readable either way.
+SCAN_PARTITIONING = os.getenv("SCAN_PARTITIONING", "none").lower()
+SCAN_PARTITION_RE = re.compile(r"^scans_(\d{4})_(\d{2})$")
+SCAN_SOURCES_TTL_SECONDS = 60
+
+_scan_sources_lock = threading.Lock()
+_scan_sources_cache: Dict[str, Any] = {"expires": 0.0, "sources": None}
+_indexed_partitions = set()
+
+# A place scans are stored: (collection, start, end) with created_at in
+# [start, end); None leaves that side unbounded.
+ScanSource = Tuple[Any, Optional[datetime], Optional[datetime]]
+
+
+def ensure_scan_indexes(collection) -> None:
+    """Indexes every scan collection (legacy or partition) needs"""
+    collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    collection.create_index([("created_at", ASCENDING)])
+    collection.create_index([("archived_at", ASCENDING), ("created_at", ASCENDING)])
+
+
+def _next_month(moment: datetime) -> datetime:
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+def scan_partition_name(moment: datetime) -> str:
+    return f"scans_{moment.year:04d}_{moment.month:02d}"
+
+
+def _partition_bounds(name: str) -> Tuple[datetime, datetime]:
+    match = SCAN_PARTITION_RE.match(name)
+    start = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return start, _next_month(start)
+
+
+def _invalidate_scan_sources() -> None:
+    with _scan_sources_lock:
+        _scan_sources_cache["expires"] = 0.0
+
+
+def scan_collection_for_write(moment: datetime):
+    """The collection a scan created at `moment` is written to"""
+    if SCAN_PARTITIONING != "monthly":
+        return scans_collection
+    name = scan_partition_name(moment)
+    collection = db[name]
+    if name not in _indexed_partitions:
+        ensure_scan_indexes(collection)
+        _indexed_partitions.add(name)
+        _invalidate_scan_sources()
+    return collection
+
+
+def scan_sources(refresh: bool = False) -> List[ScanSource]:
+    """
+    Every collection holding scans, newest range first
+
+    Partitions are discovered from the collection names; the legacy `scans`
+    collection is bounded by its oldest scan, and by its newest one once new
+    scans go to partitions. Cached briefly so reads do not list collections
+    on every call.
+    """
+    now = time.monotonic()
+    with _scan_sources_lock:
+        cached = _scan_sources_cache["sources"]
+        if refresh or cached is None or _scan_sources_cache["expires"] <= now:
+            cached = None
+    if cached is None:
+        cached = _discover_scan_sources()
+        with _scan_sources_lock:
+            _scan_sources_cache.update(expires=now + SCAN_SOURCES_TTL_SECONDS, sources=cached)
+
+    if SCAN_PARTITIONING == "monthly":
+        # Another worker may have opened this month's partition since the cache was filled
+        name = scan_partition_name(datetime.utcnow())
+        if not any(collection.name == name for collection, _, _ in cached):
+            start, end = _partition_bounds(name)
+            cached = [(db[name], start, end)] + cached
+    return cached
+
+
+def _discover_scan_sources() -> List[ScanSource]:
+    sources: List[ScanSource] = []
+    for name in db.list_collection_names():
+        if SCAN_PARTITION_RE.match(name):
+            start, end = _partition_bounds(name)
+            sources.append((db[name], start, end))
+
+    oldest = scans_collection.find_one({"created_at": {"$type": "date"}}, {"created_at": 1}, sort=[("created_at", ASCENDING)])
+    if SCAN_PARTITIONING != "monthly":
+        # Still written to, so no upper bound
+        sources.append((scans_collection, oldest["created_at"] if oldest else None, None))
+    elif oldest:
+        newest = scans_collection.find_one({"created_at": {"$type": "date"}}, {"created_at": 1}, sort=[("created_at", DESCENDING)])
+        sources.append((scans_collection, oldest["created_at"], newest["created_at"] + timedelta(microseconds=1)))
+
+    sources.sort(key=lambda source: source[2] or datetime.max, reverse=True)
+    return sources
+
+
+def scan_sources_between(created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> List[ScanSource]:
+    """Sources that can hold scans created in [created_from, created_to)"""
+    selected = []
+    for source in scan_sources():
+        _, start, end = source
+        if start is not None and created_to is not None and start >= created_to:
+            continue
+        if end is not None and created_from is not None and end <= created_from:
+            continue
+        selected.append(source)
+    return selected
+
+
+def _query_time_range(query: Dict[str, Any]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    created = query.get("created_at")
+    if not isinstance(created, dict):
+        return None, None
+    created_from = created.get("$gte") or created.get("$gt")
+    created_to = created.get("$lt")
+    if created.get("$lte"):
+        created_to = created["$lte"] + timedelta(microseconds=1)
+    return created_from, created_to
+
+
+def find_scans(
+    query: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None,
+    workload: str = OLTP
+) -> Iterator[Dict[str, Any]]:
+    """
+    Unordered find across every source a query's created_at range can touch
+    """
+    for collection, _, _ in scan_sources_between(*_query_time_range(query)):
+        yield from for_workload(collection, workload).find(query, projection)
+
+
+def _scan_order_key(scan: Dict[str, Any]) -> Tuple[datetime, ObjectId]:
+    return scan.get("created_at") or datetime.min, scan["_id"]
+
+
+def _newest_scans(query: Dict[str, Any], count: int, projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    The `count` newest scans matching `query` across sources, merged in
+    (created_at, _id) order. Sources are visited newest range first and the
+    walk stops once no older source can contribute.
+    """
+    pool: List[Dict[str, Any]] = []
+    for collection, start, end in scan_sources_between(*_query_time_range(query)):
+        if len(pool) >= count and end is not None and _scan_order_key(pool[count - 1])[0] >= end:
+            break
+        docs = list(collection.find(query, projection).sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(count))
+        _upgrade_scans(docs, collection)
+        pool.extend(docs)
+        pool.sort(key=_scan_order_key, reverse=True)
+        del pool[count:]
+    return pool
+
+
+def _scan_collections_for_id(scan_oid: ObjectId) -> List[Any]:
+    """
+    Where a scan with this _id can live: the partition of the month its id
+    was generated in, the month before (created_at is stamped first), then
+    the legacy collection
+    """
+    generated = scan_oid.generation_time.replace(tzinfo=None)
+    names = {scan_partition_name(generated), scan_partition_name(generated.replace(day=1) - timedelta(days=1))}
+    partitions = [collection for collection, _, _ in scan_sources() if collection.name in names]
+    return partitions + [scans_collection]
+
+
+def retire_scan_partition(name: str, drop: bool = False) -> Dict[str, Any]:
+    """
+    Take a whole month out of service in one metadata operation
+
+    The partition is renamed to archived_<name> (kept for export/restore) or
+    dropped outright together with its archived payloads.
+    """
+    if not SCAN_PARTITION_RE.match(name):
+        raise ValueError(f"Not a scan partition: {name}")
+    _, end = _partition_bounds(name)
+    if end > datetime.utcnow():
+        raise ValueError(f"Partition {name} is still receiving scans")
+    if name not in db.list_collection_names():
+        raise ValueError(f"Partition {name} does not exist")
+
+    if drop:
+        removed = 0
+        archived = db[name].find({"archived_at": {"$ne": None}}, {"_id": 1}).batch_size(1000)
+        batch = []
+        for scan in archived:
+            batch.append(scan["_id"])
+            if len(batch) >= 1000:
+                removed += scans_archive_collection.delete_many({"_id": {"$in": batch}}).deleted_count
+                batch = []
+        if batch:
+            removed += scans_archive_collection.delete_many({"_id": {"$in": batch}}).deleted_count
+        db[name].drop()
+        result = {"partition": name, "dropped": True, "archived_payloads_removed": removed}
+    else:
+        db[name].rename(f"archived_{name}")
+        result = {"partition": name, "dropped": False, "renamed_to": f"archived_{name}"}
+    _indexed_partitions.discard(name)
+    _invalidate_scan_sources()
+    return result
+
+
+def _upgrade_scans(scans: List[Dict[str, Any]], collection=None) -> None:
+    """
+    Lazily rewrite schema version 1 scans that were just read to the compact
+    format. The in-memory documents are left as read.
+    """
+    ops = []
+    for scan in scans:
+        update = upgrade_update(scan)
+        if update:
+            # Guard on the version so a concurrent upgrade is not applied twice
+            ops.append(UpdateOne({"_id": scan["_id"], "schema_version": {"$exists": False}}, update))
+    if not ops:
+        return
+    try:
+        (collection if collection is not None else scans_collection).bulk_write(ops, ordered=False)
+    except Exception as e:
+        print(f"[DB] Error upgrading scans: {e}")
+
 
 def save_scan(
     user_id: str,
@@ -547,6 +1373,9 @@ def save_scan(
         detection_result: Raw detection data from YOLO
         analysis_result: Processed analysis data
     
+    Only the detection boxes are persisted, in the compact format of
+    scan_schema; the analysis is re-derived on read.
+    
     Returns:
         The saved scan document or None if failed
     """
@@ -554,7 +1383,7 @@ def save_scan(
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
         
         # Get user info
-        user = users_collection.find_one({"_id": user_oid})
+        user = get_user_summary(user_oid)
         if not user:
             print(f"[DB] User not found: {user_id}")
             return None
@@ -584,17 +1413,16 @@ def save_scan(
             "confidence": confidence,
             "status": status,
             "durian_count": total_count,
-            "detection": detection_result,
-            "analysis": analysis_result,
+            **compact_fields(detection_result),
             "created_at": datetime.utcnow(),
         }
         
-        result = scans_collection.insert_one(scan_data)
+        result = scan_collection_for_write(scan_data["created_at"]).insert_one(scan_data)
         
         if result.inserted_id:
             scan_data["_id"] = result.inserted_id
             print(f"[DB] Scan saved: {result.inserted_id}")
-            return scan_data
+            return expand_scan(scan_data)
         return None
         
     except Exception as e:
@@ -612,22 +1440,120 @@ def get_user_scans(
     """
     try:
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
-        scans = scans_collection.find({"user_id": user_oid}).sort("created_at", -1).skip(skip).limit(limit)
-        return list(scans)
+        scans = _newest_scans({"user_id": user_oid}, skip + limit)[skip:]
+        return [expand_scan(scan) for scan in scans]
     except Exception as e:
         print(f"[DB] Error getting user scans: {e}")
         return []
 
 
+def get_user_scans_page(
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Dict[str, Any]:
+    """
+    Get one page of a user's scans, most recent first
+
+    Raises:
+        ValueError: if the user id or cursor is malformed
+    """
+    user_oid = parse_object_id(user_id, "user id")
+    limit = clamp_page_size(limit)
+    query: Dict[str, Any] = {"user_id": user_oid}
+    if cursor:
+        query = {"$and": [query, _after_position("created_at", decode_cursor(cursor), DESCENDING, False)]}
+        skip = 0
+
+    scans = _newest_scans(query, skip + limit + 1)[skip:]
+    next_cursor = None
+    if len(scans) > limit:
+        scans = scans[:limit]
+        next_cursor = encode_cursor(scans[-1])
+    return {"scans": [expand_scan(scan) for scan in scans], "next_cursor": next_cursor}
+
+register_query_shape(
+    "scans.user_page", "scans", {"user_id": Param("user_id")},
+    sort=[("created_at", DESCENDING), ("_id", DESCENDING)], limit=51
+)
+
+
+def _user_scans_query(user_id: str, created_from: Optional[datetime], created_to: Optional[datetime]) -> Dict[str, Any]:
+    user_oid = parse_object_id(user_id, "user id")
+    query: Dict[str, Any] = {"user_id": user_oid}
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    return query
+
+
+def iter_user_scans(
+    user_id: str,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    batch_size: int = 500
+):
+    """
+    Stream a user's scans oldest first straight from a MongoDB cursor
+
+    Only one batch of documents per source is held in memory at a time.
+    """
+    query = _user_scans_query(user_id, created_from, created_to)
+    cursors = [
+        collection.find(query, projection)
+        .sort([("created_at", ASCENDING), ("_id", ASCENDING)])
+        .batch_size(batch_size)
+        for collection, _, _ in reversed(scan_sources_between(created_from, created_to))
+    ]
+    if len(cursors) == 1:
+        return cursors[0]
+    return heapq.merge(*cursors, key=_scan_order_key)
+
+
+def count_user_scans(user_id: str, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> int:
+    """Number of scans an export over the same range would stream"""
+    query = _user_scans_query(user_id, created_from, created_to)
+    return sum(collection.count_documents(query) for collection, _, _ in scan_sources_between(created_from, created_to))
+
+register_query_shape(
+    "scans.export", "scans", {"user_id": Param("user_id"), "created_at": {"$gte": Param("since"), "$lt": Param("now")}},
+    sort=[("created_at", ASCENDING), ("_id", ASCENDING)]
+)
+
+
 def get_scan_by_id(scan_id: str) -> Optional[Dict[str, Any]]:
     """Get a single scan by ID"""
     try:
         scan_oid = ObjectId(scan_id) if not isinstance(scan_id, ObjectId) else scan_id
-        return scans_collection.find_one({"_id": scan_oid})
+        for collection in _scan_collections_for_id(scan_oid):
+            scan = collection.find_one({"_id": scan_oid})
+            if scan and scan.get("archived_at"):
+                _rehydrate_scan(scan)
+            elif scan:
+                _upgrade_scans([scan], collection)
+            if scan:
+                return expand_scan(scan)
+        return None
     except Exception as e:
         print(f"[DB] Error getting scan: {e}")
         return None
 
+register_query_shape("scans.by_id", "scans", {"_id": Param("scan_id")})
+
+
+def _rehydrate_scan(scan: Dict[str, Any]) -> None:
+    """Merge an archived scan's payload back into its summary document"""
+    archived = scans_archive_collection.find_one({"_id": scan["_id"]})
+    if not archived:
+        print(f"[DB] Archived payload missing for scan {scan['_id']}")
+        return
+    scan.update(unpack_payload(archived))
+
 
 def delete_scan(scan_id: str, user_id: str) -> bool:
     """Delete a scan (only by owner)"""
@@ -635,8 +1561,12 @@ def delete_scan(scan_id: str, user_id: str) -> bool:
         scan_oid = ObjectId(scan_id) if not isinstance(scan_id, ObjectId) else scan_id
         user_oid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
         
-        result = scans_collection.delete_one({"_id": scan_oid, "user_id": user_oid})
-        return result.deleted_count > 0
+        for collection in _scan_collections_for_id(scan_oid):
+            result = collection.delete_one({"_id": scan_oid, "user_id": user_oid})
+            if result.deleted_count:
+                scans_archive_collection.delete_one({"_id": scan_oid})
+                return True
+        return False
     except Exception as e:
         print(f"[DB] Error deleting scan: {e}")
         return False
@@ -668,10 +1598,10 @@ def get_user_scan_stats(user_id: str, time_range: str = "month") -> Dict[str, An
             start_date = now - timedelta(days=30)
         
         # Get scans in time range
-        scans = list(scans_collection.find({
+        scans = list(find_scans({
             "user_id": user_oid,
             "created_at": {"$gte": start_date}
-        }))
+        }, workload=ANALYTICS))
         
         if not scans:
             return {
@@ -702,10 +1632,10 @@ def get_user_scan_stats(user_id: str, time_range: str = "month") -> Dict[str, An
         two_weeks_ago = now - timedelta(days=14)
         
         this_week = sum(1 for s in scans if s.get("created_at", now) >= week_ago)
-        last_week = len(list(scans_collection.find({
+        last_week = len(list(find_scans({
             "user_id": user_oid,
             "created_at": {"$gte": two_weeks_ago, "$lt": week_ago}
-        })))
+        }, workload=ANALYTICS)))
         
         if last_week > 0:
             weekly_growth = ((this_week - last_week) / last_week) * 100
@@ -732,6 +1662,8 @@ def get_user_scan_stats(user_id: str, time_range: str = "month") -> Dict[str, An
             "weekly_growth": 0
         }
 
+register_query_shape("scans.user_stats", "scans", {"user_id": Param("user_id"), "created_at": {"$gte": Param("since")}})
+
 
 def get_weekly_scan_data(user_id: str) -> List[Dict[str, Any]]:
     """
@@ -750,10 +1682,10 @@ def get_weekly_scan_data(user_id: str) -> List[Dict[str, Any]]:
             day_start = (now - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
             day_end = day_start + timedelta(days=1)
             
-            day_scans = list(scans_collection.find({
+            day_scans = list(find_scans({
                 "user_id": user_oid,
                 "created_at": {"$gte": day_start, "$lt": day_end}
-            }))
+            }, workload=ANALYTICS))
             
             quality_scores = [s.get("quality_score", 0) for s in day_scans]
             avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
@@ -789,10 +1721,10 @@ def get_quality_distribution(user_id: str, time_range: str = "month") -> List[Di
         else:
             start_date = now - timedelta(days=30)
         
-        scans = list(scans_collection.find({
+        scans = list(find_scans({
             "user_id": user_oid,
             "created_at": {"$gte": start_date}
-        }))
+        }, workload=ANALYTICS))
         
         total = len(scans) or 1  # Avoid division by zero
         
@@ -816,4 +1748,34 @@ def get_quality_distribution(user_id: str, time_range: str = "month") -> List[Di
         
     except Exception as e:
         print(f"[DB] Error getting quality distribution: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# ---------------------------
+# Indexes
+# ---------------------------
+
+def ensure_indexes():
+    """Create the indexes backing pagination, likes and search (no-op when they already exist)"""
+    try:
+        ensure_scan_indexes(scans_collection)
+        likes_collection.create_index([("target_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+        for field in ("createdAt", "nameLower", "emailLower"):
+            users_collection.create_index([(field, ASCENDING), ("_id", ASCENDING)])
+        # Login/signup lookups (not unique: existing data may hold duplicates)
+        users_collection.create_index([("email", ASCENDING)])
+        posts_collection.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        posts_collection.create_index([("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        comments_collection.create_index([("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+        posts_collection.create_index(
+            [("title", TEXT), ("content", TEXT), ("username", TEXT)],
+            name="post_search",
+            weights={"title": 10, "username": 3, "content": 1},
+            # Tokenization and stop words are handled in forum_search for English and Filipino
+            default_language="none",
+            language_override="search_language"
+        )
+        posts_collection.create_index([("title_terms", ASCENDING)])
+    except Exception as e:
+        print(f"[DB] Error creating indexes: {e}")
+
+ensure_indexes()
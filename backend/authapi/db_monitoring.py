@@ -0,0 +1,303 @@
+# backend/authapi/db_monitoring.py
+"""
+MongoDB command monitoring
+
+COMMAND_MONITOR is a pymongo CommandListener registered on the app's client
+(see db.py). It records, per command name:
+    count, failures, latency histogram (ms), bytes returned
+and, per HTTP route (see init_app):
+    requests, round trips histogram, time spent in MongoDB histogram
+
+Commands slower than DB_SLOW_COMMAND_MS are logged with their shape only:
+every value is replaced by "?", so no user data reaches the logs.
+
+Round trips are attributed to whatever scopes are open on the calling
+thread. init_app opens one per request, and round_trip_budget opens one
+for a block of code:
+
+    with round_trip_budget(3):
+        client.post("/forum/posts", json=...)
+
+Views can declare a budget with @db_budget(n). Exceeding it is logged and
+counted, and raises AssertionError when the app is in testing mode or
+DB_BUDGETS_STRICT is set.
+
+Round trips made inside `with outside_budget():` are still recorded but
+don't count against any budget. That is for per-request work done before
+the view runs, such as auth_middleware loading the token's user.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from bson import BSON
+from pymongo import monitoring
+
+SLOW_COMMAND_MS = float(os.getenv("DB_SLOW_COMMAND_MS", 100))
+# Re-encoding replies to measure them costs CPU; allow switching it off
+MEASURE_REPLY_BYTES = os.getenv("DB_METRICS_REPLY_BYTES", "1") != "0"
+BUDGETS_STRICT = os.getenv("DB_BUDGETS_STRICT", "0") == "1"
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+
+# Protocol noise stripped from logged shapes
+_SHAPE_IGNORED_KEYS = {"lsid", "$clusterTime", "$db", "txnNumber", "$readPreference", "readConcern", "writeConcern"}
+
+
+class Histogram:
+    """Cumulative-bucket histogram; callers hold the owning lock"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            buckets[f"le_{bound}"] = running
+        buckets["le_inf"] = self.count
+        return {"count": self.count, "sum": round(self.total, 3), "buckets": buckets}
+
+
+def command_shape(value: Any) -> Any:
+    """A command with every value replaced by "?" (keys and operators kept)"""
+    if isinstance(value, dict):
+        return {key: command_shape(item) for key, item in value.items() if key not in _SHAPE_IGNORED_KEYS}
+    if isinstance(value, (list, tuple)):
+        # One element is enough to show the shape of a batch
+        return [command_shape(value[0]), f"...{len(value)}"] if len(value) > 1 else [command_shape(v) for v in value]
+    return "?"
+
+
+class RequestScope:
+    """Round trips made while the scope was open on its thread"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.round_trips = 0
+        # Made inside outside_budget(); included in round_trips
+        self.unbudgeted = 0
+        self.db_time_ms = 0.0
+        self.bytes_returned = 0
+        self.commands: List[str] = []
+
+    @property
+    def budgeted(self) -> int:
+        return self.round_trips - self.unbudgeted
+
+    def record(self, name: str, collection: Optional[str], duration_ms: float, reply_bytes: int,
+               budgeted: bool = True) -> None:
+        self.round_trips += 1
+        self.db_time_ms += duration_ms
+        self.bytes_returned += reply_bytes
+        command = f"{name} {collection}" if collection else name
+        if not budgeted:
+            self.unbudgeted += 1
+            command += " (unbudgeted)"
+        self.commands.append(command)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Aggregates command and per-route metrics for the whole process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending: Dict[int, Any] = {}
+        self._commands: Dict[str, Dict[str, Any]] = {}
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._slow = 0
+        self._budget_exceeded: Dict[str, int] = {}
+
+    # -- scopes --
+
+    def _scopes(self) -> List[RequestScope]:
+        scopes = getattr(self._local, "scopes", None)
+        if scopes is None:
+            scopes = self._local.scopes = []
+        return scopes
+
+    def open_scope(self, label: str = "") -> RequestScope:
+        scope = RequestScope(label)
+        self._scopes().append(scope)
+        return scope
+
+    def close_scope(self, scope: RequestScope) -> None:
+        scopes = self._scopes()
+        if scope in scopes:
+            scopes.remove(scope)
+
+    def _unbudgeted_depth(self) -> int:
+        return getattr(self._local, "unbudgeted", 0)
+
+    def _set_unbudgeted_depth(self, depth: int) -> None:
+        self._local.unbudgeted = depth
+
+    # -- listener --
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        # The command document is only available here; keep it for slow logging
+        self._pending[event.request_id] = (collection if isinstance(collection, str) else None, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        collection, command = self._pending.pop(event.request_id, (None, None))
+        duration_ms = event.duration_micros / 1000.0
+        reply_bytes = 0
+        if not failed and MEASURE_REPLY_BYTES:
+            try:
+                reply_bytes = len(BSON.encode(event.reply))
+            except Exception:
+                pass
+
+        budgeted = not self._unbudgeted_depth()
+        for scope in self._scopes():
+            scope.record(event.command_name, collection, duration_ms, reply_bytes, budgeted)
+
+        with self._lock:
+            stats = self._commands.get(event.command_name)
+            if stats is None:
+                stats = self._commands[event.command_name] = {
+                    "count": 0, "failures": 0, "bytes": 0, "latency_ms": Histogram(LATENCY_BUCKETS_MS)
+                }
+            stats["count"] += 1
+            stats["failures"] += failed
+            stats["bytes"] += reply_bytes
+            stats["latency_ms"].observe(duration_ms)
+            slow = duration_ms >= SLOW_COMMAND_MS
+            if slow:
+                self._slow += 1
+
+        if slow and command is not None:
+            print(f"[DB] Slow {event.command_name} on {collection}: {duration_ms:.1f} ms shape={command_shape(command)}")
+
+    # -- routes --
+
+    def record_route(self, route: str, scope: RequestScope) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "requests": 0,
+                    "round_trips": Histogram(ROUND_TRIP_BUCKETS),
+                    "db_time_ms": Histogram(LATENCY_BUCKETS_MS),
+                }
+            stats["requests"] += 1
+            stats["round_trips"].observe(scope.round_trips)
+            stats["db_time_ms"].observe(scope.db_time_ms)
+
+    def record_budget_exceeded(self, route: str) -> None:
+        with self._lock:
+            self._budget_exceeded[route] = self._budget_exceeded.get(route, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "commands": {
+                    name: {
+                        "count": stats["count"], "failures": stats["failures"], "bytes": stats["bytes"],
+                        "latency_ms": stats["latency_ms"].snapshot()
+                    }
+                    for name, stats in self._commands.items()
+                },
+                "routes": {
+                    route: {
+                        "requests": stats["requests"],
+                        "round_trips": stats["round_trips"].snapshot(),
+                        "db_time_ms": stats["db_time_ms"].snapshot()
+                    }
+                    for route, stats in self._routes.items()
+                },
+                "slow_commands": self._slow,
+                "slow_command_ms": SLOW_COMMAND_MS,
+                "budget_exceeded": dict(self._budget_exceeded),
+            }
+
+
+COMMAND_MONITOR = CommandMonitor()
+
+
+@contextmanager
+def outside_budget():
+    """Record the block's round trips without charging them to any budget"""
+    depth = COMMAND_MONITOR._unbudgeted_depth()
+    COMMAND_MONITOR._set_unbudgeted_depth(depth + 1)
+    try:
+        yield
+    finally:
+        COMMAND_MONITOR._set_unbudgeted_depth(depth)
+
+
+@contextmanager
+def round_trip_budget(max_round_trips: int, label: str = ""):
+    """Fail with AssertionError if the block makes more than max_round_trips commands"""
+    scope = COMMAND_MONITOR.open_scope(label)
+    try:
+        yield scope
+    finally:
+        COMMAND_MONITOR.close_scope(scope)
+    if scope.budgeted > max_round_trips:
+        raise AssertionError(
+            f"{label or 'block'} made {scope.budgeted} MongoDB round trips (budget {max_round_trips}): "
+            + ", ".join(scope.commands)
+        )
+
+
+def db_budget(max_round_trips: int):
+    """Declare the round-trip budget of a Flask view"""
+    def decorator(view):
+        view.db_round_trip_budget = max_round_trips
+        return view
+    return decorator
+
+
+def init_app(app) -> None:
+    """Open a scope per request and fold it into the per-route metrics"""
+    from flask import g, request
+
+    @app.before_request
+    def _open_db_scope():
+        g.db_scope = COMMAND_MONITOR.open_scope(request.endpoint or "")
+
+    @app.teardown_request
+    def _close_db_scope(error=None):
+        scope = g.pop("db_scope", None)
+        if scope is None:
+            return
+        COMMAND_MONITOR.close_scope(scope)
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else 'unmatched'}"
+        COMMAND_MONITOR.record_route(route, scope)
+
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, "db_round_trip_budget", None)
+        if budget is not None and scope.budgeted > budget:
+            COMMAND_MONITOR.record_budget_exceeded(route)
+            message = f"{route} made {scope.budgeted} MongoDB round trips (budget {budget}): {', '.join(scope.commands)}"
+            print(f"[DB] {message}")
+            if app.testing or BUDGETS_STRICT:
+                raise AssertionError(message)
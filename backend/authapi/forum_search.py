@@ -0,0 +1,130 @@
+# backend/authapi/forum_search.py
+"""
+Forum post search
+
+Ranked search runs on the weighted `post_search` text index (see
+db.ensure_indexes). The index is built with language "none" so MongoDB does
+not apply English stemming to Filipino words; tokenization and stop words
+for both languages are handled here on the query side instead.
+
+Title autocomplete uses `title_terms`, a multikey array of normalized title
+words kept up to date whenever a post is written (see search_fields).
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import db
+from query_registry import Param, register_query_shape
+
+MAX_QUERY_TERMS = 12
+MAX_SUGGESTIONS = 10
+
+STOP_WORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "how", "i", "in",
+    "is", "it", "its", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was",
+    "what", "when", "where", "which", "who", "why", "with", "you", "your",
+    # Filipino / Tagalog
+    "ako", "ang", "ano", "at", "ay", "ba", "dito", "din", "doon", "ito", "iyan", "iyon", "ka",
+    "kay", "ko", "kung", "lang", "mga", "mo", "na", "nang", "naman", "ng", "ni", "niya", "pa",
+    "para", "po", "rin", "sa", "si", "siya", "tayo", "yan", "yung",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip diacritics (e.g. "Piñas" -> "pinas")"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str, keep_stop_words: bool = False) -> List[str]:
+    """Split text into normalized word tokens, dropping English/Filipino stop words"""
+    tokens = _TOKEN_RE.findall(normalize(text))
+    if keep_stop_words:
+        return tokens
+    return [t for t in tokens if t not in STOP_WORDS and len(t) > 1]
+
+
+def search_fields(title: str) -> Dict[str, Any]:
+    """Derived fields to $set on a post whenever its title is written"""
+    return {"title_terms": list(dict.fromkeys(tokenize(title, keep_stop_words=True)))}
+
+
+def text_query(search: str) -> Optional[Dict[str, Any]]:
+    """
+    Build a $text filter from raw user input
+
+    Tokens are plain alphanumerics, so quotes and leading "-" from the user
+    can never turn into phrase or negation operators.
+
+    Returns:
+        The filter, or None if nothing searchable remains
+    """
+    tokens = list(dict.fromkeys(tokenize(search)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return None
+    return {"$text": {"$search": " ".join(tokens)}}
+
+
+def search_posts(search: str, category: str = "All", limit: int = 20, skip: int = 0) -> Dict[str, Any]:
+    """
+    Ranked full-text search over posts
+
+    Returns:
+        {"posts": [...], "total": int} with each post carrying its "score"
+    """
+    limit = db.clamp_page_size(limit)
+    query = text_query(search)
+    if query is None:
+        return {"posts": [], "total": 0}
+    if category and category != "All":
+        query["category"] = category
+
+    projection = dict(db.LISTING_PROJECTION, score={"$meta": "textScore"})
+    posts = list(
+        db.posts_collection.find(query, projection)
+        .sort([("score", {"$meta": "textScore"}), ("created_at", -1)])
+        .skip(max(skip, 0))
+        .limit(limit)
+    )
+    return {"posts": posts, "total": db.cached_count(db.posts_collection, query)}
+
+
+# Ordering by text score always needs a sort stage
+register_query_shape(
+    "posts.search", "posts", {"$text": {"$search": Param("search")}},
+    sort=[("score", {"$meta": "textScore"}), ("created_at", -1)],
+    projection=dict(db.LISTING_PROJECTION, score={"$meta": "textScore"}), limit=20, allow=("SORT",)
+)
+
+
+def suggest_titles(prefix: str, category: str = "All", limit: int = MAX_SUGGESTIONS) -> List[Dict[str, Any]]:
+    """
+    Title autocomplete: every complete word must appear in the title and the
+    last (possibly partial) word is matched as an anchored prefix, which
+    MongoDB answers with a bounded scan of the title_terms index.
+    """
+    words = tokenize(prefix, keep_stop_words=True)
+    if not words:
+        return []
+
+    clauses = [{"title_terms": word} for word in words[:-1]]
+    clauses.append({"title_terms": {"$regex": "^" + re.escape(words[-1])}})
+    if category and category != "All":
+        clauses.append({"category": category})
+
+    cursor = (
+        db.posts_collection.find({"$and": clauses}, {"title": 1, "category": 1})
+        .limit(max(1, min(limit, MAX_SUGGESTIONS)))
+    )
+    return [{"id": str(post["_id"]), "title": post.get("title", ""), "category": post.get("category")} for post in cursor]
+
+
+register_query_shape(
+    "posts.suggest", "posts", {"$and": [{"title_terms": {"$regex": Param("title_prefix")}}]},
+    projection={"title": 1, "category": 1}, limit=MAX_SUGGESTIONS
+)
@@ -0,0 +1,206 @@
+# backend/authapi/handlers/avatar_pipeline.py
+"""
+Background processing of profile pictures
+
+Signup and avatar updates used to upload to Cloudinary inside the request.
+Now they queue a job and respond at once. Signup responds with a generated
+default avatar; an update responds with the current photo and
+photoPending. Each job goes through these steps on a worker thread:
+
+    1. prepare   - image_normalizer with AVATAR_PROFILE: EXIF orientation,
+                   short side downscaled to AVATAR_TARGET_PX (Cloudinary
+                   still does the face crop), re-encoded without metadata
+    2. upload    - db.upload_pfp_image through the media service, which
+                   retries transient errors itself; the job retries on top
+                   with a backoff long enough to outlast an open circuit
+    3. apply     - one find_one_and_update sets all photo fields and returns
+                   the previous public id, which is queued for deletion
+
+A job only applies if no newer photo was applied in the meantime
+(photoUpdatedAt holds the time the applied job was submitted). Otherwise
+its own upload is deleted. If every upload attempt fails, the user keeps
+the default or previous avatar.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+from urllib.parse import quote
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from handlers.image_normalizer import AVATAR_PROFILE, normalize_image
+
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", 2))
+AVATAR_QUEUE_SIZE = int(os.getenv("AVATAR_QUEUE_SIZE", 100))
+AVATAR_UPLOAD_ATTEMPTS = int(os.getenv("AVATAR_UPLOAD_ATTEMPTS", 4))
+AVATAR_RETRY_BASE_SECONDS = float(os.getenv("AVATAR_RETRY_BASE_SECONDS", 5))
+SHUTDOWN_TIMEOUT_SECONDS = 10
+
+
+def default_avatar(name: Optional[str]) -> Dict[str, str]:
+    """Generated initials avatar used until (or instead of) an uploaded photo"""
+    initials = quote((name or "U")[:2])
+    base = f"https://ui-avatars.com/api/?name={initials}&background=random&color=fff"
+    return {"photoProfile": f"{base}&size=400", "photoThumbnail": f"{base}&size=150"}
+
+
+def prepare_avatar(image_data: bytes) -> bytes:
+    """Orient, downscale to AVATAR_TARGET_PX on the short side and strip metadata"""
+    return normalize_image(image_data, AVATAR_PROFILE).data
+
+
+class AvatarJob(NamedTuple):
+    user_id: ObjectId
+    username: str
+    image_data: bytes
+    submitted_at: datetime
+
+
+class AvatarPipeline:
+    """Bounded queue of avatar jobs drained by a few worker threads"""
+
+    def __init__(self, workers: int = AVATAR_WORKERS, queue_size: int = AVATAR_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[Optional[AvatarJob]]" = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, user_id, username: str, image_data: bytes) -> datetime:
+        """Queue a photo for `user_id`; returns the job's submission time"""
+        job = AvatarJob(
+            ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id,
+            username or "User",
+            image_data,
+            datetime.utcnow()
+        )
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            # Better a slow request than a lost photo
+            print(f"[AVATAR] Queue full, processing {job.user_id} inline")
+            self.process(job)
+        return job.submitted_at
+
+    def process(self, job: AvatarJob) -> bool:
+        """Run one job to completion; True if the photo was applied"""
+        try:
+            prepared = prepare_avatar(job.image_data)
+        except Exception as e:
+            print(f"[AVATAR] Unreadable image for {job.user_id}: {e}")
+            return False
+        print(f"[AVATAR] Prepared {job.user_id}: {len(job.image_data)} -> {len(prepared)} bytes")
+
+        uploaded = self._upload_with_retry(job, prepared)
+        if uploaded is None:
+            return False
+        return self._apply(job, uploaded)
+
+    def _upload_with_retry(self, job: AvatarJob, prepared: bytes) -> Optional[Dict[str, Any]]:
+        from db import upload_pfp_image
+
+        for attempt in range(1, AVATAR_UPLOAD_ATTEMPTS + 1):
+            try:
+                return upload_pfp_image(prepared, job.user_id, job.username)
+            except Exception as e:
+                if attempt == AVATAR_UPLOAD_ATTEMPTS:
+                    print(f"[AVATAR] Upload for {job.user_id} failed after {attempt} attempts: {e}")
+                    return None
+                delay = AVATAR_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                print(f"[AVATAR] Upload attempt {attempt} for {job.user_id} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+        return None
+
+    def _apply(self, job: AvatarJob, uploaded: Dict[str, Any]) -> bool:
+        from db import users_collection, invalidate_user_summary
+        from handlers.media_gc import schedule_deletion
+
+        previous = users_collection.find_one_and_update(
+            # Skip if a job submitted later has already been applied
+            {"_id": job.user_id, "photoUpdatedAt": {"$not": {"$gt": job.submitted_at}}},
+            {
+                "$set": {
+                    "photoProfile": uploaded["photoProfile"],
+                    "photoThumbnail": uploaded["photoThumbnail"],
+                    "photoPublicId": uploaded["photoPublicId"],
+                    "photoUpdatedAt": job.submitted_at
+                },
+                "$unset": {"photoPending": ""}
+            },
+            projection={"photoPublicId": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        invalidate_user_summary(job.user_id)
+
+        if previous is None:
+            # Lost to a newer job (or the user is gone): our upload is the orphan
+            stale = uploaded["photoPublicId"]
+        else:
+            stale = previous.get("photoPublicId")
+        if stale and (previous is None or stale != uploaded["photoPublicId"]):
+            schedule_deletion(stale, reason="avatar replaced")
+
+        if previous is None:
+            print(f"[AVATAR] Newer photo already applied for {job.user_id}, discarded this one")
+            return False
+        print(f"[AVATAR] Applied photo for {job.user_id}")
+        return True
+
+    def _ensure_workers(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own threads
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name="avatar-worker", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self.process(job)
+            except Exception as e:
+                print(f"[AVATAR] Job for {job.user_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Let queued jobs finish (up to `timeout`) and stop the workers"""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+# Global instance for common use
+avatar_pipeline = None
+
+
+def get_avatar_pipeline() -> AvatarPipeline:
+    """Get or create the global avatar pipeline"""
+    global avatar_pipeline
+    if avatar_pipeline is None:
+        avatar_pipeline = AvatarPipeline()
+        atexit.register(avatar_pipeline.shutdown)
+    return avatar_pipeline
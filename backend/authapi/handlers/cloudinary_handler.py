@@ -102,7 +102,7 @@ class CloudinaryPFP:
         Update user's profile picture in MongoDB
         This function should be imported from your db.py
         """
-        from db import users_collection
+        from db import users_collection, invalidate_user_summary
         
         update_data = {
             "photoProfile": pfp_data.get("photoProfile"),
@@ -118,6 +118,7 @@ class CloudinaryPFP:
             {"_id": user_id},
             {"$set": update_data}
         )
+        invalidate_user_summary(user_id)
     
     @staticmethod
     def get_default_pfp(username: str) -> Dict:
@@ -132,78 +133,50 @@ class CloudinaryPFP:
 
 
 class CloudinaryScan:
-    """Scan image handler for Cloudinary"""
-    
+    """Scan image handler (uploads go through the media service)"""
+
+    # Stored images are capped at 800px; the history list uses 200px thumbnails
+    SCAN_TRANSFORMATION = [
+        {"width": 800, "height": 800, "crop": "limit"},
+        {"quality": "auto:good"},
+        {"fetch_format": "auto"}
+    ]
+    SCAN_THUMBNAIL = {"width": 200, "height": 200, "crop": "fill", "gravity": "center", "quality": "auto:good"}
+
     @staticmethod
-    async def upload_scan_image(
-        image_data: bytes,
-        user_id: str,
-        scan_id: str
-    ) -> Dict[str, Any]:
-        """
-        Upload durian scan image to Cloudinary
-        
-        Args:
-            image_data: Image bytes
-            user_id: MongoDB user ID
-            scan_id: Unique scan identifier
-        
-        Returns:
-            Dict with upload results
-        """
+    def _upload(source, user_id: str, scan_id: str, image=None) -> Dict[str, Any]:
+        from handlers.image_normalizer import SCAN_PROFILE, normalize_image
+        from handlers.media_service import get_media_service
+
+        try:
+            # Send the 800px image we keep rather than the full camera photo;
+            # `image` is the scanner's already decoded copy of `source`
+            normalized = normalize_image(image if image is not None else source, SCAN_PROFILE)
+            source = normalized.data
+        except Exception as e:
+            print(f"Scan image normalization failed, uploading original: {str(e)}")
+
         try:
-            # Generate public ID for scan image
             timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            public_id = f"scans/{user_id}/{scan_id}_{timestamp}"
-            
-            # Upload to Cloudinary with optimizations
-            upload_result = cloudinary.uploader.upload(
-                BytesIO(image_data),
-                public_id=public_id,
+            uploaded = get_media_service().upload(
+                source,
+                public_id=f"scans/{user_id}/{scan_id}_{timestamp}",
                 folder=f"scans/{user_id}",
                 overwrite=True,
-                transformation=[
-                    {"width": 800, "height": 800, "crop": "limit"},
-                    {"quality": "auto:good"},
-                    {"fetch_format": "auto"}
-                ],
+                transformation=CloudinaryScan.SCAN_TRANSFORMATION,
                 # Generate thumbnail
-                eager=[
-                    {"width": 200, "height": 200, "crop": "fill", "gravity": "center"}
-                ]
+                eager=[{"width": 200, "height": 200, "crop": "fill", "gravity": "center"}],
+                thumbnail=CloudinaryScan.SCAN_THUMBNAIL
             )
-            
-            # Get URLs
-            secure_url = upload_result.get("secure_url")
-            public_id = upload_result.get("public_id")
-            
-            # Get thumbnail URL
-            thumbnail_url = None
-            eager_transformations = upload_result.get("eager", [])
-            for transformation in eager_transformations:
-                if transformation.get("width") == 200:
-                    thumbnail_url = transformation.get("secure_url")
-                    break
-            
-            if not thumbnail_url:
-                thumbnail_url = cloudinary.utils.cloudinary_url(
-                    public_id,
-                    width=200,
-                    height=200,
-                    crop="fill",
-                    gravity="center",
-                    quality="auto:good"
-                )[0]
-            
             return {
                 "success": True,
-                "image_url": secure_url,
-                "thumbnail_url": thumbnail_url,
-                "public_id": public_id,
-                "format": upload_result.get("format"),
-                "size": upload_result.get("bytes")
+                "image_url": uploaded["url"],
+                "thumbnail_url": uploaded["thumbnail_url"],
+                "public_id": uploaded["public_id"],
+                "format": uploaded["format"],
+                "size": uploaded["size"]
             }
-            
+
         except Exception as e:
             print(f"Cloudinary scan upload error: {str(e)}")
             return {
@@ -213,78 +186,41 @@ class CloudinaryScan:
                 "thumbnail_url": None
             }
     
+    @staticmethod
+    async def upload_scan_image(
+        image_data: bytes,
+        user_id: str,
+        scan_id: str
+    ) -> Dict[str, Any]:
+        """
+        Upload durian scan image to Cloudinary
+        
+        Args:
+            image_data: Image bytes
+            user_id: MongoDB user ID
+            scan_id: Unique scan identifier
+        
+        Returns:
+            Dict with upload results
+        """
+        return CloudinaryScan._upload(image_data, user_id, scan_id)
+    
     @staticmethod
     def upload_scan_image_sync(
         image_path: str,
         user_id: str,
-        scan_id: str
+        scan_id: str,
+        image=None
     ) -> Dict[str, Any]:
         """
         Synchronous version for uploading scan image from file path
+
+        Pass the decoded PIL image as `image` if the caller already has it.
         """
-        try:
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            public_id = f"scans/{user_id}/{scan_id}_{timestamp}"
-            
-            upload_result = cloudinary.uploader.upload(
-                image_path,
-                public_id=public_id,
-                folder=f"scans/{user_id}",
-                overwrite=True,
-                transformation=[
-                    {"width": 800, "height": 800, "crop": "limit"},
-                    {"quality": "auto:good"},
-                    {"fetch_format": "auto"}
-                ],
-                eager=[
-                    {"width": 200, "height": 200, "crop": "fill", "gravity": "center"}
-                ]
-            )
-            
-            secure_url = upload_result.get("secure_url")
-            public_id = upload_result.get("public_id")
-            
-            thumbnail_url = None
-            eager_transformations = upload_result.get("eager", [])
-            for transformation in eager_transformations:
-                if transformation.get("width") == 200:
-                    thumbnail_url = transformation.get("secure_url")
-                    break
-            
-            if not thumbnail_url:
-                thumbnail_url = cloudinary.utils.cloudinary_url(
-                    public_id,
-                    width=200,
-                    height=200,
-                    crop="fill",
-                    gravity="center",
-                    quality="auto:good"
-                )[0]
-            
-            return {
-                "success": True,
-                "image_url": secure_url,
-                "thumbnail_url": thumbnail_url,
-                "public_id": public_id,
-                "format": upload_result.get("format"),
-                "size": upload_result.get("bytes")
-            }
-            
-        except Exception as e:
-            print(f"Cloudinary scan upload error: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "image_url": None,
-                "thumbnail_url": None
-            }
+        return CloudinaryScan._upload(image_path, user_id, scan_id, image=image)
     
     @staticmethod
     def delete_scan_image(public_id: str) -> bool:
-        """Delete a scan image from Cloudinary"""
-        try:
-            result = cloudinary.uploader.destroy(public_id)
-            return result.get("result") == "ok"
-        except Exception as e:
-            print(f"Error deleting scan image: {e}")
-            return False
+        """Queue a scan image for deletion (see handlers/media_gc.py)"""
+        from handlers.media_gc import schedule_deletion
+        return schedule_deletion(public_id, reason="scan deleted") > 0
@@ -1,12 +1,14 @@
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 from email.header import Header
+import base64
 import os
+import secrets
+from typing import Iterable, Tuple
 from dotenv import load_dotenv
 
+from handlers.email_templates import RenderedEmail, get_email_templates
+from handlers.mail_queue import queue_email
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -17,6 +19,70 @@ MAILTRAP_USERNAME = os.getenv("MAIL_USERNAME", "")
 MAILTRAP_PASSWORD = os.getenv("MAIL_PASSWORD", "")
 FROM_EMAIL = os.getenv("MAIL_FROM_ADDRESS", "noreply@durianostics.com")
 FROM_NAME = os.getenv("MAIL_FROM_NAME", "Durianostics Admin")
+# Off for plain local stand-ins such as scripts/debug_smtp_server.py
+MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() in ("1", "true", "yes")
+
+# Compiled once at startup; see handlers/email_templates.py
+EMAIL_TEMPLATES = get_email_templates()
+
+CRLF = b"\r\n"
+
+
+def _header(value: str) -> str:
+    if "\r" in value or "\n" in value:
+        raise ValueError("Line break in email header")
+    # Plain ASCII headers stay readable in the raw message
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+# Headers that are the same for every message, encoded once
+FROM_HEADER = f"From: {_header(f'{FROM_NAME} <{FROM_EMAIL}>')}\r\n".encode()
+TEXT_PART_HEADERS = b'Content-Type: text/plain; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+HTML_PART_HEADERS = b'Content-Type: text/html; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+
+
+def _base64(data: bytes) -> bytes:
+    return base64.encodebytes(data).replace(b"\n", CRLF)
+
+
+def _multipart(subtype: str, parts: Iterable[bytes]) -> Tuple[bytes, bytes]:
+    """(Content-Type header, body) of a multipart container"""
+    # Parts are base64, which never contains "-", so the boundary can't collide
+    boundary = f"==============={secrets.token_hex(12)}==".encode()
+    body = b"".join(b"--" + boundary + CRLF + part + CRLF for part in parts) + b"--" + boundary + b"--" + CRLF
+    return b'Content-Type: multipart/' + subtype.encode() + b'; boundary="' + boundary + b'"\r\n', body
+
+
+def build_message(rendered: RenderedEmail, user_email: str, attachments: Iterable[Tuple[str, str, bytes]] = ()) -> bytes:
+    """
+    Raw RFC 5322 message with plain text and HTML alternatives (UTF-8)
+
+    `attachments` are (filename, mime type, data). Built by hand instead of
+    with email.mime: only the bodies and per-recipient headers are encoded
+    per message; the rest is the constants above.
+    """
+    content_type, body = _multipart("alternative", (
+        TEXT_PART_HEADERS + _base64(rendered.text.encode("utf-8")),
+        HTML_PART_HEADERS + _base64(rendered.html.encode("utf-8"))
+    ))
+    attachments = list(attachments)
+    if attachments:
+        parts = [content_type + CRLF + body]
+        for filename, mime_type, data in attachments:
+            parts.append(
+                f'Content-Type: {mime_type}\r\nContent-Transfer-Encoding: base64\r\n'
+                f'Content-Disposition: attachment; filename="{filename}"\r\n\r\n'.encode() + _base64(data)
+            )
+        content_type, body = _multipart("mixed", parts)
+
+    headers = (
+        f"Subject: {_header(rendered.subject)}\r\n".encode()
+        + FROM_HEADER
+        + f"To: {_header(user_email)}\r\n".encode()
+        + b"MIME-Version: 1.0\r\n"
+        + content_type
+    )
+    return headers + CRLF + body
 
 
 def send_checkout_email(
@@ -31,7 +97,7 @@ def send_checkout_email(
     payment_method=None
 ) -> bool:
     """
-    Send order confirmation email with attached PDF receipt via Mailtrap
+    Queue order confirmation email with attached PDF receipt
     Fully UTF-8 safe to support characters like ₱.
     """
     try:
@@ -39,328 +105,79 @@ def send_checkout_email(
         if isinstance(pdf_bytes, str):
             pdf_bytes = pdf_bytes.encode("latin1")
 
-        # Create multipart message
-        msg = MIMEMultipart("alternative")
-        msg.set_charset("utf-8")
-        msg["Subject"] = Header(
-            f"Your DurianApp Order Receipt (Transaction ID: {transaction_id})",
-            "utf-8"
+        rendered = EMAIL_TEMPLATES.render(
+            "checkout",
+            user_name=user_name,
+            items=items,
+            total=total,
+            transaction_id=transaction_id,
+            address=address,
+            phone=phone,
+            payment_method=payment_method
         )
-        msg["From"] = Header(f"{FROM_NAME} <{FROM_EMAIL}>", "utf-8")
-        msg["To"] = Header(user_email, "utf-8")
-
-        # Build order summary
-        item_lines = "".join(
-            [f"<li>{item['name']} x{item['quantity']} - P{item['price']}</li>" for item in items]
-        )
-
-        html_content = f"""
-        <html>
-        <body>
-            <h2>Thank you for your purchase, {user_name}!</h2>
-            <p>Transaction ID: <b>{transaction_id}</b></p>
-            <p><b>Delivery Address:</b> {address or 'N/A'}<br>
-               <b>Phone:</b> {phone or 'N/A'}<br>
-               <b>Payment Method:</b> {payment_method or 'N/A'}</p>
-            <h3>Order Summary:</h3>
-            <ul>{item_lines}</ul>
-            <p><b>Total:</b> P{total}</p>
-            <p>Your receipt is attached as a PDF.</p>
-        </body>
-        </html>
-        """
-
-        text_content = f"""
-Thank you for your purchase, {user_name}!
-Transaction ID: {transaction_id}
-Delivery Address: {address or 'N/A'}
-Phone: {phone or 'N/A'}
-Payment Method: {payment_method or 'N/A'}
-Total: P{total}
-Your receipt is attached as a PDF.
-        """
-
-        # Attach plain text and HTML (both UTF-8)
-        part1 = MIMEText(text_content, "plain", "utf-8")
-        part2 = MIMEText(html_content, "html", "utf-8")
-        msg.attach(part1)
-        msg.attach(part2)
 
         # Attach PDF
-        pdf_part = MIMEApplication(pdf_bytes, _subtype="pdf")
-        pdf_part.add_header('Content-Disposition', 'attachment', filename="receipt.pdf")
-        msg.attach(pdf_part)
-
-        # Send email via Mailtrap
-        with smtplib.SMTP(MAILTRAP_HOST, MAILTRAP_PORT) as server:
-            server.starttls()
-            server.login(MAILTRAP_USERNAME, MAILTRAP_PASSWORD)
-            server.sendmail(FROM_EMAIL, user_email, msg.as_string())
+        msg = build_message(rendered, user_email, attachments=[("receipt.pdf", "application/pdf", pdf_bytes)])
 
-        print(f"Checkout email sent successfully to {user_email}")
-        return True
+        # Delivered by the mail queue workers
+        queued = queue_email(msg, user_email, kind="checkout")
+        if queued:
+            print(f"Checkout email queued for {user_email}")
+        return queued
 
     except Exception as e:
-        print(f"Failed to send checkout email to {user_email}: {str(e)}")
+        print(f"Failed to queue checkout email to {user_email}: {str(e)}")
         return False
 
 
 def send_deactivation_email(user_email: str, user_name: str, reason: str) -> bool:
     """
-    Send account deactivation notification email via Mailtrap
-    
+    Queue account deactivation notification email
+
     Args:
         user_email: The email address of the deactivated user
         user_name: The name of the deactivated user
         reason: The reason for deactivation provided by admin
-    
+
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if the email was queued (or sent inline), False otherwise
     """
     try:
-        # Create message
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = "Your Durianostics Account Has Been Deactivated"
-        msg["From"] = f"{FROM_NAME} <{FROM_EMAIL}>"
-        msg["To"] = user_email
-
-        # Plain text version
-        text_content = f"""
-Hello {user_name},
-
-We regret to inform you that your Durianostics account has been deactivated by an administrator.
-
-Reason for deactivation:
-{reason}
-
-If you believe this action was taken in error or would like to appeal this decision, please contact our support team at support@durianostics.com.
-
-We apologize for any inconvenience this may cause.
-
-Best regards,
-The Durianostics Team
-        """
-
-        # HTML version
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .header {{
-            background-color: #1b5e20;
-            color: white;
-            padding: 20px;
-            text-align: center;
-            border-radius: 8px 8px 0 0;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 24px;
-        }}
-        .content {{
-            background-color: #f9f9f9;
-            padding: 30px;
-            border: 1px solid #ddd;
-            border-top: none;
-            border-radius: 0 0 8px 8px;
-        }}
-        .reason-box {{
-            background-color: #fff3e0;
-            border-left: 4px solid #ff9800;
-            padding: 15px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .reason-box h3 {{
-            margin: 0 0 10px 0;
-            color: #e65100;
-        }}
-        .footer {{
-            margin-top: 20px;
-            padding-top: 20px;
-            border-top: 1px solid #ddd;
-            font-size: 12px;
-            color: #666;
-            text-align: center;
-        }}
-        .appeal-link {{
-            color: #1b5e20;
-            text-decoration: underline;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🍈 Durianostics</h1>
-    </div>
-    <div class="content">
-        <p>Hello <strong>{user_name}</strong>,</p>
-        
-        <p>We regret to inform you that your Durianostics account has been <strong>deactivated</strong> by an administrator.</p>
-        
-        <div class="reason-box">
-            <h3>Reason for Deactivation:</h3>
-            <p>{reason}</p>
-        </div>
-        
-        <p>If you believe this action was taken in error or would like to appeal this decision, please contact our support team at <a href="mailto:support@durianostics.com" class="appeal-link">support@durianostics.com</a>.</p>
-        
-        <p>We apologize for any inconvenience this may cause.</p>
-        
-        <p>Best regards,<br>
-        <strong>The Durianostics Team</strong></p>
-        
-        <div class="footer">
-            <p>This is an automated message from Durianostics. Please do not reply directly to this email.</p>
-            <p>&copy; 2026 Durianostics. All rights reserved.</p>
-        </div>
-    </div>
-</body>
-</html>
-        """
-
-        # Attach both versions
-        part1 = MIMEText(text_content, "plain")
-        part2 = MIMEText(html_content, "html")
-        msg.attach(part1)
-        msg.attach(part2)
-
-        # Send email via Mailtrap SMTP
-        with smtplib.SMTP(MAILTRAP_HOST, MAILTRAP_PORT) as server:
-            server.starttls()
-            server.login(MAILTRAP_USERNAME, MAILTRAP_PASSWORD)
-            server.sendmail(FROM_EMAIL, user_email, msg.as_string())
-        
-        print(f"Deactivation email sent successfully to {user_email}")
-        return True
+        rendered = EMAIL_TEMPLATES.render("deactivation", user_name=user_name, reason=reason)
+        msg = build_message(rendered, user_email)
+
+        # Delivered by the mail queue workers
+        queued = queue_email(msg, user_email, kind="deactivation")
+        if queued:
+            print(f"Deactivation email queued for {user_email}")
+        return queued
 
     except Exception as e:
-        print(f"Failed to send deactivation email to {user_email}: {str(e)}")
+        print(f"Failed to queue deactivation email to {user_email}: {str(e)}")
         return False
 
 
 def send_reactivation_email(user_email: str, user_name: str) -> bool:
     """
-    Send account reactivation notification email via Mailtrap
-    
+    Queue account reactivation notification email
+
     Args:
         user_email: The email address of the reactivated user
         user_name: The name of the reactivated user
-    
+
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if the email was queued (or sent inline), False otherwise
     """
     try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = "Your Durianostics Account Has Been Reactivated"
-        msg["From"] = f"{FROM_NAME} <{FROM_EMAIL}>"
-        msg["To"] = user_email
-
-        text_content = f"""
-Hello {user_name},
-
-Great news! Your Durianostics account has been reactivated.
-
-You can now log in and access all features of the platform.
-
-If you have any questions, please contact our support team at support@durianostics.com.
-
-Best regards,
-The Durianostics Team
-        """
-
-        html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .header {{
-            background-color: #1b5e20;
-            color: white;
-            padding: 20px;
-            text-align: center;
-            border-radius: 8px 8px 0 0;
-        }}
-        .content {{
-            background-color: #f9f9f9;
-            padding: 30px;
-            border: 1px solid #ddd;
-            border-top: none;
-            border-radius: 0 0 8px 8px;
-        }}
-        .success-box {{
-            background-color: #e8f5e9;
-            border-left: 4px solid #4caf50;
-            padding: 15px;
-            margin: 20px 0;
-            border-radius: 4px;
-        }}
-        .footer {{
-            margin-top: 20px;
-            padding-top: 20px;
-            border-top: 1px solid #ddd;
-            font-size: 12px;
-            color: #666;
-            text-align: center;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🍈 Durianostics</h1>
-    </div>
-    <div class="content">
-        <p>Hello <strong>{user_name}</strong>,</p>
-        
-        <div class="success-box">
-            <p>✅ Great news! Your Durianostics account has been <strong>reactivated</strong>.</p>
-        </div>
-        
-        <p>You can now log in and access all features of the platform.</p>
-        
-        <p>If you have any questions, please contact our support team at <a href="mailto:support@durianostics.com">support@durianostics.com</a>.</p>
-        
-        <p>Best regards,<br>
-        <strong>The Durianostics Team</strong></p>
-        
-        <div class="footer">
-            <p>&copy; 2026 Durianostics. All rights reserved.</p>
-        </div>
-    </div>
-</body>
-</html>
-        """
-
-        part1 = MIMEText(text_content, "plain")
-        part2 = MIMEText(html_content, "html")
-        msg.attach(part1)
-        msg.attach(part2)
-
-        with smtplib.SMTP(MAILTRAP_HOST, MAILTRAP_PORT) as server:
-            server.starttls()
-            server.login(MAILTRAP_USERNAME, MAILTRAP_PASSWORD)
-            server.sendmail(FROM_EMAIL, user_email, msg.as_string())
-        
-        print(f"Reactivation email sent successfully to {user_email}")
-        return True
+        rendered = EMAIL_TEMPLATES.render("reactivation", user_name=user_name)
+        msg = build_message(rendered, user_email)
+
+        # Delivered by the mail queue workers
+        queued = queue_email(msg, user_email, kind="reactivation")
+        if queued:
+            print(f"Reactivation email queued for {user_email}")
+        return queued
 
     except Exception as e:
-        print(f"Failed to send reactivation email to {user_email}: {str(e)}")
+        print(f"Failed to queue reactivation email to {user_email}: {str(e)}")
         return False
@@ -0,0 +1,121 @@
+# backend/authapi/handlers/image_normalizer.py
+"""
+Normalize images before they are uploaded
+
+Phones send 3-12 MB photos. We only ever store an 800 px scan image and a
+500 px avatar, and Cloudinary used to do the shrinking after receiving the
+full file. normalize_image does it before upload:
+
+    - applies EXIF orientation
+    - downscales to the largest size a profile stores (JPEG sources are
+      decoded at reduced scale via draft(), which skips most of the
+      decoding work on large photos)
+    - re-encodes as quality-tuned JPEG or WebP (IMAGE_UPLOAD_FORMAT)
+    - drops EXIF/GPS, ICC and XMP metadata; a fresh save carries none
+
+Callers that already decoded the image (the scanner runs the color model on
+it) pass the PIL image instead of bytes, so it is not decoded twice.
+"""
+
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple
+
+IMAGE_UPLOAD_FORMAT = os.getenv("IMAGE_UPLOAD_FORMAT", "jpeg").lower()
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", 80))
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+class ImageProfile(NamedTuple):
+    """How a kind of image is stored"""
+    name: str
+    size: int
+    # "fit": longest side <= size (Cloudinary crop=limit)
+    # "cover": shortest side <= size, for a later size x size crop (crop=fill)
+    mode: str
+
+
+SCAN_PROFILE = ImageProfile("scan", int(os.getenv("SCAN_IMAGE_MAX_PX", 800)), "fit")
+AVATAR_PROFILE = ImageProfile("avatar", int(os.getenv("AVATAR_TARGET_PX", 500)), "cover")
+
+
+class NormalizedImage(NamedTuple):
+    data: bytes
+    width: int
+    height: int
+    format: str
+    mime_type: str
+    source_bytes: int
+
+
+def _target_size(width: int, height: int, profile: ImageProfile):
+    reference = max(width, height) if profile.mode == "fit" else min(width, height)
+    if reference <= profile.size:
+        return width, height
+    scale = profile.size / reference
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def normalize_image(source, profile: ImageProfile, image_format: str = IMAGE_UPLOAD_FORMAT) -> NormalizedImage:
+    """
+    Downscale, re-encode and strip an image for `profile`
+
+    `source` is bytes, a file path or an already decoded PIL image (which is
+    left untouched). Raises if it is not a readable image.
+    """
+    from PIL import Image, ImageOps
+
+    image_format = image_format if image_format in MIME_TYPES else "jpeg"
+    if isinstance(source, Image.Image):
+        image = source
+        source_bytes = 0
+    else:
+        if isinstance(source, (str, Path)):
+            source_bytes = os.path.getsize(source)
+        else:
+            source_bytes = len(source)
+            source = BytesIO(source)
+        image = Image.open(source)
+        if image.format == "JPEG":
+            # EXIF orientation may swap the axes; draft on the smaller side
+            # so it never decodes below the size we need
+            width, height = _target_size(*image.size, profile)
+            short = min(width, height)
+            image.draft("RGB", (short, short))
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Flatten transparency onto white; JPEG has no alpha and WebP photos don't need it
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    size = _target_size(*image.size, profile)
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+
+    out = BytesIO()
+    if image_format == "webp":
+        image.save(out, format="WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+    else:
+        image.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    data = out.getvalue()
+
+    if source_bytes:
+        print(f"[MEDIA] Normalized {profile.name}: {source_bytes / 1024:.0f} KB -> {len(data) / 1024:.0f} KB "
+              f"({image.width}x{image.height} {image_format})")
+    return NormalizedImage(data, image.width, image.height, image_format, MIME_TYPES[image_format], source_bytes)
+
+
+def open_image(path: str):
+    """Decode an image once so several consumers can share it"""
+    from PIL import Image
+
+    image = Image.open(path)
+    image.load()
+    return image
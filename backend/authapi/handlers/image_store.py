@@ -0,0 +1,382 @@
+# backend/authapi/handlers/image_store.py
+"""
+Content-addressed local image store (MEDIA_BACKEND=store)
+
+For on-premise deployments where the uplink is the slowest part of a scan,
+images are written to local disk and served by the app itself:
+
+    MEDIA_STORE_ROOT/ab/cd/abcd...ef.jpg            original (sha256 of the bytes)
+    MEDIA_STORE_ROOT/ab/cd/abcd...ef_200x200_fill.jpg   derived variant
+
+The public id is the original's file name. It goes into the existing
+image_url / thumbnail_url / cloudinary_public_id fields, so save_scan and the
+frontend don't change. Identical uploads share one file. The
+`media_objects` collection counts references, and destroy() removes the
+files when the last reference goes. While it does, the object is marked
+`deleting_until` and uploads of the same content wait, so a new upload
+never loses its file to a delete in flight.
+
+Variants in `eager` or requested through url() are generated by the
+server, at upload time. "fill" crops around the center (there is no face
+detection) and anything else fits inside the box. Variants are never
+larger than the original, and boxes over MEDIA_STORE_MAX_VARIANT_PX get
+the original instead.
+
+Files never change once written. /media/store/<name> serves only files
+that exist, with the content hash as a strong ETag, a year-long immutable
+Cache-Control and Range support. A variant name nobody generated is a
+404, so clients can't make the server resize images on demand.
+
+With MEDIA_STORE_SYNC=1 a background thread mirrors originals to Cloudinary
+as store/<hash> whenever the link is up, MEDIA_STORE_SYNC_BATCH at a time
+every MEDIA_STORE_SYNC_INTERVAL seconds. scripts/sync_media_store.py does
+the same from cron.
+"""
+
+import atexit
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+MEDIA_STORE_ROOT = Path(os.getenv("MEDIA_STORE_ROOT", Path(__file__).resolve().parent.parent / "media_store"))
+MEDIA_STORE_BASE_URL = os.getenv("MEDIA_STORE_BASE_URL", "/media/store")
+MEDIA_STORE_SYNC = os.getenv("MEDIA_STORE_SYNC", "0").lower() in ("1", "true", "yes")
+MEDIA_STORE_SYNC_INTERVAL = float(os.getenv("MEDIA_STORE_SYNC_INTERVAL", 60))
+MEDIA_STORE_SYNC_BATCH = int(os.getenv("MEDIA_STORE_SYNC_BATCH", 20))
+MEDIA_STORE_SYNC_MAX_ATTEMPTS = int(os.getenv("MEDIA_STORE_SYNC_MAX_ATTEMPTS", 10))
+MEDIA_STORE_MAX_VARIANT_PX = int(os.getenv("MEDIA_STORE_MAX_VARIANT_PX", 2048))
+# How long destroy() may hold an object while it removes the files
+DELETE_LEASE_SECONDS = 60
+REFERENCE_ATTEMPTS = 100
+REFERENCE_RETRY_SECONDS = 0.05
+
+# Content-addressed names are immutable
+CACHE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+MIME_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif",
+              "bin": "application/octet-stream"}
+NAME_PATTERN = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:_(?P<width>\d+)x(?P<height>\d+)_(?P<crop>[a-z]+))?\.(?P<ext>[a-z]+)$")
+
+_objects_collection = None
+
+
+def _objects():
+    """media_objects: one document per original, keyed by its file name"""
+    global _objects_collection
+    if _objects_collection is None:
+        import db
+        collection = db.db["media_objects"]
+        collection.create_index("synced_at")
+        _objects_collection = collection
+    return _objects_collection
+
+
+def _read(source) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+    return source.read()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    # Readers never see a partial file, and concurrent writers of the same
+    # content just replace each other
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ContentStore:
+    """Media backend that stores images on local disk under their content hash"""
+
+    name = "store"
+
+    def __init__(self, root: Path = MEDIA_STORE_ROOT, base_url: str = MEDIA_STORE_BASE_URL):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    # -- names and paths --
+
+    def path(self, name: str) -> Optional[Path]:
+        """On-disk path of a stored file name, or None if the name is not one of ours"""
+        match = NAME_PATTERN.match(name)
+        if not match:
+            return None
+        digest = match.group("digest")
+        return self.root / digest[:2] / digest[2:4] / name
+
+    @staticmethod
+    def variant_name(public_id: str, width: int, height: int, crop: str) -> str:
+        stem, _, ext = public_id.rpartition(".")
+        return f"{stem}_{int(width)}x{int(height)}_{crop}.{ext}"
+
+    # -- backend interface --
+
+    def upload(self, source, public_id: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+        # The requested public id (scans/<user>/..., products/...) is ignored:
+        # the name is derived from the content
+        from PIL import Image
+
+        data = _read(source)
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            ext = EXTENSIONS.get(Image.open(BytesIO(data)).format, "bin")
+        except Exception:
+            ext = "bin"
+        name = f"{digest}.{ext}"
+
+        doc = self._reference(name, len(data))
+        path = self.path(name)
+        if doc.get("refs", 1) > 1 and path.exists():
+            print(f"[MEDIA] Store hit for {name[:12]} ({doc['refs']} references)")
+        else:
+            _write_atomic(path, data)
+
+        eager = []
+        for transformation in options.get("eager") or []:
+            if transformation.get("width") and transformation.get("height"):
+                eager.append({"width": transformation["width"], "secure_url": self.url(name, **transformation)})
+
+        if MEDIA_STORE_SYNC:
+            get_store_sync().start()
+        return {"public_id": name, "secure_url": self.url(name), "format": ext, "bytes": len(data), "eager": eager}
+
+    def url(self, public_id: str, **transformation) -> str:
+        width, height = transformation.get("width"), transformation.get("height")
+        if (
+            not (width and height)
+            or public_id.endswith(".bin")
+            or max(int(width), int(height)) > MEDIA_STORE_MAX_VARIANT_PX
+        ):
+            return f"{self.base_url}/{public_id}"
+        name = self.variant_name(public_id, width, height, transformation.get("crop") or "limit")
+        self.ensure_variant(name)
+        return f"{self.base_url}/{name}"
+
+    def _reference(self, name: str, size: int) -> Dict[str, Any]:
+        """Count one more reference to `name`, waiting while destroy() removes its files"""
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        for _ in range(REFERENCE_ATTEMPTS):
+            try:
+                return _objects().find_one_and_update(
+                    # An object being deleted doesn't match; the upsert then
+                    # collides on _id until destroy() drops the document
+                    {"_id": name, "deleting_until": {"$not": {"$gt": datetime.utcnow()}}},
+                    {
+                        "$inc": {"refs": 1},
+                        "$unset": {"deleting_until": ""},
+                        "$setOnInsert": {"bytes": size, "created_at": datetime.utcnow(), "synced_at": None}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                time.sleep(REFERENCE_RETRY_SECONDS)
+        # OSError: the media service retries it
+        raise OSError(f"{name} is still being deleted")
+
+    def destroy(self, public_id: str) -> bool:
+        from pymongo import ReturnDocument
+
+        objects = _objects()
+        doc = objects.find_one_and_update({"_id": public_id}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER)
+        if doc is None:
+            return False
+        if doc.get("refs", 0) > 0:
+            return True
+        # Claim the files. An upload of the same content that re-referenced the
+        # object since the decrement wins, and the files stay.
+        now = datetime.utcnow()
+        claimed = objects.find_one_and_update(
+            {"_id": public_id, "refs": {"$lte": 0}, "deleting_until": {"$not": {"$gt": now}}},
+            {"$set": {"deleting_until": now + timedelta(seconds=DELETE_LEASE_SECONDS)}}
+        )
+        if claimed is None:
+            return True
+        # Files first: uploads of this content wait until the document is gone
+        path = self.path(public_id)
+        for file in path.parent.glob(f"{path.stem}*"):
+            file.unlink(missing_ok=True)
+        objects.delete_one({"_id": public_id, "deleting_until": {"$exists": True}})
+        if doc.get("cloudinary_public_id"):
+            get_store_sync().destroy_remote(doc["cloudinary_public_id"])
+        return True
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return isinstance(error, OSError)
+
+    # -- variants --
+
+    def ensure_variant(self, name: str) -> Optional[Path]:
+        """
+        Path of a derived variant, generating it from the original if needed
+
+        Only for server code (url() and upload); requests go through resolve().
+        """
+        from PIL import Image, ImageOps
+        from handlers.image_normalizer import IMAGE_JPEG_QUALITY, IMAGE_WEBP_QUALITY
+
+        match = NAME_PATTERN.match(name)
+        path = self.path(name)
+        if not match or path is None:
+            return None
+        if path.exists() or not match.group("width"):
+            return path if path.exists() else None
+
+        original = self.path(f"{match.group('digest')}.{match.group('ext')}")
+        if not original.exists():
+            return None
+        size = (int(match.group("width")), int(match.group("height")))
+        if max(size) > MEDIA_STORE_MAX_VARIANT_PX:
+            return None
+        with Image.open(original) as image:
+            image_format = image.format
+            # Never upscale: shrink the box, keeping its aspect ratio, until it fits the original
+            scale = min(1.0, image.width / size[0], image.height / size[1])
+            size = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+            if match.group("crop") == "fill":
+                variant = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                variant = image.copy()
+                variant.thumbnail(size, Image.LANCZOS)
+        out = BytesIO()
+        if image_format == "JPEG":
+            variant.convert("RGB").save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+        elif image_format == "WEBP":
+            variant.save(out, format="WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        else:
+            variant.save(out, format=image_format)
+        _write_atomic(path, out.getvalue())
+        return path
+
+    def resolve(self, name: str) -> Optional[Tuple[Path, str, str]]:
+        """(path, mimetype, etag) for serving a stored file, or None if it doesn't exist"""
+        path = self.path(name)
+        if path is None or not path.is_file():
+            return None
+        match = NAME_PATTERN.match(name)
+        etag = match.group("digest")
+        if match.group("width"):
+            etag = f"{etag}-{match.group('width')}x{match.group('height')}-{match.group('crop')}"
+        return path, MIME_TYPES.get(match.group("ext"), MIME_TYPES["bin"]), etag
+
+
+# ---------------------------
+# Background mirroring to Cloudinary
+# ---------------------------
+
+class StoreSync:
+    """Uploads originals that have no Cloudinary copy yet"""
+
+    def __init__(self, store: Optional[ContentStore] = None, interval: float = MEDIA_STORE_SYNC_INTERVAL):
+        self.store = store or ContentStore()
+        self.interval = interval
+        self._remote = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def _backend(self):
+        if self._remote is None:
+            from handlers.media_service import CloudinaryBackend
+            self._remote = CloudinaryBackend()
+        return self._remote
+
+    def sync_batch(self, limit: int = MEDIA_STORE_SYNC_BATCH) -> Tuple[int, int]:
+        """Mirror up to `limit` originals; returns (synced, failed)"""
+        objects = _objects()
+        pending = objects.find(
+            {"synced_at": None, "refs": {"$gt": 0}, "sync_attempts": {"$not": {"$gte": MEDIA_STORE_SYNC_MAX_ATTEMPTS}}},
+            {"_id": 1}
+        ).limit(limit)
+
+        synced = failed = 0
+        for doc in pending:
+            name = doc["_id"]
+            path = self.store.path(name)
+            remote_id = f"store/{name.rpartition('.')[0]}"
+            try:
+                result = self._backend().upload(str(path), remote_id, {"overwrite": False})
+            except Exception as e:
+                failed += 1
+                objects.update_one({"_id": name}, {"$inc": {"sync_attempts": 1}, "$set": {"sync_error": str(e)}})
+                print(f"[MEDIA] Sync of {name[:12]} failed: {e}")
+                continue
+            synced += 1
+            objects.update_one(
+                {"_id": name},
+                {
+                    "$set": {
+                        "synced_at": datetime.utcnow(),
+                        "cloudinary_public_id": result.get("public_id"),
+                        "cloudinary_url": result.get("secure_url")
+                    },
+                    "$unset": {"sync_error": "", "sync_attempts": ""}
+                }
+            )
+        if synced or failed:
+            print(f"[MEDIA] Store sync: {synced} mirrored, {failed} failed")
+        return synced, failed
+
+    def destroy_remote(self, public_id: str) -> None:
+        try:
+            self._backend().destroy(public_id)
+        except Exception as e:
+            print(f"[MEDIA] Could not delete mirrored {public_id}: {e}")
+
+    def start(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="media-store-sync", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync_batch()
+            except Exception as e:
+                print(f"[MEDIA] Store sync pass failed: {e}")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+
+
+# Global instance for common use
+store_sync = None
+
+
+def get_store_sync() -> StoreSync:
+    """Get or create the global store sync"""
+    global store_sync
+    if store_sync is None:
+        store_sync = StoreSync()
+        atexit.register(store_sync.shutdown)
+    return store_sync
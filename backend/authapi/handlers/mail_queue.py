@@ -0,0 +1,348 @@
+# backend/authapi/handlers/mail_queue.py
+"""
+Outbound mail queue
+
+The send_* helpers in email_handler used to connect, STARTTLS, log in and
+send inside the HTTP request, which cost seconds per message. Now they
+build the message and call queue_email(), which stores it in `mail_outbox`
+and returns:
+
+    {_id, kind, from, to, raw, status, attempts, created_at, due_at,
+     locked_until, claimed_by, last_error, sent_at}
+
+status is "queued", "sent" or "dead". Sent messages expire after
+MAIL_SENT_RETENTION_DAYS; dead ones stay for inspection and can be
+requeued with scripts/mail_outbox.py.
+
+MAIL_WORKERS threads per process deliver the queue. Each holds one
+authenticated keep-alive SMTP connection, so the pool has MAIL_WORKERS
+connections. A worker claims up to MAIL_BATCH_SIZE due messages under a
+lease and sends them back to back on its connection. It reconnects after
+MAIL_MAX_PER_CONNECTION messages or MAIL_SMTP_IDLE_SECONDS of idleness.
+Temporary failures (4xx, network) back off exponentially up to
+MAIL_MAX_ATTEMPTS, including recipients or senders refused with a 4xx such
+as greylisting (450/451). Permanent ones (5xx) are dead at once.
+
+app.py starts the workers through init_app(), so messages queued by other
+processes or left from an earlier run go out even if this process never
+queues one. queue_email wakes the local workers, and every
+MAIL_POLL_SECONDS each worker also checks the outbox.
+
+For local testing, scripts/debug_smtp_server.py is a stand-in SMTP server
+(MAIL_HOST=localhost MAIL_PORT=1025 MAIL_STARTTLS=false).
+"""
+
+import atexit
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from bson import Binary, ObjectId
+from pymongo import ASCENDING
+
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))
+MAIL_MAX_PER_CONNECTION = int(os.getenv("MAIL_MAX_PER_CONNECTION", 100))
+MAIL_SMTP_IDLE_SECONDS = float(os.getenv("MAIL_SMTP_IDLE_SECONDS", 30))
+MAIL_SMTP_TIMEOUT = float(os.getenv("MAIL_SMTP_TIMEOUT", 20))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", 5))
+MAIL_LEASE_SECONDS = float(os.getenv("MAIL_LEASE_SECONDS", 120))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 8))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", 30))
+MAIL_SENT_RETENTION_DAYS = float(os.getenv("MAIL_SENT_RETENTION_DAYS", 7))
+SHUTDOWN_TIMEOUT_SECONDS = 10
+
+_outbox_collection = None
+
+
+def _outbox():
+    global _outbox_collection
+    if _outbox_collection is None:
+        import db
+        collection = db.db["mail_outbox"]
+        collection.create_index([("status", ASCENDING), ("due_at", ASCENDING)])
+        collection.create_index("claimed_by", sparse=True)
+        # Only sent messages carry sent_at, so dead letters never expire
+        collection.create_index("sent_at", expireAfterSeconds=int(MAIL_SENT_RETENTION_DAYS * 86400))
+        _outbox_collection = collection
+    return _outbox_collection
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # {recipient: (code, message)}; retry unless every refusal is 5xx
+        return bool(error.recipients) and all(500 <= code < 600 for code, _ in error.recipients.values())
+    # Includes SMTPSenderRefused
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+def open_smtp_connection() -> smtplib.SMTP:
+    """Connect, STARTTLS and log in with the MAIL_* settings"""
+    from handlers.email_handler import (
+        MAILTRAP_HOST, MAILTRAP_PORT, MAILTRAP_USERNAME, MAILTRAP_PASSWORD, MAIL_STARTTLS
+    )
+
+    server = smtplib.SMTP(MAILTRAP_HOST, MAILTRAP_PORT, timeout=MAIL_SMTP_TIMEOUT)
+    try:
+        if MAIL_STARTTLS:
+            server.starttls()
+        if MAILTRAP_USERNAME:
+            server.login(MAILTRAP_USERNAME, MAILTRAP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_raw(from_addr: str, to_addrs: Sequence[str], raw: bytes) -> None:
+    """Deliver one message on a fresh connection (fallback when the queue is down)"""
+    with open_smtp_connection() as server:
+        server.sendmail(from_addr, list(to_addrs), raw)
+
+
+def queue_email(message, to_addrs, kind: str, from_addr: Optional[str] = None) -> bool:
+    """
+    Queue a message (raw bytes or an email.message) for delivery; True once it is stored
+
+    If the outbox can't be written, the message is sent inline instead,
+    as before the queue existed.
+    """
+    from handlers.email_handler import FROM_EMAIL
+
+    if isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+    from_addr = from_addr or FROM_EMAIL
+    raw = message if isinstance(message, bytes) else message.as_bytes()
+    now = datetime.utcnow()
+    try:
+        _outbox().insert_one({
+            "kind": kind,
+            "from": from_addr,
+            "to": list(to_addrs),
+            "raw": Binary(raw),
+            "status": "queued",
+            "attempts": 0,
+            "created_at": now,
+            "due_at": now
+        })
+    except Exception as e:
+        print(f"[MAIL] Could not queue {kind} email ({e}), sending inline")
+        try:
+            send_raw(from_addr, to_addrs, raw)
+            return True
+        except Exception as send_error:
+            print(f"[MAIL] Failed to send {kind} email to {', '.join(to_addrs)}: {send_error}")
+            return False
+    get_mail_queue().wake()
+    return True
+
+
+class MailQueue:
+    """Worker threads delivering mail_outbox over pooled SMTP connections"""
+
+    def __init__(self, workers: int = MAIL_WORKERS, batch_size: int = MAIL_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._counters = {"sent": 0, "retried": 0, "dead": 0, "connections": 0}
+
+    def wake(self) -> None:
+        """Start the workers if needed and have one check the outbox now"""
+        self._ensure_workers()
+        self._wake.set()
+
+    # -- claiming --
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        outbox = _outbox()
+        now = datetime.utcnow()
+        due = {"status": "queued", "due_at": {"$lte": now}, "locked_until": {"$not": {"$gt": now}}}
+        ids = [doc["_id"] for doc in outbox.find(due, {"_id": 1}).sort("due_at", ASCENDING).limit(self.batch_size)]
+        if not ids:
+            return []
+        token = ObjectId()
+        # Another worker may have claimed some of these since the find
+        outbox.update_many(
+            {"_id": {"$in": ids}, "status": "queued", "locked_until": {"$not": {"$gt": now}}},
+            {"$set": {"claimed_by": token, "locked_until": now + timedelta(seconds=MAIL_LEASE_SECONDS)}}
+        )
+        return list(outbox.find({"claimed_by": token}).sort("due_at", ASCENDING))
+
+    def _mark_sent(self, message: Dict[str, Any]) -> None:
+        _outbox().update_one(
+            {"_id": message["_id"]},
+            {
+                "$set": {"status": "sent", "sent_at": datetime.utcnow(), "attempts": message.get("attempts", 0) + 1},
+                "$unset": {"raw": "", "claimed_by": "", "locked_until": "", "last_error": ""}
+            }
+        )
+        with self._lock:
+            self._counters["sent"] += 1
+
+    def _mark_failed(self, message: Dict[str, Any], error: Exception, permanent: Optional[bool] = None) -> None:
+        attempts = message.get("attempts", 0) + 1
+        update = {"attempts": attempts, "last_error": str(error)[:500], "claimed_by": None, "locked_until": None}
+        if permanent is None:
+            permanent = _is_permanent(error)
+        if permanent or attempts >= MAIL_MAX_ATTEMPTS:
+            update["status"] = "dead"
+            counter = "dead"
+            print(f"[MAIL] Giving up on {message.get('kind')} email to {', '.join(message['to'])}: {error}")
+        else:
+            delay = MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            update["due_at"] = datetime.utcnow() + timedelta(seconds=delay)
+            counter = "retried"
+            print(f"[MAIL] {message.get('kind')} email to {', '.join(message['to'])} failed ({error}), retrying in {delay:.0f}s")
+        _outbox().update_one({"_id": message["_id"]}, {"$set": update})
+        with self._lock:
+            self._counters[counter] += 1
+
+    # -- delivery --
+
+    def _deliver(self, batch: List[Dict[str, Any]], connection: Dict[str, Any]) -> None:
+        """Send a claimed batch over the worker's connection, reconnecting as needed"""
+        for position, message in enumerate(batch):
+            try:
+                server = self._connection(connection)
+            except Exception as e:
+                # Connecting or logging in failed, which is no message's fault
+                print(f"[MAIL] SMTP connection failed: {e}")
+                for pending in batch[position:]:
+                    self._mark_failed(pending, e, permanent=False)
+                return
+            try:
+                server.sendmail(message["from"], message["to"], bytes(message["raw"]))
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                # The server rejected this message; reset and keep the connection
+                try:
+                    server.rset()
+                except Exception:
+                    self._close(connection)
+                self._mark_failed(message, e)
+                continue
+            except Exception as e:
+                self._close(connection)
+                self._mark_failed(message, e)
+                continue
+            connection["sent"] += 1
+            connection["last_used"] = time.monotonic()
+            self._mark_sent(message)
+
+    def _connection(self, connection: Dict[str, Any]) -> smtplib.SMTP:
+        server = connection.get("server")
+        if server is not None:
+            idle = time.monotonic() - connection["last_used"]
+            if connection["sent"] >= MAIL_MAX_PER_CONNECTION or idle > MAIL_SMTP_IDLE_SECONDS:
+                self._close(connection)
+                server = None
+        if server is None:
+            server = open_smtp_connection()
+            connection.update(server=server, sent=0, last_used=time.monotonic())
+            with self._lock:
+                self._counters["connections"] += 1
+        return server
+
+    @staticmethod
+    def _close(connection: Dict[str, Any]) -> None:
+        server = connection.pop("server", None)
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def process_batch(self, connection: Optional[Dict[str, Any]] = None) -> int:
+        """Claim and send one batch; returns how many messages were claimed"""
+        owned = connection is None
+        connection = {} if owned else connection
+        batch = self._claim()
+        try:
+            if batch:
+                self._deliver(batch, connection)
+        finally:
+            if owned:
+                self._close(connection)
+        return len(batch)
+
+    # -- threads --
+
+    def _ensure_workers(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own threads
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name="mail-worker", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        connection: Dict[str, Any] = {}
+        try:
+            while not self._stop.is_set():
+                try:
+                    claimed = self.process_batch(connection)
+                except Exception as e:
+                    print(f"[MAIL] Worker pass failed: {e}")
+                    claimed = 0
+                if claimed:
+                    continue
+                # Drop the connection rather than let the server time it out
+                if connection.get("server") and time.monotonic() - connection["last_used"] > MAIL_SMTP_IDLE_SECONDS:
+                    self._close(connection)
+                self._wake.wait(MAIL_POLL_SECONDS)
+                self._wake.clear()
+        finally:
+            self._close(connection)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"workers": len(self._threads), **self._counters}
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Stop the workers; unsent messages stay queued for the next start"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+# Global instance for common use
+mail_queue = None
+
+
+def get_mail_queue() -> MailQueue:
+    """Get or create the global mail queue"""
+    global mail_queue
+    if mail_queue is None:
+        mail_queue = MailQueue()
+        atexit.register(mail_queue.shutdown)
+    return mail_queue
+
+
+def init_app(app) -> None:
+    """Start the workers with the app, and again in each forked worker process"""
+    get_mail_queue().wake()
+
+    @app.before_request
+    def _ensure_mail_workers():
+        # Only a pid check unless this process has no workers yet
+        get_mail_queue()._ensure_workers()
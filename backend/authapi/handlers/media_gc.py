@@ -0,0 +1,328 @@
+# backend/authapi/handlers/media_gc.py
+"""
+Asynchronous media deletion and orphan collection
+
+Deleting a scan or replacing an avatar used to call the CDN inline, one
+asset per request. Now callers schedule_deletion() and return. The ids go
+into the `media_deletions` collection:
+
+    {_id, public_id, reason, enqueued_at, due_at, attempts,
+     locked_until, claimed_by, last_error, failed_at}
+
+A collector thread drains it every MEDIA_GC_INTERVAL seconds. Each pass
+claims up to MEDIA_GC_BATCH due jobs under a lease, so several gunicorn
+workers never delete the same batch. It deletes them with one
+delete_resources call per 100 ids (see MediaService.destroy_many). A failed
+id is retried with exponential backoff. After MEDIA_GC_MAX_ATTEMPTS it keeps
+its document with failed_at set, for inspection.
+
+Reconciliation (every MEDIA_GC_RECONCILE_HOURS, or scripts/media_gc.py
+--reconcile) lists the scans/ and users/ assets on Cloudinary. It queues any
+asset no scan or user references that is older than
+MEDIA_GC_ORPHAN_GRACE_HOURS; the grace period covers uploads whose document
+is not written yet. Failed save_scan calls, dropped scan partitions and
+crashed avatar jobs leave such orphans. With MEDIA_GC_DEACTIVATED_DAYS set,
+users deactivated for longer than that also lose their uploaded photo and
+fall back to the generated avatar. Reactivation can't undo this, so it is
+off by default.
+"""
+
+import atexit
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+MEDIA_GC_INTERVAL = float(os.getenv("MEDIA_GC_INTERVAL", 30))
+MEDIA_GC_BATCH = int(os.getenv("MEDIA_GC_BATCH", 100))
+MEDIA_GC_LEASE_SECONDS = float(os.getenv("MEDIA_GC_LEASE_SECONDS", 300))
+MEDIA_GC_MAX_ATTEMPTS = int(os.getenv("MEDIA_GC_MAX_ATTEMPTS", 8))
+MEDIA_GC_RETRY_BASE_SECONDS = float(os.getenv("MEDIA_GC_RETRY_BASE_SECONDS", 60))
+MEDIA_GC_RECONCILE_HOURS = float(os.getenv("MEDIA_GC_RECONCILE_HOURS", 24))
+MEDIA_GC_ORPHAN_GRACE_HOURS = float(os.getenv("MEDIA_GC_ORPHAN_GRACE_HOURS", 24))
+MEDIA_GC_DEACTIVATED_DAYS = float(os.getenv("MEDIA_GC_DEACTIVATED_DAYS", 0))
+
+RECONCILE_PAGE_SIZE = 500
+# Public ids embed the owner: scans/<user_id>/..., users/<user_id>/...
+OWNER_PATTERN = re.compile(r"^(scans|users)/([0-9a-f]{24})/")
+
+_collections: Dict[str, Any] = {}
+
+
+def _deletions():
+    collection = _collections.get("deletions")
+    if collection is None:
+        import db
+        collection = db.db["media_deletions"]
+        collection.create_index([("due_at", ASCENDING)])
+        collection.create_index("claimed_by", sparse=True)
+        _collections["deletions"] = collection
+    return collection
+
+
+def _state():
+    collection = _collections.get("state")
+    if collection is None:
+        import db
+        collection = _collections["state"] = db.db["media_gc_state"]
+    return collection
+
+
+def schedule_deletion(public_ids, reason: str = "deleted") -> int:
+    """
+    Queue assets for deletion; returns how many were queued
+
+    Accepts one id or an iterable. Each call gets its own job even for a
+    repeated id, because the local image store counts references.
+    """
+    if isinstance(public_ids, str):
+        public_ids = [public_ids]
+    now = datetime.utcnow()
+    docs = [
+        {"public_id": public_id, "reason": reason, "enqueued_at": now, "due_at": now, "attempts": 0}
+        for public_id in public_ids if public_id
+    ]
+    if not docs:
+        return 0
+    try:
+        _deletions().insert_many(docs, ordered=False)
+    except Exception as e:
+        # Never lose track of an asset: fall back to deleting inline
+        print(f"[MEDIA] Could not queue {len(docs)} deletions ({e}), deleting inline")
+        from handlers.media_service import get_media_service
+        get_media_service().destroy_many([d["public_id"] for d in docs])
+        return 0
+    get_media_collector().start()
+    return len(docs)
+
+
+class MediaCollector:
+    """Drains media_deletions in batches and periodically reconciles orphans"""
+
+    def __init__(self, interval: float = MEDIA_GC_INTERVAL, batch_size: int = MEDIA_GC_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    # -- deletion queue --
+
+    def _claim(self) -> List[Dict[str, Any]]:
+        deletions = _deletions()
+        now = datetime.utcnow()
+        due = {"failed_at": None, "due_at": {"$lte": now}, "locked_until": {"$not": {"$gt": now}}}
+        ids = [doc["_id"] for doc in deletions.find(due, {"_id": 1}).sort("due_at", ASCENDING).limit(self.batch_size)]
+        if not ids:
+            return []
+        token = ObjectId()
+        # Another worker may have claimed some of these since the find
+        deletions.update_many(
+            {"_id": {"$in": ids}, "locked_until": {"$not": {"$gt": now}}},
+            {"$set": {"claimed_by": token, "locked_until": now + timedelta(seconds=MEDIA_GC_LEASE_SECONDS)}}
+        )
+        return list(deletions.find({"claimed_by": token}, {"public_id": 1, "attempts": 1}))
+
+    def collect_batch(self) -> Tuple[int, int]:
+        """Delete one claimed batch; returns (deleted, failed)"""
+        from handlers.media_service import get_media_service
+
+        jobs = self._claim()
+        if not jobs:
+            return 0, 0
+        results = get_media_service().destroy_many([job["public_id"] for job in jobs])
+
+        deletions = _deletions()
+        done = [job["_id"] for job in jobs if results.get(job["public_id"])]
+        if done:
+            deletions.delete_many({"_id": {"$in": done}})
+
+        now = datetime.utcnow()
+        retries = []
+        for job in jobs:
+            if results.get(job["public_id"]):
+                continue
+            attempts = job.get("attempts", 0) + 1
+            update = {"attempts": attempts, "last_error": "delete failed", "locked_until": None, "claimed_by": None}
+            if attempts >= MEDIA_GC_MAX_ATTEMPTS:
+                update["failed_at"] = now
+                print(f"[MEDIA] Giving up on deleting {job['public_id']} after {attempts} attempts")
+            else:
+                update["due_at"] = now + timedelta(seconds=MEDIA_GC_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            retries.append(UpdateOne({"_id": job["_id"]}, {"$set": update}))
+        if retries:
+            deletions.bulk_write(retries, ordered=False)
+
+        print(f"[MEDIA] GC pass: {len(done)} deleted, {len(retries)} to retry")
+        return len(done), len(retries)
+
+    def drain(self) -> Tuple[int, int]:
+        """Collect batches until nothing is due"""
+        deleted = failed = 0
+        while True:
+            batch_deleted, batch_failed = self.collect_batch()
+            deleted += batch_deleted
+            failed += batch_failed
+            if batch_deleted + batch_failed < self.batch_size:
+                return deleted, failed
+
+    # -- reconciliation --
+
+    def _referenced(self, kind: str, public_ids: List[str]) -> set:
+        import db
+
+        owners = {}
+        unowned = []
+        for public_id in public_ids:
+            match = OWNER_PATTERN.match(public_id)
+            if match:
+                owners.setdefault(ObjectId(match.group(2)), []).append(public_id)
+            else:
+                unowned.append(public_id)
+
+        referenced = set()
+        if kind == "users":
+            for user in db.users_collection.find({"_id": {"$in": list(owners)}}, {"photoPublicId": 1}):
+                referenced.add(user.get("photoPublicId"))
+            if unowned:
+                for user in db.users_collection.find({"photoPublicId": {"$in": unowned}}, {"photoPublicId": 1}):
+                    referenced.add(user["photoPublicId"])
+            return referenced
+
+        # Scans: the owner narrows each lookup to the user_id index
+        query = {"cloudinary_public_id": {"$in": public_ids}}
+        if not unowned:
+            query["user_id"] = {"$in": list(owners)}
+        for collection, _, _ in db.scan_sources():
+            for scan in collection.find(query, {"cloudinary_public_id": 1}):
+                referenced.add(scan["cloudinary_public_id"])
+        return referenced
+
+    def find_orphans(self, prefixes: Iterable[str] = ("scans/", "users/")) -> List[str]:
+        """Assets under `prefixes` that nothing references and are past the grace period"""
+        from handlers.media_service import get_media_service
+
+        backend = get_media_service().backend
+        if not hasattr(backend, "list_assets"):
+            print(f"[MEDIA] The {backend.name} backend cannot list assets, skipping reconciliation")
+            return []
+
+        cutoff = datetime.utcnow() - timedelta(hours=MEDIA_GC_ORPHAN_GRACE_HOURS)
+        orphans = []
+        for prefix in prefixes:
+            kind = prefix.strip("/")
+            page = []
+            listed = 0
+            for public_id, created_at in backend.list_assets(prefix):
+                listed += 1
+                if created_at < cutoff:
+                    page.append(public_id)
+                if len(page) >= RECONCILE_PAGE_SIZE:
+                    referenced = self._referenced(kind, page)
+                    orphans.extend(p for p in page if p not in referenced)
+                    page = []
+            if page:
+                referenced = self._referenced(kind, page)
+                orphans.extend(p for p in page if p not in referenced)
+            print(f"[MEDIA] Reconciled {listed} assets under {prefix}")
+        return orphans
+
+    def reclaim_deactivated(self, days: float = MEDIA_GC_DEACTIVATED_DAYS) -> int:
+        """Queue photos of users deactivated more than `days` ago; returns how many"""
+        import db
+        from handlers.avatar_pipeline import default_avatar
+
+        if days <= 0:
+            return 0
+        cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        query = {
+            "isActive": False,
+            "photoPublicId": {"$nin": [None, ""]},
+            # deactivatedAt/updatedAt are stored as ISO strings, which sort chronologically
+            "$or": [
+                {"deactivatedAt": {"$lt": cutoff}},
+                {"deactivatedAt": {"$exists": False}, "updatedAt": {"$lt": cutoff}}
+            ]
+        }
+        reclaimed = 0
+        for user in db.users_collection.find(query, {"name": 1, "photoPublicId": 1}):
+            result = db.users_collection.update_one(
+                {"_id": user["_id"], "photoPublicId": user["photoPublicId"]},
+                {"$set": default_avatar(user.get("name")), "$unset": {"photoPublicId": "", "photoUpdatedAt": ""}}
+            )
+            if result.modified_count:
+                db.invalidate_user_summary(user["_id"])
+                schedule_deletion(user["photoPublicId"], reason="deactivated")
+                reclaimed += 1
+        return reclaimed
+
+    def reconcile(self, dry_run: bool = False) -> Dict[str, int]:
+        """Queue orphaned assets (and stale deactivated users' photos)"""
+        orphans = self.find_orphans()
+        if dry_run:
+            return {"orphans": len(orphans), "deactivated": 0}
+        queued = schedule_deletion(orphans, reason="orphan")
+        deactivated = self.reclaim_deactivated()
+        print(f"[MEDIA] Reconciliation queued {queued} orphans and {deactivated} deactivated users' photos")
+        return {"orphans": queued, "deactivated": deactivated}
+
+    def _reconcile_due(self) -> bool:
+        """Claim the next reconciliation run; at most one worker wins per period"""
+        if MEDIA_GC_RECONCILE_HOURS <= 0:
+            return False
+        now = datetime.utcnow()
+        try:
+            _state().find_one_and_update(
+                {"_id": "reconcile", "last_run": {"$not": {"$gt": now - timedelta(hours=MEDIA_GC_RECONCILE_HOURS)}}},
+                {"$set": {"last_run": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The document exists and was run recently
+            return False
+        return True
+
+    # -- background thread --
+
+    def start(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="media-gc", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.drain()
+                if self._reconcile_due():
+                    self.reconcile()
+            except Exception as e:
+                print(f"[MEDIA] GC pass failed: {e}")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+
+
+# Global instance for common use
+media_collector = None
+
+
+def get_media_collector() -> MediaCollector:
+    """Get or create the global media collector"""
+    global media_collector
+    if media_collector is None:
+        media_collector = MediaCollector()
+        atexit.register(media_collector.shutdown)
+    return media_collector
@@ -0,0 +1,380 @@
+# backend/authapi/handlers/media_service.py
+"""
+Media upload service
+
+Profile pictures, scan images and shop images are all uploaded through
+get_media_service(). The service adds:
+    - a shared keep-alive HTTP pool sized for MEDIA_UPLOAD_WORKERS
+      (the Cloudinary SDK's default pool keeps one connection per host)
+    - a bounded worker pool; at most MEDIA_MAX_PENDING uploads run or wait,
+      and callers beyond that get MediaUnavailable
+    - a per-request timeout and exponential-backoff retries (with jitter)
+      for errors worth retrying: network failures, 5xx and rate limiting
+    - a circuit breaker: after MEDIA_BREAKER_THRESHOLD consecutive failures,
+      uploads fail fast for MEDIA_BREAKER_COOLDOWN seconds, then one trial
+      upload decides whether to close it again
+    - latency, retry and failure metrics, served by /metrics
+
+Backends (MEDIA_BACKEND):
+    cloudinary  the Cloudinary upload API (default)
+    local       files under MEDIA_LOCAL_ROOT served by the app at /media/local,
+                for offline development, tests and benchmarks.
+                MEDIA_LOCAL_LATENCY_MS and MEDIA_LOCAL_FAILURE_RATE simulate a
+                slow or flaky provider.
+    store       content-addressed files under MEDIA_STORE_ROOT served at
+                /media/store, for on-premise deployments (handlers/image_store.py)
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+from db_monitoring import Histogram, LATENCY_BUCKETS_MS
+from handlers.image_store import ContentStore
+
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "cloudinary").lower()
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", 4))
+MEDIA_MAX_PENDING = int(os.getenv("MEDIA_MAX_PENDING", MEDIA_UPLOAD_WORKERS * 8))
+MEDIA_HTTP_POOL_SIZE = int(os.getenv("MEDIA_HTTP_POOL_SIZE", MEDIA_UPLOAD_WORKERS))
+MEDIA_UPLOAD_TIMEOUT = float(os.getenv("MEDIA_UPLOAD_TIMEOUT", 60))
+MEDIA_UPLOAD_ATTEMPTS = int(os.getenv("MEDIA_UPLOAD_ATTEMPTS", 3))
+MEDIA_RETRY_BASE_SECONDS = float(os.getenv("MEDIA_RETRY_BASE_SECONDS", 0.5))
+MEDIA_BREAKER_THRESHOLD = int(os.getenv("MEDIA_BREAKER_THRESHOLD", 5))
+MEDIA_BREAKER_COOLDOWN = float(os.getenv("MEDIA_BREAKER_COOLDOWN", 30))
+# Cloudinary's delete_resources accepts at most 100 public ids per call
+MAX_BULK_DELETE = 100
+
+MEDIA_LOCAL_ROOT = Path(os.getenv("MEDIA_LOCAL_ROOT", Path(__file__).resolve().parent.parent / "media_local"))
+MEDIA_LOCAL_BASE_URL = os.getenv("MEDIA_LOCAL_BASE_URL", "/media/local")
+MEDIA_LOCAL_LATENCY_MS = float(os.getenv("MEDIA_LOCAL_LATENCY_MS", 0))
+MEDIA_LOCAL_FAILURE_RATE = float(os.getenv("MEDIA_LOCAL_FAILURE_RATE", 0))
+
+Source = Union[bytes, str, BinaryIO]
+
+
+class MediaUnavailable(RuntimeError):
+    """The provider is failing (breaker open) or the upload pool is saturated"""
+
+
+class RetryableMediaError(RuntimeError):
+    """A transient provider failure; the local backend raises it to simulate one"""
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+
+class CloudinaryBackend:
+    name = "cloudinary"
+
+    def __init__(self):
+        import cloudinary
+        import cloudinary.uploader
+        import cloudinary.utils
+
+        self._uploader = cloudinary.uploader
+        self._utils = cloudinary.utils
+        # One keep-alive pool shared by all upload workers
+        cloudinary.uploader._http = cloudinary.utils.get_http_connector(
+            cloudinary.config(), dict(cloudinary.CERT_KWARGS, maxsize=MEDIA_HTTP_POOL_SIZE)
+        )
+
+    def upload(self, source: Source, public_id: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        if public_id:
+            options = dict(options, public_id=public_id)
+        return self._uploader.upload(source, timeout=MEDIA_UPLOAD_TIMEOUT, **options)
+
+    def url(self, public_id: str, **transformation) -> str:
+        return self._utils.cloudinary_url(public_id, **transformation)[0]
+
+    def destroy(self, public_id: str) -> bool:
+        return self._uploader.destroy(public_id, timeout=MEDIA_UPLOAD_TIMEOUT).get("result") == "ok"
+
+    def destroy_many(self, public_ids) -> Dict[str, bool]:
+        """One Admin API call per MAX_BULK_DELETE ids; maps each id to whether it is gone"""
+        import cloudinary.api
+
+        results = {}
+        for start in range(0, len(public_ids), MAX_BULK_DELETE):
+            chunk = public_ids[start:start + MAX_BULK_DELETE]
+            try:
+                deleted = cloudinary.api.delete_resources(chunk, timeout=MEDIA_UPLOAD_TIMEOUT).get("deleted", {})
+            except Exception as e:
+                print(f"[MEDIA] Bulk delete of {len(chunk)} assets failed: {e}")
+                deleted = {}
+            for public_id in chunk:
+                results[public_id] = deleted.get(public_id) in ("deleted", "not_found")
+        return results
+
+    def list_assets(self, prefix: str):
+        """Yield (public_id, created_at) for every uploaded image under `prefix`"""
+        import cloudinary.api
+
+        cursor = None
+        while True:
+            page = cloudinary.api.resources(
+                type="upload", prefix=prefix, max_results=500, next_cursor=cursor, timeout=MEDIA_UPLOAD_TIMEOUT
+            )
+            for resource in page.get("resources", []):
+                created_at = datetime.strptime(resource["created_at"], "%Y-%m-%dT%H:%M:%SZ")
+                yield resource["public_id"], created_at
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        from cloudinary.exceptions import Error, GeneralError, RateLimited
+
+        if isinstance(error, (GeneralError, RateLimited, RetryableMediaError, socket.timeout, ConnectionError)):
+            return True
+        # The SDK wraps transport failures in the base Error class
+        return type(error) is Error and str(error).startswith(("Socket error", "Unexpected error"))
+
+
+class LocalBackend:
+    """Stores files on disk; transformations are recorded but not applied"""
+
+    name = "local"
+
+    def __init__(self, root: Path = MEDIA_LOCAL_ROOT, base_url: str = MEDIA_LOCAL_BASE_URL):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, public_id: str) -> Path:
+        path = (self.root / public_id).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid public id: {public_id}")
+        return path
+
+    def upload(self, source: Source, public_id: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+        if MEDIA_LOCAL_LATENCY_MS:
+            time.sleep(MEDIA_LOCAL_LATENCY_MS / 1000)
+        if MEDIA_LOCAL_FAILURE_RATE and random.random() < MEDIA_LOCAL_FAILURE_RATE:
+            raise RetryableMediaError("Simulated provider failure")
+
+        if isinstance(source, str):
+            data = Path(source).read_bytes()
+        elif isinstance(source, bytes):
+            data = source
+        else:
+            data = source.read()
+        if not public_id:
+            public_id = f"{options.get('folder', 'uploads')}/{os.urandom(10).hex()}"
+        path = self._path(public_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return {
+            "public_id": public_id,
+            "secure_url": self.url(public_id),
+            "format": None,
+            "bytes": len(data),
+            "eager": [],
+        }
+
+    def url(self, public_id: str, **transformation) -> str:
+        return f"{self.base_url}/{public_id}"
+
+    def destroy(self, public_id: str) -> bool:
+        try:
+            self._path(public_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return isinstance(error, (RetryableMediaError, OSError))
+
+
+BACKENDS = {"cloudinary": CloudinaryBackend, "local": LocalBackend, "store": ContentStore}
+
+
+# ---------------------------
+# Service
+# ---------------------------
+
+class MediaService:
+    """Retrying, rate-bounded uploads with a circuit breaker in front of a backend"""
+
+    def __init__(self, backend=None, workers: int = MEDIA_UPLOAD_WORKERS, max_pending: int = MEDIA_MAX_PENDING):
+        self.backend = backend or BACKENDS[MEDIA_BACKEND]()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="media-upload")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._trial_running = False
+        self._counters = {"uploads": 0, "failures": 0, "retries": 0, "rejected": 0, "destroys": 0}
+        self._latency = Histogram(LATENCY_BUCKETS_MS)
+
+    # -- circuit breaker --
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._consecutive_failures < MEDIA_BREAKER_THRESHOLD:
+                return
+            if time.monotonic() < self._open_until or self._trial_running:
+                self._counters["rejected"] += 1
+                raise MediaUnavailable("Media provider unavailable, retry later")
+            # Half-open: let this one call through as a trial
+            self._trial_running = True
+
+    def _record(self, ok: bool, latency_ms: Optional[float] = None, transient: bool = True) -> None:
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self._consecutive_failures = 0
+                self._counters["uploads"] += 1
+                self._latency.observe(latency_ms)
+                return
+            self._counters["failures"] += 1
+            if not transient:
+                # A bad request says nothing about the provider's health
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= MEDIA_BREAKER_THRESHOLD:
+                self._open_until = time.monotonic() + MEDIA_BREAKER_COOLDOWN
+                print(f"[MEDIA] Circuit open for {MEDIA_BREAKER_COOLDOWN:.0f}s after {self._consecutive_failures} failures")
+
+    # -- uploads --
+
+    def _upload(self, source: Source, public_id: Optional[str], options: Dict[str, Any],
+                thumbnail: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            if hasattr(source, "seek"):
+                source.seek(0)
+            start = time.perf_counter()
+            try:
+                result = self.backend.upload(source, public_id, options)
+            except Exception as e:
+                retryable = self.backend.is_retryable(e)
+                self._record(False, transient=retryable)
+                if attempt >= MEDIA_UPLOAD_ATTEMPTS or not retryable:
+                    print(f"[MEDIA] Upload of {public_id or 'unnamed'} failed after {attempt} attempts: {e}")
+                    raise
+                delay = MEDIA_RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                with self._lock:
+                    self._counters["retries"] += 1
+                print(f"[MEDIA] Upload attempt {attempt} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self._record(True, (time.perf_counter() - start) * 1000)
+            return self._normalize(result, thumbnail)
+
+    def _normalize(self, result: Dict[str, Any], thumbnail: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        public_id = result.get("public_id")
+        thumbnail_url = None
+        if thumbnail:
+            width = thumbnail.get("width")
+            thumbnail_url = next(
+                (e.get("secure_url") for e in result.get("eager") or [] if e.get("width") == width), None
+            ) or self.backend.url(public_id, **thumbnail)
+        return {
+            "url": result.get("secure_url"),
+            "thumbnail_url": thumbnail_url,
+            "public_id": public_id,
+            "format": result.get("format"),
+            "size": result.get("bytes"),
+        }
+
+    def submit(self, source: Source, public_id: Optional[str] = None,
+               thumbnail: Optional[Dict[str, Any]] = None, **options) -> Future:
+        """Queue an upload on the worker pool; the Future yields what upload() returns"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise MediaUnavailable("Too many uploads in progress, retry later")
+        try:
+            future = self._executor.submit(self._upload, source, public_id, options, thumbnail)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def upload(self, source: Source, public_id: Optional[str] = None,
+               thumbnail: Optional[Dict[str, Any]] = None, **options) -> Dict[str, Any]:
+        """
+        Upload bytes, a file path or a file object
+
+        Extra keyword arguments go to the backend (folder, transformation,
+        eager, ...). `thumbnail` is a transformation for thumbnail_url.
+        Returns url, thumbnail_url, public_id, format and size; raises on failure.
+        """
+        return self.submit(source, public_id, thumbnail, **options).result()
+
+    def url(self, public_id: str, **transformation) -> str:
+        return self.backend.url(public_id, **transformation)
+
+    def destroy(self, public_id: str) -> bool:
+        """Delete an asset; failures are logged and reported as False"""
+        try:
+            deleted = self.backend.destroy(public_id)
+        except Exception as e:
+            print(f"[MEDIA] Could not delete {public_id}: {e}")
+            return False
+        with self._lock:
+            self._counters["destroys"] += 1
+        return deleted
+
+    def destroy_many(self, public_ids) -> Dict[str, bool]:
+        """
+        Delete assets in bulk; maps each id to whether it is now gone
+
+        Backends without a bulk call delete one by one. An id that no longer
+        exists counts as gone.
+        """
+        public_ids = list(public_ids)
+        bulk = getattr(self.backend, "destroy_many", None)
+        if bulk is not None:
+            results = bulk(public_ids)
+        else:
+            results = {}
+            for public_id in public_ids:
+                try:
+                    self.backend.destroy(public_id)
+                    results[public_id] = True
+                except Exception as e:
+                    print(f"[MEDIA] Could not delete {public_id}: {e}")
+                    results[public_id] = False
+        with self._lock:
+            self._counters["destroys"] += sum(results.values())
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                **self._counters,
+                "circuit_open": self._consecutive_failures >= MEDIA_BREAKER_THRESHOLD,
+                "latency_ms": self._latency.snapshot(),
+            }
+
+
+# Global instance for common use
+media_service = None
+_media_lock = threading.Lock()
+
+
+def get_media_service() -> MediaService:
+    """Get or create the global media service"""
+    global media_service
+    if media_service is None:
+        with _media_lock:
+            if media_service is None:
+                media_service = MediaService()
+                print(f"[MEDIA] Using {media_service.backend.name} backend")
+    return media_service
@@ -0,0 +1,187 @@
+# backend/authapi/handlers/view_counter.py
+"""
+Write-behind buffer for forum post view counters
+
+Views are accumulated in process and flushed periodically (and at shutdown)
+as one unordered bulk_write, so a popular post no longer turns every read
+into a write on the same document.
+
+Modes (FORUM_VIEW_COUNT_MODE):
+    hits   - every request counts (default)
+    unique - distinct viewers per post, estimated with a HyperLogLog sketch
+"""
+
+import atexit
+import hashlib
+import math
+import os
+import threading
+from typing import Dict, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+
+VIEW_COUNT_MODE = os.getenv("FORUM_VIEW_COUNT_MODE", "hits").lower()
+FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_COUNTER_FLUSH_SECONDS", 5))
+HLL_PRECISION = int(os.getenv("VIEW_COUNTER_HLL_PRECISION", 10))
+
+# View counts are advisory, so the flush does not wait for acknowledgement
+RELAXED_WRITE_CONCERN = WriteConcern(w=0)
+
+
+class HyperLogLog:
+    """Minimal HyperLogLog sketch with 2^precision one-byte registers"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: str) -> None:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        h = int.from_bytes(digest, "big")
+        index = h >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge_registers(self, registers: Dict[str, int]) -> None:
+        """Fold in a sparse {index: rank} mapping as stored in MongoDB"""
+        for index, rank in registers.items():
+            i = int(index)
+            if rank > self.registers[i]:
+                self.registers[i] = rank
+
+    def sparse(self) -> Dict[str, int]:
+        """Non-empty registers as {index: rank}"""
+        return {str(i): r for i, r in enumerate(self.registers) if r}
+
+    def estimate(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class ViewCounter:
+    """Coalesces post view increments and flushes them in bulk"""
+
+    def __init__(self, mode: str = VIEW_COUNT_MODE, flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.mode = mode if mode in ("hits", "unique") else "hits"
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._hits: Dict[ObjectId, int] = {}
+        self._sketches: Dict[ObjectId, HyperLogLog] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def record(self, post_id: ObjectId, viewer: Optional[str] = None) -> None:
+        """Buffer one view of `post_id` (viewer identifies the reader in unique mode)"""
+        self._ensure_flusher()
+        with self._lock:
+            if self.mode == "unique":
+                sketch = self._sketches.get(post_id)
+                if sketch is None:
+                    sketch = self._sketches[post_id] = HyperLogLog()
+                sketch.add(viewer or "anonymous")
+            else:
+                self._hits[post_id] = self._hits.get(post_id, 0) + 1
+
+    def pending(self, post_id: ObjectId) -> int:
+        """Views buffered for `post_id` that are not yet in MongoDB (hits mode only)"""
+        with self._lock:
+            return self._hits.get(post_id, 0)
+
+    def flush(self) -> int:
+        """Write buffered views to MongoDB; returns the number of posts touched"""
+        with self._lock:
+            hits, self._hits = self._hits, {}
+            sketches, self._sketches = self._sketches, {}
+
+        try:
+            if hits:
+                self._flush_hits(hits)
+            if sketches:
+                self._flush_sketches(sketches)
+        except Exception as e:
+            print(f"[VIEWS] Flush failed, re-buffering: {e}")
+            with self._lock:
+                for post_id, count in hits.items():
+                    self._hits[post_id] = self._hits.get(post_id, 0) + count
+                for post_id, sketch in sketches.items():
+                    current = self._sketches.setdefault(post_id, HyperLogLog(sketch.precision))
+                    current.merge_registers(sketch.sparse())
+            return 0
+        return len(hits) + len(sketches)
+
+    def _flush_hits(self, hits: Dict[ObjectId, int]) -> None:
+        from db import posts_collection
+
+        ops = [UpdateOne({"_id": post_id}, {"$inc": {"views": count}}) for post_id, count in hits.items()]
+        posts_collection.with_options(write_concern=RELAXED_WRITE_CONCERN).bulk_write(ops, ordered=False)
+
+    def _flush_sketches(self, sketches: Dict[ObjectId, HyperLogLog]) -> None:
+        from db import posts_collection, post_view_sketches_collection
+
+        # $max per register is commutative, so workers can merge concurrently
+        ops = [
+            UpdateOne(
+                {"_id": post_id},
+                {"$max": {f"registers.{i}": r for i, r in sketch.sparse().items()}},
+                upsert=True
+            )
+            for post_id, sketch in sketches.items()
+        ]
+        post_view_sketches_collection.bulk_write(ops, ordered=False)
+
+        estimates = []
+        for doc in post_view_sketches_collection.find({"_id": {"$in": list(sketches)}}):
+            merged = HyperLogLog(sketches[doc["_id"]].precision)
+            merged.merge_registers(doc.get("registers", {}))
+            estimates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"views": merged.estimate()}}))
+        if estimates:
+            posts_collection.with_options(write_concern=RELAXED_WRITE_CONCERN).bulk_write(estimates, ordered=False)
+
+    def _ensure_flusher(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._hits, self._sketches = {}, {}
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="view-counter-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def shutdown(self) -> None:
+        """Stop the flush thread and write out whatever is still buffered"""
+        self._stop.set()
+        self.flush()
+
+
+# Global instance for common use
+view_counter = None
+
+
+def get_view_counter() -> ViewCounter:
+    """Get or create the global view counter"""
+    global view_counter
+    if view_counter is None:
+        view_counter = ViewCounter()
+        atexit.register(view_counter.shutdown)
+    return view_counter
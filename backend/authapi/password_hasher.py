@@ -0,0 +1,222 @@
+# backend/authapi/password_hasher.py
+"""
+Password hashing service
+
+Argon2 hashing and verification cost tens of milliseconds of CPU and hold
+the GIL while they run, so they are sent to a small process pool instead of
+running in the request thread. Each web worker process has its own pool
+of PASSWORD_HASH_WORKERS processes, and at most PASSWORD_HASH_MAX_PENDING
+of its calls may be running or queued at once. Both limits are per web
+worker: N gunicorn workers run up to N times as many hashes. Once the cap
+is reached, callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds and then
+get PasswordHashingBusy. The app turns that into a 503 with Retry-After.
+
+Argon2 cost is read from the environment:
+    ARGON2_TIME_COST     iterations              (default 2)
+    ARGON2_MEMORY_COST   KiB per hash            (default 102400)
+    ARGON2_PARALLELISM   lanes per hash          (default 8)
+scripts/benchmark_password_hashing.py suggests values for a target latency.
+verify_and_update returns a new hash whenever the stored one was made with
+other parameters (or with bcrypt), and login saves it.
+
+PASSWORD_HASH_WORKERS=0 runs everything inline (scripts, debugging).
+
+app.py starts the pool with warm_up(), and it is shut down at exit. A
+spawned child normally re-runs the parent's main script first, which for
+`python app.py` would rebuild the whole app (Mongo, models, mail workers)
+in every hashing process. The pool's processes are started without it and
+import only this module, so keep it free of app imports (db, flask).
+"""
+
+import atexit
+import hmac
+import multiprocessing
+import multiprocessing.context as mp_context
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 102400))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 8))
+
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(2, os.cpu_count() or 1)))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", max(HASH_WORKERS, 1) * 4))
+QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 5))
+# Forking a process that already runs pymongo and request threads is unsafe
+START_METHOD = os.getenv("PASSWORD_HASH_START_METHOD", "spawn")
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated for longer than QUEUE_TIMEOUT"""
+
+    retry_after = max(1, int(QUEUE_TIMEOUT))
+
+
+def build_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    # bcrypt stays verifiable; deprecated="auto" rehashes it to argon2 on login
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+pwd_context = build_context(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+
+
+# ---------------------------
+# Work done in the pool
+# ---------------------------
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(password, hashed)
+    except (ValueError, TypeError):
+        # Very old accounts stored the password as-is; upgrade them on match
+        if isinstance(hashed, str) and hmac.compare_digest(password.encode(), hashed.encode()):
+            return True, pwd_context.hash(password)
+        return False, None
+
+
+# ---------------------------
+# Pool
+# ---------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_shutdown_registered = False
+
+# Stands in for __main__ while a pool process starts: it has no file or
+# spec, so the child has no main script to re-run
+_NO_MAIN = types.ModuleType("__main__")
+_start_lock = threading.Lock()
+
+
+class _WithoutMain:
+    def start(self):
+        # get_preparation_data() reads sys.modules["__main__"] inside start()
+        with _start_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = _NO_MAIN
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = main
+
+
+class _SpawnProcess(_WithoutMain, mp_context.SpawnProcess):
+    pass
+
+
+class _ForkServerProcess(_WithoutMain, mp_context.ForkServerProcess):
+    pass
+
+
+class _SpawnContext(mp_context.SpawnContext):
+    Process = _SpawnProcess
+
+
+class _ForkServerContext(mp_context.ForkServerContext):
+    Process = _ForkServerProcess
+
+
+def pool_context(start_method: str = START_METHOD):
+    """A multiprocessing context whose processes don't re-import the main script"""
+    if start_method == "spawn":
+        return _SpawnContext()
+    if start_method == "forkserver":
+        multiprocessing.set_forkserver_preload([__name__])
+        return _ForkServerContext()
+    return multiprocessing.get_context(start_method)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid, _shutdown_registered
+    # A pool inherited from a gunicorn master belongs to the master
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=pool_context())
+                _pool_pid = os.getpid()
+                if not _shutdown_registered:
+                    atexit.register(shutdown)
+                    _shutdown_registered = True
+                print(f"[AUTH] Password hashing pool started ({HASH_WORKERS} workers, {MAX_PENDING} pending max)")
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def _run(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(timeout=QUEUE_TIMEOUT):
+        print("[AUTH] Password hashing pool saturated")
+        raise PasswordHashingBusy("Password hashing is saturated, retry shortly")
+    try:
+        pool = _get_pool()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (OOM on a large memory cost); start a fresh pool once
+            print("[AUTH] Password hashing pool broke, restarting")
+            _reset_pool(pool)
+            return _get_pool().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def warm_up() -> None:
+    """Start the worker processes now rather than on the first login"""
+    if HASH_WORKERS > 0:
+        pool = _get_pool()
+        for future in [pool.submit(int) for _ in range(HASH_WORKERS)]:
+            future.result()
+
+
+def shutdown() -> None:
+    """Stop this process's pool; the next hash starts a new one"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+        owned = _pool_pid == os.getpid()
+    if pool is not None and owned:
+        pool.shutdown(wait=True)
+
+
+# ---------------------------
+# Public API
+# ---------------------------
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new_hash); new_hash is set when the stored hash should be replaced"""
+    return _run(_verify_and_update, password, hashed)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return verify_and_update(password, hashed)[0]
@@ -0,0 +1,76 @@
+# backend/authapi/query_registry.py
+"""
+Registry of the query shapes the application sends to MongoDB
+
+Query helpers register the shape of each query they run (filter, sort,
+projection, limit, or an aggregation pipeline) next to their definition.
+scripts/explain_audit.py runs explain("executionStats") on every registered
+shape against a seeded database and flags collection scans, in-memory sorts
+and queries that examine far more documents than they return.
+
+Values that depend on the request are written as Param("name") and filled in
+by the audit from sample data, e.g. {"user_id": Param("user_id")}.
+"""
+
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Findings the audit can report for a shape
+FLAGS = ("COLLSCAN", "SORT", "RATIO")
+
+
+class Param(NamedTuple):
+    """Placeholder for a request-dependent value in a registered shape"""
+    name: str
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Any]]
+    projection: Optional[Dict[str, Any]]
+    limit: Optional[int]
+    pipeline: Optional[List[Dict[str, Any]]]
+    # Findings that are expected for this shape and not reported as problems,
+    # e.g. COLLSCAN for a tiny collection or SORT for text score ordering
+    allow: Tuple[str, ...]
+    source: str
+
+
+QUERY_SHAPES: Dict[str, QueryShape] = {}
+
+
+def register_query_shape(
+    name: str,
+    collection: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[Any]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    pipeline: Optional[List[Dict[str, Any]]] = None,
+    allow: Tuple[str, ...] = ()
+) -> None:
+    """Add a shape to the registry; names must be unique"""
+    if name in QUERY_SHAPES:
+        raise ValueError(f"Query shape registered twice: {name}")
+    unknown = set(allow) - set(FLAGS)
+    if unknown:
+        raise ValueError(f"Unknown audit flags for {name}: {sorted(unknown)}")
+    source = sys._getframe(1).f_globals.get("__name__", "?")
+    QUERY_SHAPES[name] = QueryShape(
+        name, collection, filter or {}, sort, projection, limit, pipeline, tuple(allow), source
+    )
+
+
+def resolve(value: Any, params: Dict[str, Any]) -> Any:
+    """Replace every Param in a shape component with its value from params"""
+    if isinstance(value, Param):
+        if value.name not in params:
+            raise KeyError(f"No sample value for parameter: {value.name}")
+        return params[value.name]
+    if isinstance(value, dict):
+        return {key: resolve(item, params) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [resolve(item, params) for item in value]
+    return value
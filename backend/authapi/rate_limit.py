@@ -0,0 +1,213 @@
+# backend/authapi/rate_limit.py
+"""
+Token-bucket rate limiting for expensive endpoints
+
+Each limited route gets one bucket per client IP and, optionally, one per
+email address in the request body. A limit "N/period" is a bucket of N
+tokens that refills at N per period. Every request takes a token, and a
+request that finds its bucket empty gets 429 with Retry-After.
+
+    @auth_bp.route("/login", methods=["POST", "OPTIONS"])
+    @rate_limit("login", per_ip="20/minute", per_email="5/minute")
+    def login(): ...
+
+The limits in code are defaults. RATE_LIMIT_<NAME>_IP and
+RATE_LIMIT_<NAME>_EMAIL override them per route (e.g.
+RATE_LIMIT_LOGIN_EMAIL=10/minute), and "off" disables one.
+
+Buckets live in this process by default (RATE_LIMIT_BACKEND=local); idle
+buckets that have refilled completely are evicted periodically. With
+RATE_LIMIT_BACKEND=mongo they live in the `rate_limits` collection so all
+gunicorn workers share them. Each check is one atomic find_one_and_update,
+and a TTL index removes idle buckets. If MongoDB is unreachable the local
+buckets are used instead.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Only trust X-Forwarded-For behind a proxy that sets it (ngrok, a load balancer)
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+EVICT_INTERVAL_SECONDS = 60
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day|s)?\s*$")
+
+
+class Limit:
+    """A bucket of `capacity` tokens refilled at `rate` tokens per second"""
+
+    __slots__ = ("capacity", "rate", "text")
+
+    def __init__(self, capacity: int, period_seconds: float, text: str):
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self.text = text
+
+
+def parse_limit(text: Optional[str]) -> Optional[Limit]:
+    """'5/minute', '100/hour' or '10/30s'; None or 'off' disables the limit"""
+    if not text or text.strip().lower() == "off":
+        return None
+    match = _LIMIT_RE.match(text.lower())
+    if not match:
+        raise ValueError(f"Invalid rate limit: {text!r}")
+    count, multiplier, unit = match.groups()
+    period = _PERIODS.get(unit, 1) * (int(multiplier) if multiplier else 1)
+    if unit is None and not multiplier:
+        raise ValueError(f"Rate limit needs a period: {text!r}")
+    return Limit(int(count), period, text)
+
+
+# ---------------------------
+# Bucket stores
+# ---------------------------
+
+class LocalBucketStore:
+    """Buckets in this process: key -> (tokens, updated_at, full_at)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._next_eviction = time.monotonic() + EVICT_INTERVAL_SECONDS
+
+    def take(self, key: str, limit: Limit) -> float:
+        """0 if a token was taken, otherwise seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now)
+            tokens, updated, _ = self._buckets.get(key, (limit.capacity, now, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / limit.rate
+            self._buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+            return wait
+
+    def _evict(self, now: float) -> None:
+        # A full bucket is indistinguishable from a missing one
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_eviction = now + EVICT_INTERVAL_SECONDS
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class MongoBucketStore:
+    """Buckets shared by every worker, one document per key in `rate_limits`"""
+
+    def __init__(self, fallback: LocalBucketStore):
+        self._fallback = fallback
+        self._collection = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            import db
+            collection = db.db["rate_limits"]
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._collection = collection
+        return self._collection
+
+    def take(self, key: str, limit: Limit) -> float:
+        from pymongo import ReturnDocument
+        from pymongo.errors import PyMongoError
+
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [
+            limit.capacity,
+            {"$add": [{"$ifNull": ["$tokens", limit.capacity]}, {"$multiply": [elapsed_seconds, limit.rate]}]}
+        ]}
+        try:
+            bucket = self._get_collection().find_one_and_update(
+                {"_id": key},
+                [
+                    {"$set": {"tokens": refilled}},
+                    {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                    {"$set": {
+                        "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                        "updated_at": now,
+                        "expires_at": now + timedelta(seconds=limit.capacity / limit.rate)
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except PyMongoError as e:
+            print(f"[RATE] Shared buckets unavailable, using local: {e}")
+            return self._fallback.take(key, limit)
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / limit.rate
+
+
+_local_store = LocalBucketStore()
+_store = MongoBucketStore(_local_store) if RATE_LIMIT_BACKEND == "mongo" else _local_store
+
+
+def get_store():
+    return _store
+
+
+def set_store(store) -> None:
+    """Swap the bucket store (tests use a fresh LocalBucketStore)"""
+    global _store
+    _store = store
+
+
+# ---------------------------
+# Flask decorator
+# ---------------------------
+
+def _client_ip(request) -> str:
+    if TRUST_PROXY:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.remote_addr or "unknown"
+
+
+def _request_email(request) -> Optional[str]:
+    data = request.get_json(silent=True) if request.is_json else request.form
+    email = (data or {}).get("email")
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(name: str, per_ip: Optional[str] = None, per_email: Optional[str] = None):
+    """Limit a view per client IP and per request email; see the module docstring"""
+    env_name = re.sub(r"[^A-Z0-9]", "_", name.upper())
+    ip_limit = parse_limit(os.getenv(f"RATE_LIMIT_{env_name}_IP", per_ip))
+    email_limit = parse_limit(os.getenv(f"RATE_LIMIT_{env_name}_EMAIL", per_email))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify, request
+
+            if not RATE_LIMIT_ENABLED or request.method == "OPTIONS":
+                return view(*args, **kwargs)
+
+            wait = 0.0
+            if ip_limit:
+                wait = _store.take(f"{name}:ip:{_client_ip(request)}", ip_limit)
+            if not wait and email_limit:
+                email = _request_email(request)
+                if email:
+                    wait = _store.take(f"{name}:email:{email}", email_limit)
+            if wait:
+                print(f"[RATE] {name} limited for {_client_ip(request)}, retry in {wait:.1f}s")
+                response = jsonify({"success": False, "error": "Too many requests, please retry later"})
+                response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
-from db import users_collection
+from pymongo import ASCENDING, DESCENDING
+from db import users_collection, analytics, cached_count, estimated_count, get_users_page, invalidate_user_summary, parse_utc_datetime
 from handlers.email_handler import send_deactivation_email, send_reactivation_email
+import admin_analytics
 import datetime
 
 # Create Blueprint
@@ -11,17 +13,39 @@ admin_bp = Blueprint('admin', __name__)
 # Admin User Management
 # ---------------------------
 
+def _parse_date(value, label="date"):
+    """Parse an ISO date/datetime query parameter as naive UTC (None when absent)"""
+    if not value:
+        return None
+    return parse_utc_datetime(value, label)
+
 @admin_bp.route("/users", methods=["GET", "OPTIONS"])
 def get_all_users():
-    """Get all users (admin)"""
+    """Get users (admin), paginated, sortable and filterable"""
     if request.method == "OPTIONS":
         return '', 200
     
     try:
-        users = list(users_collection.find({}, {"password": 0}))  # Exclude passwords
+        active = request.args.get('active')
+        cursor = request.args.get('cursor')
+        try:
+            page = get_users_page(
+                role=request.args.get('role') or None,
+                active=None if active is None else active.lower() == 'true',
+                created_from=_parse_date(request.args.get('created_from'), "created_from"),
+                created_to=_parse_date(request.args.get('created_to'), "created_to"),
+                search=request.args.get('search', ''),
+                sort=request.args.get('sort', 'createdAt'),
+                direction=ASCENDING if request.args.get('order', 'desc') == 'asc' else DESCENDING,
+                limit=int(request.args.get('limit', 50)),
+                cursor=cursor,
+                include_total=request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
         users_data = []
-        
-        for user in users:
+        for user in page["users"]:
             users_data.append({
                 "id": str(user["_id"]),
                 "name": user.get("name", ""),
@@ -33,11 +57,14 @@ def get_all_users():
                 "isActive": user.get("isActive", True)
             })
         
-        return jsonify({
+        response = {
             "success": True,
             "users": users_data,
-            "total": len(users_data)
-        }), 200
+            "next_cursor": page["next_cursor"]
+        }
+        if "total" in page:
+            response["total"] = page["total"]
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -61,6 +88,7 @@ def update_user_role(user_id):
             {"_id": ObjectId(user_id)},
             {"$set": {"role": data["role"], "updatedAt": datetime.datetime.utcnow().isoformat()}}
         )
+        invalidate_user_summary(user_id)
         
         if result.modified_count > 0:
             return jsonify({"success": True, "message": "Role updated"}), 200
@@ -98,6 +126,8 @@ def deactivate_user(user_id):
                 }
             }
         )
+        # Cached sessions of this user are refused from the next request on
+        invalidate_user_summary(user_id)
         
         if result.modified_count > 0:
             # Send deactivation email
@@ -144,6 +174,7 @@ def activate_user(user_id):
                 }
             }
         )
+        invalidate_user_summary(user_id)
         
         if result.modified_count > 0:
             # Send reactivation email
@@ -176,6 +207,7 @@ def delete_user(user_id):
             {"_id": ObjectId(user_id)},
             {"$set": {"isActive": False, "updatedAt": datetime.datetime.utcnow().isoformat()}}
         )
+        invalidate_user_summary(user_id)
         
         if result.modified_count > 0:
             return jsonify({"success": True, "message": "User deleted"}), 200
@@ -192,9 +224,10 @@ def get_admin_stats():
         return '', 200
     
     try:
-        total_users = users_collection.count_documents({})
-        active_users = users_collection.count_documents({"isActive": True})
-        admin_users = users_collection.count_documents({"role": "admin"})
+        stats_users = analytics(users_collection)
+        total_users = estimated_count(stats_users)
+        active_users = cached_count(stats_users, {"isActive": True})
+        admin_users = cached_count(stats_users, {"role": "admin"})
         
         return jsonify({
             "success": True,
@@ -208,3 +241,71 @@ def get_admin_stats():
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+
+# ---------------------------
+# Platform Analytics (served from rollups)
+# ---------------------------
+
+def _analytics_range():
+    """from/to query parameters, defaulting to the last 30 days"""
+    end = _parse_date(request.args.get('to'), "to") or datetime.datetime.utcnow()
+    start = _parse_date(request.args.get('from'), "from") or end - datetime.timedelta(days=30)
+    return start, end
+
+@admin_bp.route("/analytics/rollups", methods=["GET", "OPTIONS"])
+def get_analytics_rollups():
+    """Hourly or daily platform rollups for a time range"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        try:
+            start, end = _analytics_range()
+            granularity = request.args.get('granularity', 'day')
+            rollups = admin_analytics.get_rollups(granularity, start, end)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return jsonify({
+            "success": True,
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "rollups": rollups
+        }), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@admin_bp.route("/analytics/summary", methods=["GET", "OPTIONS"])
+def get_analytics_summary():
+    """Platform totals for a time range, merged from daily rollups"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        try:
+            start, end = _analytics_range()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return jsonify({
+            "success": True,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "summary": admin_analytics.get_summary(start, end)
+        }), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@admin_bp.route("/analytics/refresh", methods=["POST", "OPTIONS"])
+def refresh_analytics():
+    """Run the incremental rollup job up to now"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        return jsonify({"success": True, "processed": admin_analytics.run_incremental()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -1,10 +1,11 @@
 from flask import Blueprint, request, jsonify
-from auth import signup_user, login_user, hash_password, signup_user_with_pfp
+from auth import signup_user, login_user, hash_password, signup_user_with_pfp, PasswordHashingBusy
 from db import users_collection, upload_user_pfp
 from bson.objectid import ObjectId
 import tempfile
 import os
 import traceback
+from rate_limit import rate_limit
 
 # Create Blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -14,6 +15,7 @@ auth_bp = Blueprint('auth', __name__)
 # ---------------------------
 
 @auth_bp.route("/signup", methods=["POST", "OPTIONS"])
+@rate_limit("signup", per_ip="20/hour", per_email="5/hour")
 def signup():
     """User registration (JSON)"""
     if request.method == "OPTIONS":
@@ -37,6 +39,7 @@ def signup():
     return jsonify(result), status_code
 
 @auth_bp.route("/signup-with-pfp", methods=["POST", "OPTIONS"])
+@rate_limit("signup", per_ip="20/hour", per_email="5/hour")
 def signup_with_pfp():
     """User registration with profile picture (multipart/form-data)"""
     if request.method == "OPTIONS":
@@ -83,12 +86,15 @@ def signup_with_pfp():
         status_code = 200 if "success" in result else 400
         return jsonify(result), status_code
         
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
         print(f"[ROUTE] Signup error: {str(e)}")
         print(f"[ROUTE] Traceback: {traceback.format_exc()}")
         return jsonify({"error": "Registration failed"}), 500
 
 @auth_bp.route("/login", methods=["POST", "OPTIONS"])
+@rate_limit("login", per_ip="30/minute", per_email="10/minute")
 def login():
     """User login"""
     if request.method == "OPTIONS":
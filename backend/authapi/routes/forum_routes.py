@@ -2,17 +2,42 @@ from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from datetime import datetime
 import db
+import forum_search
+from db_monitoring import db_budget
+from auth_middleware import request_user
 
 # Create Blueprint
 forum_bp = Blueprint('forum', __name__)
 
+
+def _serialize_doc(doc):
+    """Serialize BSON types (ObjectId, datetime) and lists to JSON-safe types"""
+    for k, v in list(doc.items()):
+        if isinstance(v, ObjectId):
+            doc[k] = str(v)
+        elif isinstance(v, list):
+            doc[k] = [str(x) if isinstance(x, ObjectId) else (x.isoformat() if isinstance(x, datetime) else x) for x in v]
+        elif isinstance(v, datetime):
+            doc[k] = v.isoformat()
+    return doc
+
+
+def _mark_liked_by_me(docs, viewer_id):
+    """Set liked_by_me on each doc with a single likes lookup for the viewer"""
+    liked = db.liked_targets(viewer_id, [doc["_id"] for doc in docs])
+    for doc in docs:
+        doc["liked_by_me"] = doc["_id"] in liked
+    return docs
+
+
 # ---------------------------
 # Posts Routes
 # ---------------------------
 
 @forum_bp.route("/posts", methods=["GET", "OPTIONS"])
+@db_budget(3)
 def get_forum_posts():
-    """Get all forum posts with optional filtering"""
+    """Get forum posts with optional filtering and cursor pagination"""
     if request.method == "OPTIONS":
         return '', 200
 
@@ -23,75 +48,102 @@ def get_forum_posts():
         limit = int(request.args.get('limit', 50))
         skip = int(request.args.get('skip', 0))
         search = request.args.get('search', '')
+        cursor = request.args.get('cursor')
+        # Legacy clients always got a total; cursor clients opt in
+        include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
+        
+        try:
+            page = db.get_posts(
+                category=category,
+                limit=limit,
+                skip=skip,
+                search=search,
+                cursor=cursor,
+                include_total=include_total
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        viewer_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        posts = [_serialize_doc(post) for post in _mark_liked_by_me(page["posts"], viewer_id)]
         
-        query = {}
-        if category and category != "All":
-            query["category"] = category
-        
-        if search:
-            query["$or"] = [
-                {"title": {"$regex": search, "$options": "i"}},
-                {"content": {"$regex": search, "$options": "i"}},
-                {"username": {"$regex": search, "$options": "i"}}
-            ]
-        
-        posts = list(db.posts_collection.find(query)
-                    .sort("created_at", -1)
-                    .skip(skip)
-                    .limit(limit))
+        response = {
+            "success": True,
+            "posts": posts,
+            "next_cursor": page["next_cursor"]
+        }
+        if include_total:
+            response["total"] = page["total"]
+        return jsonify(response), 200
         
-        # Helper to serialize BSON types (ObjectId, datetime) and lists
-        def _serialize_doc(doc):
-            for k, v in list(doc.items()):
-                if isinstance(v, ObjectId):
-                    doc[k] = str(v)
-                elif isinstance(v, list):
-                    doc[k] = [str(x) if isinstance(x, ObjectId) else (x.isoformat() if isinstance(x, datetime) else x) for x in v]
-                elif isinstance(v, datetime):
-                    doc[k] = v.isoformat()
-            return doc
+    except Exception as e:
+        print(f"Error getting posts: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@forum_bp.route("/search", methods=["GET", "OPTIONS"])
+def search_forum_posts():
+    """Ranked full-text search over posts"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        q = request.args.get('q', '')
+        category = request.args.get('category', 'All')
+        limit = int(request.args.get('limit', 20))
+        skip = int(request.args.get('skip', 0))
+
+        result = forum_search.search_posts(q, category=category, limit=limit, skip=skip)
+        viewer_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        posts = [_serialize_doc(post) for post in _mark_liked_by_me(result["posts"], viewer_id)]
 
-        posts = [_serialize_doc(post) for post in posts]
-            
         return jsonify({
             "success": True,
             "posts": posts,
-            "total": db.posts_collection.count_documents(query)
+            "total": result["total"],
+            "limit": limit,
+            "skip": skip
         }), 200
-        
+
     except Exception as e:
-        print(f"Error getting posts: {e}")
+        print(f"Error searching posts: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@forum_bp.route("/search/suggest", methods=["GET", "OPTIONS"])
+def suggest_post_titles():
+    """Prefix autocomplete for post titles"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        q = request.args.get('q', '')
+        category = request.args.get('category', 'All')
+        limit = int(request.args.get('limit', forum_search.MAX_SUGGESTIONS))
+
+        return jsonify({
+            "success": True,
+            "suggestions": forum_search.suggest_titles(q, category=category, limit=limit)
+        }), 200
+
+    except Exception as e:
+        print(f"Error suggesting titles: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
 @forum_bp.route("/posts/<post_id>", methods=["GET", "OPTIONS"])
+@db_budget(2)
 def get_single_post(post_id):
     """Get a single post by ID"""
     if request.method == "OPTIONS":
         return '', 200
     
     try:
-        post = db.posts_collection.find_one({"_id": ObjectId(post_id)})
+        # The view is buffered and flushed in bulk, so this is one round trip
+        viewer_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        post = db.get_post(post_id, viewer=viewer_id or request.remote_addr)
         
         if not post:
             return jsonify({"success": False, "error": "Post not found"}), 404
         
-        db.posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$inc": {"views": 1}}
-        )
-        
-        # Serialize BSON types to JSON-safe types
-        def _serialize_doc(doc):
-            for k, v in list(doc.items()):
-                if isinstance(v, ObjectId):
-                    doc[k] = str(v)
-                elif isinstance(v, list):
-                    doc[k] = [str(x) if isinstance(x, ObjectId) else (x.isoformat() if isinstance(x, datetime) else x) for x in v]
-                elif isinstance(v, datetime):
-                    doc[k] = v.isoformat()
-            return doc
-
-        post = _serialize_doc(post)
+        post = _serialize_doc(_mark_liked_by_me([post], viewer_id)[0])
         
         return jsonify({"success": True, "post": post}), 200
         
@@ -100,6 +152,7 @@ def get_single_post(post_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 @forum_bp.route("/posts", methods=["POST", "OPTIONS"])
+@db_budget(4)
 def create_forum_post():
     """Create a new forum post"""
     if request.method == "OPTIONS":
@@ -117,7 +170,7 @@ def create_forum_post():
             print("[ROUTE] Missing required fields in POST /forum/posts", data)
             return jsonify({"success": False, "error": "Missing required fields"}), 400
         
-        user = db.users_collection.find_one({"_id": ObjectId(data["user_id"])})
+        user = request_user(data["user_id"])
         if not user:
             print(f"[ROUTE] User not found for id: {data.get('user_id')}")
             return jsonify({"success": False, "error": "User not found"}), 404
@@ -132,14 +185,15 @@ def create_forum_post():
             "replies": 0,
             "views": 0,
             "likes": 0,
-            "liked_by": [],
             "is_pinned": False,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
+        post_data.update(forum_search.search_fields(data["title"]))
         
         result = db.posts_collection.insert_one(post_data)
         print(f"[ROUTE] Inserted post id: {result.inserted_id}")
+        db.adjust_category_count(data["category"], 1)
         
         created_post = db.posts_collection.find_one({"_id": result.inserted_id})
         # Serialize new post doc
@@ -176,52 +230,14 @@ def like_forum_post(post_id):
         if "user_id" not in data:
             return jsonify({"success": False, "error": "User ID required"}), 400
         
-        post = db.posts_collection.find_one({"_id": ObjectId(post_id)})
-        if not post:
+        result = db.toggle_like(db.posts_collection, ObjectId(post_id), ObjectId(data["user_id"]))
+        if result is None:
             return jsonify({"success": False, "error": "Post not found"}), 404
         
-        user_id = ObjectId(data["user_id"])
-        liked_by = post.get("liked_by", [])
-        
-        if user_id in liked_by:
-            db.posts_collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {
-                    "$pull": {"liked_by": user_id},
-                    "$inc": {"likes": -1},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            liked = False
-        else:
-            db.posts_collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {
-                    "$addToSet": {"liked_by": user_id},
-                    "$inc": {"likes": 1},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            liked = True
-        
-        updated_post = db.posts_collection.find_one({"_id": ObjectId(post_id)})
-        # Serialize updated post
-        def _serialize_doc(doc):
-            for k, v in list(doc.items()):
-                if isinstance(v, ObjectId):
-                    doc[k] = str(v)
-                elif isinstance(v, list):
-                    doc[k] = [str(x) if isinstance(x, ObjectId) else (x.isoformat() if isinstance(x, datetime) else x) for x in v]
-                elif isinstance(v, datetime):
-                    doc[k] = v.isoformat()
-            return doc
-        updated_post = _serialize_doc(updated_post)
-        
         return jsonify({
             "success": True,
-            "liked": liked,
-            "likes": updated_post["likes"],
-            "post": updated_post
+            "liked": result["liked"],
+            "likes": result["likes"]
         }), 200
         
     except Exception as e:
@@ -233,6 +249,7 @@ def like_forum_post(post_id):
 # ---------------------------
 
 @forum_bp.route("/comments", methods=["POST", "OPTIONS"])
+@db_budget(4)
 def create_comment():
     """Create a new comment"""
     if request.method == "OPTIONS":
@@ -250,7 +267,7 @@ def create_comment():
             print("[ROUTE] Missing required fields in POST /forum/comments", data)
             return jsonify({"success": False, "error": "Missing required fields"}), 400
         
-        user = db.users_collection.find_one({"_id": ObjectId(data["user_id"])})
+        user = request_user(data["user_id"])
         if not user:
             return jsonify({"success": False, "error": "User not found"}), 404
         
@@ -261,7 +278,6 @@ def create_comment():
             "post_id": ObjectId(data["post_id"]),
             "content": data["content"],
             "likes": 0,
-            "liked_by": [],
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -289,31 +305,29 @@ def create_comment():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @forum_bp.route("/posts/<post_id>/comments", methods=["GET", "OPTIONS"])
+@db_budget(2)
 def get_post_comments(post_id):
-    """Get all comments for a post"""
+    """Get comments for a post, oldest first, with cursor pagination"""
     if request.method == "OPTIONS":
         return '', 200
     
     try:
-        comments = list(db.comments_collection.find({"post_id": ObjectId(post_id)})
-                       .sort("created_at", 1))
-        
-        # Serialize comment docs
-        def _serialize_doc(doc):
-            for k, v in list(doc.items()):
-                if isinstance(v, ObjectId):
-                    doc[k] = str(v)
-                elif isinstance(v, list):
-                    doc[k] = [str(x) if isinstance(x, ObjectId) else (x.isoformat() if isinstance(x, datetime) else x) for x in v]
-                elif isinstance(v, datetime):
-                    doc[k] = v.isoformat()
-            return doc
+        limit = int(request.args.get('limit', 50))
+        skip = int(request.args.get('skip', 0))
+        cursor = request.args.get('cursor')
+
+        try:
+            page = db.get_comments_page(post_id, limit=limit, cursor=cursor, skip=skip)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
-        comments = [_serialize_doc(comment) for comment in comments]
+        viewer_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        comments = [_serialize_doc(comment) for comment in _mark_liked_by_me(page["comments"], viewer_id)]
         
         return jsonify({
             "success": True,
-            "comments": comments
+            "comments": comments,
+            "next_cursor": page["next_cursor"]
         }), 200
         
     except Exception as e:
@@ -332,44 +346,14 @@ def like_comment(comment_id):
         if "user_id" not in data:
             return jsonify({"success": False, "error": "User ID required"}), 400
         
-        comment = db.comments_collection.find_one({"_id": ObjectId(comment_id)})
-        if not comment:
+        result = db.toggle_like(db.comments_collection, ObjectId(comment_id), ObjectId(data["user_id"]))
+        if result is None:
             return jsonify({"success": False, "error": "Comment not found"}), 404
         
-        user_id = ObjectId(data["user_id"])
-        liked_by = comment.get("liked_by", [])
-        
-        if user_id in liked_by:
-            db.comments_collection.update_one(
-                {"_id": ObjectId(comment_id)},
-                {
-                    "$pull": {"liked_by": user_id},
-                    "$inc": {"likes": -1},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            liked = False
-        else:
-            db.comments_collection.update_one(
-                {"_id": ObjectId(comment_id)},
-                {
-                    "$addToSet": {"liked_by": user_id},
-                    "$inc": {"likes": 1},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-            liked = True
-        
-        updated_comment = db.comments_collection.find_one({"_id": ObjectId(comment_id)})
-        updated_comment["_id"] = str(updated_comment["_id"])
-        updated_comment["user_id"] = str(updated_comment["user_id"])
-        updated_comment["post_id"] = str(updated_comment["post_id"])
-        
         return jsonify({
             "success": True,
-            "liked": liked,
-            "likes": updated_comment["likes"],
-            "comment": updated_comment
+            "liked": result["liked"],
+            "likes": result["likes"]
         }), 200
         
     except Exception as e:
@@ -387,20 +371,38 @@ def get_forum_stats():
         return '', 200
     
     try:
-        total_posts = db.posts_collection.count_documents({})
-        total_comments = db.comments_collection.count_documents({})
-        total_users = db.users_collection.count_documents({})
+        stats = db.get_forum_stats()
         
         return jsonify({
             "success": True,
             "stats": {
-                "total_posts": total_posts,
-                "total_comments": total_comments,
-                "total_users": total_users,
+                "total_posts": stats["total_posts"],
+                "total_comments": stats["total_comments"],
+                "total_users": stats["total_users"],
                 "online_users": 24
             }
         }), 200
         
     except Exception as e:
         print(f"Error getting stats: {e}")
-        return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@forum_bp.route("/categories", methods=["GET", "OPTIONS"])
+def get_forum_categories():
+    """Get post counts per category"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        counts = db.category_counts()
+        categories = [{"category": name, "count": count} for name, count in sorted(counts.items())]
+
+        return jsonify({
+            "success": True,
+            "categories": categories,
+            "total": sum(counts.values())
+        }), 200
+
+    except Exception as e:
+        print(f"Error getting categories: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -1,14 +1,18 @@
 from flask import Blueprint, request, jsonify
 from bson.objectid import ObjectId
-from auth import hash_password
-from db import users_collection, upload_user_pfp
+from auth import hash_password, PasswordHashingBusy
+from db import users_collection, user_search_fields, get_user_summary, invalidate_user_summary
+from handlers.avatar_pipeline import get_avatar_pipeline
 import datetime
-import tempfile
-import os
 
 # Create Blueprint
 profile_bp = Blueprint('profile', __name__)
 
+
+def _photo_timestamp(value):
+    """Fixed-width ISO time at MongoDB's millisecond precision, so clients can compare strings"""
+    return value.isoformat(timespec="milliseconds") if value else None
+
 # ---------------------------
 # Profile Routes
 # ---------------------------
@@ -28,6 +32,8 @@ def get_profile(user_id):
             "photoProfile": user.get("photoProfile", "https://via.placeholder.com/120"),
             "photoThumbnail": user.get("photoThumbnail", user.get("photoProfile", "https://via.placeholder.com/120")),
             "photoPublicId": user.get("photoPublicId", ""),
+            "photoPending": bool(user.get("photoPending")),
+            "photoUpdatedAt": _photo_timestamp(user.get("photoUpdatedAt")),
             "createdAt": user.get("createdAt"),
             "updatedAt": user.get("updatedAt"),
             "isLoggedIn": user.get("isLoggedIn", False)
@@ -48,7 +54,8 @@ def update_profile(user_id):
             "updatedAt": datetime.datetime.utcnow()
         }
         
-        # Add Cloudinary fields if provided
+        # Add Cloudinary fields if provided. New uploads go through update-pfp,
+        # which applies the photo in the background.
         if data.get("photoProfile"):
             update_data["photoProfile"] = data.get("photoProfile")
         if data.get("photoPublicId"):
@@ -58,6 +65,9 @@ def update_profile(user_id):
         if data.get("password"):
             update_data["password"] = hash_password(data["password"])
 
+        # Keep the admin search fields in step with name/email
+        update_data.update(user_search_fields(data.get("name"), data.get("email")))
+
         # Remove None values
         update_data = {k: v for k, v in update_data.items() if v is not None}
         
@@ -66,12 +76,15 @@ def update_profile(user_id):
             {"_id": ObjectId(user_id)}, 
             {"$set": update_data}
         )
+        invalidate_user_summary(user_id)
         
         if result.modified_count > 0:
             return jsonify({"success": True, "message": "Profile updated"}), 200
         else:
             return jsonify({"success": False, "message": "No changes made"}), 200
             
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -88,7 +101,7 @@ def update_profile_picture():
             return jsonify({"error": "User ID required"}), 400
         
         # Check user
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = get_user_summary(user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
         
@@ -96,47 +109,22 @@ def update_profile_picture():
         if 'photo' not in request.files:
             return jsonify({"error": "No photo provided"}), 400
         
-        photo_file = request.files['photo']
-        
-        # Save temp file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-        photo_file.save(temp_file.name)
-        temp_file.close()
-        
-        # Read file
-        with open(temp_file.name, 'rb') as f:
-            image_data = f.read()
-        
-        # Upload to Cloudinary
-        upload_result = upload_user_pfp(
-            image_data=image_data,
-            user_id=user_id,
-            username=user.get("name", "User")
-        )
+        image_data = request.files['photo'].read()
+        if not image_data:
+            return jsonify({"error": "No photo provided"}), 400
         
-        # Clean up
-        os.unlink(temp_file.name)
+        # Resized, uploaded and saved in the background; the current photo stays until then.
+        # The new photo is applied once GET /profile/<id> has photoUpdatedAt >= photoSubmittedAt.
+        submitted_at = get_avatar_pipeline().submit(user_id, user.get("name", "User"), image_data)
         
-        if upload_result["success"]:
-            # Update database
-            users_collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {
-                    "photoProfile": upload_result.get("url"),
-                    "photoThumbnail": upload_result.get("thumbnail"),
-                    "photoPublicId": upload_result.get("public_id")
-                }}
-            )
-            
-            return jsonify({
-                "success": True,
-                "message": "Profile picture updated",
-                "photoProfile": upload_result.get("url"),
-                "photoThumbnail": upload_result.get("thumbnail"),
-                "photoPublicId": upload_result.get("public_id")
-            }), 200
-            
-        return jsonify({"error": "Upload failed"}), 500
+        return jsonify({
+            "success": True,
+            "message": "Profile picture is being processed",
+            "photoPending": True,
+            "photoSubmittedAt": _photo_timestamp(submitted_at),
+            "photoProfile": user.get("photoProfile"),
+            "photoThumbnail": user.get("photoThumbnail")
+        }), 202
             
     except Exception as e:
         print(f"Update error: {str(e)}")
@@ -1,8 +1,12 @@
 # backend/authapi/routes/scanner_routes.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_cors import cross_origin
 import tempfile
 import os
+import csv
+import io
+import json
+import zlib
 from datetime import datetime
 import uuid
 
@@ -11,13 +15,28 @@ from ai.yolo_detector import get_yolo_detector
 from ai.durian_color import get_durian_color
 from ai.durian_desease import get_durian_disease
 from handlers.cloudinary_handler import CloudinaryScan
+from handlers.image_normalizer import open_image
 from db import (
-    save_scan, get_user_scans, get_scan_by_id, delete_scan,
+    save_scan, get_user_scans, get_user_scans_page, get_scan_by_id, delete_scan,
+    iter_user_scans, count_user_scans, parse_object_id, parse_utc_datetime,
     get_user_scan_stats, get_weekly_scan_data, get_quality_distribution
 )
 
 scanner_bp = Blueprint('scanner', __name__)
 
+# Scan history export
+EXPORT_COLUMNS = [
+    "id", "created_at", "variety", "quality_score", "confidence", "status",
+    "durian_count", "image_url", "thumbnail_url"
+]
+EXPORT_PROJECTION = {
+    "created_at": 1, "variety": 1, "quality_score": 1, "confidence": 1, "status": 1,
+    "durian_count": 1, "image_url": 1, "thumbnail_url": 1
+}
+EXPORT_DEFAULT_BATCH_SIZE = int(os.getenv("SCAN_EXPORT_BATCH_SIZE", 500))
+EXPORT_MAX_BATCH_SIZE = 5000
+EXPORT_GZIP_THRESHOLD_ROWS = int(os.getenv("SCAN_EXPORT_GZIP_THRESHOLD_ROWS", 1000))
+
 # ---------------------------
 # Health / Test Routes
 # ---------------------------
@@ -56,6 +75,7 @@ def test_endpoint():
                 "classify_disease": "POST /scanner/classify/disease",
                 "health": "GET /scanner/health",
                 "history": "GET /scanner/history/<user_id>",
+                "export": "GET /scanner/export/<user_id>?format=ndjson|csv",
                 "analytics": "GET /scanner/analytics/<user_id>"
             },
             "timestamp": datetime.utcnow().isoformat()
@@ -110,15 +130,21 @@ def detect_durians():
         detector = get_yolo_detector()
         result = detector.predict(temp_path)
         
+        # Decode once; the color model and the upload normalizer share it
+        try:
+            image = open_image(temp_path)
+        except Exception:
+            image = None
+        
         # -- Durian Color --
         print("[DEBUG] Calling get_durian_color with:", temp_path)
-        result["color"] = get_durian_color(temp_path)
+        result["color"] = get_durian_color(image if image is not None else temp_path)
         
         # -- Cloudinary Save if needed --
         if result.get("success") and user_id and save_to_history:
             try:
                 scan_id = str(uuid.uuid4())[:8]
-                cloudinary_data = CloudinaryScan.upload_scan_image_sync(temp_path, user_id, scan_id)
+                cloudinary_data = CloudinaryScan.upload_scan_image_sync(temp_path, user_id, scan_id, image=image)
                 if cloudinary_data.get("success"):
                     scan_record = save_scan(
                         user_id=user_id,
@@ -137,6 +163,10 @@ def detect_durians():
                                 "thumbnail_url": cloudinary_data.get("thumbnail_url")
                             }
                         })
+                    else:
+                        # Nothing references the upload now
+                        CloudinaryScan.delete_scan_image(cloudinary_data.get("public_id"))
+                        result.update({"scan_saved": False})
                 else:
                     result.update({"scan_saved": False, "cloudinary_error": cloudinary_data.get("error")})
             except Exception as e:
@@ -240,13 +270,104 @@ def classify_disease():
 def get_scan_history(user_id):
     limit = int(request.args.get('limit', 50))
     skip = int(request.args.get('skip', 0))
-    scans = get_user_scans(user_id, limit=limit, skip=skip)
+    cursor = request.args.get('cursor')
+    try:
+        page = get_user_scans_page(user_id, limit=limit, cursor=cursor, skip=skip)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    scans = page["scans"]
     for scan in scans:
         scan["_id"] = str(scan.get("_id"))
         scan["user_id"] = str(scan.get("user_id"))
         if scan.get("created_at"):
             scan["created_at"] = scan["created_at"].isoformat()
-    return jsonify({"success": True, "scans": scans, "count": len(scans), "limit": limit, "skip": skip})
+    return jsonify({"success": True, "scans": scans, "count": len(scans), "limit": limit, "skip": skip, "next_cursor": page["next_cursor"]})
+
+def _flatten_scan(scan):
+    """One export row: flat columns only, no detection/analysis payload"""
+    created_at = scan.get("created_at")
+    return {
+        "id": str(scan.get("_id")),
+        "created_at": created_at.isoformat() if created_at else None,
+        "variety": scan.get("variety", "Unknown"),
+        "quality_score": scan.get("quality_score", 0),
+        "confidence": scan.get("confidence", 0),
+        "status": scan.get("status", "Unknown"),
+        "durian_count": scan.get("durian_count", 0),
+        "image_url": scan.get("image_url"),
+        "thumbnail_url": scan.get("thumbnail_url")
+    }
+
+def _export_chunks(cursor, export_format, batch_size):
+    """Serialize the cursor one batch at a time so memory stays constant"""
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+    rows = 0
+    for scan in cursor:
+        row = _flatten_scan(scan)
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + "\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@scanner_bp.route("/export/<user_id>", methods=["GET"])
+@cross_origin()
+def export_scan_history(user_id):
+    """Stream a user's full scan history as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"success": False, "error": "format must be ndjson or csv"}), 400
+    try:
+        parse_object_id(user_id, "user id")
+        created_from = parse_utc_datetime(request.args['from'], "from") if request.args.get('from') else None
+        created_to = parse_utc_datetime(request.args['to'], "to") if request.args.get('to') else None
+        batch_size = max(1, min(int(request.args.get('batch_size', EXPORT_DEFAULT_BATCH_SIZE)), EXPORT_MAX_BATCH_SIZE))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    # compress=auto gzips large exports for clients that accept it. compress=true
+    # always gzips: as Content-Encoding when accepted, else as a .gz attachment
+    accepts_gzip = request.accept_encodings['gzip'] > 0
+    compress = request.args.get('compress', 'auto').lower()
+    if compress == 'auto':
+        use_gzip = accepts_gzip and count_user_scans(user_id, created_from, created_to) > EXPORT_GZIP_THRESHOLD_ROWS
+    else:
+        use_gzip = compress == 'true'
+
+    cursor = iter_user_scans(user_id, created_from, created_to, projection=EXPORT_PROJECTION, batch_size=batch_size)
+    chunks = _export_chunks(cursor, export_format, batch_size)
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    extension = "csv" if export_format == "csv" else "ndjson"
+    headers = {"Vary": "Accept-Encoding"}
+    if use_gzip and not accepts_gzip:
+        mimetype = "application/gzip"
+        extension += ".gz"
+    elif use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    headers["Content-Disposition"] = f'attachment; filename="scans_{user_id}.{extension}"'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @scanner_bp.route("/scan/<scan_id>", methods=["GET"])
 @cross_origin()
@@ -267,9 +388,10 @@ def delete_user_scan(scan_id):
     if not user_id:
         return jsonify({"success": False, "error": "User ID required"}), 400
     scan = get_scan_by_id(scan_id)
-    if scan and scan.get("cloudinary_public_id"):
-        CloudinaryScan.delete_scan_image(scan["cloudinary_public_id"])
     success = delete_scan(scan_id, user_id)
+    # Only the owner's delete removes the image; the CDN call happens in the background
+    if success and scan and scan.get("cloudinary_public_id"):
+        CloudinaryScan.delete_scan_image(scan["cloudinary_public_id"])
     return jsonify({"success": success, "message": "Scan deleted successfully" if success else "Could not delete scan"})
 
 @scanner_bp.route("/analytics/<user_id>", methods=["GET"])
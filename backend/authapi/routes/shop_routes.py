@@ -1,10 +1,11 @@
 
 print("[DEBUG] shop_routes.py loaded")
 from flask import Blueprint, request, jsonify
-import cloudinary.uploader
+from handlers.media_service import get_media_service, MediaUnavailable
 import os
 from db import get_db
 from bson.objectid import ObjectId
+from query_registry import Param, register_query_shape
 
 shop_bp = Blueprint('shop', __name__)
 
@@ -21,12 +22,14 @@ def upload_image():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     try:
-        upload_result = cloudinary.uploader.upload(file)
-        url = upload_result.get('secure_url')
+        upload_result = get_media_service().upload(file, folder='products')
+        url = upload_result.get('url')
         if url:
             return jsonify({'url': url})
         else:
             return jsonify({'error': 'Upload failed'}), 500
+    except MediaUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -34,6 +37,10 @@ def get_products_collection():
     db = get_db()
     return db['products']
 
+# The catalogue is listed whole; edits and deletes go by id
+register_query_shape("products.all", "products", allow=("COLLSCAN",))
+register_query_shape("products.by_id", "products", {"_id": Param("product_id")})
+
 @shop_bp.route('/products', methods=['GET'])
 def get_products():
     try:
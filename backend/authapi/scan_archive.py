@@ -0,0 +1,129 @@
+# backend/authapi/scan_archive.py
+"""
+Retention tiering for scan payloads
+
+Scans older than the retention window keep their summary (variety,
+quality_score, status, image URLs, ...) in `scans`, while their detection
+payload moves to `scans_archive` as a compressed blob:
+
+    {_id: <scan _id>, user_id, created_at, archived_at,
+     codec: "zstd" | "zlib", payload: <binary>, raw_bytes}
+
+Archived scans are marked with `archived_at`; db.get_scan_by_id merges the
+payload back in transparently. The archiver walks the oldest unarchived
+scans of each scan collection (see db.scan_sources) in bounded batches, so
+it can run from cron and resume anywhere.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from bson import BSON
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+
+import db
+from query_registry import Param, register_query_shape
+from scan_schema import PAYLOAD_FIELDS, SCAN_SCHEMA_VERSION, pack_payload, payload_fields
+
+RETENTION_DAYS = int(os.getenv("SCAN_RETENTION_DAYS", 180))
+ARCHIVE_BATCH_SIZE = int(os.getenv("SCAN_ARCHIVE_BATCH_SIZE", 200))
+
+_PENDING = {"archived_at": None}
+_READ_PROJECTION = {field: 1 for field in PAYLOAD_FIELDS + ("user_id", "created_at")}
+
+
+def ensure_indexes():
+    """The work queue index on scans lives in db.ensure_scan_indexes"""
+    try:
+        db.scans_archive_collection.create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+    except Exception as e:
+        print(f"[ARCHIVE] Error creating indexes: {e}")
+
+
+def archive_batch(
+    collection,
+    cutoff: datetime,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Archive up to `batch_size` of the oldest unarchived scans in `collection`
+    created before `cutoff`
+
+    The archive copy is written before the payload is removed from `scans`,
+    so an interrupted batch is simply redone by the next run.
+
+    Returns:
+        {"scans", "bytes_reclaimed", "bytes_archived"} for this batch
+    """
+    scans = list(
+        collection.find(dict(_PENDING, created_at={"$lt": cutoff}), _READ_PROJECTION)
+        .sort([("archived_at", ASCENDING), ("created_at", ASCENDING)])
+        .limit(batch_size)
+    )
+    stats = {"scans": len(scans), "bytes_reclaimed": 0, "bytes_archived": 0}
+    if not scans:
+        return stats
+
+    now = datetime.utcnow()
+    archive_ops = []
+    scan_ops = []
+    for scan in scans:
+        stored = {field: scan[field] for field in PAYLOAD_FIELDS if field in scan}
+        packed = pack_payload(payload_fields(scan))
+        stats["bytes_reclaimed"] += len(BSON.encode(stored))
+        stats["bytes_archived"] += len(packed["payload"])
+        archive_ops.append(ReplaceOne({"_id": scan["_id"]}, {
+            "user_id": scan.get("user_id"),
+            "created_at": scan.get("created_at"),
+            "archived_at": now,
+            **packed
+        }, upsert=True))
+        scan_ops.append(UpdateOne(dict(_PENDING, _id=scan["_id"]), {
+            # Version 1 payloads are archived compacted
+            "$set": {"archived_at": now, "schema_version": SCAN_SCHEMA_VERSION},
+            "$unset": {field: "" for field in PAYLOAD_FIELDS}
+        }))
+
+    if not dry_run:
+        db.scans_archive_collection.bulk_write(archive_ops, ordered=False)
+        collection.bulk_write(scan_ops, ordered=False)
+    return stats
+
+
+register_query_shape(
+    "scans.archive_queue", "scans", dict(_PENDING, created_at={"$lt": Param("now")}), projection=_READ_PROJECTION,
+    sort=[("archived_at", ASCENDING), ("created_at", ASCENDING)], limit=ARCHIVE_BATCH_SIZE
+)
+
+
+def run_archiver(
+    retention_days: int = RETENTION_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Archive every scan older than `retention_days`, one bounded batch at a time
+
+    With dry_run only the first batch of each collection is measured, since
+    nothing is marked archived and later batches would see the same scans.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    totals: Dict[str, Any] = {"scans": 0, "bytes_reclaimed": 0, "bytes_archived": 0, "batches": 0, "cutoff": cutoff}
+    # Oldest collections first, matching the oldest-first walk inside each
+    for collection, _, _ in reversed(db.scan_sources_between(None, cutoff)):
+        while max_batches is None or totals["batches"] < max_batches:
+            stats = archive_batch(collection, cutoff, batch_size, dry_run)
+            if not stats["scans"]:
+                break
+            for key, value in stats.items():
+                totals[key] += value
+            totals["batches"] += 1
+            if dry_run or stats["scans"] < batch_size:
+                break
+    return totals
+
+
+ensure_indexes()
@@ -0,0 +1,180 @@
+# backend/authapi/scan_schema.py
+"""
+Compact storage format for scan detection payloads
+
+Schema version 1 stored the whole `detection` dict from YOLODetector.predict
+plus the `analysis` dict derived from it. Version 2 keeps only what cannot be
+recomputed:
+
+    schema_version: 2
+    boxes:       BSON binary, little-endian float32 records of
+                 (confidence, x1, y1, x2, y2, x, y, width, height)
+    class_ids:   BSON binary, little-endian uint16 per box
+    class_names: {"<class_id>": "<name>"} for the classes present
+
+`detection` and `analysis` are rebuilt on read by expand_scan, so API
+responses keep the version 1 shape. Version 1 documents are rewritten to
+version 2 the first time they are read (see upgrade_update).
+
+Scans past the retention window keep only their summary fields in `scans`;
+the payload fields move to `scans_archive` as one compressed BSON blob (see
+pack_payload and scan_archive.py).
+"""
+
+import os
+import struct
+import zlib
+from typing import Any, Dict, List, Optional
+
+from bson import BSON
+from bson.binary import Binary
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from ai.yolo_detector import analyze_detections
+
+SCAN_SCHEMA_VERSION = 2
+
+_BOX = struct.Struct("<9f")
+_CLASS_ID = struct.Struct("<H")
+COMPACT_FIELDS = ("schema_version", "boxes", "class_ids", "class_names")
+# Everything that moves to the archive; the rest of a scan is its summary
+PAYLOAD_FIELDS = ("detection", "analysis", "boxes", "class_ids", "class_names")
+
+ARCHIVE_CODEC = os.getenv("SCAN_ARCHIVE_CODEC", "zstd" if zstandard else "zlib")
+if ARCHIVE_CODEC == "zstd" and zstandard is None:
+    print("[SCANS] zstandard not installed, archiving with zlib")
+    ARCHIVE_CODEC = "zlib"
+
+
+def _f32(value: float) -> float:
+    # float32 keeps ~7 significant digits; drop the noise from widening back
+    return float(f"{value:.7g}")
+
+
+def compact_fields(detection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode a YOLO `detection` dict into the version 2 fields"""
+    objects = (detection or {}).get("objects") or []
+    boxes = bytearray()
+    class_ids = bytearray()
+    class_names: Dict[str, str] = {}
+    for obj in objects:
+        bbox = obj.get("bbox") or {}
+        norm = obj.get("bbox_normalized") or {}
+        boxes += _BOX.pack(
+            obj.get("confidence", 0),
+            bbox.get("x1", 0), bbox.get("y1", 0), bbox.get("x2", 0), bbox.get("y2", 0),
+            norm.get("x", 0), norm.get("y", 0), norm.get("width", 0), norm.get("height", 0)
+        )
+        class_id = int(obj.get("class_id", 0))
+        class_ids += _CLASS_ID.pack(class_id)
+        class_names[str(class_id)] = obj.get("class_name", "Unknown")
+
+    return {
+        "schema_version": SCAN_SCHEMA_VERSION,
+        "boxes": Binary(bytes(boxes)),
+        "class_ids": Binary(bytes(class_ids)),
+        "class_names": class_names
+    }
+
+
+def decode_objects(scan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rebuild the detection objects of a version 2 scan, highest confidence first"""
+    boxes = bytes(scan.get("boxes") or b"")
+    class_ids = bytes(scan.get("class_ids") or b"")
+    count = len(boxes) // _BOX.size
+    if len(boxes) % _BOX.size or len(class_ids) != count * _CLASS_ID.size:
+        raise ValueError(f"Corrupt detection payload on scan {scan.get('_id')}")
+
+    names = scan.get("class_names") or {}
+    objects = []
+    for i in range(count):
+        conf, x1, y1, x2, y2, x, y, width, height = (_f32(v) for v in _BOX.unpack_from(boxes, i * _BOX.size))
+        (class_id,) = _CLASS_ID.unpack_from(class_ids, i * _CLASS_ID.size)
+        objects.append({
+            "class_id": class_id,
+            "class_name": names.get(str(class_id), "Unknown"),
+            "confidence": conf,
+            "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
+            "bbox_normalized": {"x": x, "y": y, "width": width, "height": height}
+        })
+    return objects
+
+
+def expand_scan(scan: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Give a stored scan its version 1 shape (`detection` and `analysis`)
+
+    Version 1 documents pass through untouched. Mutates and returns `scan`.
+    """
+    if not scan or scan.get("schema_version", 1) < SCAN_SCHEMA_VERSION or "boxes" not in scan:
+        return scan
+
+    objects = decode_objects(scan)
+    analysis = analyze_detections(objects)
+    if objects and "quality_score" in scan:
+        # The stored score was computed from full-precision boxes; keep it authoritative
+        analysis["quality_score"] = scan["quality_score"]
+
+    for field in COMPACT_FIELDS:
+        scan.pop(field, None)
+    scan["detection"] = {
+        "count": len(objects),
+        "objects": objects,
+        "primary": objects[0] if objects else None
+    }
+    scan["analysis"] = analysis
+    return scan
+
+
+def upgrade_update(scan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The update that rewrites a version 1 scan to version 2, or None if the
+    document is already compact (or has no payload to compact)
+    """
+    if scan.get("schema_version", 1) >= SCAN_SCHEMA_VERSION or "detection" not in scan:
+        return None
+    return {
+        "$set": compact_fields(scan.get("detection")),
+        "$unset": {"detection": "", "analysis": ""}
+    }
+
+
+def payload_fields(scan: Dict[str, Any]) -> Dict[str, Any]:
+    """The heavy fields of a stored scan, in compact form"""
+    fields = {field: scan[field] for field in PAYLOAD_FIELDS if field in scan}
+    if "detection" in fields:
+        # Archive version 1 scans compacted; their analysis is derived anyway
+        fields = compact_fields(fields["detection"])
+        fields.pop("schema_version")
+    return fields
+
+
+def pack_payload(fields: Dict[str, Any], codec: str = ARCHIVE_CODEC) -> Dict[str, Any]:
+    """Compress payload fields into the archive representation"""
+    raw = BSON.encode(fields)
+    if codec == "zstd":
+        blob = zstandard.ZstdCompressor(level=10).compress(raw)
+    elif codec == "zlib":
+        blob = zlib.compress(raw, 9)
+    else:
+        raise ValueError(f"Unknown archive codec: {codec}")
+    return {"codec": codec, "payload": Binary(blob), "raw_bytes": len(raw)}
+
+
+def unpack_payload(archived: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of pack_payload"""
+    codec = archived.get("codec")
+    blob = bytes(archived["payload"])
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archived scan")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == "zlib":
+        raw = zlib.decompress(blob)
+    else:
+        raise ValueError(f"Unknown archive codec: {codec}")
+    return BSON(raw).decode()
@@ -0,0 +1,42 @@
+"""
+Maintain the admin analytics rollups
+
+Without arguments, processes everything newer than the stored watermark;
+run it from cron (e.g. every 5 minutes). --backfill rebuilds history.
+
+Usage:
+    cd backend/authapi
+    python scripts/analytics_rollup.py
+    python scripts/analytics_rollup.py --backfill [--since 2026-01-01]
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import admin_analytics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update admin analytics rollups")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild rollups instead of resuming from the watermark")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="With --backfill, only rebuild from this date")
+    args = parser.parse_args()
+
+    if args.backfill:
+        totals = admin_analytics.backfill(args.since)
+    else:
+        totals = admin_analytics.run_incremental()
+
+    print(
+        f"Processed {totals['windows']} windows: {totals['scans']} scans, "
+        f"{totals['signups']} signups, {totals['logins']} logins"
+    )
+
+
+if __name__ == "__main__":
+    main()
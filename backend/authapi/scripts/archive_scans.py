@@ -0,0 +1,42 @@
+"""
+Move the detection payload of old scans to the compressed archive
+
+Archives scans older than SCAN_RETENTION_DAYS (default 180) in bounded
+batches and reports the bytes taken out of the hot `scans` collection.
+Safe to interrupt and re-run; run it from cron (e.g. nightly).
+
+Usage:
+    cd backend/authapi
+    python scripts/archive_scans.py [--days 180] [--batch-size 200] [--max-batches N] [--dry-run]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scan_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive cold scan payloads")
+    parser.add_argument("--days", type=int, default=scan_archive.RETENTION_DAYS, help="Retention window for full payloads")
+    parser.add_argument("--batch-size", type=int, default=scan_archive.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="Measure one batch without writing")
+    args = parser.parse_args()
+
+    totals = scan_archive.run_archiver(args.days, args.batch_size, args.max_batches, args.dry_run)
+
+    prefix = "[DRY RUN] " if args.dry_run else ""
+    print(
+        f"{prefix}Archived {totals['scans']} scans created before {totals['cutoff']:%Y-%m-%d} "
+        f"in {totals['batches']} batches: reclaimed {totals['bytes_reclaimed']} bytes, "
+        f"archive grew by {totals['bytes_archived']} bytes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Populate search fields (title_terms) on posts written before forum search
+
+The text index itself is built by MongoDB from existing documents; only the
+autocomplete terms need backfilling. Safe to re-run.
+
+Usage:
+    cd backend/authapi
+    python scripts/backfill_search_fields.py [--batch-size 500] [--all]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo import UpdateOne
+
+import db
+from forum_search import search_fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill forum search fields")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--all", action="store_true", help="Recompute for every post, not only missing ones")
+    args = parser.parse_args()
+
+    db.ensure_indexes()
+    query = {} if args.all else {"title_terms": {"$exists": False}}
+
+    updated = 0
+    ops = []
+    for post in db.posts_collection.find(query, {"title": 1}):
+        ops.append(UpdateOne({"_id": post["_id"]}, {"$set": search_fields(post.get("title", ""))}))
+        if len(ops) >= args.batch_size:
+            updated += db.posts_collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.posts_collection.bulk_write(ops, ordered=False).modified_count
+
+    print(f"Updated search fields on {updated} posts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark email message building
+
+Builds deactivation and reactivation messages for generated recipients and
+reports messages per second for each stage:
+    render   - the per-recipient template body plus the cached static parts
+    uncached - the same, but re-rendering the header (with its stylesheet)
+               and the footer for every message, as the f-string version did
+    message  - render plus the raw MIME message, as it is queued
+    stdlib   - the same message built with email.mime and as_bytes(), as
+               before the static MIME headers were pre-encoded
+
+Nothing is queued or sent, and no database is needed.
+
+Usage:
+    cd backend/authapi
+    python scripts/benchmark_email_templates.py [--messages 5000]
+"""
+
+import argparse
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from handlers.email_templates import KINDS, TEMPLATE_DIR, EmailTemplates
+
+
+def _recipients(count):
+    for i in range(count):
+        yield {
+            "user_email": f"farmer{i}@example.com",
+            "user_name": f"Farmer <{i}> & Sons",
+            "reason": f"Repeated spam in the forum (report #{i}) <script>alert(1)</script>",
+        }
+
+
+def _rate(label, recipients, fn):
+    # fn builds one deactivation and one reactivation message per recipient
+    start = time.perf_counter()
+    for fields in _recipients(recipients):
+        fn(fields)
+    elapsed = time.perf_counter() - start
+    messages = recipients * 2
+    print(f"{label:<10} {messages / elapsed:>10,.0f} msg/s  ({elapsed * 1e6 / messages:,.1f} us/msg)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure email messages built per second")
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    from handlers.email_handler import build_message
+
+    templates = EmailTemplates()
+    styles = (TEMPLATE_DIR / "_styles.css").read_text(encoding="utf-8")
+
+    def render(fields):
+        templates.render("deactivation", user_name=fields["user_name"], reason=fields["reason"])
+        templates.render("reactivation", user_name=fields["user_name"])
+
+    def uncached(fields):
+        for kind, body in (("deactivation", fields), ("reactivation", {"user_name": fields["user_name"]})):
+            header = templates.env.get_template("_header.html").render(styles=styles)
+            footer = templates.env.get_template("_footer.html").render(automated_notice=KINDS[kind].automated_notice)
+            header + templates.bodies[kind][1].render(**body) + footer
+            templates.bodies[kind][0].render(**body)
+
+    def message(fields):
+        rendered = templates.render("deactivation", user_name=fields["user_name"], reason=fields["reason"])
+        build_message(rendered, fields["user_email"])
+        rendered = templates.render("reactivation", user_name=fields["user_name"])
+        build_message(rendered, fields["user_email"])
+
+    def stdlib(fields):
+        for rendered in (
+            templates.render("deactivation", user_name=fields["user_name"], reason=fields["reason"]),
+            templates.render("reactivation", user_name=fields["user_name"])
+        ):
+            msg = MIMEMultipart("alternative")
+            msg["Subject"] = rendered.subject
+            msg["From"] = "Durianostics Admin <noreply@durianostics.com>"
+            msg["To"] = fields["user_email"]
+            msg.attach(MIMEText(rendered.text, "plain", "utf-8"))
+            msg.attach(MIMEText(rendered.html, "html", "utf-8"))
+            msg.as_bytes()
+
+    recipients = max(1, args.messages // 2)
+    print(f"Building {recipients * 2} messages per stage")
+    _rate("render", recipients, render)
+    _rate("uncached", recipients, uncached)
+    _rate("message", recipients, message)
+    _rate("stdlib", recipients, stdlib)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Pick Argon2 parameters for a target login latency on this machine
+
+Times one hash for each (memory cost, time cost) pair and then suggests the
+most expensive pair that still fits --target-ms. Run it on the production
+hardware, not a laptop. It then measures throughput of the suggested
+parameters through a process pool sized like PASSWORD_HASH_WORKERS, so you
+can see how many logins per second the pool absorbs before callers queue.
+
+Usage:
+    cd backend/authapi
+    python scripts/benchmark_password_hashing.py [--target-ms 250] [--parallelism 4]
+    python scripts/benchmark_password_hashing.py --memory 19456,65536 --time 1,2,3 --workers 4
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import password_hasher
+from password_hasher import build_context
+
+PASSWORD = "correct horse battery staple"
+
+
+def time_hash(context, repeat: int) -> float:
+    """Median milliseconds per hash (verify costs the same)"""
+    context.hash(PASSWORD)  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context.hash(PASSWORD)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _configure(time_cost: int, memory_cost: int, parallelism: int) -> None:
+    password_hasher.pwd_context = build_context(time_cost, memory_cost, parallelism)
+
+
+def pool_throughput(time_cost: int, memory_cost: int, parallelism: int, workers: int, hashes: int):
+    """(hashes per second, p95 ms) with `hashes` submitted at once"""
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=password_hasher.pool_context(),
+        initializer=_configure,
+        initargs=(time_cost, memory_cost, parallelism),
+    ) as pool:
+        for future in [pool.submit(int) for _ in range(workers)]:
+            future.result()
+
+        start = time.perf_counter()
+        futures = [(time.perf_counter(), pool.submit(password_hasher._hash, PASSWORD)) for _ in range(hashes)]
+        latencies = []
+        for submitted, future in futures:
+            future.result()
+            latencies.append((time.perf_counter() - submitted) * 1000)
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return hashes / elapsed, latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Argon2 parameters")
+    parser.add_argument("--target-ms", type=float, default=250, help="Latency budget for one hash")
+    parser.add_argument("--memory", default="19456,47104,65536,102400", help="Memory costs to try, KiB")
+    parser.add_argument("--time", default="1,2,3,4", help="Time costs to try")
+    parser.add_argument("--parallelism", type=int, default=password_hasher.ARGON2_PARALLELISM)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=max(password_hasher.HASH_WORKERS, 1))
+    parser.add_argument("--burst", type=int, default=40, help="Hashes submitted at once for the throughput test")
+    args = parser.parse_args()
+
+    memory_costs = [int(v) for v in args.memory.split(",")]
+    time_costs = [int(v) for v in args.time.split(",")]
+
+    print(f"parallelism={args.parallelism}, target {args.target_ms:.0f} ms")
+    print(f"{'memory KiB':>10} {'time':>5} {'ms':>8}")
+    fitting = []
+    for memory_cost in memory_costs:
+        for time_cost in time_costs:
+            ms = time_hash(build_context(time_cost, memory_cost, args.parallelism), args.repeat)
+            fits = ms <= args.target_ms
+            print(f"{memory_cost:>10} {time_cost:>5} {ms:>8.1f}{'' if fits else '  over'}")
+            if fits:
+                fitting.append((memory_cost * time_cost, memory_cost, time_cost, ms))
+
+    current = (password_hasher.ARGON2_MEMORY_COST, password_hasher.ARGON2_TIME_COST)
+    print(f"\nCurrent: ARGON2_MEMORY_COST={current[0]} ARGON2_TIME_COST={current[1]}")
+    if not fitting:
+        sys.exit("Nothing fits the target; lower --memory/--time or raise --target-ms")
+
+    # Most total work that fits; memory before time on ties since it hurts GPU attacks more
+    _, memory_cost, time_cost, ms = max(fitting)
+    print(f"Suggested ({ms:.0f} ms per hash):")
+    print(f"    ARGON2_MEMORY_COST={memory_cost}")
+    print(f"    ARGON2_TIME_COST={time_cost}")
+    print(f"    ARGON2_PARALLELISM={args.parallelism}")
+
+    rate, p95 = pool_throughput(time_cost, memory_cost, args.parallelism, args.workers, args.burst)
+    print(f"\nPool of {args.workers}: {rate:.1f} hashes/s, p95 {p95:.0f} ms for a burst of {args.burst}")
+    print(f"Peak memory ~{args.workers * memory_cost / 1024:.0f} MiB across workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Verify OLTP/analytics read routing against a three-member replica set
+
+With --spawn, starts three local mongod processes as replica set "rs0"
+in a temporary directory. Otherwise it uses --uri. It then seeds a user
+and a scan, and runs request-path helpers and analytics helpers while a
+CommandListener records which member served each command. It exits
+non-zero if an OLTP command reached a secondary or an analytics read
+reached the primary while a secondary was available.
+
+--uri should point at a scratch deployment: the check writes to the
+"durianapp" database and removes its own documents afterwards.
+
+Usage:
+    cd backend/authapi
+    python scripts/check_read_routing.py --spawn [--mongod mongod] [--base-port 27117]
+    python scripts/check_read_routing.py --uri "mongodb://localhost:27117,localhost:27118,localhost:27119/?replicaSet=rs0"
+"""
+
+import argparse
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo import MongoClient, monitoring
+
+REPLICA_SET = "rs0"
+CHECKED_COMMANDS = {"find", "aggregate", "count", "insert", "update", "delete"}
+
+
+class RoutingListener(monitoring.CommandListener):
+    """Remembers (phase, command, member address) for every command sent"""
+
+    def __init__(self):
+        self.phase = None
+        self.commands = []
+
+    def started(self, event):
+        if self.phase and event.command_name in CHECKED_COMMANDS:
+            collection = event.command.get(event.command_name)
+            self.commands.append((self.phase, event.command_name, collection, event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def spawn_replica_set(mongod: str, base_port: int) -> str:
+    """Start three mongod members, initiate the set and wait for a primary"""
+    root = tempfile.mkdtemp(prefix="durian-rs-")
+    ports = [base_port + i for i in range(3)]
+    processes = []
+    for port in ports:
+        path = Path(root) / str(port)
+        path.mkdir()
+        processes.append(subprocess.Popen(
+            [mongod, "--replSet", REPLICA_SET, "--port", str(port), "--dbpath", str(path),
+             "--bind_ip", "127.0.0.1", "--quiet", "--logpath", str(path / "mongod.log")],
+            stdout=subprocess.DEVNULL
+        ))
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+        shutil.rmtree(root, ignore_errors=True)
+    atexit.register(stop)
+
+    seed = MongoClient(f"mongodb://127.0.0.1:{ports[0]}", directConnection=True, serverSelectionTimeoutMS=30000)
+    seed.admin.command("ping")
+    seed.admin.command("replSetInitiate", {
+        "_id": REPLICA_SET,
+        "members": [{"_id": i, "host": f"127.0.0.1:{port}"} for i, port in enumerate(ports)]
+    })
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if seed.admin.command("hello").get("isWritablePrimary"):
+            break
+        time.sleep(0.5)
+    else:
+        sys.exit("Replica set did not elect a primary")
+    seed.close()
+    hosts = ",".join(f"127.0.0.1:{port}" for port in ports)
+    return f"mongodb://{hosts}/?replicaSet={REPLICA_SET}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check read preference routing on a replica set")
+    parser.add_argument("--uri", help="Existing replica set to check")
+    parser.add_argument("--spawn", action="store_true", help="Start a throwaway local replica set")
+    parser.add_argument("--mongod", default="mongod", help="mongod binary for --spawn")
+    parser.add_argument("--base-port", type=int, default=27117)
+    args = parser.parse_args()
+
+    if args.spawn:
+        os.environ["MONGO_URI"] = spawn_replica_set(args.mongod, args.base_port)
+    elif args.uri:
+        os.environ["MONGO_URI"] = args.uri
+    else:
+        parser.error("pass --spawn or --uri")
+
+    # Must be registered before db creates its client
+    listener = RoutingListener()
+    monitoring.register(listener)
+
+    import db
+    import admin_analytics
+
+    deadline = time.monotonic() + 60
+    while not db.client.secondaries and time.monotonic() < deadline:
+        time.sleep(0.5)
+    primary = db.client.primary
+    secondaries = db.client.secondaries
+    if not secondaries:
+        sys.exit("No secondaries visible to the client; is this a replica set?")
+    print(f"Primary: {primary}, secondaries: {sorted(secondaries)}")
+
+    user_id = db.users_collection.insert_one({"name": "routing-check", "email": "routing-check@example.invalid"}).inserted_id
+    try:
+        # Warm caches that read the primary on purpose (partition discovery)
+        db.scan_sources(refresh=True)
+
+        listener.phase = db.OLTP
+        scan = db.save_scan(str(user_id), "", "", "", {"objects": []}, {"quality_score": 80})
+        db.get_user_scans_page(str(user_id))
+        db.get_scan_by_id(str(scan["_id"]))
+
+        listener.phase = db.ANALYTICS
+        db.get_user_scan_stats(str(user_id))
+        db.get_weekly_scan_data(str(user_id))
+        db.get_quality_distribution(str(user_id))
+        db.get_forum_stats()
+        admin_analytics.get_summary(scan["created_at"].replace(hour=0), scan["created_at"])
+        listener.phase = None
+
+        db.delete_scan(str(scan["_id"]), str(user_id))
+    finally:
+        listener.phase = None
+        db.users_collection.delete_one({"_id": user_id})
+
+    failures = 0
+    for phase, command, collection, address in listener.commands:
+        on_primary = address == primary
+        ok = on_primary if phase == db.OLTP else not on_primary
+        failures += not ok
+        member = "primary" if on_primary else "secondary"
+        print(f"{'ok  ' if ok else 'FAIL'} {phase:<9} {command:<9} {collection!s:<20} -> {member} {address[0]}:{address[1]}")
+
+    if not any(phase == db.ANALYTICS for phase, *_ in listener.commands):
+        sys.exit("No analytics commands were observed")
+    if failures:
+        sys.exit(f"{failures} commands were routed to the wrong member")
+    print("Routing OK")
+
+
+if __name__ == "__main__":
+    main()
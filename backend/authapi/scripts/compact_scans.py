@@ -0,0 +1,62 @@
+"""
+Rewrite schema version 1 scans to the compact detection format
+
+Scans are upgraded lazily when read; this walks the rest so the whole
+collection shrinks. Safe to re-run and to run while the app is serving.
+
+Usage:
+    cd backend/authapi
+    python scripts/compact_scans.py [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import BSON
+from pymongo import UpdateOne
+
+import db
+from scan_schema import compact_fields, upgrade_update
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact stored scan detection payloads")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the expected savings")
+    args = parser.parse_args()
+
+    query = {"schema_version": {"$exists": False}, "detection": {"$exists": True}}
+    scanned = 0
+    upgraded = 0
+    bytes_before = 0
+    bytes_after = 0
+
+    for collection, _, _ in db.scan_sources():
+        ops = []
+        for scan in collection.find(query, {"detection": 1, "analysis": 1}).batch_size(args.batch_size):
+            update = upgrade_update(scan)
+            if not update:
+                continue
+            scanned += 1
+            bytes_before += len(BSON.encode({"detection": scan.get("detection"), "analysis": scan.get("analysis")}))
+            bytes_after += len(BSON.encode(compact_fields(scan.get("detection"))))
+            if args.dry_run:
+                continue
+            ops.append(UpdateOne({"_id": scan["_id"], "schema_version": {"$exists": False}}, update))
+            if len(ops) >= args.batch_size:
+                upgraded += collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            upgraded += collection.bulk_write(ops, ordered=False).modified_count
+
+    prefix = "[DRY RUN] " if args.dry_run else ""
+    ratio = f" ({bytes_before / bytes_after:.1f}x smaller)" if bytes_after else ""
+    print(f"{prefix}{scanned} scans, payload {bytes_before} -> {bytes_after} bytes{ratio}, {upgraded} rewritten")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local SMTP stand-in for testing outbound mail
+
+Accepts every message (any AUTH PLAIN/LOGIN credentials), prints a summary
+and saves it as an .eml file. --fail-rate answers a share of messages with a
+temporary 451 error, so the mail queue's retries can be watched. It only
+uses the standard library (smtpd is gone in Python 3.12).
+
+Usage:
+    cd backend/authapi
+    python scripts/debug_smtp_server.py [--port 1025] [--maildir /tmp/mail] [--fail-rate 0.2]
+
+then run the app with:
+    MAIL_HOST=localhost MAIL_PORT=1025 MAIL_STARTTLS=false
+"""
+
+import argparse
+import random
+import socketserver
+import time
+from email import message_from_bytes
+from pathlib import Path
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        options = self.server.options
+        self.reply("220 debug-smtp ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.reply("250-debug-smtp")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 debug-smtp")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip(" <>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b".\n", b""):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                if options.fail_rate and random.random() < options.fail_rate:
+                    self.reply("451 Simulated temporary failure")
+                else:
+                    self.server.store(sender, recipients, b"".join(lines))
+                    self.reply("250 OK: queued")
+                sender, recipients = None, []
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, SMTPHandler)
+        self.options = options
+        self.count = 0
+        self.maildir = Path(options.maildir)
+        self.maildir.mkdir(parents=True, exist_ok=True)
+
+    def store(self, sender, recipients, raw: bytes) -> None:
+        self.count += 1
+        path = self.maildir / f"{time.strftime('%Y%m%d_%H%M%S')}_{self.count:05d}.eml"
+        path.write_bytes(raw)
+        subject = message_from_bytes(raw).get("Subject", "")
+        print(f"#{self.count} {sender} -> {', '.join(recipients)}: {subject} ({len(raw)} bytes, {path.name})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Debugging SMTP server that stores messages on disk")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--maildir", default="/tmp/durianostics-mail")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of messages answered with 451")
+    args = parser.parse_args()
+
+    server = DebugSMTPServer((args.host, args.port), args)
+    print(f"Debug SMTP server on {args.host}:{args.port}, saving to {args.maildir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Explain-plan audit of every registered query shape
+
+Imports the modules that register query shapes (see query_registry), runs
+explain("executionStats") for each shape and flags:
+    COLLSCAN  the winning plan scans the whole collection
+    SORT      the winning plan sorts in memory instead of reading an index in order
+    RATIO     far more documents were examined than returned
+
+Run it against a local scratch MongoDB (MONGO_URI). --seed fills an empty
+database with synthetic users, posts, comments, likes, scans and products
+so the plans reflect realistic data; seeded documents carry audit_seed and
+are removed again with --cleanup. Seeding never touches the analytics
+rollups (a backfill would replace the real ones); their shapes are
+explained against whatever rollups the database already holds.
+
+Usage:
+    cd backend/authapi
+    python scripts/explain_audit.py --seed 200
+    python scripts/explain_audit.py [--ratio 10] [--min-examined 50] [--strict]
+    python scripts/explain_audit.py --write-baseline explain_baseline.json
+    python scripts/explain_audit.py --baseline explain_baseline.json
+    python scripts/explain_audit.py --cleanup
+"""
+
+import argparse
+import importlib
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId, SON
+from pymongo.errors import PyMongoError
+
+import db
+from query_registry import QUERY_SHAPES, resolve
+
+# Every module that runs queries registers its shapes at import time
+AUDITED_MODULES = [
+    "db",
+    "auth",
+    "forum_search",
+    "admin_analytics",
+    "scan_archive",
+    "routes.forum_routes",
+    "routes.admin.admin_routes",
+    "routes.shop_routes",
+]
+
+CATEGORIES = ["General", "Tips", "Market", "Disease", "Harvest"]
+WORDS = ["durian", "musang", "king", "d24", "puyat", "harvest", "ripe", "thorn", "aroma", "market",
+         "price", "davao", "farm", "tree", "fruit", "season", "export", "grade", "disease", "leaf"]
+SEEDED_COLLECTIONS = ["users", "posts", "comments", "likes", "products"]
+
+
+def _sentence(count: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(count))
+
+
+def seed(users: int) -> None:
+    """Insert synthetic data proportional to `users`, tagged with audit_seed"""
+    from forum_search import search_fields
+    from scan_schema import compact_fields
+
+    now = datetime.utcnow()
+    user_docs = []
+    for i in range(users):
+        name = f"{random.choice(WORDS).title()} Grower {i}"
+        email = f"grower{i}@example.invalid"
+        created = now - timedelta(days=random.randint(0, 365))
+        user_docs.append({
+            "name": name, "email": email, **db.user_search_fields(name, email),
+            "role": "admin" if i % 50 == 0 else "user", "isActive": i % 10 != 0,
+            "createdAt": created, "lastLogin": created + timedelta(days=random.randint(0, 30)),
+            "audit_seed": True
+        })
+    user_ids = db.users_collection.insert_many(user_docs).inserted_ids
+
+    post_docs = []
+    for _ in range(users * 3):
+        title = _sentence(5)
+        post_docs.append({
+            "title": title, "content": _sentence(40), "category": random.choice(CATEGORIES),
+            "user_id": random.choice(user_ids), "username": "seed", "likes": 0, "views": 0,
+            "created_at": now - timedelta(minutes=random.randint(0, 525600)), "audit_seed": True,
+            **search_fields(title)
+        })
+    post_ids = db.posts_collection.insert_many(post_docs).inserted_ids
+
+    db.comments_collection.insert_many([{
+        "post_id": random.choice(post_ids), "user_id": random.choice(user_ids), "content": _sentence(12),
+        "likes": 0, "created_at": now - timedelta(minutes=random.randint(0, 525600)), "audit_seed": True
+    } for _ in range(users * 5)])
+
+    pairs = {(random.choice(post_ids), random.choice(user_ids)) for _ in range(users * 5)}
+    db.likes_collection.insert_many([{
+        "target_id": target, "target_type": "posts", "user_id": user, "created_at": now, "audit_seed": True
+    } for target, user in pairs])
+
+    for _ in range(users * 10):
+        created = now - timedelta(minutes=random.randint(0, 525600))
+        quality = round(random.uniform(20, 100), 1)
+        db.scan_collection_for_write(created).insert_one({
+            "user_id": random.choice(user_ids), "username": "seed", "image_url": "", "thumbnail_url": "",
+            "variety": random.choice(["D24", "Musang King", "Puyat"]), "quality_score": quality,
+            "confidence": random.random(), "status": "Export Ready" if quality >= 70 else "Rejected",
+            "durian_count": 1, **compact_fields({}), "created_at": created, "audit_seed": True
+        })
+
+    db.db["products"].insert_many([{
+        "name": f"{_sentence(2).title()} Box", "price": random.randint(100, 2000), "audit_seed": True
+    } for _ in range(30)])
+
+    db.rebuild_category_counts()
+    print(f"Seeded {users} users, {len(post_ids)} posts, {users * 5} comments, {len(pairs)} likes, {users * 10} scans")
+
+
+def cleanup() -> None:
+    for name in SEEDED_COLLECTIONS:
+        removed = db.db[name].delete_many({"audit_seed": True}).deleted_count
+        print(f"{name}: removed {removed}")
+    for collection, _, _ in db.scan_sources(refresh=True):
+        removed = collection.delete_many({"audit_seed": True}).deleted_count
+        print(f"{collection.name}: removed {removed}")
+    db.rebuild_category_counts()
+
+
+def sample_params() -> dict:
+    """Representative values for every Param, taken from the data"""
+    now = datetime.utcnow()
+    post = db.posts_collection.find_one({}, sort=[("created_at", -1)]) or {}
+    user = db.users_collection.find_one({}) or {}
+    scan = next(iter(db.find_scans({})), None) or {}
+    product = db.db["products"].find_one({}) or {}
+    terms = post.get("title_terms") or ["durian"]
+    return {
+        "user_id": scan.get("user_id") or user.get("_id") or ObjectId(),
+        "email": user.get("email", "nobody@example.invalid"),
+        "name_prefix": "^" + (user.get("nameLower") or "a")[:2],
+        "post_id": post.get("_id") or ObjectId(),
+        "post_ids": [doc["_id"] for doc in db.posts_collection.find({}, {"_id": 1}).limit(20)],
+        "post_created_at": post.get("created_at") or now,
+        "category": post.get("category", "General"),
+        "search": terms[0],
+        "title_prefix": "^" + terms[0][:3],
+        "scan_id": scan.get("_id") or ObjectId(),
+        "product_id": product.get("_id") or ObjectId(),
+        "granularity": "day",
+        "since": now - timedelta(days=30),
+        "now": now,
+    }
+
+
+def _command(collection, shape, params) -> SON:
+    if shape.pipeline is not None:
+        return SON([("aggregate", collection.name), ("pipeline", resolve(shape.pipeline, params)), ("cursor", {})])
+    command = SON([("find", collection.name), ("filter", resolve(shape.filter, params))])
+    if shape.sort:
+        command["sort"] = SON((field, order) for field, order in resolve(shape.sort, params))
+    if shape.projection:
+        command["projection"] = resolve(shape.projection, params)
+    if shape.limit:
+        command["limit"] = shape.limit
+    return command
+
+
+def _collect(doc, key, found):
+    """Every value stored under `key` anywhere in an explain document"""
+    if isinstance(doc, dict):
+        for k, value in doc.items():
+            if k == key:
+                found.append(value)
+            _collect(value, key, found)
+    elif isinstance(doc, list):
+        for item in doc:
+            _collect(item, key, found)
+    return found
+
+
+def analyze(explain: dict, ratio: float, min_examined: int) -> dict:
+    stages = []
+    for plan in _collect(explain, "winningPlan", []):
+        stages.extend(stage for stage in _collect(plan, "stage", []) if isinstance(stage, str))
+    stats = next((s for s in _collect(explain, "executionStats", []) if "totalDocsExamined" in s), {})
+    returned = stats.get("nReturned", 0)
+    examined = stats.get("totalDocsExamined", 0)
+
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if "SORT" in stages:
+        flags.append("SORT")
+    if examined >= min_examined and examined / max(returned, 1) > ratio:
+        flags.append("RATIO")
+    return {
+        "plan": ">".join(dict.fromkeys(stages)) or "?",
+        "returned": returned,
+        "keys": stats.get("totalKeysExamined", 0),
+        "docs": examined,
+        "ms": stats.get("executionTimeMillis", 0),
+        "flags": flags,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain every registered query shape")
+    parser.add_argument("--seed", type=int, metavar="USERS", help="Seed synthetic data for this many users first")
+    parser.add_argument("--force", action="store_true", help="Seed even if the database is not empty")
+    parser.add_argument("--cleanup", action="store_true", help="Remove seeded documents and exit")
+    parser.add_argument("--ratio", type=float, default=10, help="Flag shapes examining more docs than this per result")
+    parser.add_argument("--min-examined", type=int, default=50, help="Ignore ratios below this many examined docs")
+    parser.add_argument("--baseline", help="Fail on findings not present in this baseline file")
+    parser.add_argument("--write-baseline", help="Save the current findings as a baseline file")
+    parser.add_argument("--strict", action="store_true", help="Fail on any finding")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+    if args.seed:
+        if db.users_collection.estimated_document_count() and not args.force:
+            sys.exit("Refusing to seed a non-empty database; point MONGO_URI at a scratch instance or pass --force")
+        seed(args.seed)
+
+    for module in AUDITED_MODULES:
+        importlib.import_module(module)
+    params = sample_params()
+
+    findings = {}
+    errors = 0
+    print(f"{'shape':<28} {'collection':<18} {'plan':<34} {'ret':>6} {'keys':>7} {'docs':>7} {'ms':>5}  flags")
+    for shape in sorted(QUERY_SHAPES.values(), key=lambda s: s.name):
+        if shape.collection == "scans":
+            collections = [collection for collection, _, _ in db.scan_sources(refresh=True)]
+        else:
+            collections = [db.db[shape.collection]]
+        for collection in collections:
+            try:
+                explain = db.db.command(SON([("explain", _command(collection, shape, params)), ("verbosity", "executionStats")]))
+            except (PyMongoError, KeyError) as e:
+                errors += 1
+                print(f"{shape.name:<28} {collection.name:<18} ERROR {e}")
+                continue
+            result = analyze(explain, args.ratio, args.min_examined)
+            flags = [flag for flag in result["flags"] if flag not in shape.allow]
+            allowed = [flag.lower() for flag in result["flags"] if flag in shape.allow]
+            if flags:
+                findings[shape.name] = sorted(set(findings.get(shape.name, [])) | set(flags))
+            print(
+                f"{shape.name:<28} {collection.name:<18} {result['plan'][:34]:<34} {result['returned']:>6} "
+                f"{result['keys']:>7} {result['docs']:>7} {result['ms']:>5}  {' '.join(flags + allowed)}"
+            )
+
+    print(f"\n{len(QUERY_SHAPES)} shapes, {len(findings)} with findings, {errors} errors")
+
+    if args.write_baseline:
+        Path(args.write_baseline).write_text(json.dumps(findings, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.write_baseline}")
+
+    failed = errors > 0 and (args.strict or args.baseline)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = {
+            name: [flag for flag in flags if flag not in baseline.get(name, [])]
+            for name, flags in findings.items()
+        }
+        regressions = {name: flags for name, flags in regressions.items() if flags}
+        for name, flags in sorted(regressions.items()):
+            print(f"REGRESSION {name}: {', '.join(flags)}")
+        failed = failed or bool(regressions)
+    if args.strict and findings:
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
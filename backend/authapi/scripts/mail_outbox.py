@@ -0,0 +1,62 @@
+"""
+Inspect and manage the outbound mail queue
+
+Shows counts per status, lists dead letters, requeues them, or delivers
+everything due right now without the app running.
+
+Usage:
+    cd backend/authapi
+    python scripts/mail_outbox.py [--dead] [--requeue-dead] [--drain]
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from handlers.mail_queue import MailQueue, _outbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and manage the mail outbox")
+    parser.add_argument("--dead", action="store_true", help="List dead letters")
+    parser.add_argument("--requeue-dead", action="store_true", help="Give dead letters a fresh set of attempts")
+    parser.add_argument("--drain", action="store_true", help="Deliver every due message now")
+    args = parser.parse_args()
+
+    outbox = _outbox()
+    for row in outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        print(f"{row['_id']}: {row['count']}")
+
+    if args.dead:
+        for message in outbox.find({"status": "dead"}, {"raw": 0}).sort("created_at", -1):
+            print(f"{message['_id']} {message['kind']} -> {', '.join(message['to'])} "
+                  f"after {message['attempts']} attempts: {message.get('last_error')}")
+
+    if args.requeue_dead:
+        result = outbox.update_many(
+            {"status": "dead"},
+            {"$set": {"status": "queued", "attempts": 0, "due_at": datetime.utcnow(), "locked_until": None}}
+        )
+        print(f"Requeued {result.modified_count} dead letters")
+
+    if args.drain:
+        queue = MailQueue(workers=1)
+        connection = {}
+        sent = 0
+        try:
+            while True:
+                claimed = queue.process_batch(connection)
+                if not claimed:
+                    break
+                sent += claimed
+        finally:
+            queue._close(connection)
+        print(f"Processed {sent} messages: {queue.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Drain the media deletion queue and reconcile orphaned assets
+
+The app does this in the background (handlers/media_gc.py). This runs the
+same passes from cron or by hand, e.g. after dropping a scan partition.
+
+Usage:
+    cd backend/authapi
+    python scripts/media_gc.py [--reconcile] [--dry-run] [--retry-failed]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from handlers.media_gc import MediaCollector, _deletions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete queued media assets and find orphans")
+    parser.add_argument("--reconcile", action="store_true", help="Also list Cloudinary assets and queue orphans")
+    parser.add_argument("--dry-run", action="store_true", help="With --reconcile, only report orphans")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue deletions that exhausted their attempts")
+    args = parser.parse_args()
+
+    collector = MediaCollector()
+    if args.retry_failed:
+        result = _deletions().update_many(
+            {"failed_at": {"$ne": None}},
+            {"$set": {"failed_at": None, "attempts": 0, "locked_until": None}}
+        )
+        print(f"Requeued {result.modified_count} failed deletions")
+
+    if args.reconcile:
+        if args.dry_run:
+            orphans = collector.find_orphans()
+            for public_id in orphans:
+                print(public_id)
+            print(f"{len(orphans)} orphaned assets")
+            return
+        collector.reconcile()
+
+    deleted, failed = collector.drain()
+    print(f"Deleted {deleted} assets, {failed} failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Move embedded liked_by arrays into the likes collection
+
+Copies every (post/comment, user) pair from liked_by into `likes`, resets
+the denormalized `likes` counter from the collection and removes the array.
+Safe to re-run: existing likes are skipped by the unique index.
+
+--recount only resets every counter from the likes collection. db.toggle_like
+writes the like and the counter separately, so a crash between the two
+leaves a counter off by one until this runs.
+
+Usage:
+    cd backend/authapi
+    python scripts/migrate_likes.py [--batch-size 500] [--dry-run]
+    python scripts/migrate_likes.py --recount [--dry-run]
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import db
+
+
+def migrate_collection(collection, batch_size: int, dry_run: bool) -> dict:
+    """Migrate one of posts/comments; returns counters for the report"""
+    stats = {"documents": 0, "likes": 0}
+    docs = collection.find({"liked_by": {"$exists": True}}, {"liked_by": 1})
+
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            _migrate_batch(collection, batch, stats, dry_run)
+            batch = []
+    if batch:
+        _migrate_batch(collection, batch, stats, dry_run)
+    return stats
+
+
+def _migrate_batch(collection, docs, stats, dry_run):
+    now = datetime.utcnow()
+    inserts = [
+        InsertOne({
+            "target_id": doc["_id"],
+            "target_type": collection.name,
+            "user_id": user_oid,
+            "created_at": now
+        })
+        for doc in docs
+        for user_oid in set(doc.get("liked_by") or [])
+    ]
+    stats["documents"] += len(docs)
+    stats["likes"] += len(inserts)
+    if dry_run:
+        return
+
+    if inserts:
+        try:
+            db.likes_collection.bulk_write(inserts, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates are likes that already exist; anything else is real
+            errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+            if errors:
+                raise
+
+    # Recount from the likes collection so likes made before the migration are kept
+    ids = [doc["_id"] for doc in docs]
+    counts = _like_counts(ids)
+    collection.bulk_write([
+        UpdateOne({"_id": doc_id}, {"$set": {"likes": counts.get(doc_id, 0)}, "$unset": {"liked_by": ""}})
+        for doc_id in ids
+    ], ordered=False)
+
+
+def _like_counts(ids) -> dict:
+    return {
+        row["_id"]: row["count"]
+        for row in db.likes_collection.aggregate([
+            {"$match": {"target_id": {"$in": ids}}},
+            {"$group": {"_id": "$target_id", "count": {"$sum": 1}}}
+        ])
+    }
+
+
+def recount_collection(collection, batch_size: int, dry_run: bool) -> dict:
+    """Reset the likes counters of posts/comments that drifted from the likes collection"""
+    stats = {"documents": 0, "corrected": 0}
+    batch = []
+    for doc in collection.find({}, {"likes": 1}):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            _recount_batch(collection, batch, stats, dry_run)
+            batch = []
+    if batch:
+        _recount_batch(collection, batch, stats, dry_run)
+    return stats
+
+
+def _recount_batch(collection, docs, stats, dry_run):
+    counts = _like_counts([doc["_id"] for doc in docs])
+    updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"likes": counts.get(doc["_id"], 0)}})
+        for doc in docs
+        if doc.get("likes", 0) != counts.get(doc["_id"], 0)
+    ]
+    stats["documents"] += len(docs)
+    stats["corrected"] += len(updates)
+    if updates and not dry_run:
+        collection.bulk_write(updates, ordered=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move liked_by arrays into the likes collection")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--recount", action="store_true", help="Only reset drifted likes counters")
+    args = parser.parse_args()
+
+    db.ensure_indexes()
+    prefix = "[DRY RUN] " if args.dry_run else ""
+    for collection in (db.posts_collection, db.comments_collection):
+        if args.recount:
+            stats = recount_collection(collection, args.batch_size, args.dry_run)
+            print(f"{prefix}{collection.name}: {stats['documents']} documents, {stats['corrected']} counters corrected")
+            continue
+        stats = migrate_collection(collection, args.batch_size, args.dry_run)
+        print(f"{prefix}{collection.name}: {stats['documents']} documents, {stats['likes']} likes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Manage monthly scan partitions (SCAN_PARTITIONING=monthly)
+
+list            show every scan collection with its range and size
+retire NAME     rename a past month out of service (archived_<NAME>),
+                or with --drop delete it and its archived payloads
+migrate-legacy  move scans from the single `scans` collection into their
+                monthly partitions, in batches; safe to interrupt and re-run
+
+Usage:
+    cd backend/authapi
+    python scripts/scan_partitions.py list
+    python scripts/scan_partitions.py retire scans_2025_01 [--drop]
+    python scripts/scan_partitions.py migrate-legacy [--batch-size 1000]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pymongo.errors import BulkWriteError
+
+import db
+
+
+def list_partitions():
+    for collection, start, end in db.scan_sources(refresh=True):
+        stats = db.db.command("collStats", collection.name)
+        span = f"{start:%Y-%m-%d} .. {end:%Y-%m-%d}" if start and end else "open"
+        print(f"{collection.name:<16} {span:<24} {stats.get('count', 0):>10} scans {stats.get('storageSize', 0):>14} bytes")
+
+
+def migrate_legacy(batch_size: int):
+    if db.SCAN_PARTITIONING != "monthly":
+        sys.exit("Set SCAN_PARTITIONING=monthly first so new scans stop landing in `scans`")
+
+    moved = 0
+    while True:
+        batch = list(db.scans_collection.find({}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        by_partition = {}
+        for scan in batch:
+            created = scan.get("created_at") or scan["_id"].generation_time.replace(tzinfo=None)
+            by_partition.setdefault(db.scan_partition_name(created), []).append(scan)
+
+        for name, scans in by_partition.items():
+            db.ensure_scan_indexes(db.db[name])
+            try:
+                db.db[name].insert_many(scans, ordered=False)
+            except BulkWriteError as e:
+                # Duplicates were copied by an interrupted run; anything else is real
+                errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+                if errors:
+                    raise
+
+        db.scans_collection.delete_many({"_id": {"$in": [scan["_id"] for scan in batch]}})
+        moved += len(batch)
+        print(f"Moved {moved} scans")
+    print(f"Done: {moved} scans moved into monthly partitions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly scan partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    retire = commands.add_parser("retire")
+    retire.add_argument("name", help="Partition to retire, e.g. scans_2025_01")
+    retire.add_argument("--drop", action="store_true", help="Delete instead of renaming")
+    migrate = commands.add_parser("migrate-legacy")
+    migrate.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_partitions()
+    elif args.command == "retire":
+        try:
+            print(db.retire_scan_partition(args.name, drop=args.drop))
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        migrate_legacy(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
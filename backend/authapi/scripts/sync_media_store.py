@@ -0,0 +1,45 @@
+"""
+Mirror the local image store to Cloudinary
+
+Uploads originals in the content-addressed store (MEDIA_BACKEND=store) that
+have no Cloudinary copy yet. This is the one-shot counterpart of
+MEDIA_STORE_SYNC=1, for running from cron when the link is up. Safe to
+re-run; failed objects are retried up to MEDIA_STORE_SYNC_MAX_ATTEMPTS times.
+
+Usage:
+    cd backend/authapi
+    python scripts/sync_media_store.py [--batch-size 20] [--max-batches 0]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from handlers.image_store import MEDIA_STORE_SYNC_BATCH, StoreSync
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the local image store to Cloudinary")
+    parser.add_argument("--batch-size", type=int, default=MEDIA_STORE_SYNC_BATCH)
+    parser.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches (0 = until done)")
+    args = parser.parse_args()
+
+    sync = StoreSync()
+    total_synced = total_failed = batches = 0
+    while True:
+        synced, failed = sync.sync_batch(args.batch_size)
+        total_synced += synced
+        total_failed += failed
+        batches += 1
+        # A batch with no successes is either the end or a dead link
+        if not synced or (args.max_batches and batches >= args.max_batches):
+            break
+
+    print(f"Mirrored {total_synced} images, {total_failed} failures")
+
+
+if __name__ == "__main__":
+    main()
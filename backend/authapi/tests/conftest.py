@@ -0,0 +1,157 @@
+# backend/authapi/tests/conftest.py
+"""
+Shared test setup: an in-memory MongoDB in place of the real client
+
+db.py connects at import time, so pymongo.MongoClient is replaced with
+mongomock's before anything imports db. mongomock sends no command
+monitoring events. Each public collection method therefore reports one
+round trip to db_monitoring.COMMAND_MONITOR itself, under the command
+name the real driver would send. Calls that mongomock makes internally
+(find_one calls find) are not counted again.
+
+app.py loads the ML models at import, so the `app` fixture builds a
+smaller app with the same hooks in the same order.
+
+Usage:
+    cd backend/authapi
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+
+import itertools
+import sys
+import threading
+from functools import wraps
+from pathlib import Path
+
+import mongomock
+import pymongo
+import pytest
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Add authapi/ to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_client = mongomock.MongoClient()
+pymongo.MongoClient = lambda *args, **kwargs: _client
+# Read preferences are meaningless against a single in-memory server
+mongomock.collection.Collection.with_options = lambda self, *args, **kwargs: self
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    # mongomock's bulk builder rejects the `sort` that pymongo 4.16 operations carry
+    errors = []
+    for index, op in enumerate(requests):
+        try:
+            if isinstance(op, pymongo.InsertOne):
+                self.insert_one(op._doc)
+            elif isinstance(op, (pymongo.UpdateOne, pymongo.UpdateMany)):
+                update = self.update_one if isinstance(op, pymongo.UpdateOne) else self.update_many
+                update(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, pymongo.ReplaceOne):
+                self.replace_one(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, (pymongo.DeleteOne, pymongo.DeleteMany)):
+                delete = self.delete_one if isinstance(op, pymongo.DeleteOne) else self.delete_many
+                delete(op._filter)
+        except DuplicateKeyError as e:
+            # Reported like the server does: unordered writes carry on
+            errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+            if ordered:
+                break
+    if errors:
+        raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": 0})
+
+
+mongomock.collection.Collection.bulk_write = _bulk_write
+
+from db_monitoring import COMMAND_MONITOR  # noqa: E402
+
+# Collection method -> command the real driver sends for it
+MONITORED_METHODS = {
+    "find": "find",
+    "find_one": "find",
+    "count_documents": "aggregate",
+    "estimated_document_count": "count",
+    "aggregate": "aggregate",
+    "distinct": "distinct",
+    "insert_one": "insert",
+    "insert_many": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "replace_one": "update",
+    "bulk_write": "update",
+    "delete_one": "delete",
+    "delete_many": "delete",
+    "find_one_and_update": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+    "create_index": "createIndexes",
+}
+
+_request_ids = itertools.count(1)
+_in_command = threading.local()
+
+
+class _CommandEvent:
+    """The attributes of a pymongo monitoring event that CommandMonitor reads"""
+
+    def __init__(self, command_name, collection):
+        self.command_name = command_name
+        self.command = {command_name: collection}
+        self.request_id = next(_request_ids)
+        self.duration_micros = 0
+        self.reply = {"ok": 1}
+
+
+def _monitored(method, command_name):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_in_command, "active", False):
+            return method(self, *args, **kwargs)
+        _in_command.active = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _in_command.active = False
+            event = _CommandEvent(command_name, self.name)
+            COMMAND_MONITOR.started(event)
+            COMMAND_MONITOR.succeeded(event)
+    return wrapper
+
+
+for _name, _command in MONITORED_METHODS.items():
+    setattr(mongomock.collection.Collection, _name, _monitored(getattr(mongomock.collection.Collection, _name), _command))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def mongo():
+    """The app's database, emptied and with the counters bootstrapped"""
+    for name in db.db.list_collection_names():
+        db.db[name].delete_many({})
+    db._count_cache.clear()
+    db._user_cache.clear()
+    db.rebuild_category_counts()
+    yield db.db
+
+
+@pytest.fixture
+def app(mongo):
+    """The forum blueprint behind the same per-request hooks as app.py"""
+    from flask import Flask
+
+    import auth_middleware
+    import db_monitoring
+    from routes.forum_routes import forum_bp
+
+    app = Flask(__name__)
+    app.testing = True
+    app.register_blueprint(forum_bp, url_prefix="/forum")
+    db_monitoring.init_app(app)
+    auth_middleware.init_app(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
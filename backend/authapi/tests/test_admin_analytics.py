@@ -0,0 +1,118 @@
+# backend/authapi/tests/test_admin_analytics.py
+"""Incremental analytics rollups (see admin_analytics)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import admin_analytics
+import db
+
+START = datetime(2024, 5, 1)
+
+
+def _without_date_trunc(node):
+    # mongomock has no $dateTrunc; {"unit": "hour"} is the same as rebuilding the date from its parts
+    if isinstance(node, dict):
+        if "$dateTrunc" in node:
+            date = node["$dateTrunc"]["date"]
+            return {"$dateFromParts": {
+                "year": {"$year": date}, "month": {"$month": date},
+                "day": {"$dayOfMonth": date}, "hour": {"$hour": date}
+            }}
+        return {key: _without_date_trunc(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_without_date_trunc(item) for item in node]
+    return node
+
+
+@pytest.fixture
+def analytics(mongo, monkeypatch):
+    for name in ("_scans_pipeline", "_users_pipeline"):
+        pipeline = getattr(admin_analytics, name)
+        monkeypatch.setattr(admin_analytics, name, lambda *args, _pipeline=pipeline: _without_date_trunc(_pipeline(*args)))
+    return admin_analytics
+
+
+def _scan(moment, user_id, status="Good", variety="Musang King", quality=80):
+    db.scans_collection.insert_one({
+        "user_id": user_id, "created_at": moment, "status": status, "variety": variety, "quality_score": quality
+    })
+
+
+def test_window_is_folded_into_hourly_and_daily_buckets(analytics):
+    farmer, other = ObjectId(), ObjectId()
+    _scan(START + timedelta(hours=1, minutes=5), farmer, quality=90)
+    _scan(START + timedelta(hours=1, minutes=50), farmer, status="Unripe", variety="D.24", quality=70)
+    _scan(START + timedelta(hours=3), other)
+    db.users_collection.insert_one({"name": "New", "createdAt": START + timedelta(hours=3), "lastLogin": START + timedelta(hours=4)})
+
+    assert analytics.process_window(START, START + timedelta(days=1)) == {"scans": 3, "signups": 1, "logins": 1}
+
+    hours = analytics.get_rollups("hour", START, START + timedelta(days=1))
+    assert [(h["bucket"], h["scans"]) for h in hours if h["scans"]] == [("2024-05-01T01:00:00", 2), ("2024-05-01T03:00:00", 1)]
+    assert hours[0]["avg_quality"] == 80.0
+    assert hours[0]["status"] == {"Good": 1, "Unripe": 1}
+    # "." can't be part of a field name
+    assert hours[0]["variety"] == {"Musang King": 1, "D_24": 1}
+
+    (day,) = analytics.get_rollups("day", START, START + timedelta(days=1))
+    assert (day["scans"], day["signups"], day["logins"], day["active_scanners"]) == (3, 1, 1, 2)
+
+
+def test_incremental_runs_only_read_past_the_watermark(analytics):
+    farmer = ObjectId()
+    _scan(START + timedelta(hours=1), farmer)
+    assert analytics.run_incremental(until=START + timedelta(days=1))["scans"] == 1
+    assert analytics.run_incremental(until=START + timedelta(days=1))["windows"] == 0
+
+    _scan(START + timedelta(days=1, hours=2), farmer)
+    assert analytics.run_incremental(until=START + timedelta(days=2))["scans"] == 1
+    summary = analytics.get_summary(START, START + timedelta(days=2))
+    assert (summary["scans"], summary["days"], summary["up_to"]) == (2, 2, "2024-05-03T00:00:00")
+
+
+def test_overlapping_runs_claim_disjoint_windows(analytics, monkeypatch):
+    farmer = ObjectId()
+    for day in range(20):
+        _scan(START + timedelta(days=day, hours=12), farmer)
+
+    windows = []
+    process_window = analytics.process_window
+
+    def overlapping(start, end):
+        windows.append((start, end))
+        if len(windows) == 1:
+            # Another worker runs while this one is still inside its first window
+            analytics.run_incremental(until=START + timedelta(days=20))
+        return process_window(start, end)
+
+    monkeypatch.setattr(analytics, "process_window", overlapping)
+    analytics.run_incremental(until=START + timedelta(days=20))
+
+    ordered = sorted(windows)
+    assert ordered[0][0] == START + timedelta(hours=12) and ordered[-1][1] == START + timedelta(days=20)
+    assert all(previous[1] == current[0] for previous, current in zip(ordered, ordered[1:]))
+    assert analytics.get_summary(START, START + timedelta(days=20))["scans"] == 20
+
+
+def test_backfill_since_rebuilds_only_recent_days(analytics, monkeypatch):
+    run_incremental = analytics.run_incremental
+    # Stop at the test data instead of walking every window up to today
+    monkeypatch.setattr(analytics, "run_incremental", lambda until=None: run_incremental(START + timedelta(days=2)))
+    farmer = ObjectId()
+    _scan(START + timedelta(hours=1), farmer)
+    _scan(START + timedelta(days=1, hours=1), farmer)
+    analytics.run_incremental(until=START + timedelta(days=2))
+    # Hand-edited rollups show whether a day was rebuilt
+    admin_analytics.rollups_collection.update_many({}, {"$inc": {"scans": 100}})
+
+    analytics.backfill(since=START + timedelta(days=1, hours=5))
+    days = {d["bucket"]: d["scans"] for d in analytics.get_rollups("day", START, START + timedelta(days=2))}
+    assert days == {"2024-05-01T00:00:00": 101, "2024-05-02T00:00:00": 1}
+
+
+def test_unknown_granularity_is_rejected(analytics):
+    with pytest.raises(ValueError, match="Invalid granularity"):
+        analytics.get_rollups("minute", START, START + timedelta(days=1))
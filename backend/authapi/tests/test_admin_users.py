@@ -0,0 +1,81 @@
+# backend/authapi/tests/test_admin_users.py
+"""Admin user listing: keyset pages, filters and date ranges (see admin_routes)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def admin_client(mongo):
+    from flask import Flask
+
+    from routes.admin.admin_routes import admin_bp
+
+    app = Flask(__name__)
+    app.testing = True
+    app.register_blueprint(admin_bp, url_prefix="/admin")
+    return app.test_client()
+
+
+def _add_user(name, created_at, **fields):
+    db.users_collection.insert_one({
+        "name": name, "email": f"{name.lower()}@example.com", "nameLower": name.lower(),
+        "emailLower": f"{name.lower()}@example.com", "role": "user", "createdAt": created_at, **fields
+    })
+
+
+def test_pages_follow_the_cursor_without_gaps(admin_client):
+    start = datetime(2024, 1, 1)
+    for i in range(120):
+        _add_user(f"Farmer{i:03d}", start + timedelta(minutes=i))
+
+    first = admin_client.get("/admin/users?limit=50").json
+    assert first["total"] == 120 and len(first["users"]) == 50
+    names = [user["name"] for user in first["users"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = admin_client.get(f"/admin/users?limit=50&cursor={cursor}").json
+        assert "total" not in page
+        names += [user["name"] for user in page["users"]]
+        cursor = page["next_cursor"]
+    assert names == [f"Farmer{i:03d}" for i in reversed(range(120))]
+
+
+def test_active_filter_hides_deactivated_users(admin_client):
+    _add_user("Active", datetime(2024, 5, 1))
+    _add_user("Legacy", datetime(2024, 5, 2))
+    _add_user("Gone", datetime(2024, 5, 3), isActive=False)
+    response = admin_client.get("/admin/users?active=true").json
+    assert {user["name"] for user in response["users"]} == {"Active", "Legacy"}
+    assert response["total"] == 2
+
+
+def test_created_range_with_an_offset_is_converted_to_utc(admin_client):
+    # May 1st in UTC+8 is [Apr 30 16:00, May 1 16:00) UTC
+    _add_user("Before", datetime(2024, 4, 30, 15, 59))
+    _add_user("Start", datetime(2024, 4, 30, 16, 0))
+    _add_user("Late", datetime(2024, 5, 1, 15, 59))
+    _add_user("After", datetime(2024, 5, 1, 16, 0))
+    response = admin_client.get(
+        "/admin/users",
+        query_string={"created_from": "2024-05-01T00:00:00+08:00", "created_to": "2024-05-02T00:00:00+08:00"}
+    ).json
+    assert {user["name"] for user in response["users"]} == {"Start", "Late"}
+
+
+def test_malformed_date_is_a_bad_request(admin_client):
+    response = admin_client.get("/admin/users?created_from=soon")
+    assert response.status_code == 400
+    assert response.json["error"] == "Invalid created_from"
+
+
+def test_analytics_range_is_converted_to_utc(admin_client):
+    response = admin_client.get(
+        "/admin/analytics/rollups",
+        query_string={"from": "2024-05-01T00:00:00+08:00", "to": "2024-05-02T00:00:00Z"}
+    ).json
+    assert response["from"] == "2024-04-30T16:00:00"
+    assert response["to"] == "2024-05-02T00:00:00"
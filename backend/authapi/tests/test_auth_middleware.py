@@ -0,0 +1,102 @@
+# backend/authapi/tests/test_auth_middleware.py
+"""Bearer-token authentication and its caches (see auth_middleware)"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytest
+from jose import jwt
+
+import auth_middleware
+import db
+from auth import JWT_ALGORITHM, JWT_SECRET
+from db_monitoring import round_trip_budget
+
+
+def _token(user_id, expires_in=timedelta(hours=1)):
+    return jwt.encode({"sub": str(user_id), "exp": datetime.utcnow() + expires_in}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Every full JWT verification, with an empty token cache"""
+    monkeypatch.setattr(auth_middleware, "_verified", OrderedDict())
+    calls = []
+    decode = auth_middleware.jwt.decode
+
+    def counting(token, *args, **kwargs):
+        calls.append(token)
+        return decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(auth_middleware.jwt, "decode", counting)
+    return calls
+
+
+@pytest.fixture
+def user_id(mongo):
+    return db.users_collection.insert_one({"name": "Farmer", "email": "farmer@example.com", "isActive": True}).inserted_id
+
+
+def test_verified_tokens_are_served_from_the_cache(decodes, user_id):
+    token = _token(user_id)
+    assert auth_middleware.verify_token(token) == str(user_id)
+    assert auth_middleware.verify_token(token) == str(user_id)
+    assert decodes == [token]
+
+
+def test_a_cached_signature_needs_the_same_payload(decodes, user_id):
+    token = _token(user_id)
+    auth_middleware.verify_token(token)
+    header, _, signature = token.split(".")
+    forged = ".".join([header, _token("someone-else").split(".")[1], signature])
+    assert auth_middleware.verify_token(forged) is None
+
+
+def test_expired_tokens_are_rejected_and_evicted(decodes, user_id):
+    assert auth_middleware.verify_token(_token(user_id, timedelta(seconds=-1))) is None
+    token = _token(user_id)
+    auth_middleware.verify_token(token)
+    signature = token.rpartition(".")[2]
+    signing_input, subject, _ = auth_middleware._verified[signature]
+    auth_middleware._verified[signature] = (signing_input, subject, 0.0)
+    # The expired entry is dropped and the token re-verified on its real exp
+    assert auth_middleware.verify_token(token) == str(user_id)
+    assert len(decodes) == 3
+
+
+def test_token_cache_is_bounded(decodes, monkeypatch):
+    monkeypatch.setattr(auth_middleware, "TOKEN_CACHE_SIZE", 2)
+    tokens = [_token(f"user{i}") for i in range(3)]
+    for token in tokens:
+        auth_middleware.verify_token(token)
+    assert list(auth_middleware._verified) == [token.rpartition(".")[2] for token in tokens[1:]]
+
+
+def test_requests_carry_the_current_user(client, decodes, user_id):
+    headers = {"Authorization": f"Bearer {_token(user_id)}"}
+    assert client.get("/forum/posts", headers=headers).status_code == 200
+    # The summary is cached too, so a repeat costs no users round trip
+    with round_trip_budget(0):
+        assert db.get_user_summary(user_id)["name"] == "Farmer"
+
+    assert client.get("/forum/posts").status_code == 200
+    response = client.get("/forum/posts", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+
+
+def test_deactivation_applies_to_cached_sessions(client, decodes, user_id):
+    headers = {"Authorization": f"Bearer {_token(user_id)}"}
+    assert client.get("/forum/posts", headers=headers).status_code == 200
+
+    db.users_collection.update_one({"_id": user_id}, {"$set": {"isActive": False}})
+    db.invalidate_user_summary(user_id)
+    response = client.get("/forum/posts", headers=headers)
+    assert response.status_code == 403
+    assert response.json["error"] == "User is deactivated. Please contact support."
+    assert len(decodes) == 1
+
+
+def test_tokens_of_deleted_users_are_refused(client, decodes, user_id):
+    headers = {"Authorization": f"Bearer {_token(user_id)}"}
+    db.users_collection.delete_one({"_id": user_id})
+    assert client.get("/forum/posts", headers=headers).status_code == 401
@@ -0,0 +1,80 @@
+# backend/authapi/tests/test_counts.py
+"""Cached, estimated and incremental counts (see db.cached_count and category_counts)"""
+
+import pytest
+
+import db
+from db_monitoring import round_trip_budget
+
+
+def _add_posts(category, count):
+    db.posts_collection.insert_many([{"title": f"{category} {i}", "category": category} for i in range(count)])
+
+
+def test_cached_count_serves_repeats_from_memory(mongo):
+    _add_posts("Tips", 3)
+    assert db.cached_count(db.posts_collection, {"category": "Tips"}) == 3
+    _add_posts("Tips", 2)
+    with round_trip_budget(0):
+        assert db.cached_count(db.posts_collection, {"category": "Tips"}) == 3
+    # Another query shape or value is its own entry
+    assert db.cached_count(db.posts_collection, {"category": "Market"}) == 0
+    db._count_cache.clear()
+    assert db.cached_count(db.posts_collection, {"category": "Tips"}) == 5
+
+
+def test_estimated_count_is_cached_too(mongo):
+    _add_posts("Tips", 4)
+    assert db.estimated_count(db.posts_collection) == 4
+    _add_posts("Tips", 1)
+    assert db.estimated_count(db.posts_collection) == 4
+
+
+def test_counters_follow_inserts_and_deletes(mongo):
+    _add_posts("Tips", 2)
+    db.rebuild_category_counts()
+    db.adjust_category_count("Tips", 1)
+    db.adjust_category_count("Market", 1)
+    db.adjust_category_count("Market", -1)
+    assert db.category_counts() == {"Tips": 3}
+
+
+@pytest.fixture
+def unbootstrapped(mongo, monkeypatch):
+    """Counters from before the marker existed: one category was only ever $inc'ed"""
+    _add_posts("Tips", 5)
+    _add_posts("Market", 2)
+    db.counters_collection.delete_many({})
+    db.counters_collection.insert_one({"_id": "post_category:Tips", "scope": "post_category", "key": "Tips", "count": 1})
+    monkeypatch.setattr(db, "_category_counts_bootstrapped", False)
+
+
+def test_first_read_rebuilds_partial_counters(unbootstrapped):
+    assert db.category_counts() == {"Tips": 5, "Market": 2}
+    assert db.counters_collection.find_one({"_id": db.CATEGORY_COUNTS_MARKER})
+
+
+def test_first_write_rebuilds_instead_of_incrementing(unbootstrapped):
+    # The new post is already in posts when its counter is adjusted
+    _add_posts("Tips", 1)
+    db.adjust_category_count("Tips", 1)
+    assert db.category_counts() == {"Tips": 6, "Market": 2}
+
+
+def test_marker_survives_a_process_restart(mongo, monkeypatch):
+    _add_posts("Tips", 2)
+    db.rebuild_category_counts()
+    monkeypatch.setattr(db, "_category_counts_bootstrapped", False)
+    db.adjust_category_count("Tips", 1)
+    assert db.category_counts() == {"Tips": 3}
+
+
+def test_count_posts_uses_the_cheapest_source(mongo):
+    _add_posts("Tips", 3)
+    db.rebuild_category_counts()
+    with round_trip_budget(1) as scope:
+        assert db.count_posts({"category": "Tips"}) == 3
+    assert scope.commands == ["find counters"]
+    with round_trip_budget(1) as scope:
+        assert db.count_posts({}) == 3
+    assert scope.commands == ["count posts"]
@@ -0,0 +1,90 @@
+# backend/authapi/tests/test_db_budgets.py
+"""MongoDB round-trip budgets of the forum routes (see db_monitoring)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from jose import jwt
+
+import db
+from auth import JWT_ALGORITHM, JWT_SECRET
+from db_monitoring import round_trip_budget
+
+
+@pytest.fixture
+def forum(mongo):
+    """A user, a viewer, two pages of posts and comments on the newest post"""
+    now = datetime.utcnow()
+    author = db.users_collection.insert_one({"name": "Author", "email": "author@example.com", "isActive": True}).inserted_id
+    viewer = db.users_collection.insert_one({"name": "Viewer", "email": "viewer@example.com", "isActive": True}).inserted_id
+    post_ids = db.posts_collection.insert_many([{
+        "user_id": author, "username": "Author", "title": f"Durian post {i}", "content": "Ripe yet?",
+        "category": "Tips" if i % 2 else "Market", "replies": 0, "views": 0, "likes": 0,
+        "created_at": now - timedelta(minutes=i)
+    } for i in range(60)]).inserted_ids
+    db.comments_collection.insert_many([{
+        "post_id": post_ids[0], "user_id": author, "content": f"Comment {i}", "likes": 0,
+        "created_at": now - timedelta(minutes=60 - i)
+    } for i in range(60)])
+    db.likes_collection.insert_one({"target_id": post_ids[0], "user_id": viewer, "created_at": now})
+    db.rebuild_category_counts()
+    db._user_cache.clear()
+    return {"author": str(author), "viewer": str(viewer), "post": str(post_ids[0])}
+
+
+def _bearer(user_id):
+    token = jwt.encode({"sub": user_id, "exp": datetime.utcnow() + timedelta(hours=1)}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("path", [
+    "/forum/posts?user_id={viewer}",
+    "/forum/posts?category=Tips&user_id={viewer}",
+    "/forum/posts/{post}?user_id={viewer}",
+    "/forum/posts/{post}/comments?user_id={viewer}",
+])
+def test_read_routes_stay_within_budget(client, forum, path):
+    # app.testing makes the per-request check raise if the view's @db_budget is exceeded
+    response = client.get(path.format(**forum))
+    assert response.status_code == 200
+    assert response.json["success"]
+
+
+def test_posts_page_follows_cursor_within_budget(client, forum):
+    first = client.get(f"/forum/posts?limit=50&user_id={forum['viewer']}").json
+    assert len(first["posts"]) == 50 and first["next_cursor"]
+    second = client.get(f"/forum/posts?cursor={first['next_cursor']}&user_id={forum['viewer']}").json
+    assert len(second["posts"]) == 10 and second["next_cursor"] is None
+
+
+def test_bearer_token_lookup_is_outside_the_route_budget(client, forum):
+    # Cache miss: the middleware loads the viewer, then the view makes its own 3 round trips
+    with round_trip_budget(3) as scope:
+        response = client.get(f"/forum/posts?category=Tips&user_id={forum['viewer']}", headers=_bearer(forum["viewer"]))
+    assert response.status_code == 200
+    assert scope.round_trips == 4
+    assert scope.unbudgeted == 1
+    assert any(command.startswith("find users") for command in scope.commands)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/forum/posts", {"title": "Musang King season", "content": "When?", "category": "Tips", "user_id": "{author}"}),
+    ("/forum/comments", {"post_id": "{post}", "content": "Soon", "user_id": "{author}"}),
+])
+def test_write_routes_stay_within_budget(client, forum, path, body):
+    body = {key: value.format(**forum) for key, value in body.items()}
+    response = client.post(path, json=body, headers=_bearer(forum["author"]))
+    assert response.status_code == 201
+    assert response.json["success"]
+
+
+def test_exceeding_a_budget_raises(client, forum):
+    with pytest.raises(AssertionError, match="round trips"):
+        with round_trip_budget(1, "posts listing"):
+            client.get(f"/forum/posts?user_id={forum['viewer']}")
+
+
+def test_category_total_counts_existing_posts(client, forum):
+    response = client.get("/forum/posts?category=Tips").json
+    assert response["total"] == 30
@@ -0,0 +1,93 @@
+# backend/authapi/tests/test_email_templates.py
+"""Precompiled email templates and raw message building (see handlers/email_templates.py)"""
+
+from email import message_from_bytes, policy
+
+import pytest
+from jinja2 import UndefinedError
+
+import handlers.email_handler as email_handler
+import handlers.mail_queue as mail_queue
+from handlers.email_handler import build_message
+from handlers.email_templates import EmailTemplates, RenderedEmail
+
+
+@pytest.fixture(scope="module")
+def templates():
+    return EmailTemplates()
+
+
+def test_html_escapes_fields_and_text_does_not(templates):
+    rendered = templates.render("deactivation", user_name="Ana & Co", reason='<script>alert("x")</script>')
+    assert "&lt;script&gt;" in rendered.html and "<script>" not in rendered.html
+    assert "Ana &amp; Co" in rendered.html
+    assert '<script>alert("x")</script>' in rendered.text
+
+
+def test_bodies_are_wrapped_in_the_cached_layout(templates):
+    deactivation = templates.render("deactivation", user_name="Ana", reason="Spam")
+    reactivation = templates.render("reactivation", user_name="Ana")
+    assert deactivation.html.startswith(templates.header)
+    assert deactivation.html.endswith(templates.footers[True])
+    assert reactivation.html.endswith(templates.footers[False])
+    assert templates.footers[True] != templates.footers[False]
+
+    checkout = templates.render(
+        "checkout", user_name="Ana", items=[{"name": "Durian", "quantity": 2, "price": 500}], total=1000,
+        transaction_id="TX1", address=None, phone=None, payment_method="GCash"
+    )
+    assert checkout.subject == "Your DurianApp Order Receipt (Transaction ID: TX1)"
+    assert templates.header not in checkout.html
+    assert "Durian x2 - P500" in checkout.html and "Phone: N/A" in checkout.text
+
+
+def test_rendering_reuses_compiled_templates(templates, monkeypatch):
+    def no_lookups(name):
+        raise AssertionError(f"{name} looked up at send time")
+
+    monkeypatch.setattr(templates.env, "get_template", no_lookups)
+    assert templates.render("reactivation", user_name="Ana").subject == "Your Durianostics Account Has Been Reactivated"
+
+
+def test_missing_fields_fail_loudly(templates):
+    with pytest.raises(UndefinedError):
+        templates.render("deactivation", user_name="Ana")
+
+
+def _parse(raw):
+    return message_from_bytes(raw, policy=policy.default)
+
+
+def test_built_message_round_trips_through_a_parser():
+    rendered = RenderedEmail("Salamat, Niño ₱", "Total: ₱1,000\n", "<p>Total: ₱1,000</p>\n")
+    message = _parse(build_message(rendered, "nino@example.com", [("receipt.pdf", "application/pdf", b"%PDF-1.4 data")]))
+    assert message["Subject"] == "Salamat, Niño ₱"
+    assert message["To"] == "nino@example.com"
+    assert message["From"].addresses[0].addr_spec == email_handler.FROM_EMAIL
+    assert message.get_content_type() == "multipart/mixed"
+
+    assert message.get_body(("plain",)).get_content() == "Total: ₱1,000\n"
+    assert message.get_body(("html",)).get_content() == "<p>Total: ₱1,000</p>\n"
+    (attachment,) = message.iter_attachments()
+    assert attachment.get_filename() == "receipt.pdf"
+    assert attachment.get_content() == b"%PDF-1.4 data"
+
+
+def test_plain_messages_are_multipart_alternative():
+    raw = build_message(RenderedEmail("Hi", "text\n", "<p>html</p>\n"), "a@example.com")
+    assert b"Subject: Hi\r\n" in raw
+    assert _parse(raw).get_content_type() == "multipart/alternative"
+
+
+def test_line_breaks_in_headers_are_refused():
+    with pytest.raises(ValueError, match="Line break"):
+        build_message(RenderedEmail("Hi", "", ""), "a@example.com\r\nBcc: everyone@example.com")
+
+
+def test_send_helpers_queue_the_built_message(mongo, monkeypatch):
+    monkeypatch.setattr(mail_queue.MailQueue, "_ensure_workers", lambda self: None)
+    assert email_handler.send_deactivation_email("ana@example.com", "Ana", "<b>Spam</b>")
+    queued = mail_queue._outbox().find_one({"kind": "deactivation"})
+    assert queued["to"] == ["ana@example.com"] and queued["status"] == "queued"
+    html = _parse(bytes(queued["raw"])).get_body(("html",)).get_content()
+    assert "&lt;b&gt;Spam&lt;/b&gt;" in html
@@ -0,0 +1,75 @@
+# backend/authapi/tests/test_forum_search.py
+"""Forum search query building and title autocomplete (see forum_search)"""
+
+from datetime import datetime
+
+import pytest
+
+import db
+import forum_search
+
+
+def test_tokenize_normalizes_and_drops_stop_words():
+    assert forum_search.normalize("Piñas DURIAN") == "pinas durian"
+    assert forum_search.tokenize("Ano ang best na fertilizer para sa Musang King?") == ["best", "fertilizer", "musang", "king"]
+    assert forum_search.tokenize("ang mga durian", keep_stop_words=True) == ["ang", "mga", "durian"]
+
+
+@pytest.mark.parametrize("search, expected", [
+    ('"black thorn" -pest', "black thorn pest"),
+    ("durian durian DURIAN rot", "durian rot"),
+    ("the and of sa ng", None),
+    ("", None),
+])
+def test_text_query_never_passes_operators_through(search, expected):
+    query = forum_search.text_query(search)
+    assert (query and query["$text"]["$search"]) == expected
+
+
+def test_text_query_caps_the_terms():
+    query = forum_search.text_query(" ".join(f"term{i}" for i in range(30)))
+    assert len(query["$text"]["$search"].split()) == forum_search.MAX_QUERY_TERMS
+
+
+def test_search_fields_keep_every_title_word_once():
+    assert forum_search.search_fields("Ang Durian ng Davao, durian!") == {"title_terms": ["ang", "durian", "ng", "davao"]}
+
+
+@pytest.fixture
+def titled_posts(mongo):
+    for title, category in [
+        ("Musang King fertilizer schedule", "Tips"),
+        ("Musang King prices in Davao", "Market"),
+        ("Black Thorn vs Musang King", "Tips"),
+        ("Mussels are not durians", "Tips"),
+    ]:
+        db.posts_collection.insert_one({"title": title, "category": category, **forum_search.search_fields(title)})
+
+
+def test_suggest_matches_whole_words_and_a_last_prefix(titled_posts):
+    titles = {s["title"] for s in forum_search.suggest_titles("musang ki")}
+    assert titles == {"Musang King fertilizer schedule", "Musang King prices in Davao", "Black Thorn vs Musang King"}
+    assert {s["title"] for s in forum_search.suggest_titles("mus")} == titles | {"Mussels are not durians"}
+    assert [s["title"] for s in forum_search.suggest_titles("musang king", category="Market")] == ["Musang King prices in Davao"]
+    assert forum_search.suggest_titles("  ") == []
+
+
+def test_suggest_ignores_regex_syntax_in_input(titled_posts):
+    # Only alphanumeric tokens reach the $regex
+    assert forum_search.suggest_titles("^mus.*") == forum_search.suggest_titles("mus")
+    assert forum_search.suggest_titles("(k|b)") == []
+
+
+def test_search_route_returns_nothing_for_stop_words(client, mongo):
+    response = client.get("/forum/search?q=ang+the").json
+    assert response["success"] and response["posts"] == []
+
+
+def test_created_posts_carry_title_terms(client, mongo):
+    author = db.users_collection.insert_one({"name": "Author", "email": "a@example.com", "created_at": datetime.utcnow()}).inserted_id
+    response = client.post("/forum/posts", json={
+        "title": "Puyat sa Durian Harvest", "content": "Sulit", "category": "Tips", "user_id": str(author)
+    })
+    assert response.status_code == 201
+    post = db.posts_collection.find_one({"title": "Puyat sa Durian Harvest"})
+    assert post["title_terms"] == ["puyat", "sa", "durian", "harvest"]
@@ -0,0 +1,81 @@
+# backend/authapi/tests/test_image_normalizer.py
+"""Downscaling and re-encoding before upload (see handlers/image_normalizer.py)"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from handlers.image_normalizer import AVATAR_PROFILE, SCAN_PROFILE, ImageProfile, normalize_image
+
+ORIENTATION = 0x0112
+GPS_INFO = 0x8825
+
+
+def _encode(size, mode="RGB", image_format="JPEG", color=(200, 120, 40), exif=None):
+    out = BytesIO()
+    image = Image.new(mode, size, color)
+    if exif is not None:
+        image.save(out, format=image_format, exif=exif)
+    else:
+        image.save(out, format=image_format)
+    return out.getvalue()
+
+
+def _decode(normalized):
+    return Image.open(BytesIO(normalized.data))
+
+
+def test_scans_fit_inside_the_profile():
+    result = normalize_image(_encode((4000, 3000)), SCAN_PROFILE)
+    assert (result.width, result.height) == (800, 600)
+    assert (result.format, result.mime_type) == ("jpeg", "image/jpeg")
+    assert result.source_bytes > 0 and _decode(result).size == (800, 600)
+
+
+def test_avatars_cover_the_profile_on_their_short_side():
+    result = normalize_image(_encode((3000, 4000)), AVATAR_PROFILE)
+    assert (result.width, result.height) == (500, 667)
+
+
+def test_small_images_are_never_upscaled():
+    result = normalize_image(_encode((320, 240), image_format="PNG"), SCAN_PROFILE)
+    assert (result.width, result.height) == (320, 240)
+
+
+def test_exif_orientation_is_applied_and_metadata_dropped():
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[GPS_INFO] = {1: "N", 2: (7.0, 4.0, 0.0)}
+    result = normalize_image(_encode((1600, 1200), exif=exif), SCAN_PROFILE)
+    # Rotated 90 degrees, so the portrait side is now the long one
+    assert (result.width, result.height) == (600, 800)
+    decoded = _decode(result)
+    assert not decoded.getexif() and "icc_profile" not in decoded.info
+
+
+def test_transparency_is_flattened_onto_white():
+    result = normalize_image(_encode((64, 64), mode="RGBA", image_format="PNG", color=(0, 0, 0, 0)), SCAN_PROFILE)
+    assert _decode(result).convert("RGB").getpixel((32, 32)) >= (250, 250, 250)
+
+
+def test_webp_output():
+    result = normalize_image(_encode((1000, 1000)), ImageProfile("test", 100, "fit"), "webp")
+    assert (result.format, result.mime_type) == ("webp", "image/webp")
+    assert _decode(result).format == "WEBP"
+
+
+def test_unknown_formats_fall_back_to_jpeg():
+    assert normalize_image(_encode((10, 10)), SCAN_PROFILE, "avif").format == "jpeg"
+
+
+def test_decoded_images_are_left_untouched():
+    image = Image.new("RGB", (1600, 1200))
+    result = normalize_image(image, SCAN_PROFILE)
+    assert image.size == (1600, 1200)
+    assert (result.width, result.source_bytes) == (800, 0)
+
+
+def test_unreadable_input_raises():
+    with pytest.raises(UnidentifiedImageError):
+        normalize_image(b"not an image", SCAN_PROFILE)
@@ -0,0 +1,137 @@
+# backend/authapi/tests/test_image_store.py
+"""Content-addressed image store (see handlers/image_store.py)"""
+
+import hashlib
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import handlers.image_store as image_store
+from handlers.image_store import ContentStore, StoreSync
+
+
+def _jpeg(size=(120, 80), color=(200, 120, 40)):
+    out = BytesIO()
+    Image.new("RGB", size, color).save(out, format="JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def store(mongo, tmp_path):
+    return ContentStore(tmp_path, "/media/store")
+
+
+def _objects():
+    return image_store._objects()
+
+
+def test_identical_uploads_share_one_file(store):
+    data = _jpeg()
+    first = store.upload(data, "scans/user/1", {})
+    second = store.upload(BytesIO(data), "scans/user/2", {})
+    name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+    assert first["public_id"] == second["public_id"] == name
+    assert first["secure_url"] == f"/media/store/{name}"
+    assert _objects().find_one({"_id": name})["refs"] == 2
+    assert store.path(name).read_bytes() == data
+
+
+def test_eager_variants_are_generated_at_upload(store):
+    result = store.upload(_jpeg(), None, {"eager": [{"width": 40, "height": 40, "crop": "fill"}]})
+    (variant,) = result["eager"]
+    name = variant["secure_url"].rpartition("/")[2]
+    assert name.endswith("_40x40_fill.jpg")
+    path, mime_type, etag = store.resolve(name)
+    assert mime_type == "image/jpeg" and etag.endswith("-40x40-fill")
+    assert Image.open(path).size == (40, 40)
+
+
+def test_variants_never_upscale(store):
+    name = store.upload(_jpeg((120, 80)), None, {})["public_id"]
+    url = store.url(name, width=600, height=600, crop="fill")
+    with Image.open(store.resolve(url.rpartition("/")[2])[0]) as variant:
+        assert variant.size == (80, 80)
+    # The 600x300 box shrinks to 120x60, and the image fits inside it
+    url = store.url(name, width=600, height=300)
+    with Image.open(store.resolve(url.rpartition("/")[2])[0]) as variant:
+        assert variant.size == (90, 60)
+
+
+def test_boxes_over_the_cap_get_the_original(store, monkeypatch):
+    monkeypatch.setattr(image_store, "MEDIA_STORE_MAX_VARIANT_PX", 100)
+    name = store.upload(_jpeg(), None, {})["public_id"]
+    assert store.url(name, width=101, height=50) == f"/media/store/{name}"
+    assert store.ensure_variant(store.variant_name(name, 101, 50, "limit")) is None
+
+
+def test_resolve_serves_only_existing_files(store):
+    name = store.upload(_jpeg(), None, {})["public_id"]
+    path, mime_type, etag = store.resolve(name)
+    assert (mime_type, etag) == ("image/jpeg", name.partition(".")[0])
+
+    # Nobody asked for this size, so a request can't make the server render it
+    unrequested = store.variant_name(name, 64, 64, "fill")
+    assert store.resolve(unrequested) is None
+    assert not store.path(unrequested).exists()
+    for bad in ("../../etc/passwd", "not-a-hash.jpg", f"{name}/../x"):
+        assert store.resolve(bad) is None
+
+
+def test_last_destroy_removes_files_and_object(store):
+    data = _jpeg()
+    name = store.upload(data, None, {"eager": [{"width": 40, "height": 40, "crop": "fill"}]})["public_id"]
+    store.upload(data, None, {})
+
+    assert store.destroy(name)
+    assert store.path(name).exists()
+    assert store.destroy(name)
+    assert not list(store.path(name).parent.iterdir())
+    assert _objects().find_one({"_id": name}) is None
+    assert store.destroy(name) is False
+
+
+def test_uploads_wait_for_a_delete_in_flight(store, monkeypatch):
+    monkeypatch.setattr(image_store, "REFERENCE_ATTEMPTS", 3)
+    monkeypatch.setattr(image_store, "REFERENCE_RETRY_SECONDS", 0)
+    data = _jpeg()
+    name = store.upload(data, None, {})["public_id"]
+    _objects().update_one({"_id": name}, {"$set": {"refs": 0, "deleting_until": datetime.utcnow() + timedelta(minutes=1)}})
+    with pytest.raises(OSError, match="still being deleted"):
+        store.upload(data, None, {})
+    assert store.is_retryable(OSError())
+
+    # A lease left behind by a crashed delete expires
+    _objects().update_one({"_id": name}, {"$set": {"deleting_until": datetime.utcnow() - timedelta(seconds=1)}})
+    store.path(name).unlink()
+    store.upload(data, None, {})
+    doc = _objects().find_one({"_id": name})
+    assert doc["refs"] == 1 and "deleting_until" not in doc
+    assert store.path(name).read_bytes() == data
+
+
+class FlakyRemote:
+    def __init__(self):
+        self.uploaded = []
+
+    def upload(self, source, public_id, options):
+        if len(self.uploaded) == 1:
+            self.uploaded.append(None)
+            raise ConnectionError("uplink down")
+        self.uploaded.append(public_id)
+        return {"public_id": public_id, "secure_url": f"https://cdn/{public_id}"}
+
+
+def test_sync_mirrors_originals_and_counts_failures(store):
+    names = [store.upload(_jpeg(color=(i, i, i)), None, {})["public_id"] for i in range(3)]
+    sync = StoreSync(store)
+    sync._remote = FlakyRemote()
+    assert sync.sync_batch() == (2, 1)
+    assert _objects().count_documents({"synced_at": None}) == 1
+    failed = _objects().find_one({"synced_at": None})
+    assert failed["sync_attempts"] == 1 and failed["sync_error"] == "uplink down"
+
+    assert sync.sync_batch() == (1, 0)
+    mirrored = _objects().find_one({"_id": names[0]})
+    assert mirrored["cloudinary_public_id"] == f"store/{names[0].partition('.')[0]}"
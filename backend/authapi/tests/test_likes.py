@@ -0,0 +1,106 @@
+# backend/authapi/tests/test_likes.py
+"""Like toggling over the likes collection (see db.toggle_like)"""
+
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+import db
+from db_monitoring import round_trip_budget
+
+
+def _load_script(name):
+    path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def post(mongo):
+    db.ensure_indexes()
+    return db.posts_collection.insert_one({"title": "Musang King", "category": "Tips", "likes": 0}).inserted_id
+
+
+def test_toggle_flips_like_and_counter(post):
+    first, second = ObjectId(), ObjectId()
+    assert db.like_post(post, first) == {"likes": 1, "liked": True}
+    assert db.like_post(post, second) == {"likes": 2, "liked": True}
+    assert db.like_post(post, first) == {"likes": 1, "liked": False}
+    assert db.liked_targets(str(second), [post]) == {post}
+    assert db.liked_targets(str(first), [post]) == set()
+
+
+def test_round_trips_per_direction(post):
+    user = ObjectId()
+    with round_trip_budget(2) as scope:
+        db.like_post(post, user)
+    assert scope.round_trips == 2
+    with round_trip_budget(3) as scope:
+        db.like_post(post, user)
+    assert scope.round_trips == 3
+
+
+def test_missing_target_leaves_no_like(mongo):
+    db.ensure_indexes()
+    assert db.like_post(ObjectId(), ObjectId()) is None
+    assert db.likes_collection.count_documents({}) == 0
+
+
+def test_recount_repairs_a_drifted_counter(post):
+    db.like_post(post, ObjectId())
+    db.like_post(post, ObjectId())
+    # As if the process died between the like insert and the counter update
+    db.likes_collection.insert_one({"target_id": post, "target_type": "posts", "user_id": ObjectId()})
+
+    migrate_likes = _load_script("migrate_likes")
+    stats = migrate_likes.recount_collection(db.posts_collection, batch_size=10, dry_run=True)
+    assert stats == {"documents": 1, "corrected": 1}
+    assert db.posts_collection.find_one({"_id": post})["likes"] == 2
+
+    migrate_likes.recount_collection(db.posts_collection, batch_size=10, dry_run=False)
+    assert db.posts_collection.find_one({"_id": post})["likes"] == 3
+
+
+def test_migration_moves_liked_by_arrays_and_can_rerun(mongo):
+    db.ensure_indexes()
+    fans = [ObjectId() for _ in range(3)]
+    post = db.posts_collection.insert_one({"title": "Old", "likes": 99, "liked_by": fans + [fans[0]]}).inserted_id
+    comment = db.comments_collection.insert_one({"post_id": post, "likes": 0, "liked_by": fans[:1]}).inserted_id
+    # Liked after the deploy but before the migration ran
+    late = ObjectId()
+    db.likes_collection.insert_one({"target_id": post, "target_type": "posts", "user_id": late})
+
+    migrate_likes = _load_script("migrate_likes")
+    for collection in (db.posts_collection, db.comments_collection):
+        migrate_likes.migrate_collection(collection, batch_size=1, dry_run=False)
+    assert db.posts_collection.find_one({"_id": post}) == {"_id": post, "title": "Old", "likes": 4}
+    assert db.comments_collection.find_one({"_id": comment}) == {"_id": comment, "post_id": post, "likes": 1}
+    assert db.liked_targets(str(late), [post, comment]) == {post}
+    assert db.liked_targets(str(fans[0]), [post, comment]) == {post, comment}
+
+    # A re-run over an array that was already copied skips the duplicates
+    db.posts_collection.update_one({"_id": post}, {"$set": {"liked_by": fans}})
+    assert migrate_likes.migrate_collection(db.posts_collection, batch_size=10, dry_run=False)["likes"] == 3
+    assert db.posts_collection.find_one({"_id": post})["likes"] == 4
+
+
+def test_listings_mark_liked_by_me_without_shipping_likers(client, mongo):
+    db.ensure_indexes()
+    viewer = ObjectId()
+    posts = db.posts_collection.insert_many([
+        {"title": f"Post {i}", "category": "Tips", "likes": 0, "created_at": datetime.utcnow()} for i in range(3)
+    ]).inserted_ids
+    db.like_post(posts[1], viewer)
+
+    listed = client.get(f"/forum/posts?user_id={viewer}").json["posts"]
+    assert {post["_id"]: post["liked_by_me"] for post in listed} == {
+        str(posts[0]): False, str(posts[1]): True, str(posts[2]): False
+    }
+    assert all("liked_by" not in post for post in listed)
+    anonymous = client.get("/forum/posts").json["posts"]
+    assert not any(post["liked_by_me"] for post in anonymous)
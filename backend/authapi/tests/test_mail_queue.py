@@ -0,0 +1,161 @@
+# backend/authapi/tests/test_mail_queue.py
+"""Outbound mail queue: failure classification, retries and pooled delivery (see handlers/mail_queue.py)"""
+
+import smtplib
+from datetime import datetime, timedelta
+
+import pytest
+
+import handlers.mail_queue as mail_queue
+from handlers.mail_queue import MailQueue, _is_permanent, queue_email
+
+
+class FakeSmtp:
+    """An SMTP connection that replays scripted sendmail outcomes"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def sendmail(self, from_addr, to_addrs, raw):
+        outcome = self.server.outcomes.pop(0) if self.server.outcomes else None
+        if outcome is not None:
+            raise outcome
+        self.server.delivered.append((from_addr, tuple(to_addrs), raw))
+
+    def rset(self):
+        self.server.resets += 1
+
+    def quit(self):
+        self.server.closed += 1
+
+    close = quit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+
+class FakeServer:
+    def __init__(self):
+        self.outcomes = []
+        self.delivered = []
+        self.connections = 0
+        self.resets = 0
+        self.closed = 0
+        self.refuse_login = None
+
+    def connect(self):
+        if self.refuse_login:
+            raise self.refuse_login
+        self.connections += 1
+        return FakeSmtp(self)
+
+
+@pytest.fixture
+def smtp(mongo, monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(mail_queue, "open_smtp_connection", server.connect)
+    # Tests deliver by hand
+    monkeypatch.setattr(MailQueue, "_ensure_workers", lambda self: None)
+    return server
+
+
+def _outbox():
+    return mail_queue._outbox()
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"a@x.test": (550, b"no such user"), "b@x.test": (553, b"bad")}), True),
+    # Greylisting one recipient is worth a retry
+    (smtplib.SMTPRecipientsRefused({"a@x.test": (550, b"no such user"), "b@x.test": (450, b"try later")}), False),
+    (smtplib.SMTPRecipientsRefused({}), False),
+    (smtplib.SMTPSenderRefused(451, b"try later", "noreply@x.test"), False),
+    (smtplib.SMTPSenderRefused(553, b"not allowed", "noreply@x.test"), True),
+    (smtplib.SMTPDataError(554, b"spam"), True),
+    (smtplib.SMTPDataError(421, b"busy"), False),
+    (smtplib.SMTPServerDisconnected("gone"), False),
+    (ConnectionResetError(), False),
+])
+def test_permanent_failures_are_5xx_only(error, permanent):
+    assert _is_permanent(error) is permanent
+
+
+def test_queued_messages_go_out_on_one_connection(smtp):
+    for i in range(3):
+        assert queue_email(f"Subject: {i}\r\n\r\nbody".encode(), f"user{i}@x.test", "test", "noreply@x.test")
+    assert MailQueue().process_batch() == 3
+    assert [to for _, to, _ in smtp.delivered] == [("user0@x.test",), ("user1@x.test",), ("user2@x.test",)]
+    assert smtp.connections == 1 and smtp.closed == 1
+    sent = _outbox().find_one({"to": "user0@x.test"})
+    assert sent["status"] == "sent" and sent["attempts"] == 1 and "raw" not in sent
+
+
+def test_temporary_rejections_back_off_and_permanent_ones_die(smtp, monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_MAX_ATTEMPTS", 2)
+    queue_email(b"greylisted", "grey@x.test", "test", "noreply@x.test")
+    queue_email(b"bounced", "gone@x.test", "test", "noreply@x.test")
+    queue_email(b"fine", "ok@x.test", "test", "noreply@x.test")
+    smtp.outcomes = [
+        smtplib.SMTPRecipientsRefused({"grey@x.test": (450, b"greylisted")}),
+        smtplib.SMTPRecipientsRefused({"gone@x.test": (550, b"no such user")}),
+    ]
+    queue = MailQueue()
+    queue.process_batch()
+
+    grey = _outbox().find_one({"to": "grey@x.test"})
+    assert grey["status"] == "queued" and grey["attempts"] == 1
+    assert grey["due_at"] > datetime.utcnow() + timedelta(seconds=20)
+    assert _outbox().find_one({"to": "gone@x.test"})["status"] == "dead"
+    # A rejected message doesn't cost the connection
+    assert smtp.resets == 2 and smtp.connections == 1 and len(smtp.delivered) == 1
+    assert queue.process_batch() == 0
+
+    _outbox().update_one({"_id": grey["_id"]}, {"$set": {"due_at": datetime.utcnow()}})
+    smtp.outcomes = [smtplib.SMTPRecipientsRefused({"grey@x.test": (450, b"greylisted")})]
+    queue.process_batch()
+    assert _outbox().find_one({"_id": grey["_id"]})["status"] == "dead"
+    snapshot = queue.snapshot()
+    assert (snapshot["sent"], snapshot["retried"], snapshot["dead"]) == (1, 1, 2)
+
+
+def test_login_failures_never_kill_messages(smtp):
+    queue_email(b"one", "a@x.test", "test", "noreply@x.test")
+    queue_email(b"two", "b@x.test", "test", "noreply@x.test")
+    smtp.refuse_login = smtplib.SMTPAuthenticationError(535, b"bad credentials")
+    MailQueue().process_batch()
+    assert [doc["status"] for doc in _outbox().find()] == ["queued", "queued"]
+    assert all(doc["attempts"] == 1 for doc in _outbox().find())
+
+
+def test_dropped_connections_are_reopened(smtp, monkeypatch):
+    monkeypatch.setattr(mail_queue, "MAIL_MAX_PER_CONNECTION", 2)
+    for i in range(4):
+        queue_email(b"body", f"user{i}@x.test", "test", "noreply@x.test")
+    smtp.outcomes = [None, smtplib.SMTPServerDisconnected("gone")]
+    MailQueue().process_batch()
+    # user1 lost the connection; user2 and user3 reached the per-connection cap on a new one
+    assert [to[0] for _, to, _ in smtp.delivered] == ["user0@x.test", "user2@x.test", "user3@x.test"]
+    assert smtp.connections == 2
+    assert _outbox().find_one({"to": "user1@x.test"})["status"] == "queued"
+
+
+def test_claims_are_leased(smtp):
+    for i in range(3):
+        queue_email(b"body", f"user{i}@x.test", "test", "noreply@x.test")
+    first, second = MailQueue(batch_size=2), MailQueue(batch_size=2)
+    assert len(first._claim()) == 2
+    assert [doc["to"] for doc in second._claim()] == [["user2@x.test"]]
+    assert second._claim() == []
+
+
+def test_outbox_outage_sends_inline(smtp, monkeypatch):
+    def unavailable():
+        raise RuntimeError("no primary")
+
+    monkeypatch.setattr(mail_queue, "_outbox", unavailable)
+    assert queue_email(b"body", "a@x.test", "test", "noreply@x.test")
+    assert smtp.delivered == [("noreply@x.test", ("a@x.test",), b"body")]
+    smtp.refuse_login = smtplib.SMTPConnectError(421, b"down")
+    assert not queue_email(b"body", "a@x.test", "test", "noreply@x.test")
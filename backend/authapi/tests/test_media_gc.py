@@ -0,0 +1,126 @@
+# backend/authapi/tests/test_media_gc.py
+"""Queued media deletion and orphan reconciliation (see handlers/media_gc.py)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import db
+import handlers.media_gc as media_gc
+import handlers.media_service as media_service
+from handlers.media_gc import MediaCollector, schedule_deletion
+from handlers.media_service import MediaService
+
+
+class FakeCdn:
+    name = "fake"
+
+    def __init__(self):
+        self.bulk_calls = []
+        self.failing = set()
+        self.assets = []
+
+    def destroy_many(self, public_ids):
+        self.bulk_calls.append(list(public_ids))
+        return {public_id: public_id not in self.failing for public_id in public_ids}
+
+    def list_assets(self, prefix):
+        return [(public_id, created) for public_id, created in self.assets if public_id.startswith(prefix)]
+
+
+@pytest.fixture
+def cdn(mongo, monkeypatch):
+    cdn = FakeCdn()
+    monkeypatch.setattr(media_service, "media_service", MediaService(cdn, workers=1))
+    # Tests drain by hand
+    monkeypatch.setattr(MediaCollector, "start", lambda self: None)
+    return cdn
+
+
+def test_queued_ids_are_deleted_in_one_bulk_call(cdn):
+    assert schedule_deletion(["scans/a", "scans/b", None, ""]) == 2
+    assert schedule_deletion("users/c", reason="avatar replaced") == 1
+    assert MediaCollector().drain() == (3, 0)
+    assert cdn.bulk_calls == [["scans/a", "scans/b", "users/c"]]
+    assert media_gc._deletions().count_documents({}) == 0
+
+
+def test_failures_back_off_then_give_up(cdn, monkeypatch):
+    monkeypatch.setattr(media_gc, "MEDIA_GC_MAX_ATTEMPTS", 2)
+    cdn.failing.add("scans/stuck")
+    schedule_deletion("scans/stuck")
+    collector = MediaCollector()
+
+    assert collector.drain() == (0, 1)
+    job = media_gc._deletions().find_one()
+    assert job["attempts"] == 1 and job["due_at"] > datetime.utcnow() + timedelta(seconds=30)
+    assert collector.drain() == (0, 0)
+
+    media_gc._deletions().update_one({}, {"$set": {"due_at": datetime.utcnow()}})
+    assert collector.drain() == (0, 1)
+    job = media_gc._deletions().find_one()
+    assert job["failed_at"] and job["attempts"] == 2
+    assert collector.drain() == (0, 0)
+
+
+def test_claimed_jobs_are_leased_to_one_worker(cdn):
+    schedule_deletion(["scans/a", "scans/b"])
+    first, second = MediaCollector(), MediaCollector()
+    assert {job["public_id"] for job in first._claim()} == {"scans/a", "scans/b"}
+    assert second._claim() == []
+
+
+def test_queue_outage_deletes_inline(cdn, monkeypatch):
+    def unavailable():
+        raise RuntimeError("no primary")
+
+    monkeypatch.setattr(media_gc, "_deletions", unavailable)
+    assert schedule_deletion(["scans/a"]) == 0
+    assert cdn.bulk_calls == [["scans/a"]]
+
+
+def test_orphans_are_unreferenced_and_past_the_grace_period(cdn):
+    owner = ObjectId()
+    old, recent = datetime.utcnow() - timedelta(days=3), datetime.utcnow()
+    db.scans_collection.insert_one({"user_id": owner, "cloudinary_public_id": f"scans/{owner}/kept", "created_at": old})
+    db.users_collection.insert_one({"_id": owner, "name": "Farmer", "photoPublicId": f"users/{owner}/avatar"})
+    db._invalidate_scan_sources()
+    cdn.assets = [
+        (f"scans/{owner}/kept", old), (f"scans/{owner}/lost", old), (f"scans/{owner}/uploading", recent),
+        (f"users/{owner}/avatar", old), (f"users/{owner}/old-avatar", old), ("users/legacy-name", old),
+    ]
+    assert sorted(MediaCollector().find_orphans()) == [
+        f"scans/{owner}/lost", f"users/{owner}/old-avatar", "users/legacy-name"
+    ]
+
+
+def test_reconcile_queues_orphans(cdn):
+    cdn.assets = [("scans/orphan", datetime.utcnow() - timedelta(days=3))]
+    db._invalidate_scan_sources()
+    assert MediaCollector().reconcile(dry_run=True) == {"orphans": 1, "deactivated": 0}
+    assert media_gc._deletions().count_documents({}) == 0
+    assert MediaCollector().reconcile() == {"orphans": 1, "deactivated": 0}
+    assert media_gc._deletions().find_one()["reason"] == "orphan"
+
+
+def test_stale_deactivated_users_fall_back_to_the_generated_avatar(cdn):
+    long_ago = (datetime.utcnow() - timedelta(days=90)).isoformat()
+    gone = db.users_collection.insert_one({
+        "name": "Gone", "isActive": False, "deactivatedAt": long_ago, "photoPublicId": "users/x/gone"
+    }).inserted_id
+    db.users_collection.insert_one({
+        "name": "Recent", "isActive": False, "deactivatedAt": datetime.utcnow().isoformat(), "photoPublicId": "users/x/recent"
+    })
+
+    assert MediaCollector().reclaim_deactivated(days=0) == 0
+    assert MediaCollector().reclaim_deactivated(days=30) == 1
+    user = db.users_collection.find_one({"_id": gone})
+    assert "photoPublicId" not in user and user["photoProfile"].startswith("https://ui-avatars.com/")
+    assert [(job["public_id"], job["reason"]) for job in media_gc._deletions().find()] == [("users/x/gone", "deactivated")]
+
+
+def test_reconciliation_runs_once_per_period(mongo):
+    media_gc._state().delete_many({})
+    assert MediaCollector()._reconcile_due()
+    assert not MediaCollector()._reconcile_due()
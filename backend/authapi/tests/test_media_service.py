@@ -0,0 +1,131 @@
+# backend/authapi/tests/test_media_service.py
+"""Retries, circuit breaker and upload pool of the media service (see handlers/media_service.py)"""
+
+import threading
+from io import BytesIO
+
+import pytest
+
+import handlers.media_service as media_service
+from handlers.media_service import LocalBackend, MediaService, MediaUnavailable, RetryableMediaError
+
+
+class ScriptedBackend:
+    """Raises the scripted errors in order, then uploads"""
+
+    name = "scripted"
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.received = []
+
+    def upload(self, source, public_id, options):
+        self.received.append(source.read() if hasattr(source, "read") else source)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"public_id": public_id or "generated", "secure_url": f"https://cdn/{public_id}", "bytes": 3,
+                "eager": [{"width": 300, "secure_url": "https://cdn/thumb-300"}]}
+
+    def url(self, public_id, **transformation):
+        return f"https://cdn/{public_id}?w={transformation.get('width')}"
+
+    def destroy(self, public_id):
+        if public_id == "stuck":
+            raise ConnectionError("reset")
+        return True
+
+    @staticmethod
+    def is_retryable(error):
+        return isinstance(error, (RetryableMediaError, ConnectionError))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(media_service, "MEDIA_RETRY_BASE_SECONDS", 0)
+
+
+def test_transient_failures_are_retried():
+    backend = ScriptedBackend(RetryableMediaError("503"), ConnectionError("reset"))
+    service = MediaService(backend, workers=1)
+    result = service.upload(BytesIO(b"img"), "avatars/1", thumbnail={"width": 300})
+    assert result["url"] == "https://cdn/avatars/1"
+    assert result["thumbnail_url"] == "https://cdn/thumb-300"
+    # A file object is rewound before every attempt
+    assert backend.received == [b"img"] * 3
+    snapshot = service.snapshot()
+    assert (snapshot["uploads"], snapshot["retries"], snapshot["failures"]) == (1, 2, 2)
+
+
+def test_attempts_are_bounded(monkeypatch):
+    monkeypatch.setattr(media_service, "MEDIA_UPLOAD_ATTEMPTS", 2)
+    backend = ScriptedBackend(*[RetryableMediaError("503")] * 3)
+    with pytest.raises(RetryableMediaError):
+        MediaService(backend, workers=1).upload(b"img")
+    assert len(backend.received) == 2
+
+
+def test_bad_requests_fail_at_once_and_keep_the_circuit_closed(monkeypatch):
+    monkeypatch.setattr(media_service, "MEDIA_BREAKER_THRESHOLD", 1)
+    backend = ScriptedBackend(ValueError("Invalid image file"))
+    service = MediaService(backend, workers=1)
+    with pytest.raises(ValueError):
+        service.upload(b"img")
+    assert len(backend.received) == 1
+    assert not service.snapshot()["circuit_open"]
+    assert service.upload(b"img")["public_id"] == "generated"
+
+
+def test_circuit_opens_then_lets_one_trial_through(monkeypatch):
+    monkeypatch.setattr(media_service, "MEDIA_UPLOAD_ATTEMPTS", 1)
+    monkeypatch.setattr(media_service, "MEDIA_BREAKER_THRESHOLD", 2)
+    backend = ScriptedBackend(RetryableMediaError("503"), RetryableMediaError("503"))
+    service = MediaService(backend, workers=1)
+    for _ in range(2):
+        with pytest.raises(RetryableMediaError):
+            service.upload(b"img")
+
+    with pytest.raises(MediaUnavailable):
+        service.upload(b"img")
+    assert len(backend.received) == 2 and service.snapshot()["rejected"] == 1
+
+    service._open_until = 0.0
+    assert service.upload(b"img")["public_id"] == "generated"
+    assert not service.snapshot()["circuit_open"]
+
+
+def test_saturated_pool_rejects_instead_of_queueing():
+    release = threading.Event()
+
+    class SlowBackend(ScriptedBackend):
+        def upload(self, source, public_id, options):
+            release.wait(5)
+            return super().upload(source, public_id, options)
+
+    service = MediaService(SlowBackend(), workers=1, max_pending=1)
+    pending = service.submit(b"img")
+    with pytest.raises(MediaUnavailable, match="Too many uploads"):
+        service.submit(b"img")
+    release.set()
+    assert pending.result(5)["public_id"] == "generated"
+    assert service.submit(b"img").result(5)["public_id"] == "generated"
+
+
+def test_thumbnail_url_falls_back_to_a_transformation():
+    service = MediaService(ScriptedBackend(), workers=1)
+    assert service.upload(b"img", "scans/1", thumbnail={"width": 150})["thumbnail_url"] == "https://cdn/scans/1?w=150"
+
+
+def test_destroy_many_without_a_bulk_call():
+    service = MediaService(ScriptedBackend(), workers=1)
+    assert service.destroy_many(["a", "stuck", "b"]) == {"a": True, "stuck": False, "b": True}
+    assert service.snapshot()["destroys"] == 2
+
+
+def test_local_backend_stays_under_its_root(tmp_path):
+    backend = LocalBackend(tmp_path, "/media/local")
+    result = backend.upload(b"img", "avatars/1", {})
+    assert (tmp_path / "avatars" / "1").read_bytes() == b"img"
+    assert result["secure_url"] == "/media/local/avatars/1"
+    with pytest.raises(ValueError, match="Invalid public id"):
+        backend.upload(b"img", "../escape", {})
+    assert backend.destroy("avatars/1") and not backend.destroy("avatars/1")
@@ -0,0 +1,91 @@
+# backend/authapi/tests/test_pagination.py
+"""Keyset cursor pagination (see db.paginate)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+import db
+
+
+def _pages(collection, query=None, **kwargs):
+    """Every page's items, following next_cursor"""
+    pages, cursor = [], None
+    while True:
+        page = db.paginate(collection, query or {}, cursor=cursor, **kwargs)
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trips_the_position():
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30, 15, 250000)}
+    cursor = db.encode_cursor(doc)
+    assert "=" not in cursor
+    assert db.decode_cursor(cursor) == {"value": doc["created_at"], "_id": doc["_id"]}
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10", db.encode_cursor({"_id": ObjectId(), "nameLower": "a"}, "nameLower")])
+def test_malformed_or_foreign_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        db.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("direction", [DESCENDING, ASCENDING])
+def test_pages_have_no_gaps_or_repeats_across_equal_sort_keys(mongo, direction):
+    # Groups of five posts share a timestamp, so _id has to break the ties
+    start = datetime(2024, 1, 1)
+    db.posts_collection.insert_many([{"created_at": start + timedelta(minutes=i // 5), "n": i} for i in range(23)])
+    pages = _pages(db.posts_collection, limit=4, direction=direction)
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 3]
+    seen = [post["n"] for page in pages for post in page]
+    assert sorted(seen) == list(range(23))
+    expected = sorted(db.posts_collection.find(), key=lambda post: (post["created_at"], post["_id"]), reverse=direction == DESCENDING)
+    assert seen == [post["n"] for post in expected]
+
+
+def test_nullable_sort_keeps_documents_without_the_field(mongo):
+    db.users_collection.insert_many(
+        [{"name": f"user{i}", "createdAt": datetime(2024, 1, 1) + timedelta(days=i)} for i in range(5)]
+        + [{"name": f"legacy{i}"} for i in range(3)]
+    )
+    for direction in (DESCENDING, ASCENDING):
+        pages = _pages(db.users_collection, limit=3, direction=direction, sort_field="createdAt", nullable=True)
+        assert sorted(user["name"] for page in pages for user in page) == sorted(
+            [f"user{i}" for i in range(5)] + [f"legacy{i}" for i in range(3)]
+        )
+
+
+def test_inclusion_projection_keeps_the_sort_key(mongo):
+    db.posts_collection.insert_many([{"created_at": datetime(2024, 1, 1) + timedelta(minutes=i), "title": str(i)} for i in range(3)])
+    page = db.paginate(db.posts_collection, {}, limit=2, projection={"title": 1})
+    assert page["next_cursor"] and "created_at" in page["items"][0]
+
+
+def test_user_scans_page_follows_the_cursor(mongo):
+    user_id = ObjectId()
+    db.scans_collection.insert_many([
+        {"user_id": user_id, "created_at": datetime(2024, 1, 1) + timedelta(hours=i), "variety": "D24"} for i in range(7)
+    ])
+    first = db.get_user_scans_page(str(user_id), limit=5)
+    second = db.get_user_scans_page(str(user_id), limit=5, cursor=first["next_cursor"])
+    assert len(first["scans"]) == 5 and len(second["scans"]) == 2 and second["next_cursor"] is None
+    times = [scan["created_at"] for scan in first["scans"] + second["scans"]]
+    assert times == sorted(times, reverse=True)
+
+
+@pytest.mark.parametrize("user_id, cursor, message", [
+    ("not-an-id", None, "Invalid user id"),
+    (str(ObjectId()), "garbage", "Invalid cursor"),
+])
+def test_user_scans_page_rejects_bad_input(mongo, user_id, cursor, message):
+    with pytest.raises(ValueError, match=message):
+        db.get_user_scans_page(user_id, cursor=cursor)
+
+
+def test_comments_route_rejects_bad_ids_and_cursors(client, mongo):
+    assert client.get("/forum/posts/not-an-id/comments").status_code == 400
+    assert client.get(f"/forum/posts/{ObjectId()}/comments?cursor=garbage").status_code == 400
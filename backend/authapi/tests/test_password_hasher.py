@@ -0,0 +1,74 @@
+# backend/authapi/tests/test_password_hasher.py
+"""Password hashing pool (see password_hasher)"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import password_hasher
+from password_hasher import PasswordHashingBusy, build_context
+
+
+@pytest.fixture
+def main_script(tmp_path, monkeypatch):
+    """Pose as `python app.py`: a main script that leaves a marker whenever it runs"""
+    marker = tmp_path / "ran"
+    script = tmp_path / "app.py"
+    script.write_text(f"open({str(marker)!r}, 'a').write('ran')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(script)
+    main.__spec__ = None
+    monkeypatch.setitem(sys.modules, "__main__", main)
+    return marker
+
+
+def _start_one(context):
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(os.getpid).result()
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+def test_pool_processes_do_not_rerun_the_main_script(main_script, start_method):
+    assert _start_one(password_hasher.pool_context(start_method)) != os.getpid()
+    assert not main_script.exists()
+    assert sys.modules["__main__"].__file__.endswith("app.py")
+
+
+def test_plain_spawn_reruns_the_main_script(main_script):
+    # What pool_context() prevents
+    _start_one(multiprocessing.get_context("spawn"))
+    assert main_script.read_text() == "ran"
+
+
+def test_saturated_pool_raises_busy(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(password_hasher, "HASH_WORKERS", 1)
+    monkeypatch.setattr(password_hasher, "QUEUE_TIMEOUT", 0.01)
+    monkeypatch.setattr(password_hasher, "_slots", slots)
+    with pytest.raises(PasswordHashingBusy):
+        password_hasher.hash_password("durian")
+
+
+def test_verify_and_update_upgrades_old_hashes(monkeypatch):
+    monkeypatch.setattr(password_hasher, "HASH_WORKERS", 0)
+    monkeypatch.setattr(password_hasher, "pwd_context", build_context(1, 1024, 1))
+    current = password_hasher.hash_password("durian")
+    assert password_hasher.verify_and_update("durian", current) == (True, None)
+    assert password_hasher.verify_and_update("musang", current) == (False, None)
+
+    # Stored as-is by very old accounts
+    matches, new_hash = password_hasher.verify_and_update("durian", "durian")
+    assert matches and new_hash.startswith("$argon2")
+    assert password_hasher.verify_and_update("musang", "durian") == (False, None)
+
+    # Made with other parameters
+    stronger = build_context(2, 2048, 1)
+    monkeypatch.setattr(password_hasher, "pwd_context", stronger)
+    matches, new_hash = password_hasher.verify_and_update("durian", current)
+    assert matches and stronger.identify(new_hash) == "argon2" and new_hash != current
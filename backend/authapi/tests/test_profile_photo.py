@@ -0,0 +1,84 @@
+# backend/authapi/tests/test_profile_photo.py
+"""Profile photo updates through the avatar pipeline (see profile_routes)"""
+
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+
+import db
+from handlers.avatar_pipeline import AvatarJob, AvatarPipeline
+
+
+class _QueuedPipeline:
+    """Takes jobs like AvatarPipeline.submit but leaves processing to the test"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, user_id, username, image_data):
+        job = AvatarJob(db.parse_object_id(user_id), username, image_data, datetime.utcnow())
+        self.jobs.append(job)
+        return job.submitted_at
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    import routes.profile_routes as profile_routes
+
+    queued = _QueuedPipeline()
+    monkeypatch.setattr(profile_routes, "get_avatar_pipeline", lambda: queued)
+    return queued
+
+
+@pytest.fixture
+def profile_client(mongo):
+    from flask import Flask
+
+    from routes.profile_routes import profile_bp
+
+    app = Flask(__name__)
+    app.testing = True
+    app.register_blueprint(profile_bp, url_prefix="/profile")
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id(mongo):
+    return str(db.users_collection.insert_one({
+        "name": "Grower", "email": "grower@example.com", "photoProfile": "https://cdn.example.com/old.jpg"
+    }).inserted_id)
+
+
+def test_put_still_sets_photo_fields(profile_client, user_id):
+    response = profile_client.put(f"/profile/{user_id}", json={
+        "name": "Grower", "photoProfile": "https://cdn.example.com/new.jpg", "photoPublicId": "profile_pics/new"
+    })
+    assert response.json["success"]
+    profile = profile_client.get(f"/profile/{user_id}").json
+    assert profile["photoProfile"] == "https://cdn.example.com/new.jpg"
+    assert profile["photoPublicId"] == "profile_pics/new"
+
+
+def test_upload_is_pending_until_the_pipeline_applies_it(profile_client, pipeline, user_id):
+    response = profile_client.post("/profile/update-pfp", data={
+        "userId": user_id, "photo": (BytesIO(b"jpeg bytes"), "me.jpg")
+    }, content_type="multipart/form-data")
+    assert response.status_code == 202
+    accepted = response.json
+    assert accepted["photoPending"] and accepted["photoProfile"] == "https://cdn.example.com/old.jpg"
+
+    profile = profile_client.get(f"/profile/{user_id}").json
+    assert profile["photoUpdatedAt"] is None
+
+    (job,) = pipeline.jobs
+    AvatarPipeline()._apply(job, {
+        "photoProfile": "https://cdn.example.com/new.jpg",
+        "photoThumbnail": "https://cdn.example.com/new_thumb.jpg",
+        "photoPublicId": "profile_pics/new"
+    })
+    profile = profile_client.get(f"/profile/{user_id}").json
+    # The client's check: fixed-width ISO strings compare in time order
+    assert profile["photoUpdatedAt"] >= accepted["photoSubmittedAt"]
+    assert profile["photoProfile"] == "https://cdn.example.com/new.jpg"
+    assert not profile["photoPending"]
@@ -0,0 +1,93 @@
+# backend/authapi/tests/test_query_registry.py
+"""Registered query shapes and the explain audit over them (see query_registry)"""
+
+import importlib
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+import query_registry
+from query_registry import Param, register_query_shape, resolve
+
+
+def _load_script(name):
+    path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def audit():
+    return _load_script("explain_audit")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(query_registry, "QUERY_SHAPES", {})
+    return query_registry.QUERY_SHAPES
+
+
+def test_shapes_record_where_they_were_registered(registry):
+    register_query_shape("posts.by_author", "posts", {"user_id": Param("user_id")}, sort=[("created_at", -1)], limit=20)
+    shape = registry["posts.by_author"]
+    assert (shape.collection, shape.limit, shape.allow, shape.source) == ("posts", 20, (), __name__)
+
+
+def test_duplicate_names_and_unknown_flags_are_rejected(registry):
+    register_query_shape("posts.all", "posts")
+    with pytest.raises(ValueError, match="registered twice"):
+        register_query_shape("posts.all", "posts")
+    with pytest.raises(ValueError, match="Unknown audit flags"):
+        register_query_shape("posts.slow", "posts", allow=("SLOW",))
+
+
+def test_resolve_fills_nested_params():
+    user_id = ObjectId()
+    shape = {"$and": [{"user_id": Param("user_id")}, {"created_at": {"$lt": Param("now")}}], "status": "Good"}
+    now = datetime(2024, 5, 1)
+    assert resolve(shape, {"user_id": user_id, "now": now}) == {
+        "$and": [{"user_id": user_id}, {"created_at": {"$lt": now}}], "status": "Good"
+    }
+    with pytest.raises(KeyError, match="No sample value for parameter: now"):
+        resolve(shape, {"user_id": user_id})
+
+
+def test_every_registered_shape_has_sample_values(audit, mongo):
+    for module in audit.AUDITED_MODULES:
+        importlib.import_module(module)
+    params = audit.sample_params()
+    assert query_registry.QUERY_SHAPES
+    for shape in query_registry.QUERY_SHAPES.values():
+        command = audit._command(audit.db.db[shape.collection], shape, params)
+        assert ("aggregate" in command) == (shape.pipeline is not None), shape.name
+
+
+def _explain(stages, returned, examined):
+    plan = {"stage": stages[0]}
+    node = plan
+    for stage in stages[1:]:
+        node["inputStage"] = {"stage": stage}
+        node = node["inputStage"]
+    return {
+        "queryPlanner": {"winningPlan": plan, "rejectedPlans": [{"stage": "COLLSCAN"}]},
+        "executionStats": {"nReturned": returned, "totalDocsExamined": examined, "totalKeysExamined": examined},
+    }
+
+
+@pytest.mark.parametrize("stages, returned, examined, flags", [
+    (["LIMIT", "FETCH", "IXSCAN"], 20, 20, []),
+    (["COLLSCAN"], 20, 20, ["COLLSCAN"]),
+    (["SORT", "FETCH", "IXSCAN"], 20, 20, ["SORT"]),
+    (["FETCH", "IXSCAN"], 2, 500, ["RATIO"]),
+    # Too few documents examined to judge the ratio
+    (["FETCH", "IXSCAN"], 0, 40, []),
+])
+def test_analyze_flags_only_the_winning_plan(audit, stages, returned, examined, flags):
+    result = audit.analyze(_explain(stages, returned, examined), ratio=10, min_examined=50)
+    assert result["flags"] == flags
+    assert result["plan"] == ">".join(stages)
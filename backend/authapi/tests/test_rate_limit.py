@@ -0,0 +1,128 @@
+# backend/authapi/tests/test_rate_limit.py
+"""Token-bucket rate limiting (see rate_limit)"""
+
+import pytest
+from flask import Flask, jsonify
+from pymongo.errors import ServerSelectionTimeoutError
+
+import rate_limit
+from rate_limit import LocalBucketStore, MongoBucketStore, parse_limit
+
+
+@pytest.mark.parametrize("text, capacity, period", [
+    ("5/minute", 5, 60),
+    ("100 / hour", 100, 3600),
+    ("10/30s", 10, 30),
+    ("3/2minute", 3, 120),
+])
+def test_parse_limit(text, capacity, period):
+    limit = parse_limit(text)
+    assert limit.capacity == capacity
+    assert limit.rate == pytest.approx(capacity / period)
+
+
+@pytest.mark.parametrize("text", [None, "", "off", " OFF "])
+def test_parse_limit_off(text):
+    assert parse_limit(text) is None
+
+
+@pytest.mark.parametrize("text", ["5", "five/minute", "5/fortnight"])
+def test_parse_limit_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        parse_limit(text)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_empties_and_refills(clock):
+    store, limit = LocalBucketStore(), parse_limit("2/minute")
+    assert [store.take("k", limit) for _ in range(2)] == [0.0, 0.0]
+    assert store.take("k", limit) == pytest.approx(30)
+    clock.now += 30
+    assert store.take("k", limit) == 0.0
+    assert store.take("other", limit) == 0.0
+
+
+def test_full_buckets_are_evicted(clock):
+    store, limit = LocalBucketStore(), parse_limit("2/minute")
+    store.take("idle", limit)
+    clock.now += 45
+    store.take("busy", limit)
+    store.take("busy", limit)
+    clock.now += rate_limit.EVICT_INTERVAL_SECONDS - 45
+    store.take("new", limit)
+    # "idle" refilled after 30s; "busy" needs a minute from its last take
+    assert len(store) == 2
+
+
+def test_shared_buckets_limit_across_stores(mongo):
+    limit = parse_limit("2/minute")
+    first, second = MongoBucketStore(LocalBucketStore()), MongoBucketStore(LocalBucketStore())
+    assert first.take("k", limit) == 0.0
+    assert second.take("k", limit) == 0.0
+    assert first.take("k", limit) == pytest.approx(30, abs=0.1)
+
+
+def test_shared_buckets_fall_back_to_local(monkeypatch):
+    fallback = LocalBucketStore()
+    store = MongoBucketStore(fallback)
+
+    def unreachable():
+        raise ServerSelectionTimeoutError("no primary")
+
+    monkeypatch.setattr(store, "_get_collection", unreachable)
+    limit = parse_limit("1/minute")
+    assert store.take("k", limit) == 0.0
+    assert store.take("k", limit) > 0
+    assert len(fallback) == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_TEST_EMAIL", "1/minute")
+    rate_limit.set_store(LocalBucketStore())
+    app = Flask(__name__)
+
+    @app.route("/login", methods=["POST", "OPTIONS"])
+    @rate_limit.rate_limit("test", per_ip="3/minute", per_email="5/minute")
+    def login():
+        return jsonify({"success": True})
+
+    yield app.test_client()
+    rate_limit.set_store(rate_limit._local_store)
+
+
+def test_view_is_limited_per_email_and_ip(client):
+    assert client.post("/login", json={"email": "Farmer@Example.com"}).status_code == 200
+    # The environment lowered the email limit to 1/minute, case-insensitively
+    response = client.post("/login", json={"email": " farmer@example.com"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert response.json == {"success": False, "error": "Too many requests, please retry later"}
+
+    # A limited request still took an IP token, so the third address is the last one in
+    assert client.post("/login", json={"email": "other@example.com"}).status_code == 200
+    assert client.post("/login", json={"email": "third@example.com"}).status_code == 429
+    assert client.open("/login", method="OPTIONS").status_code == 200
+
+
+def test_forwarded_for_is_ignored_unless_trusted(client, monkeypatch):
+    for _ in range(3):
+        client.post("/login", headers={"X-Forwarded-For": "203.0.113.9"})
+    assert client.post("/login", headers={"X-Forwarded-For": "198.51.100.7"}).status_code == 429
+
+    monkeypatch.setattr(rate_limit, "TRUST_PROXY", True)
+    assert client.post("/login", headers={"X-Forwarded-For": "198.51.100.7"}).status_code == 200
@@ -0,0 +1,65 @@
+# backend/authapi/tests/test_read_routing.py
+"""OLTP/ANALYTICS read routing (see db.for_workload)"""
+
+import pytest
+from bson import ObjectId
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import db
+
+
+@pytest.mark.parametrize("mode, staleness, expected", [
+    ("primary", 120, Primary()),
+    ("secondaryPreferred", 120, SecondaryPreferred(max_staleness=120)),
+    # Below MongoDB's minimum is raised to it; -1 means unbounded
+    ("secondaryPreferred", 30, SecondaryPreferred(max_staleness=90)),
+    ("secondaryPreferred", -1, SecondaryPreferred()),
+])
+def test_read_preference_from_settings(mode, staleness, expected):
+    assert db._read_preference(mode, staleness) == expected
+
+
+def test_unknown_read_preference_is_rejected():
+    with pytest.raises(ValueError, match="Unknown read preference"):
+        db._read_preference("fastest", 120)
+
+
+@pytest.fixture
+def handles(monkeypatch):
+    """with_options calls, recorded instead of the conftest pass-through"""
+    calls = []
+
+    def with_options(collection, **options):
+        calls.append((collection.name, options))
+        return collection
+
+    monkeypatch.setattr(db.posts_collection, "with_options", lambda **options: with_options(db.posts_collection, **options))
+    monkeypatch.setattr(db, "_workload_handles", {})
+    return calls
+
+
+def test_oltp_reads_use_the_collection_itself(handles):
+    assert db.for_workload(db.posts_collection) is db.posts_collection
+    assert handles == []
+
+
+def test_analytics_handles_are_created_once(handles):
+    db.analytics(db.posts_collection)
+    db.for_workload(db.posts_collection, db.ANALYTICS)
+    assert handles == [("posts", {"read_preference": db._WORKLOAD_READ_PREFERENCES[db.ANALYTICS]})]
+
+
+def test_dashboard_reads_are_tagged_analytics(mongo, monkeypatch):
+    workloads = []
+    for_workload = db.for_workload
+
+    def recording(collection, workload=db.OLTP):
+        workloads.append((collection.name, workload))
+        return for_workload(collection, workload)
+
+    monkeypatch.setattr(db, "for_workload", recording)
+    db.get_user_scan_stats(str(ObjectId()))
+    db.get_forum_stats()
+    assert ("scans", db.ANALYTICS) in workloads
+    assert {("posts", db.ANALYTICS), ("comments", db.ANALYTICS), ("users", db.ANALYTICS)} <= set(workloads)
+    assert all(workload == db.ANALYTICS for _, workload in workloads)
@@ -0,0 +1,90 @@
+# backend/authapi/tests/test_scan_archive.py
+"""Retention tiering of scan payloads (see scan_archive)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import db
+import scan_archive
+from scan_schema import PAYLOAD_FIELDS, compact_fields
+
+DETECTION = {
+    "count": 1,
+    "objects": [{"class_id": 2, "class_name": "Puyat", "confidence": 0.75,
+                 "bbox": {"x1": 1.0, "y1": 2.0, "x2": 3.0, "y2": 4.0},
+                 "bbox_normalized": {"x": 0.5, "y": 0.5, "width": 0.25, "height": 0.25}}],
+}
+
+
+@pytest.fixture
+def scans(mongo):
+    """Two scans past the retention window (one still version 1) and a recent one"""
+    db._invalidate_scan_sources()
+    user_id = ObjectId()
+    old = datetime.utcnow() - timedelta(days=400)
+    ids = db.scans_collection.insert_many([
+        {"user_id": user_id, "variety": "Puyat", "quality_score": 75, "created_at": old, **compact_fields(DETECTION)},
+        {"user_id": user_id, "variety": "Puyat", "quality_score": 75, "created_at": old + timedelta(days=1),
+         "detection": DETECTION, "analysis": {"quality_score": 75}},
+        {"user_id": user_id, "variety": "Puyat", "quality_score": 75, "created_at": datetime.utcnow(), **compact_fields(DETECTION)},
+    ]).inserted_ids
+    yield ids
+    db._invalidate_scan_sources()
+
+
+def test_old_payloads_move_to_the_archive(scans):
+    compact, version_1, recent = scans
+    totals = scan_archive.run_archiver(retention_days=180, batch_size=1)
+    assert (totals["scans"], totals["batches"]) == (2, 2)
+    assert totals["bytes_archived"] > 0 and totals["bytes_reclaimed"] > 0
+
+    for scan_id in (compact, version_1):
+        stored = db.scans_collection.find_one({"_id": scan_id})
+        assert stored["archived_at"] and stored["variety"] == "Puyat"
+        assert not set(PAYLOAD_FIELDS) & set(stored)
+        assert db.scans_archive_collection.find_one({"_id": scan_id})["raw_bytes"] > 0
+    assert "boxes" in db.scans_collection.find_one({"_id": recent})
+    assert db.scans_archive_collection.count_documents({}) == 2
+
+    assert scan_archive.run_archiver(retention_days=180)["scans"] == 0
+
+
+def test_archived_scans_are_rehydrated_on_read(scans):
+    compact, version_1, _ = scans
+    scan_archive.run_archiver(retention_days=180)
+    for scan_id in (compact, version_1):
+        scan = db.get_scan_by_id(scan_id)
+        assert scan["detection"]["count"] == 1
+        assert scan["detection"]["primary"]["class_name"] == "Puyat"
+        assert scan["analysis"]["quality_score"] == 75
+
+
+def test_dry_run_measures_without_writing(scans):
+    totals = scan_archive.run_archiver(retention_days=180, dry_run=True)
+    assert totals["scans"] == 2
+    assert db.scans_archive_collection.count_documents({}) == 0
+    assert db.scans_collection.count_documents({"archived_at": {"$ne": None}}) == 0
+
+
+def test_interrupted_batch_is_redone(scans, monkeypatch):
+    compact, _, _ = scans
+    cutoff = datetime.utcnow() - timedelta(days=180)
+    # The archive copy lands, then the process dies before the scans are updated
+    monkeypatch.setattr(db.scans_collection, "bulk_write", lambda *args, **kwargs: None)
+    scan_archive.archive_batch(db.scans_collection, cutoff)
+    monkeypatch.undo()
+    assert "boxes" in db.scans_collection.find_one({"_id": compact})
+
+    assert scan_archive.archive_batch(db.scans_collection, cutoff)["scans"] == 2
+    assert db.scans_archive_collection.count_documents({}) == 2
+    assert db.get_scan_by_id(compact)["detection"]["count"] == 1
+
+
+def test_deleting_an_archived_scan_removes_its_payload(scans):
+    compact, _, _ = scans
+    user_id = str(db.scans_collection.find_one({"_id": compact})["user_id"])
+    scan_archive.run_archiver(retention_days=180)
+    assert db.delete_scan(str(compact), user_id)
+    assert db.scans_archive_collection.find_one({"_id": compact}) is None
@@ -0,0 +1,80 @@
+# backend/authapi/tests/test_scan_export.py
+"""Scan history export date ranges (see scanner_routes.export_scan_history)"""
+
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import db
+from db import parse_utc_datetime
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-05-01", datetime(2024, 5, 1)),
+    ("2024-05-01T08:30:00", datetime(2024, 5, 1, 8, 30)),
+    ("2024-05-01T00:00:00+00:00", datetime(2024, 5, 1)),
+    ("2024-05-01T00:00:00Z", datetime(2024, 5, 1)),
+    ("2024-05-01T08:00:00+08:00", datetime(2024, 5, 1)),
+    ("2024-04-30T19:00:00-05:00", datetime(2024, 5, 1)),
+])
+def test_parse_utc_datetime_returns_naive_utc(value, expected):
+    parsed = parse_utc_datetime(value)
+    assert parsed == expected and parsed.tzinfo is None
+
+
+@pytest.mark.parametrize("value", ["yesterday", "2024-13-01", ""])
+def test_parse_utc_datetime_rejects_garbage(value):
+    with pytest.raises(ValueError, match="Invalid from"):
+        parse_utc_datetime(value, "from")
+
+
+@pytest.fixture
+def monthly_scans(mongo, monkeypatch):
+    """Scans on both sides of the April/May and May/June partition bounds"""
+    monkeypatch.setattr(db, "SCAN_PARTITIONING", "monthly")
+    db._invalidate_scan_sources()
+    user_id = ObjectId()
+    for moment in (datetime(2024, 4, 30, 23), datetime(2024, 5, 1), datetime(2024, 5, 15), datetime(2024, 6, 1)):
+        db.scan_collection_for_write(moment).insert_one({"user_id": user_id, "created_at": moment, "variety": "D197"})
+    yield str(user_id)
+    db._invalidate_scan_sources()
+
+
+def test_offset_bounds_select_partitions_in_utc(monthly_scans):
+    # 08:00 at +08:00 is midnight UTC, so the April scan is out and the June one too
+    created_from = parse_utc_datetime("2024-05-01T08:00:00+08:00")
+    created_to = parse_utc_datetime("2024-06-01T00:00:00Z")
+    assert db.count_user_scans(monthly_scans, created_from, created_to) == 2
+    scans = list(db.iter_user_scans(monthly_scans, created_from, created_to))
+    assert [scan["created_at"] for scan in scans] == [datetime(2024, 5, 1), datetime(2024, 5, 15)]
+
+
+@pytest.fixture
+def scanner_client(mongo):
+    # The scanner blueprint loads the ML models at import
+    scanner_routes = pytest.importorskip("routes.scanner_routes", reason="needs the ML dependencies")
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.testing = True
+    app.register_blueprint(scanner_routes.scanner_bp, url_prefix="/scanner")
+    return app.test_client()
+
+
+def test_export_accepts_an_offset_bearing_from(scanner_client, monthly_scans):
+    response = scanner_client.get(
+        f"/scanner/export/{monthly_scans}",
+        query_string={"from": "2024-05-01T08:00:00+08:00", "to": "2024-06-01T00:00:00Z", "compress": "false"}
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+    assert len(rows) == 2
+
+
+def test_export_rejects_a_malformed_from(scanner_client, monthly_scans):
+    response = scanner_client.get(f"/scanner/export/{monthly_scans}", query_string={"from": "last week"})
+    assert response.status_code == 400
+    assert response.json["error"] == "Invalid from"
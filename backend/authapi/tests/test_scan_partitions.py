@@ -0,0 +1,122 @@
+# backend/authapi/tests/test_scan_partitions.py
+"""Monthly scan partitions (see db.scan_sources and scripts/scan_partitions.py)"""
+
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+import db
+from db_monitoring import round_trip_budget
+
+
+def _load_script(name):
+    path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _drop_partitions():
+    for name in db.db.list_collection_names():
+        if db.SCAN_PARTITION_RE.match(name) or name.startswith("archived_scans_"):
+            db.db[name].drop()
+    db._indexed_partitions.clear()
+    db._invalidate_scan_sources()
+
+
+@pytest.fixture
+def monthly(mongo, monkeypatch):
+    monkeypatch.setattr(db, "SCAN_PARTITIONING", "monthly")
+    _drop_partitions()
+    yield
+    _drop_partitions()
+
+
+def _scan(user_id, moment, **fields):
+    doc = {"_id": ObjectId.from_datetime(moment), "user_id": user_id, "created_at": moment, "variety": "D197", **fields}
+    db.scan_collection_for_write(moment).insert_one(doc)
+    return doc["_id"]
+
+
+def test_partition_names_and_bounds():
+    assert db.scan_partition_name(datetime(2024, 12, 31, 23, 59)) == "scans_2024_12"
+    assert db._partition_bounds("scans_2024_12") == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+
+def test_writes_land_in_their_month(monthly):
+    user_id = ObjectId()
+    _scan(user_id, datetime(2024, 4, 30, 23, 59))
+    _scan(user_id, datetime(2024, 5, 1))
+    assert db.db["scans_2024_04"].count_documents({}) == 1
+    assert db.db["scans_2024_05"].count_documents({}) == 1
+    assert db.scans_collection.count_documents({}) == 0
+    assert [c.name for c, _, _ in db.scan_sources(refresh=True)][1:] == ["scans_2024_05", "scans_2024_04"]
+
+
+def test_newest_scans_merge_partitions_and_stop_early(monthly):
+    user_id = ObjectId()
+    # A legacy scan from before partitioning was switched on
+    db.scans_collection.insert_one({"user_id": user_id, "created_at": datetime(2024, 2, 10), "variety": "Legacy"})
+    for moment in (datetime(2024, 3, 5), datetime(2024, 4, 2), datetime(2024, 4, 20)):
+        _scan(user_id, moment)
+    db._invalidate_scan_sources()
+
+    assert [s["created_at"] for s in db.get_user_scans(str(user_id), limit=10)] == [
+        datetime(2024, 4, 20), datetime(2024, 4, 2), datetime(2024, 3, 5), datetime(2024, 2, 10)
+    ]
+    db.scan_sources()
+    with round_trip_budget(3) as scope:
+        newest = db.get_user_scans(str(user_id), limit=2)
+    # This month's (empty) partition and April fill the page; March and the legacy collection are never read
+    assert [s["created_at"] for s in newest] == [datetime(2024, 4, 20), datetime(2024, 4, 2)]
+    assert scope.commands == [f"find {db.scan_partition_name(datetime.utcnow())}", "find scans_2024_04"]
+
+
+def test_lookup_by_id_tries_the_month_of_the_id(monthly):
+    user_id = ObjectId()
+    # created_at is stamped before the insert, so the id can be a month later
+    scan_id = ObjectId.from_datetime(datetime(2024, 5, 1, 0, 0, 1))
+    db.scan_collection_for_write(datetime(2024, 4, 30, 23, 59)).insert_one(
+        {"_id": scan_id, "user_id": user_id, "created_at": datetime(2024, 4, 30, 23, 59)}
+    )
+    assert db.get_scan_by_id(scan_id)["created_at"] == datetime(2024, 4, 30, 23, 59)
+
+
+def test_retire_renames_or_drops_a_past_month(monthly):
+    user_id = ObjectId()
+    kept = _scan(user_id, datetime(2024, 3, 5))
+    dropped = _scan(user_id, datetime(2024, 4, 5), archived_at=datetime(2024, 10, 1))
+    db.scans_archive_collection.insert_one({"_id": dropped, "payload": b""})
+
+    assert db.retire_scan_partition("scans_2024_03")["renamed_to"] == "archived_scans_2024_03"
+    assert db.db["archived_scans_2024_03"].find_one({"_id": kept})
+    assert db.retire_scan_partition("scans_2024_04", drop=True)["archived_payloads_removed"] == 1
+    assert "scans_2024_04" not in db.db.list_collection_names()
+    assert all(c.name not in ("scans_2024_03", "scans_2024_04") for c, _, _ in db.scan_sources())
+
+
+@pytest.mark.parametrize("name, message", [
+    ("users", "Not a scan partition"),
+    (db.scan_partition_name(datetime.utcnow()), "still receiving scans"),
+    ("scans_2001_01", "does not exist"),
+])
+def test_retire_refuses(monthly, name, message):
+    with pytest.raises(ValueError, match=message):
+        db.retire_scan_partition(name)
+
+
+def test_migrate_legacy_is_safe_to_rerun(monthly):
+    user_id = ObjectId()
+    scans = [{"user_id": user_id, "created_at": moment} for moment in (datetime(2024, 3, 5), datetime(2024, 4, 5))]
+    db.scans_collection.insert_many(scans)
+    # An interrupted run already copied the March scan
+    db.db["scans_2024_03"].insert_one(dict(scans[0]))
+
+    _load_script("scan_partitions").migrate_legacy(batch_size=1)
+    assert db.scans_collection.count_documents({}) == 0
+    assert db.db["scans_2024_03"].count_documents({}) == 1
+    assert db.db["scans_2024_04"].count_documents({}) == 1
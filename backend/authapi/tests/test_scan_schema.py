@@ -0,0 +1,110 @@
+# backend/authapi/tests/test_scan_schema.py
+"""Compact scan payloads and their archive blobs (see scan_schema)"""
+
+from datetime import datetime
+
+import pytest
+
+import db
+import scan_schema
+
+DETECTION = {
+    "count": 2,
+    "objects": [
+        {"class_id": 3, "class_name": "Musang King", "confidence": 0.912345678,
+         "bbox": {"x1": 10.5, "y1": 20.25, "x2": 300.125, "y2": 410.0},
+         "bbox_normalized": {"x": 0.123456789, "y": 0.5, "width": 0.25, "height": 0.75}},
+        {"class_id": 7, "class_name": "D.24", "confidence": 0.5,
+         "bbox": {"x1": 1.0, "y1": 2.0, "x2": 3.0, "y2": 4.0},
+         "bbox_normalized": {"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4}},
+    ],
+}
+
+
+def test_compact_fields_round_trip_at_float32_precision():
+    fields = scan_schema.compact_fields(DETECTION)
+    assert fields["schema_version"] == scan_schema.SCAN_SCHEMA_VERSION
+    assert len(fields["boxes"]) == 2 * 9 * 4 and len(fields["class_ids"]) == 2 * 2
+    assert fields["class_names"] == {"3": "Musang King", "7": "D.24"}
+
+    first, second = scan_schema.decode_objects(fields)
+    assert (first["class_id"], first["class_name"]) == (3, "Musang King")
+    assert first["confidence"] == pytest.approx(0.912345678, rel=1e-6)
+    assert first["bbox_normalized"]["x"] == pytest.approx(0.123456789, rel=1e-6)
+    # Values float32 holds exactly come back exactly
+    assert first["bbox"] == {"x1": 10.5, "y1": 20.25, "x2": 300.125, "y2": 410.0}
+    assert second["bbox_normalized"] == {"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4}
+
+
+def test_empty_detection_compacts_to_empty_binaries():
+    fields = scan_schema.compact_fields(None)
+    assert (bytes(fields["boxes"]), bytes(fields["class_ids"]), fields["class_names"]) == (b"", b"", {})
+    scan = scan_schema.expand_scan(dict(fields, quality_score=0))
+    assert scan["detection"] == {"count": 0, "objects": [], "primary": None}
+    assert scan["analysis"]["found"] is False
+
+
+def test_expand_restores_the_version_1_shape():
+    scan = dict(scan_schema.compact_fields(DETECTION), _id="scan", quality_score=88.8)
+    expanded = scan_schema.expand_scan(scan)
+    assert not set(scan_schema.COMPACT_FIELDS) & set(expanded)
+    assert expanded["detection"]["count"] == 2
+    assert expanded["detection"]["primary"]["class_name"] == "Musang King"
+    assert expanded["analysis"]["class_breakdown"] == {"Musang King": 1, "D.24": 1}
+    # The stored score wins over one recomputed from float32 boxes
+    assert expanded["analysis"]["quality_score"] == 88.8
+
+    version_1 = {"detection": DETECTION, "analysis": {"quality_score": 1}}
+    assert scan_schema.expand_scan(version_1) is version_1
+
+
+def test_truncated_payload_is_rejected():
+    fields = scan_schema.compact_fields(DETECTION)
+    fields["boxes"] = bytes(fields["boxes"])[:-1]
+    with pytest.raises(ValueError, match="Corrupt detection payload"):
+        scan_schema.decode_objects(fields)
+
+
+def test_upgrade_update_only_touches_version_1():
+    update = scan_schema.upgrade_update({"detection": DETECTION, "analysis": {}})
+    assert update["$unset"] == {"detection": "", "analysis": ""}
+    assert update["$set"]["class_names"] == {"3": "Musang King", "7": "D.24"}
+    assert scan_schema.upgrade_update(scan_schema.compact_fields(DETECTION)) is None
+    assert scan_schema.upgrade_update({"quality_score": 50}) is None
+
+
+@pytest.mark.parametrize("codec", [
+    "zlib",
+    pytest.param("zstd", marks=pytest.mark.skipif(scan_schema.zstandard is None, reason="zstandard not installed")),
+])
+def test_archive_blob_round_trip(codec):
+    fields = scan_schema.payload_fields({"detection": DETECTION, "analysis": {"found": True}, "variety": "Musang King"})
+    assert set(fields) == {"boxes", "class_ids", "class_names"}
+
+    packed = scan_schema.pack_payload(fields, codec)
+    assert packed["codec"] == codec and packed["raw_bytes"] > 0
+    unpacked = scan_schema.unpack_payload(packed)
+    # Subtype 0 binaries come back as plain bytes, which decode the same
+    assert scan_schema.decode_objects(unpacked) == scan_schema.decode_objects(fields)
+    assert unpacked["class_names"] == fields["class_names"]
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError, match="Unknown archive codec"):
+        scan_schema.pack_payload({}, "lz4")
+    with pytest.raises(ValueError, match="Unknown archive codec"):
+        scan_schema.unpack_payload({"codec": "lz4", "payload": b""})
+
+
+def test_reading_a_version_1_scan_rewrites_it(mongo):
+    scan_id = db.scans_collection.insert_one({
+        "variety": "Musang King", "quality_score": 91.2, "created_at": datetime.utcnow(),
+        "detection": DETECTION, "analysis": {"quality_score": 91.2}
+    }).inserted_id
+
+    scan = db.get_scan_by_id(scan_id)
+    assert scan["detection"]["objects"][0]["class_name"] == "Musang King"
+    stored = db.scans_collection.find_one({"_id": scan_id})
+    assert stored["schema_version"] == scan_schema.SCAN_SCHEMA_VERSION
+    assert "detection" not in stored and "analysis" not in stored
+    assert db.get_scan_by_id(scan_id)["detection"]["count"] == 2
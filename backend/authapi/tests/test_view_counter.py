@@ -0,0 +1,90 @@
+# backend/authapi/tests/test_view_counter.py
+"""Write-behind post view counters (see handlers/view_counter.py)"""
+
+import pytest
+
+import db
+from db_monitoring import round_trip_budget
+from handlers.view_counter import HyperLogLog, ViewCounter
+
+
+@pytest.fixture
+def counter():
+    # The flush thread never fires on its own; tests flush explicitly
+    counter = ViewCounter(mode="hits", flush_interval=3600)
+    yield counter
+    counter._stop.set()
+
+
+@pytest.fixture
+def posts(mongo):
+    return db.posts_collection.insert_many([{"title": "A", "views": 10}, {"title": "B"}]).inserted_ids
+
+
+def test_hits_are_coalesced_into_one_bulk_write(counter, posts):
+    first, second = posts
+    for _ in range(5):
+        counter.record(first)
+    counter.record(second)
+    counter.record(second)
+    assert counter.pending(first) == 5
+
+    with round_trip_budget(1) as scope:
+        assert counter.flush() == 2
+    assert scope.round_trips == 1
+    assert db.posts_collection.find_one({"_id": first})["views"] == 15
+    assert db.posts_collection.find_one({"_id": second})["views"] == 2
+    assert counter.pending(first) == 0
+    assert counter.flush() == 0
+
+
+def test_failed_flush_keeps_the_views(counter, posts, monkeypatch):
+    first, _ = posts
+    counter.record(first)
+    counter.record(first)
+
+    def fail(hits):
+        raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(counter, "_flush_hits", fail)
+    assert counter.flush() == 0
+    counter.record(first)
+    assert counter.pending(first) == 3
+
+    monkeypatch.undo()
+    assert counter.flush() == 1
+    assert db.posts_collection.find_one({"_id": first})["views"] == 13
+
+
+def test_unique_mode_counts_distinct_viewers(posts):
+    counter = ViewCounter(mode="unique", flush_interval=3600)
+    first, _ = posts
+    try:
+        for _ in range(3):
+            for viewer in range(400):
+                counter.record(first, f"viewer-{viewer}")
+        counter.flush()
+    finally:
+        counter._stop.set()
+    views = db.posts_collection.find_one({"_id": first})["views"]
+    assert 360 <= views <= 440
+
+
+def test_sketches_merge_like_a_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        (left if i % 2 else right).add(str(i))
+        union.add(str(i))
+    left.merge_registers(right.sparse())
+    assert left.registers == union.registers
+    assert abs(left.estimate() - 3000) < 3000 * 0.1
+
+
+def test_get_post_shows_buffered_views(counter, posts, monkeypatch):
+    import handlers.view_counter as view_counter
+
+    monkeypatch.setattr(view_counter, "view_counter", counter)
+    first, _ = posts
+    db.get_post(first)
+    assert db.get_post(first)["views"] == 12
+    assert db.posts_collection.find_one({"_id": first})["views"] == 10
@@ -31,7 +31,7 @@ interface ForumPost {
   replies: number;
   views: number;
   likes: number;
-  liked_by: string[];
+  liked_by_me?: boolean;
   is_pinned: boolean;
   timestamp: string;
   created_at: string;
@@ -46,7 +46,7 @@ interface Comment {
   post_id: string;
   content: string;
   likes: number;
-  liked_by: string[];
+  liked_by_me?: boolean;
   timestamp: string;
   created_at: string;
 }
@@ -68,6 +68,8 @@ export default function Forum({ embedded = false }: ForumProps) {
   const [comments, setComments] = useState<Comment[]>([]);
   const [newComment, setNewComment] = useState("");
   const [loadingComments, setLoadingComments] = useState(false);
+  const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
+  const [loadingMoreComments, setLoadingMoreComments] = useState(false);
   const [submittingComment, setSubmittingComment] = useState(false);
 
   // New Post state
@@ -89,7 +91,7 @@ export default function Forum({ embedded = false }: ForumProps) {
   const fetchPosts = async () => {
     try {
       setLoadingPosts(true);
-      const url = `${API_URL}/forum/posts?category=${selectedCategory}&search=${searchQuery}`;
+      const url = `${API_URL}/forum/posts?category=${selectedCategory}&search=${searchQuery}&user_id=${userId || ''}`;
       console.log('[CLIENT] fetchPosts url:', url);
 
       const response = await fetch(url, {
@@ -125,11 +127,16 @@ export default function Forum({ embedded = false }: ForumProps) {
     }
   };
 
-  // Fetch comments for a post
-  const fetchComments = async (postId: string) => {
+  // Fetch comments for a post; pass the cursor to append the next page
+  const fetchComments = async (postId: string, cursor: string | null = null) => {
     try {
-      setLoadingComments(true);
-      const response = await fetch(`${API_URL}/forum/posts/${postId}/comments`, {
+      if (cursor) {
+        setLoadingMoreComments(true);
+      } else {
+        setLoadingComments(true);
+      }
+      const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_URL}/forum/posts/${postId}/comments?user_id=${userId || ''}${cursorParam}`, {
         headers: {
           'ngrok-skip-browser-warning': 'true',
           'Accept': 'application/json',
@@ -138,13 +145,15 @@ export default function Forum({ embedded = false }: ForumProps) {
       const data = await response.json();
 
       if (data.success) {
-        setComments(data.comments);
+        setComments(prev => cursor ? [...prev, ...data.comments] : data.comments);
+        setCommentsCursor(data.next_cursor || null);
       }
     } catch (error) {
       console.error("Error fetching comments:", error);
       Alert.alert("Error", "Failed to load comments");
     } finally {
       setLoadingComments(false);
+      setLoadingMoreComments(false);
     }
   };
 
@@ -179,7 +188,11 @@ export default function Forum({ embedded = false }: ForumProps) {
       });
       const data = await response.json();
       if (data.success) {
-        setComments([...comments, data.comment]);
+        // Oldest first: while older pages are still unloaded, the new
+        // comment arrives with the last page instead
+        if (!commentsCursor) {
+          setComments([...comments, data.comment]);
+        }
         setNewComment("");
         setPosts(posts.map(post =>
           post._id === selectedPost._id
@@ -282,7 +295,7 @@ export default function Forum({ embedded = false }: ForumProps) {
         // Update post in local state
         setPosts(posts.map(post =>
           post._id === postId
-            ? { ...post, likes: data.likes, liked: data.liked }
+            ? { ...post, likes: data.likes, liked_by_me: data.liked }
             : post
         ));
       }
@@ -314,7 +327,7 @@ export default function Forum({ embedded = false }: ForumProps) {
         // Update comment in local state
         setComments(comments.map(comment =>
           comment._id === commentId
-            ? { ...comment, likes: data.likes }
+            ? { ...comment, likes: data.likes, liked_by_me: data.liked }
             : comment
         ));
       }
@@ -327,6 +340,8 @@ export default function Forum({ embedded = false }: ForumProps) {
   const openCommentsModal = (post: ForumPost) => {
     setSelectedPost(post);
     setShowCommentsModal(true);
+    setComments([]);
+    setCommentsCursor(null);
     fetchComments(post._id);
   };
 
@@ -539,9 +554,9 @@ export default function Forum({ embedded = false }: ForumProps) {
                         onPress={() => handleLikePost(post._id)}
                       >
                         <Ionicons
-                          name={post.liked_by?.includes(userId || "") ? "heart" : "heart-outline"}
+                          name={post.liked_by_me ? "heart" : "heart-outline"}
                           size={18}
-                          color={post.liked_by?.includes(userId || "") ? "#ef4444" : "#64748b"}
+                          color={post.liked_by_me ? "#ef4444" : "#64748b"}
                         />
                         <Text style={styles.statText}>{formatNumber(post.likes)}</Text>
                       </TouchableOpacity>
@@ -701,9 +716,9 @@ export default function Forum({ embedded = false }: ForumProps) {
                         onPress={() => handleLikeComment(comment._id)}
                       >
                         <Ionicons
-                          name={comment.liked_by?.includes(userId || "") ? "heart" : "heart-outline"}
+                          name={comment.liked_by_me ? "heart" : "heart-outline"}
                           size={16}
-                          color={comment.liked_by?.includes(userId || "") ? "#ef4444" : "#64748b"}
+                          color={comment.liked_by_me ? "#ef4444" : "#64748b"}
                         />
                         <Text style={styles.commentLikeCount}>{comment.likes}</Text>
                       </TouchableOpacity>
@@ -711,6 +726,19 @@ export default function Forum({ embedded = false }: ForumProps) {
                   </View>
                 ))
               )}
+              {!loadingComments && commentsCursor && selectedPost && (
+                <TouchableOpacity
+                  style={styles.loadMoreComments}
+                  onPress={() => fetchComments(selectedPost._id, commentsCursor)}
+                  disabled={loadingMoreComments}
+                >
+                  {loadingMoreComments ? (
+                    <ActivityIndicator size="small" color="#16a34a" />
+                  ) : (
+                    <Text style={styles.loadMoreCommentsText}>Load more comments</Text>
+                  )}
+                </TouchableOpacity>
+              )}
             </ScrollView>
 
             {/* Comment Input */}
@@ -29,6 +29,10 @@ import { styles } from '@/styles/Profile.styles';
 import { Fonts, Palette } from '@/constants/theme';
 import { useUser } from '@/contexts/UserContext';
 
+// Background photo processing usually takes a few seconds; retries can take ~40s
+const PHOTO_POLL_INTERVAL_MS = 2000;
+const PHOTO_POLL_ATTEMPTS = 30;
+
 export default function Profile() {
   const { user, loading: userLoading, refreshUser, logout } = useUser();
   const [name, setName] = useState('');
@@ -169,6 +173,49 @@ export default function Profile() {
     }
   };
 
+  // The server resizes and uploads the photo in the background (202 + photoPending).
+  // Poll the profile until the photo submitted at `submittedAt` (or a newer one) is applied.
+  const waitForProcessedPhoto = async (submittedAt: string) => {
+    const token = await AsyncStorage.getItem('jwt_token');
+    const userId = await AsyncStorage.getItem('user_id');
+    for (let attempt = 0; attempt < PHOTO_POLL_ATTEMPTS; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, PHOTO_POLL_INTERVAL_MS));
+      try {
+        const res = await axios.get(`${API_URL}/profile/${userId}`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        // Both timestamps are fixed-width ISO strings, so they compare as strings
+        if (res.data.photoUpdatedAt && res.data.photoUpdatedAt >= submittedAt) {
+          return res.data;
+        }
+      } catch (error) {
+        console.log('Photo status check failed, retrying');
+      }
+    }
+    return null;
+  };
+
+  const applyUploadedPhoto = async (uploadResult: any) => {
+    const photo = uploadResult.photoPending
+      ? await waitForProcessedPhoto(uploadResult.photoSubmittedAt)
+      : uploadResult;
+    if (!photo) {
+      Alert.alert('Processing', 'Your new photo is still being processed and will appear shortly.');
+      return;
+    }
+
+    setPhotoUri(photo.photoProfile);
+    setPhotoPublicId(photo.photoPublicId || '');
+
+    await AsyncStorage.setItem('photoProfile', photo.photoProfile);
+    if (photo.photoPublicId) {
+      await AsyncStorage.setItem('photoPublicId', photo.photoPublicId);
+    }
+    await refreshUser();
+
+    Alert.alert('Success', 'Profile photo updated!');
+  };
+
   const pickImageFromGallery = async () => {
     try {
       setUploadingPhoto(true);
@@ -186,14 +233,7 @@ export default function Profile() {
               const result = e.target?.result as string;
               try {
                 const uploadResult = await uploadPhotoToCloudinary(result);
-
-                setPhotoUri(uploadResult.photoProfile);
-                setPhotoPublicId(uploadResult.photoPublicId);
-
-                await AsyncStorage.setItem('photoProfile', uploadResult.photoProfile);
-                await AsyncStorage.setItem('photoPublicId', uploadResult.photoPublicId);
-
-                Alert.alert('Success', 'Profile photo updated!');
+                await applyUploadedPhoto(uploadResult);
               } catch (error) {
                 Alert.alert('Error', 'Failed to upload photo');
               }
@@ -214,14 +254,7 @@ export default function Profile() {
         if (!result.canceled && result.assets[0].uri) {
           try {
             const uploadResult = await uploadPhotoToCloudinary(result.assets[0].uri);
-
-            setPhotoUri(uploadResult.photoProfile);
-            setPhotoPublicId(uploadResult.photoPublicId);
-
-            await AsyncStorage.setItem('photoProfile', uploadResult.photoProfile);
-            await AsyncStorage.setItem('photoPublicId', uploadResult.photoPublicId);
-
-            Alert.alert('Success', 'Profile photo updated!');
+            await applyUploadedPhoto(uploadResult);
           } catch (error) {
             Alert.alert('Error', 'Failed to upload photo');
           }
@@ -255,14 +288,7 @@ export default function Profile() {
       if (!result.canceled && result.assets[0].uri) {
         try {
           const uploadResult = await uploadPhotoToCloudinary(result.assets[0].uri);
-
-          setPhotoUri(uploadResult.photoProfile);
-          setPhotoPublicId(uploadResult.photoPublicId);
-
-          await AsyncStorage.setItem('photoProfile', uploadResult.photoProfile);
-          await AsyncStorage.setItem('photoPublicId', uploadResult.photoPublicId);
-
-          Alert.alert('Success', 'Profile photo updated!');
+          await applyUploadedPhoto(uploadResult);
         } catch (error) {
           Alert.alert('Error', 'Failed to upload photo');
         }
@@ -315,10 +341,6 @@ export default function Profile() {
         updateData.password = password;
       }
 
-      if (photoPublicId) {
-        updateData.photoPublicId = photoPublicId;
-      }
-
       await axios.put(
         `${API_URL}/profile/${storedId}`,
         updateData,
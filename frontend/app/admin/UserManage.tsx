@@ -20,6 +20,8 @@ import AdminSidebar from '@/components/admin/AdminSidebar';
 import { Fonts, Palette } from '@/constants/theme';
 import { Ionicons } from '@expo/vector-icons';
 
+const USERS_PAGE_SIZE = 50;
+
 // Interface for User Data
 interface User {
     _id: string;
@@ -44,11 +46,21 @@ export default function UserManage() {
     const [deactivateReason, setDeactivateReason] = useState('');
     const [userToDeactivate, setUserToDeactivate] = useState<User | null>(null);
     const [deactivating, setDeactivating] = useState(false);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [totalUsers, setTotalUsers] = useState<number | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
-    // Fetch users from backend
-    const fetchUsers = () => {
-        setLoading(true);
-        fetch(`${API_URL}/admin/users`, {
+    // Fetch users from backend, one page at a time; pass the cursor to append the next page
+    const fetchUsers = (cursor: string | null = null) => {
+        if (cursor) {
+            setLoadingMore(true);
+        } else {
+            setLoading(true);
+        }
+        const params = new URLSearchParams({ limit: String(USERS_PAGE_SIZE) });
+        if (!showDeactivated) params.append('active', 'true');
+        if (cursor) params.append('cursor', cursor);
+        fetch(`${API_URL}/admin/users?${params.toString()}`, {
             headers: {
                 'ngrok-skip-browser-warning': 'true',
                 'Accept': 'application/json',
@@ -63,13 +75,25 @@ export default function UserManage() {
                     ...user,
                     _id: user._id || user.id,
                 }));
-                setUsers(normalizedUsers);
+                setUsers((prev) => cursor ? [...prev, ...normalizedUsers] : normalizedUsers);
+                setNextCursor(data.next_cursor || null);
+                if (!cursor) setTotalUsers(typeof data.total === 'number' ? data.total : null);
             })
             .catch((err) => {
                 console.error('Fetch Users Error:', err);
                 Alert.alert('Error', 'Failed to fetch users list.');
             })
-            .finally(() => setLoading(false));
+            .finally(() => {
+                setLoading(false);
+                setLoadingMore(false);
+            });
+    };
+
+    // Apply a change to one loaded user without reloading every page
+    const updateLocalUser = (userId: string, changes: Partial<User>) => {
+        setUsers((prev) => prev
+            .map((u) => u._id === userId ? { ...u, ...changes } : u)
+            .filter((u) => showDeactivated || u.isActive !== false));
     };
 
     // Update user role
@@ -86,7 +110,7 @@ export default function UserManage() {
             .then((data) => {
                 if (data.success) {
                     Alert.alert('Success', `User is now an ${newRole}.`);
-                    fetchUsers();
+                    updateLocalUser(userId, { role: newRole });
                 } else {
                     Alert.alert('Error', data.error || 'Failed to update role.');
                 }
@@ -129,8 +153,8 @@ export default function UserManage() {
             .then((data) => {
                 if (data.success) {
                     Alert.alert('Success', 'User deactivated and notified via email.');
+                    updateLocalUser(userToDeactivate._id, { isActive: false });
                     closeDeactivateModal();
-                    fetchUsers();
                 } else {
                     Alert.alert('Error', data.error || 'Failed to deactivate user.');
                 }
@@ -154,7 +178,7 @@ export default function UserManage() {
             .then((data) => {
                 if (data.success) {
                     Alert.alert('Success', 'User reactivated.');
-                    fetchUsers();
+                    updateLocalUser(userId, { isActive: true });
                 } else {
                     Alert.alert('Error', data.error || 'Failed to reactivate user.');
                 }
@@ -165,9 +189,10 @@ export default function UserManage() {
             });
     };
 
+    // The server filters deactivated users, so toggling reloads from the first page
     useEffect(() => {
         fetchUsers();
-    }, []);
+    }, [showDeactivated]);
 
     if (loading && users.length === 0) {
         return (
@@ -226,10 +251,14 @@ export default function UserManage() {
                             </TouchableOpacity>
                         </View>
 
-                        {(showDeactivated ? users : users.filter((u) => u.isActive !== false)).length === 0 ? (
+                        {totalUsers !== null && users.length > 0 && (
+                            <Text style={styles.userEmail}>Showing {users.length} of {totalUsers} users</Text>
+                        )}
+
+                        {users.length === 0 ? (
                             <Text style={styles.emptyText}>No users found.</Text>
                         ) : (
-                            (showDeactivated ? users : users.filter((u) => u.isActive !== false)).map((user) => (
+                            users.map((user) => (
                                 <View key={user._id} style={styles.userRow}>
                                     <View style={styles.userInfo}>
                                         <Text style={styles.userName}>{user.name}</Text>
@@ -285,6 +314,20 @@ export default function UserManage() {
                                 </View>
                             ))
                         )}
+
+                        {nextCursor && (
+                            <TouchableOpacity
+                                style={[styles.retryBtn, { alignSelf: 'center', marginTop: 16 }]}
+                                onPress={() => fetchUsers(nextCursor)}
+                                disabled={loadingMore}
+                            >
+                                {loadingMore ? (
+                                    <ActivityIndicator size="small" color={Palette.warmCopper} />
+                                ) : (
+                                    <Text style={styles.retryBtnText}>Load More Users</Text>
+                                )}
+                            </TouchableOpacity>
+                        )}
                     </View>
                 </ScrollView>
 
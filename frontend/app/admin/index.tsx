@@ -112,6 +112,8 @@ const modalStyles = RNStyleSheet.create({
   },
 });
 
+const USERS_PAGE_SIZE = 50;
+
 interface User {
   _id: string;
   id: string;
@@ -152,6 +154,9 @@ export default function Admin() {
   const [deactivateReason, setDeactivateReason] = useState('');
   const [userToDeactivate, setUserToDeactivate] = useState<User | null>(null);
   const [deactivating, setDeactivating] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [totalUsers, setTotalUsers] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Fetch backend status
   const fetchStatus = () => {
@@ -177,10 +182,17 @@ export default function Admin() {
       .finally(() => setLoading(false));
   };
 
-  // Fetch users from backend
-  const fetchUsers = () => {
-    setLoading(true);
-    fetch(`${API_URL}/admin/users`, {
+  // Fetch users from backend, one page at a time; pass the cursor to append the next page
+  const fetchUsers = (cursor: string | null = null) => {
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
+    const params = new URLSearchParams({ limit: String(USERS_PAGE_SIZE) });
+    if (!showDeactivated) params.append('active', 'true');
+    if (cursor) params.append('cursor', cursor);
+    fetch(`${API_URL}/admin/users?${params.toString()}`, {
       headers: {
         'ngrok-skip-browser-warning': 'true',
         'Accept': 'application/json',
@@ -195,14 +207,26 @@ export default function Admin() {
           ...user,
           _id: user._id || user.id,
         }));
-        setUsers(normalizedUsers);
+        setUsers((prev) => cursor ? [...prev, ...normalizedUsers] : normalizedUsers);
+        setNextCursor(data.next_cursor || null);
+        if (!cursor) setTotalUsers(typeof data.total === 'number' ? data.total : null);
         setError(null);
       })
       .catch((err) => {
         console.error('Fetch Users Error:', err);
         setError('Failed to fetch users.');
       })
-      .finally(() => setLoading(false));
+      .finally(() => {
+        setLoading(false);
+        setLoadingMore(false);
+      });
+  };
+
+  // Apply a change to one loaded user without reloading every page
+  const updateLocalUser = (userId: string, changes: Partial<User>) => {
+    setUsers((prev) => prev
+      .map((u) => u._id === userId ? { ...u, ...changes } : u)
+      .filter((u) => showDeactivated || u.isActive !== false));
   };
 
   // Logout handler
@@ -230,7 +254,7 @@ export default function Admin() {
       .then((data) => {
         if (data.success) {
           Alert.alert('Success', `User is now an ${newRole}.`);
-          fetchUsers();
+          updateLocalUser(userId, { role: newRole });
         } else {
           Alert.alert('Error', data.error || 'Failed to update role.');
         }
@@ -280,8 +304,8 @@ export default function Admin() {
       .then((data) => {
         if (data.success) {
           Alert.alert('Success', 'User deactivated and notified via email.');
+          updateLocalUser(userToDeactivate._id, { isActive: false });
           closeDeactivateModal();
-          fetchUsers();
         } else {
           Alert.alert('Error', data.error || 'Failed to deactivate user.');
         }
@@ -305,7 +329,7 @@ export default function Admin() {
       .then((data) => {
         if (data.success) {
           Alert.alert('Success', 'User reactivated.');
-          fetchUsers();
+          updateLocalUser(userId, { isActive: true });
         } else {
           Alert.alert('Error', data.error || 'Failed to reactivate user.');
         }
@@ -318,9 +342,13 @@ export default function Admin() {
 
   useEffect(() => {
     fetchStatus();
-    fetchUsers();
   }, []);
 
+  // The server filters deactivated users, so toggling reloads from the first page
+  useEffect(() => {
+    fetchUsers();
+  }, [showDeactivated]);
+
   if (loading && users.length === 0) {
     return (
       <View style={styles.centeredContainer}>
@@ -397,10 +425,14 @@ export default function Admin() {
               </Text>
             </TouchableOpacity>
 
-            {(showDeactivated ? users : users.filter((u) => u.isActive !== false)).length === 0 ? (
+            {totalUsers !== null && users.length > 0 && (
+              <Text style={styles.userEmail}>Showing {users.length} of {totalUsers} users</Text>
+            )}
+
+            {users.length === 0 ? (
               <Text style={styles.emptyText}>No users found.</Text>
             ) : (
-              (showDeactivated ? users : users.filter((u) => u.isActive !== false)).map((user) => (
+              users.map((user) => (
                 <View key={user._id} style={styles.userRow}>
                   <View style={styles.userInfo}>
                     <Text style={styles.userName}>{user.name}</Text>
@@ -444,6 +476,20 @@ export default function Admin() {
                 </View>
               ))
             )}
+
+            {nextCursor && (
+              <TouchableOpacity
+                style={[styles.retryBtn, { alignSelf: 'center', marginTop: 16 }]}
+                onPress={() => fetchUsers(nextCursor)}
+                disabled={loadingMore}
+              >
+                {loadingMore ? (
+                  <ActivityIndicator size="small" color={Palette.warmCopper} />
+                ) : (
+                  <Text style={styles.retryBtnText}>Load More Users</Text>
+                )}
+              </TouchableOpacity>
+            )}
           </View>
         </ScrollView>
 
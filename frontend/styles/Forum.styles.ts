@@ -719,6 +719,17 @@ const styles = StyleSheet.create({
     color: colors.gray500,
   },
 
+  loadMoreComments: {
+    paddingVertical: 14,
+    alignItems: 'center',
+  },
+
+  loadMoreCommentsText: {
+    fontSize: scale(14),
+    fontFamily: Fonts.semiBold,
+    color: colors.primary,
+  },
+
   // ========== COMMENT INPUT ==========
   commentInputContainer: {
     flexDirection: 'row',